@@ -0,0 +1,376 @@
+# hot-loop allocation profiler: python allocations per frame and per render pass
+# - tracemalloc: transient peak bytes of each frame/pass (temporaries freed before the
+#   frame ends) and, on sampled frames, snapshot diffs of what a frame leaves behind
+# - gc callbacks: collections and pause time, how the churn turns into hitches
+# - sampled frames also count cffi allocations (rl.Vector3(...), rl.matrix_*() results,
+#   ffi.new pointers) per call site through sys.setprofile, too slow for every frame
+#
+# cpython only exposes live block counts, so "blocks" is what a frame retains (0 in a
+# steady state), churn shows up in "cdata" and "peak_kib"
+
+import argparse
+import gc
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+import pyray as rl
+import raylib as nrl
+
+import numpy as np
+
+from renderer import *
+
+ffi = nrl.ffi
+
+# per frame: cffi allocations (sampled frames), net blocks, transient peak, gc runs
+ALLOCATION_METRICS = ("cdata", "blocks", "peak_kib", "gc_collections")
+
+# gate: a metric fails when it exceeds baseline * (1 + tolerance) + slack
+ALLOCATION_GATE_SLACK = {"cdata": 0.0, "blocks": 2.0, "peak_kib": 16.0}
+
+
+def _take_snapshot():
+    # without tracemalloc's and the profiler's own bookkeeping
+    return tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        )
+    )
+
+
+def _site(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{frame.f_lineno} in {code.co_name}"
+
+
+def _is_pyray(frame) -> bool:
+    return frame is not None and frame.f_globals.get("__name__") == "pyray"
+
+
+class AllocationFrame:
+    def __init__(self, frame_index):
+        self.frame_index = frame_index
+        self.blocks = 0
+        self.peak_bytes = 0
+        self.gc_collections = 0
+        self.gc_ms = 0.0
+        # None on frames without the profile hook
+        self.cdata = None
+        # pass name -> {"blocks": .., "peak_bytes": .., "cdata": ..}
+        self.passes = {}
+
+    def metric(self, name: str):
+        if name == "peak_kib":
+            return self.peak_bytes / 1024.0
+        return getattr(self, name)
+
+
+class AllocationProfiler:
+    def __init__(self, sample_interval: int = 30, trace_depth: int = 1, top: int = 10):
+        # every n-th frame runs the profile hook and the tracemalloc snapshots
+        self.sample_interval = sample_interval
+        self.trace_depth = trace_depth
+        self.top = top
+        self.frames = []
+        # (pass name, site) -> cffi allocations over all sampled frames
+        self.site_counts = {}
+        # traceback -> [blocks, bytes] retained over all sampled frames
+        self.retained = {}
+
+        self.frame = None
+        self.frame_bytes = 0
+        self.frame_blocks = 0
+        self.frame_peak = 0
+        self.snapshot = None
+        self.pass_name = None
+        self.pass_bytes = 0
+        self.pass_blocks = 0
+        self.pass_cdata = 0
+        self.gc_begin = 0.0
+
+    def start(self):
+        tracemalloc.start(self.trace_depth)
+        gc.callbacks.append(self._on_gc)
+
+    def stop(self):
+        sys.setprofile(None)
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        tracemalloc.stop()
+
+    def _on_gc(self, phase, info):
+        if self.frame is None:
+            return
+        if phase == "start":
+            self.gc_begin = time.perf_counter()
+        else:
+            self.frame.gc_collections += 1
+            self.frame.gc_ms += (time.perf_counter() - self.gc_begin) * 1000.0
+
+    def _on_profile(self, frame, event, arg):
+        # pyray wrappers returning a struct, and ffi.new calls made outside of pyray
+        if event == "return":
+            if (
+                isinstance(arg, ffi.CData)
+                and _is_pyray(frame)
+                and not _is_pyray(frame.f_back)
+            ):
+                self._count(frame.f_back)
+        elif event == "c_call":
+            if (
+                getattr(arg, "__self__", None) is ffi
+                and arg.__name__ == "new"
+                and not _is_pyray(frame)
+            ):
+                self._count(frame)
+
+    def _count(self, frame):
+        key = (self.pass_name, _site(frame))
+        self.site_counts[key] = self.site_counts.get(key, 0) + 1
+        self.frame.cdata += 1
+
+    def _fold_peak(self):
+        # tracemalloc keeps a single peak: fold it into the frame before resetting it
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        self.frame_peak = max(self.frame_peak, peak)
+        return peak
+
+    def begin_frame(self):
+        self.frame = AllocationFrame(len(self.frames))
+        if self.frame.frame_index % self.sample_interval == 0:
+            self.snapshot = _take_snapshot()
+            self.frame.cdata = 0
+            sys.setprofile(self._on_profile)
+        tracemalloc.reset_peak()
+        self.frame_bytes = tracemalloc.get_traced_memory()[0]
+        self.frame_peak = self.frame_bytes
+        self.frame_blocks = sys.getallocatedblocks()
+
+    def begin_pass(self, name: str):
+        # ends the previous pass, passes run back to back until end_frame()
+        self._end_pass()
+        if self.frame is None:
+            return
+        self._fold_peak()
+        self.pass_name = name
+        self.pass_bytes = tracemalloc.get_traced_memory()[0]
+        self.pass_blocks = sys.getallocatedblocks()
+        self.pass_cdata = self.frame.cdata or 0
+
+    def _end_pass(self):
+        if self.pass_name is None:
+            return
+        peak = self._fold_peak()
+        entry = self.frame.passes.setdefault(
+            self.pass_name, {"blocks": 0, "peak_bytes": 0, "cdata": 0}
+        )
+        entry["blocks"] += sys.getallocatedblocks() - self.pass_blocks
+        entry["peak_bytes"] = max(entry["peak_bytes"], peak - self.pass_bytes)
+        if self.frame.cdata is not None:
+            entry["cdata"] += self.frame.cdata - self.pass_cdata
+        self.pass_name = None
+
+    def end_frame(self):
+        self._end_pass()
+        if self.frame is None:
+            return
+        frame = self.frame
+        if frame.cdata is not None:
+            sys.setprofile(None)
+        frame.blocks = sys.getallocatedblocks() - self.frame_blocks
+        self._fold_peak()
+        frame.peak_bytes = self.frame_peak - self.frame_bytes
+
+        if self.snapshot is not None:
+            for stat in _take_snapshot().compare_to(self.snapshot, "traceback"):
+                if stat.count_diff <= 0:
+                    continue
+                key = str(stat.traceback)
+                entry = self.retained.setdefault(key, [0, 0])
+                entry[0] += stat.count_diff
+                entry[1] += stat.size_diff
+            self.snapshot = None
+
+        self.frames.append(frame)
+        self.frame = None
+
+    def summary(self) -> dict:
+        # mean per frame of every metric, cdata over sampled frames only
+        summary = {"frames": len(self.frames)}
+        for metric in ALLOCATION_METRICS:
+            values = [
+                frame.metric(metric)
+                for frame in self.frames
+                if frame.metric(metric) is not None
+            ]
+            summary[metric] = float(np.mean(values)) if values else 0.0
+        sampled = [frame for frame in self.frames if frame.cdata is not None]
+        summary["passes"] = {}
+        for frame in sampled:
+            for name, entry in frame.passes.items():
+                summary["passes"][name] = summary["passes"].get(name, 0.0) + entry[
+                    "cdata"
+                ] / len(sampled)
+        return summary
+
+    def report(self):
+        if not self.frames:
+            return
+        sampled = sum(frame.cdata is not None for frame in self.frames)
+        print(f"allocations: {len(self.frames)} frames, {sampled} sampled")
+        for metric in ALLOCATION_METRICS:
+            values = [
+                frame.metric(metric)
+                for frame in self.frames
+                if frame.metric(metric) is not None
+            ]
+            if not values:
+                continue
+            print(
+                f"  {metric:<16} mean {np.mean(values):10.1f}  "
+                f"p95 {np.percentile(values, 95):10.1f}  max {np.max(values):10.1f}"
+            )
+        gc_ms = [frame.gc_ms for frame in self.frames]
+        print(f"  {'gc_ms':<16} total {np.sum(gc_ms):9.1f}  max {np.max(gc_ms):10.2f}")
+
+        # per pass: mean cffi allocations, retained blocks and peak
+        passes = {}
+        for frame in self.frames:
+            for name, entry in frame.passes.items():
+                passes.setdefault(name, []).append(entry)
+        if passes:
+            print("  pass             cdata   blocks   peak_kib")
+        for name, entries in passes.items():
+            cdata = [entry["cdata"] for entry in entries]
+            print(
+                f"  {name:<14} {np.mean(cdata) if sampled else 0.0:7.1f} "
+                f"{np.mean([entry['blocks'] for entry in entries]):8.1f} "
+                f"{np.mean([entry['peak_bytes'] for entry in entries]) / 1024.0:10.1f}"
+            )
+
+        if self.site_counts:
+            print("  top cffi allocation sites (per sampled frame):")
+            for (name, site), count in sorted(
+                self.site_counts.items(), key=lambda item: -item[1]
+            )[: self.top]:
+                print(f"    {count / sampled:8.1f}  [{name or '-'}] {site}")
+        if self.retained:
+            print("  top retained sites (blocks per sampled frame):")
+            for traceback, (blocks, size) in sorted(
+                self.retained.items(), key=lambda item: -item[1][1]
+            )[: self.top]:
+                print(
+                    f"    {blocks / sampled:8.1f}  {size / sampled:8.0f}B  {traceback}"
+                )
+
+
+def check_allocation_baseline(
+    summary: dict, path: str, tolerance: float = 0.05, update: bool = False
+) -> bool:
+    # regression gate: False when a metric or a pass exceeds its stored baseline
+    # - update=True records the summary as the new baseline instead
+    # - a missing baseline fails, the gate must not pass by writing its own reference
+    if update:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(summary, file, indent=2, sort_keys=True)
+        print(f"allocation baseline written: {path}")
+        return True
+    if not os.path.exists(path):
+        print(f"allocation baseline missing: {path}, record it with --update-baseline")
+        return False
+
+    with open(path) as file:
+        baseline = json.load(file)
+    passed = True
+    for metric, slack in ALLOCATION_GATE_SLACK.items():
+        limit = baseline[metric] * (1.0 + tolerance) + slack
+        failed = summary[metric] > limit
+        passed = passed and not failed
+        print(
+            f"  {metric:<16} {summary[metric]:10.1f}  baseline {baseline[metric]:10.1f}"
+            f"  limit {limit:10.1f}  {'FAIL' if failed else 'ok'}"
+        )
+    for name, cdata in summary["passes"].items():
+        previous = baseline["passes"].get(name)
+        if previous is not None and cdata > previous * (1.0 + tolerance):
+            passed = False
+            print(
+                f"  pass {name}: {cdata:.1f} cffi allocations, baseline {previous:.1f}"
+                "  FAIL"
+            )
+    return passed
+
+
+def benchmark_allocations(
+    width: int = 640,
+    height: int = 360,
+    warmup_frames: int = 30,
+    frames: int = 120,
+    baseline_path: str = "./benchmarks/allocation_baseline.json",
+    tolerance: float = 0.05,
+    update_baseline: bool = False,
+) -> bool:
+    # steady-state loop on an orbiting camera, every frame sampled so counts are exact
+    rl.set_trace_log_level(rl.LOG_WARNING)
+    rl.set_config_flags(rl.FLAG_WINDOW_HIDDEN)
+    rl.init_window(width, height, b"SseEngine Allocations")
+    rl.set_target_fps(0)
+
+    renderer = Renderer(width, height)
+    camera3d = rl.Camera3D()
+    camera3d.target = rl.Vector3(0.0, 0.5, 0.0)
+    camera3d.up = rl.Vector3(0.0, 1.0, 0.0)
+    camera3d.fovy = 45.0
+    camera3d.projection = rl.CAMERA_PERSPECTIVE
+
+    profiler = AllocationProfiler(sample_interval=1)
+    renderer.alloc_profiler = profiler
+    for frame_index in range(warmup_frames + frames):
+        if frame_index == warmup_frames:
+            profiler.start()
+        angle = 2.0 * math.pi * frame_index / (warmup_frames + frames)
+        camera3d.position = rl.Vector3(
+            5.0 * math.cos(angle), 3.0, 5.0 * math.sin(angle)
+        )
+        if frame_index >= warmup_frames:
+            profiler.begin_frame()
+        rl.begin_drawing()
+        renderer.render(camera3d)
+        renderer.render_final()
+        rl.end_drawing()
+        profiler.end_frame()
+    profiler.stop()
+    renderer.alloc_profiler = None
+
+    renderer.unload()
+    gpu_resources.check_leaks()
+    rl.close_window()
+
+    profiler.report()
+    return check_allocation_baseline(
+        profiler.summary(), baseline_path, tolerance, update_baseline
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SseEngine allocation gate")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--baseline", default="./benchmarks/allocation_baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.05)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    passed = benchmark_allocations(
+        frames=args.frames,
+        baseline_path=args.baseline,
+        tolerance=args.tolerance,
+        update_baseline=args.update_baseline,
+    )
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,411 @@
+import argparse
+import concurrent.futures
+import json
+import math
+import os
+import struct
+import time
+
+import pyray as rl
+
+import numpy as np
+
+from renderer import *
+from readback import *
+
+# pose layout: position(3), target(3), up(3), fovy(1)
+CAMERA_POSE_SIZE = 10
+
+# outputs read back per pose
+BATCH_OUTPUTS = ("color", "depth", "normal")
+
+# openexr pixel types
+EXR_PIXEL_TYPE_FLOAT = 2
+
+
+def load_camera_poses(path: str):
+    # .json: [{"position": [..], "target": [..], "up": [..], "fovy": 45.0}, ..]
+    # .csv/.txt: one pose per row (header lines starting with '#' are skipped)
+    # .npy: (N, 10) float array
+    if path.endswith(".json"):
+        with open(path, "r") as file:
+            entries = json.load(file)
+        poses = np.zeros((len(entries), CAMERA_POSE_SIZE), dtype=np.float32)
+        for index, entry in enumerate(entries):
+            poses[index, 0:3] = entry["position"]
+            poses[index, 3:6] = entry["target"]
+            poses[index, 6:9] = entry.get("up", (0.0, 1.0, 0.0))
+            poses[index, 9] = entry.get("fovy", 45.0)
+        return poses
+
+    if path.endswith(".npy"):
+        poses = np.load(path).astype(np.float32)
+    else:
+        poses = np.loadtxt(path, dtype=np.float32, delimiter=",", ndmin=2)
+    assert poses.ndim == 2 and poses.shape[1] == CAMERA_POSE_SIZE
+    return poses
+
+
+def save_camera_poses(path: str, poses):
+    poses = np.asarray(poses, dtype=np.float32)
+    if path.endswith(".npy"):
+        np.save(path, poses)
+        return
+    np.savetxt(
+        path,
+        poses,
+        delimiter=",",
+        fmt="%.6f",
+        header="px,py,pz,tx,ty,tz,ux,uy,uz,fovy",
+    )
+
+
+def generate_orbit_poses(
+    num_poses: int,
+    target=(0.0, 0.5, 0.0),
+    distance: float = 4.0,
+    altitude: float = 0.4,
+    fovy: float = 45.0,
+):
+    # evenly spaced views around the target, handy to produce a pose file
+    azimuths = np.linspace(0.0, 2.0 * math.pi, num_poses, endpoint=False)
+    poses = np.zeros((num_poses, CAMERA_POSE_SIZE), dtype=np.float32)
+    poses[:, 0] = target[0] + distance * math.cos(altitude) * np.sin(azimuths)
+    poses[:, 1] = target[1] + distance * math.sin(altitude)
+    poses[:, 2] = target[2] + distance * math.cos(altitude) * np.cos(azimuths)
+    poses[:, 3:6] = target
+    poses[:, 6:9] = (0.0, 1.0, 0.0)
+    poses[:, 9] = fovy
+    return poses
+
+
+def camera_from_pose(pose) -> rl.Camera3D:
+    camera3d = rl.Camera3D()
+    camera3d.position = rl.Vector3(float(pose[0]), float(pose[1]), float(pose[2]))
+    camera3d.target = rl.Vector3(float(pose[3]), float(pose[4]), float(pose[5]))
+    camera3d.up = rl.Vector3(float(pose[6]), float(pose[7]), float(pose[8]))
+    camera3d.fovy = float(pose[9])
+    camera3d.projection = rl.CAMERA_PERSPECTIVE
+    return camera3d
+
+
+def _exr_attribute(name: str, type_name: str, value: bytes) -> bytes:
+    return (
+        name.encode()
+        + b"\0"
+        + type_name.encode()
+        + b"\0"
+        + struct.pack("<i", len(value))
+        + value
+    )
+
+
+def write_exr(path: str, channels):
+    # minimal uncompressed scanline openexr writer for float32 channels
+    # - channels: {name: (height, width) array}, top row first
+    names = sorted(channels)
+    planes = np.stack(
+        [np.asarray(channels[name], dtype=np.float32) for name in names], axis=1
+    )
+    height, num_channels, width = planes.shape
+
+    channel_list = b""
+    for name in names:
+        channel_list += name.encode() + b"\0"
+        channel_list += struct.pack("<iB3xii", EXR_PIXEL_TYPE_FLOAT, 0, 1, 1)
+    channel_list += b"\0"
+    window = struct.pack("<iiii", 0, 0, width - 1, height - 1)
+
+    header = struct.pack("<ii", 20000630, 2)
+    header += _exr_attribute("channels", "chlist", channel_list)
+    header += _exr_attribute("compression", "compression", b"\0")
+    header += _exr_attribute("dataWindow", "box2i", window)
+    header += _exr_attribute("displayWindow", "box2i", window)
+    header += _exr_attribute("lineOrder", "lineOrder", b"\0")
+    header += _exr_attribute("pixelAspectRatio", "float", struct.pack("<f", 1.0))
+    header += _exr_attribute("screenWindowCenter", "v2f", struct.pack("<ff", 0.0, 0.0))
+    header += _exr_attribute("screenWindowWidth", "float", struct.pack("<f", 1.0))
+    header += b"\0"
+
+    # one chunk per scanline: y, byte size, then each channel's row
+    line_bytes = num_channels * width * 4
+    chunks = np.zeros(
+        height,
+        dtype=np.dtype(
+            [("y", "<i4"), ("size", "<i4"), ("data", "<f4", (num_channels, width))]
+        ),
+    )
+    chunks["y"] = np.arange(height)
+    chunks["size"] = line_bytes
+    chunks["data"] = planes
+
+    offsets = (
+        len(header) + 8 * height + np.arange(height, dtype=np.uint64) * (8 + line_bytes)
+    ).astype("<u8")
+
+    with open(path, "wb") as file:
+        file.write(header)
+        file.write(offsets.tobytes())
+        file.write(chunks.tobytes())
+
+
+def write_batch_outputs(prefix: str, color, linear_depth, world_normal, data_format):
+    export_png(prefix + "_color.png", color)
+    if data_format == "npz":
+        np.savez_compressed(
+            prefix + ".npz", color=color, depth=linear_depth, normal=world_normal
+        )
+    elif data_format == "exr":
+        write_exr(prefix + "_depth.exr", {"Z": linear_depth})
+        write_exr(
+            prefix + "_normal.exr",
+            {
+                "R": world_normal[..., 0],
+                "G": world_normal[..., 1],
+                "B": world_normal[..., 2],
+            },
+        )
+    else:
+        raise ValueError(f"unknown data format: {data_format}")
+
+
+def encode_batch_frame(
+    output_dir: str,
+    frame_index: int,
+    color,
+    depth,
+    normal,
+    near: float,
+    far: float,
+    data_format: str = "npz",
+):
+    # runs in a worker process: decode gbuffer values and write the files
+    write_batch_outputs(
+        os.path.join(output_dir, f"{frame_index:06d}"),
+        color,
+        linearize_gbuffer_depth(depth[..., 0], near, far),
+        decode_gbuffer_normal(normal),
+        data_format,
+    )
+    return frame_index
+
+
+def render_pose(
+    renderer: Renderer,
+    final: rl.RenderTexture,
+    readback: AsyncReadback,
+    pose,
+    frame_index: int,
+):
+    # render one pose and queue its color/depth/normal readbacks
+    # - the camera clip planes ride along as user data to linearize depth later
+    rl.begin_drawing()
+
+    renderer.render(camera_from_pose(pose))
+    clip_planes = (renderer.camera_clip_near, renderer.camera_clip_far)
+
+    readback.request(
+        "depth",
+        renderer.gbuffer.id,
+        READBACK_ATTACHMENT_DEPTH,
+        renderer.width,
+        renderer.height,
+        READBACK_DEPTH32F,
+        frame_index,
+        user_data=clip_planes,
+    )
+    readback.request(
+        "normal",
+        renderer.gbuffer.id,
+        1,
+        renderer.width,
+        renderer.height,
+        READBACK_RGBA16F,
+        frame_index,
+        user_data=clip_planes,
+    )
+
+    rl.begin_texture_mode(final)
+    renderer.render_final()
+    rl.end_texture_mode()
+
+    readback.request(
+        "color",
+        final.id,
+        0,
+        renderer.width,
+        renderer.height,
+        READBACK_RGBA8,
+        frame_index,
+        user_data=clip_planes,
+    )
+
+    rl.end_drawing()
+
+    # frame N+1 is submitted while frame N is copied, only wait once the ring is full
+    readback.poll()
+    while len(readback.in_flight) > len(BATCH_OUTPUTS) * (readback.ring_size - 1):
+        readback.poll(timeout_ns=1000000)
+
+
+class BatchRenderStats:
+    def __init__(self):
+        self.num_frames = 0
+        self.num_workers = 0
+        # render loop only (gpu submission + readback), then including encoding
+        self.render_seconds = 0.0
+        self.total_seconds = 0.0
+
+    @property
+    def render_fps(self):
+        return self.num_frames / max(self.render_seconds, 1e-9)
+
+    @property
+    def fps(self):
+        return self.num_frames / max(self.total_seconds, 1e-9)
+
+
+class _BatchEncoder:
+    # groups the readbacks of a pose and hands them to the process pool
+    def __init__(self, executor, output_dir, data_format, max_pending):
+        self.executor = executor
+        self.output_dir = output_dir
+        self.data_format = data_format
+        self.max_pending = max_pending
+        # frame index -> {output name: array}
+        self.frames = {}
+        self.futures = []
+
+    def on_readback(self, frame: ReadbackFrame):
+        # the pbo is unmapped after the callback, the pool needs its own copy anyway
+        outputs = self.frames.setdefault(frame.frame_index, {})
+        outputs[frame.name] = frame.copy()
+        if len(outputs) < len(BATCH_OUTPUTS):
+            return
+
+        del self.frames[frame.frame_index]
+        near, far = frame.user_data
+        self.futures.append(
+            self.executor.submit(
+                encode_batch_frame,
+                self.output_dir,
+                frame.frame_index,
+                outputs["color"],
+                outputs["depth"],
+                outputs["normal"],
+                near,
+                far,
+                self.data_format,
+            )
+        )
+
+        # bound memory held by queued frames
+        while len(self.futures) > self.max_pending:
+            self.futures.pop(0).result()
+
+    def drain(self):
+        for future in self.futures:
+            future.result()
+        self.futures = []
+
+
+def render_batch(
+    pose_path: str,
+    output_dir: str,
+    width: int = 1280,
+    height: int = 720,
+    data_format: str = "npz",
+    num_workers: int = None,
+    ring_size: int = 3,
+    quality: str = "medium",
+) -> BatchRenderStats:
+    poses = load_camera_poses(pose_path)
+    os.makedirs(output_dir, exist_ok=True)
+
+    if num_workers is None:
+        # the render loop keeps one core busy
+        num_workers = max(1, (os.cpu_count() or 1) - 1)
+
+    stats = BatchRenderStats()
+    stats.num_workers = num_workers
+
+    # headless: hidden window, no vsync and no frame limiter
+    rl.set_trace_log_level(rl.LOG_WARNING)
+    rl.set_config_flags(rl.FLAG_WINDOW_HIDDEN)
+    rl.init_window(width, height, b"SseEngine Batch")
+    rl.set_target_fps(0)
+
+    renderer = Renderer(width, height, quality)
+    # every frame sees the decoded textures, not the white placeholder
+    renderer.texture_streamer.finish()
+    final = rl.load_render_texture(width, height)
+    final_resource = gpu_resources.track(
+        "batch_render",
+        "final",
+        final,
+        rl.unload_render_texture,
+        GPU_RENDER_TARGETS,
+        render_texture_bytes(final),
+    )
+
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=num_workers)
+    encoder = _BatchEncoder(executor, output_dir, data_format, 4 * num_workers)
+
+    readback = AsyncReadback(ring_size=ring_size)
+    for name in BATCH_OUTPUTS:
+        readback.add_callback(name, encoder.on_readback)
+
+    begin = time.perf_counter()
+    for frame_index, pose in enumerate(poses):
+        render_pose(renderer, final, readback, pose, frame_index)
+
+    # flush the remaining copies
+    while readback.in_flight:
+        readback.poll(timeout_ns=1000000)
+    stats.render_seconds = time.perf_counter() - begin
+
+    encoder.drain()
+    executor.shutdown()
+    stats.total_seconds = time.perf_counter() - begin
+    stats.num_frames = len(poses)
+
+    readback.unload()
+    gpu_resources.release(final_resource)
+    renderer.unload()
+    gpu_resources.check_leaks()
+    rl.close_window()
+
+    print(
+        f"batch: {stats.num_frames} frames, {stats.num_workers} workers, "
+        f"render {stats.render_fps:.1f} fps, total {stats.fps:.1f} fps"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="render camera poses offline")
+    parser.add_argument("poses", help="camera pose file (.json, .csv or .npy)")
+    parser.add_argument("output", help="output directory")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--format", choices=("npz", "exr"), default="npz")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--quality", choices=tuple(SHADER_QUALITY_TIERS), default="medium"
+    )
+    parser.add_argument(
+        "--orbit", type=int, default=0, help="write an orbit pose file first"
+    )
+    args = parser.parse_args()
+
+    if args.orbit > 0:
+        save_camera_poses(args.poses, generate_orbit_poses(args.orbit))
+    render_batch(
+        args.poses,
+        args.output,
+        args.width,
+        args.height,
+        args.format,
+        args.workers,
+        quality=args.quality,
+    )
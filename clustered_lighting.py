@@ -0,0 +1,462 @@
+import math
+import time
+
+import pyray as rl
+import raylib as nrl
+
+import numpy as np
+
+from gpu_resources import *
+
+# use raylib's ffi to pass numpy buffers into raylib
+ffi = nrl.ffi
+
+LIGHT_TYPE_POINT = 0
+LIGHT_TYPE_SPOT = 1
+
+# texels per light in the light data texture:
+# [position, radius], [color, intensity], [spot direction, cos outer], [cos inner, type, 0, 0]
+LIGHT_DATA_TEXELS = 4
+
+# width of the 2d texture holding the flattened per-cluster light index lists
+CLUSTER_INDEX_WIDTH = 1024
+
+
+class LocalLights:
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.count = 0
+        self.positions = np.zeros((capacity, 3), dtype=np.float32)
+        self.radii = np.zeros(capacity, dtype=np.float32)
+        self.colors = np.zeros((capacity, 3), dtype=np.float32)
+        self.intensities = np.zeros(capacity, dtype=np.float32)
+        self.directions = np.zeros((capacity, 3), dtype=np.float32)
+        # point lights use cos ranges below -1 so the spot falloff is always 1
+        self.cos_inner = np.full(capacity, -1.0, dtype=np.float32)
+        self.cos_outer = np.full(capacity, -2.0, dtype=np.float32)
+        self.types = np.zeros(capacity, dtype=np.int32)
+
+    def add_point_light(self, position, radius, color, intensity) -> int:
+        assert self.count < self.capacity
+        index = self.count
+        self.positions[index] = position
+        self.radii[index] = radius
+        self.colors[index] = color
+        self.intensities[index] = intensity
+        self.directions[index] = (0.0, -1.0, 0.0)
+        self.cos_inner[index] = -1.0
+        self.cos_outer[index] = -2.0
+        self.types[index] = LIGHT_TYPE_POINT
+        self.count += 1
+        return index
+
+    def add_spot_light(
+        self,
+        position,
+        direction,
+        radius,
+        color,
+        intensity,
+        inner_angle,
+        outer_angle,
+    ) -> int:
+        index = self.add_point_light(position, radius, color, intensity)
+        direction = np.asarray(direction, dtype=np.float32)
+        self.directions[index] = direction / np.linalg.norm(direction)
+        self.cos_inner[index] = math.cos(inner_angle)
+        self.cos_outer[index] = math.cos(outer_angle)
+        self.types[index] = LIGHT_TYPE_SPOT
+        return index
+
+    def clear(self):
+        self.count = 0
+
+    def pack(self):
+        # light data texture rows: (count, LIGHT_DATA_TEXELS, 4)
+        count = self.count
+        data = np.zeros((count, LIGHT_DATA_TEXELS, 4), dtype=np.float32)
+        data[:, 0, 0:3] = self.positions[:count]
+        data[:, 0, 3] = self.radii[:count]
+        data[:, 1, 0:3] = self.colors[:count]
+        data[:, 1, 3] = self.intensities[:count]
+        data[:, 2, 0:3] = self.directions[:count]
+        data[:, 2, 3] = self.cos_outer[:count]
+        data[:, 3, 0] = self.cos_inner[:count]
+        data[:, 3, 1] = self.types[:count]
+        return data
+
+
+class LightClusters:
+    def __init__(self, tiles_x: int = 16, tiles_y: int = 9, slices: int = 24):
+        self.tiles_x = tiles_x
+        self.tiles_y = tiles_y
+        self.slices = slices
+        # exponential depth slicing: slice = log(depth) * scale + bias
+        self.depth_scale = 1.0
+        self.depth_bias = 0.0
+        # per-cluster [offset, count] into light_indices, cluster = (z * tiles_y + y) * tiles_x + x
+        self.offsets = np.zeros(self.num_clusters, dtype=np.int32)
+        self.counts = np.zeros(self.num_clusters, dtype=np.int32)
+        self.light_indices = np.zeros(0, dtype=np.int32)
+
+    @property
+    def num_clusters(self):
+        return self.tiles_x * self.tiles_y * self.slices
+
+
+def _segment_arange(counts):
+    # concatenated aranges: [0..counts[0]), [0..counts[1]), ...
+    starts = np.cumsum(counts, dtype=np.int32) - counts
+    return np.arange(int(counts.sum()), dtype=np.int32) - np.repeat(starts, counts)
+
+
+def build_light_clusters(
+    clusters: LightClusters,
+    positions,
+    radii,
+    view,
+    projection,
+    near: float,
+    far: float,
+):
+    # bins light bounding spheres into view-space froxels
+    # view/projection: row-major numpy 4x4 (see render_queue.matrix_to_numpy)
+    tiles_x, tiles_y, slices = clusters.tiles_x, clusters.tiles_y, clusters.slices
+    clusters.depth_scale = slices / math.log(far / near)
+    clusters.depth_bias = -slices * math.log(near) / math.log(far / near)
+
+    num_lights = positions.shape[0]
+    if num_lights == 0:
+        clusters.offsets[:] = 0
+        clusters.counts[:] = 0
+        clusters.light_indices = np.zeros(0, dtype=np.int32)
+        return clusters
+
+    # light centers in view-space (camera looks down -z)
+    centers = positions @ view[:3, :3].T + view[:3, 3]
+    depths = -centers[:, 2]
+    depth_min = np.maximum(depths - radii, near)
+    depth_max = depths + radii
+    visible = (depth_max > near) & (depth_min < far)
+
+    # depth slices
+    slice_min = np.floor(np.log(depth_min) * clusters.depth_scale + clusters.depth_bias)
+    slice_max = np.floor(
+        np.log(np.clip(depth_max, near, far)) * clusters.depth_scale
+        + clusters.depth_bias
+    )
+    slice_min = np.clip(slice_min, 0, slices - 1).astype(np.int32)
+    slice_max = np.clip(slice_max, 0, slices - 1).astype(np.int32)
+
+    # screen-space bounds from the projected view-space aabb corners
+    corner_signs = np.array(
+        [[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)],
+        dtype=np.float32,
+    )
+    corners = centers[:, None, :] + corner_signs[None, :, :] * radii[:, None, None]
+    clip = corners @ projection[:3, :3].T + projection[:3, 3]
+    clip_w = corners @ projection[3, :3] + projection[3, 3]
+    ndc = clip[:, :, 0:2] / np.maximum(clip_w, 1e-6)[:, :, None]
+    ndc_min = ndc.min(axis=1)
+    ndc_max = ndc.max(axis=1)
+
+    # spheres crossing the near plane cover the whole screen
+    crossing = (depths - radii) <= near
+    ndc_min[crossing] = -1.0
+    ndc_max[crossing] = 1.0
+
+    tiles = np.array([tiles_x, tiles_y], dtype=np.float32)
+    tile_min = np.floor((ndc_min * 0.5 + 0.5) * tiles)
+    tile_max = np.floor((ndc_max * 0.5 + 0.5) * tiles)
+    visible &= np.all(tile_max >= 0, axis=1) & np.all(tile_min < tiles, axis=1)
+    tile_min = np.clip(tile_min, 0, tiles - 1).astype(np.int32)
+    tile_max = np.clip(tile_max, 0, tiles - 1).astype(np.int32)
+
+    # enumerate (light, cluster) pairs without python loops:
+    # expand each light over its screen tiles first, then over its depth slices
+    light_ids = np.nonzero(visible)[0].astype(np.int32)
+    x0, y0, z0 = tile_min[light_ids, 0], tile_min[light_ids, 1], slice_min[light_ids]
+    size_x = tile_max[light_ids, 0] - x0 + 1
+    size_y = tile_max[light_ids, 1] - y0 + 1
+    size_z = slice_max[light_ids] - z0 + 1
+
+    tile_owners = np.repeat(
+        np.arange(light_ids.shape[0], dtype=np.int32), size_x * size_y
+    )
+    local = _segment_arange(size_x * size_y)
+    tile_x = x0[tile_owners] + local % size_x[tile_owners]
+    tile_y = y0[tile_owners] + local // size_x[tile_owners]
+
+    slice_counts = size_z[tile_owners]
+    pair_owners = np.repeat(tile_owners, slice_counts)
+    pair_tiles = np.repeat(tile_y * tiles_x + tile_x, slice_counts)
+    pair_slices = z0[pair_owners] + _segment_arange(slice_counts)
+    pair_clusters = pair_slices * (tiles_x * tiles_y) + pair_tiles
+    pair_lights = light_ids[pair_owners]
+
+    # group light indices by cluster (stable sort of 16-bit keys is a radix sort)
+    if clusters.num_clusters <= np.iinfo(np.int16).max:
+        pair_clusters = pair_clusters.astype(np.int16)
+    order = np.argsort(pair_clusters, kind="stable")
+    clusters.light_indices = pair_lights[order]
+    clusters.counts = np.bincount(
+        pair_clusters, minlength=clusters.num_clusters
+    ).astype(np.int32)
+    clusters.offsets = (np.cumsum(clusters.counts) - clusters.counts).astype(np.int32)
+    return clusters
+
+
+class LightClusterTextures:
+    def __init__(self):
+        # light data: (LIGHT_DATA_TEXELS x max_lights) RGBA32F
+        self.light_data = rl.Texture()
+        # cluster grid: (tiles_x * tiles_y x slices) RGBA32F [offset, count, 0, 0]
+        self.grid = rl.Texture()
+        # light index lists: (CLUSTER_INDEX_WIDTH x rows) R32F
+        self.light_indices = rl.Texture()
+        self.max_lights = 0
+        self.max_light_indices = 0
+
+
+def _load_float_texture(texture: rl.Texture, width, height, format):
+    texture.id = rl.rl_load_texture(ffi.NULL, width, height, format, 1)
+    texture.width = width
+    texture.height = height
+    texture.format = format
+    texture.mipmaps = 1
+
+
+def load_light_cluster_textures(
+    clusters: LightClusters, max_lights: int = 1024, max_light_indices: int = 1 << 18
+):
+    target = LightClusterTextures()
+    target.max_lights = max_lights
+    target.max_light_indices = max_light_indices
+
+    _load_float_texture(
+        target.light_data,
+        LIGHT_DATA_TEXELS,
+        max_lights,
+        rl.PIXELFORMAT_UNCOMPRESSED_R32G32B32A32,
+    )
+    _load_float_texture(
+        target.grid,
+        clusters.tiles_x * clusters.tiles_y,
+        clusters.slices,
+        rl.PIXELFORMAT_UNCOMPRESSED_R32G32B32A32,
+    )
+    _load_float_texture(
+        target.light_indices,
+        CLUSTER_INDEX_WIDTH,
+        max_light_indices // CLUSTER_INDEX_WIDTH,
+        rl.PIXELFORMAT_UNCOMPRESSED_R32,
+    )
+    return target
+
+
+def light_cluster_textures_bytes(target: LightClusterTextures) -> int:
+    return sum(
+        texture_bytes(texture)
+        for texture in (target.light_data, target.grid, target.light_indices)
+    )
+
+
+def unload_light_cluster_textures(target: LightClusterTextures):
+    for texture in (target.light_data, target.grid, target.light_indices):
+        if texture.id > 0:
+            rl.rl_unload_texture(texture.id)
+            texture.id = 0
+
+
+def _update_texture_rows(texture: rl.Texture, data, rows):
+    if rows > 0:
+        data = np.ascontiguousarray(data)
+        rl.rl_update_texture(
+            texture.id, 0, 0, texture.width, rows, texture.format, ffi.from_buffer(data)
+        )
+
+
+def update_light_cluster_textures(
+    target: LightClusterTextures, clusters: LightClusters, lights: LocalLights
+):
+    assert lights.count <= target.max_lights
+
+    # only rows in use are uploaded
+    _update_texture_rows(target.light_data, lights.pack(), lights.count)
+
+    grid = np.zeros((clusters.num_clusters, 4), dtype=np.float32)
+    grid[:, 0] = clusters.offsets
+    grid[:, 1] = clusters.counts
+    _update_texture_rows(target.grid, grid, clusters.slices)
+
+    # drop overflowing indices, clamping each cluster's count to the capacity
+    num_indices = min(clusters.light_indices.shape[0], target.max_light_indices)
+    if num_indices < clusters.light_indices.shape[0]:
+        clusters.counts = np.clip(
+            np.minimum(clusters.counts, num_indices - clusters.offsets), 0, None
+        ).astype(np.int32)
+        grid[:, 1] = clusters.counts
+        _update_texture_rows(target.grid, grid, clusters.slices)
+
+    rows = (num_indices + CLUSTER_INDEX_WIDTH - 1) // CLUSTER_INDEX_WIDTH
+    indices = np.zeros(rows * CLUSTER_INDEX_WIDTH, dtype=np.float32)
+    indices[:num_indices] = clusters.light_indices[:num_indices]
+    _update_texture_rows(target.light_indices, indices, rows)
+
+
+"""
+benchmark: cpu binning cost and per-pixel light evaluations, clustered vs naive
+"""
+
+
+def _look_at_numpy(eye, target, up):
+    forward = target - eye
+    forward = forward / np.linalg.norm(forward)
+    right = np.cross(forward, up)
+    right = right / np.linalg.norm(right)
+    true_up = np.cross(right, forward)
+    view = np.identity(4, dtype=np.float32)
+    view[0, 0:3] = right
+    view[1, 0:3] = true_up
+    view[2, 0:3] = -forward
+    view[0:3, 3] = -view[0:3, 0:3] @ eye
+    return view
+
+
+def _perspective_numpy(fovy, aspect, near, far):
+    top = near * math.tan(fovy * 0.5)
+    right = top * aspect
+    projection = np.zeros((4, 4), dtype=np.float32)
+    projection[0, 0] = near / right
+    projection[1, 1] = near / top
+    projection[2, 2] = -(far + near) / (far - near)
+    projection[2, 3] = -2.0 * far * near / (far - near)
+    projection[3, 2] = -1.0
+    return projection
+
+
+def _shade_lights(pixel_positions, pixel_normals, light_positions, light_radii):
+    # diffuse point light term, shared by the naive and clustered paths
+    to_light = light_positions[None, :, :] - pixel_positions[:, None, :]
+    distance = np.linalg.norm(to_light, axis=2)
+    diffuse = np.maximum(
+        np.einsum("plk,pk->pl", to_light, pixel_normals) / np.maximum(distance, 1e-4),
+        0.0,
+    )
+    window = np.clip(1.0 - (distance / light_radii[None, :]) ** 4, 0.0, 1.0)
+    return np.sum(diffuse * window * window / (distance * distance + 1.0), axis=1)
+
+
+def benchmark_light_clusters(
+    light_counts=(16, 64, 256, 1024), width: int = 320, height: int = 180, seed=0
+):
+    rng = np.random.default_rng(seed)
+    near, far = 0.01, 50.0
+    eye = np.array([2.0, 3.0, 5.0], dtype=np.float32)
+    view = _look_at_numpy(
+        eye, np.array([-0.5, 1.0, 0.0], dtype=np.float32), np.array([0.0, 1.0, 0.0])
+    )
+    projection = _perspective_numpy(math.radians(45.0), width / height, near, far)
+
+    # synthetic g-buffer: ground plane y = 0
+    ndc_x = (np.arange(width) + 0.5) / width * 2.0 - 1.0
+    ndc_y = (np.arange(height) + 0.5) / height * 2.0 - 1.0
+    ndc = np.stack(np.meshgrid(ndc_x, ndc_y), axis=-1).reshape(-1, 2)
+    inv_view_projection = np.linalg.inv(projection @ view)
+    far_points = np.concatenate([ndc, np.ones((ndc.shape[0], 2))], axis=1)
+    far_points = far_points @ inv_view_projection.T
+    far_points = far_points[:, 0:3] / far_points[:, 3:4]
+    rays = far_points - eye
+    t = -eye[1] / np.minimum(rays[:, 1], -1e-6)
+    hit = (rays[:, 1] < 0.0) & (t < 1.0)
+    pixel_positions = (eye + rays * t[:, None])[hit].astype(np.float32)
+    pixel_normals = np.tile(np.array([0.0, 1.0, 0.0], dtype=np.float32), (hit.sum(), 1))
+
+    # cluster of each shaded pixel (same mapping as lighting.fs)
+    clusters = LightClusters()
+    pixel_depths = -(pixel_positions @ view[2, 0:3] + view[2, 3])
+    pixel_tiles = np.floor(
+        (ndc[hit] * 0.5 + 0.5) * np.array([clusters.tiles_x, clusters.tiles_y])
+    ).astype(np.int64)
+
+    print(f"resolution: {width}x{height}, shaded pixels: {pixel_positions.shape[0]}")
+    print(
+        "lights | binning ms | naive evals/px | clustered evals/px (max) | naive shade ms | clustered shade ms"
+    )
+    for num_lights in light_counts:
+        light_positions = np.concatenate(
+            [
+                rng.uniform(-10.0, 10.0, (num_lights, 1)),
+                rng.uniform(0.1, 1.0, (num_lights, 1)),
+                rng.uniform(-10.0, 10.0, (num_lights, 1)),
+            ],
+            axis=1,
+        ).astype(np.float32)
+        light_radii = rng.uniform(0.5, 2.0, num_lights).astype(np.float32)
+
+        start = time.perf_counter()
+        build_light_clusters(
+            clusters, light_positions, light_radii, view, projection, near, far
+        )
+        binning_ms = (time.perf_counter() - start) * 1000.0
+
+        slices = np.clip(
+            np.floor(
+                np.log(np.maximum(pixel_depths, near)) * clusters.depth_scale
+                + clusters.depth_bias
+            ),
+            0,
+            clusters.slices - 1,
+        ).astype(np.int64)
+        pixel_clusters = (
+            slices * clusters.tiles_y + pixel_tiles[:, 1]
+        ) * clusters.tiles_x + pixel_tiles[:, 0]
+        pixel_counts = clusters.counts[pixel_clusters]
+
+        # naive: every pixel evaluates every light (chunked to bound memory)
+        start = time.perf_counter()
+        naive = np.zeros(pixel_positions.shape[0], dtype=np.float32)
+        for chunk in range(0, num_lights, 64):
+            naive += _shade_lights(
+                pixel_positions,
+                pixel_normals,
+                light_positions[chunk : chunk + 64],
+                light_radii[chunk : chunk + 64],
+            )
+        naive_ms = (time.perf_counter() - start) * 1000.0
+
+        # clustered: pixels of a cluster evaluate only that cluster's lights
+        start = time.perf_counter()
+        clustered = np.zeros(pixel_positions.shape[0], dtype=np.float32)
+        pixel_order = np.argsort(pixel_clusters, kind="stable")
+        unique_clusters, cluster_starts = np.unique(
+            pixel_clusters[pixel_order], return_index=True
+        )
+        cluster_ends = np.append(cluster_starts[1:], pixel_order.shape[0])
+        for cluster, begin, end in zip(unique_clusters, cluster_starts, cluster_ends):
+            count = clusters.counts[cluster]
+            if count == 0:
+                continue
+            offset = clusters.offsets[cluster]
+            lights = clusters.light_indices[offset : offset + count]
+            pixels = pixel_order[begin:end]
+            clustered[pixels] = _shade_lights(
+                pixel_positions[pixels],
+                pixel_normals[pixels],
+                light_positions[lights],
+                light_radii[lights],
+            )
+        clustered_ms = (time.perf_counter() - start) * 1000.0
+
+        # clusters are conservative, both paths must agree
+        assert np.allclose(naive, clustered, atol=1e-4)
+
+        print(
+            f"{num_lights:6d} | {binning_ms:10.3f} | {num_lights:14d} | "
+            f"{pixel_counts.mean():13.2f} ({pixel_counts.max():4d}) | "
+            f"{naive_ms:14.2f} | {clustered_ms:18.2f}"
+        )
+
+
+if __name__ == "__main__":
+    benchmark_light_clusters()
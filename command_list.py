@@ -0,0 +1,135 @@
+# recorded command lists: a pass's rlgl/raylib call stream captured once and replayed
+# - replay is one native call per command: no pyray wrapper (argument conversion, struct
+#   copies, string encoding), arguments are converted at record time
+# - uniforms point at live buffers (LiveUniforms): update the buffer, not the list
+# - a list is re-recorded only when its key (the pass structure: shaders, targets,
+#   textures) changes, see CommandList.needs_recording()
+
+import time
+
+import pyray as rl
+import raylib as nrl
+
+ffi = nrl.ffi
+
+
+class LiveUniforms:
+    # named ffi buffers, updated in place every frame: ptr[0] = value
+    def __init__(self, **c_types):
+        for name, c_type in c_types.items():
+            setattr(self, name, ffi.new(f"{c_type} *"))
+
+
+def _color(color) -> rl.Color:
+    # pyray colors are tuples, converted once instead of on every call
+    return rl.Color(*color) if isinstance(color, tuple) else color
+
+
+class CommandList:
+    def __init__(self):
+        # (native function, args)
+        self.commands = []
+        self.key = None
+        # buffers created while recording, alive as long as the list
+        self.buffers = []
+        self.num_recordings = 0
+
+    def needs_recording(self, key) -> bool:
+        # clears the list if the pass structure changed since the last recording
+        if key == self.key and self.commands:
+            return False
+        self.key = key
+        self.commands = []
+        self.buffers = []
+        self.num_recordings += 1
+        return True
+
+    def call(self, function, *args):
+        self.commands.append((function, args))
+
+    def replay(self):
+        for function, args in self.commands:
+            function(*args)
+
+    # recorders, same arguments as the pyray calls they replace
+
+    def begin_texture_mode(self, target: rl.RenderTexture):
+        self.call(nrl.BeginTextureMode, target)
+
+    def end_texture_mode(self):
+        self.call(nrl.EndTextureMode)
+
+    def begin_shader_mode(self, shader: rl.Shader):
+        self.call(nrl.BeginShaderMode, shader)
+        # uniforms below go to the program right away (rl.set_shader_value() does the same)
+        self.call(nrl.rlEnableShader, shader.id)
+
+    def end_shader_mode(self):
+        self.call(nrl.EndShaderMode)
+
+    def clear_background(self, color):
+        self.call(nrl.ClearBackground, _color(color))
+
+    def uniform(self, location: int, value_ptr, uniform_type: int, count: int = 1):
+        # value_ptr: live buffer, read at every replay
+        if location > -1:
+            self.call(nrl.rlSetUniform, location, value_ptr, uniform_type, count)
+
+    def uniform_value(self, location: int, c_type: str, value, uniform_type: int):
+        # constant for the lifetime of the recording
+        buffer = ffi.new(f"{c_type} *", value)
+        self.buffers.append(buffer)
+        self.uniform(location, buffer, uniform_type)
+
+    def uniform_matrix(self, location: int, matrix_ptr):
+        if location > -1:
+            self.call(nrl.rlSetUniformMatrices, location, matrix_ptr, 1)
+
+    def uniform_texture(self, location: int, texture: rl.Texture):
+        # batch texture unit, see rl.set_shader_value_texture()
+        if location > -1:
+            self.call(nrl.rlSetUniformSampler, location, texture.id)
+
+    def uniform_texture_slot(self, location: int, texture_id: int, slot: int):
+        # fixed texture unit outside of raylib's batch units, see set_shader_value_texture_slot()
+        if location > -1:
+            slot_ptr = ffi.new("int *", slot)
+            self.buffers.append(slot_ptr)
+            self.call(nrl.rlActiveTextureSlot, slot)
+            self.call(nrl.rlEnableTexture, texture_id)
+            self.call(nrl.rlSetUniform, location, slot_ptr, rl.SHADER_UNIFORM_INT, 1)
+            self.call(nrl.rlActiveTextureSlot, 0)
+
+    def draw_texture_rec(self, texture, source, position, tint):
+        self.call(nrl.DrawTextureRec, texture, source, position, _color(tint))
+
+
+def benchmark_dispatch(iterations: int = 20000, commands_per_pass: int = 32):
+    # cpu-only: pyray dispatch vs replay of the same call stream (no gl context needed)
+    a = rl.Vector3(1.0, 2.0, 3.0)
+    b = rl.Vector3(4.0, 5.0, 6.0)
+
+    def immediate():
+        for _ in range(commands_per_pass // 2):
+            rl.vector3_add(a, b)
+            rl.vector3_length(a)
+
+    commands = CommandList()
+    commands.needs_recording("benchmark")
+    for _ in range(commands_per_pass // 2):
+        commands.call(nrl.Vector3Add, a, b)
+        commands.call(nrl.Vector3Length, a)
+
+    for name, function in (("pyray", immediate), ("replay", commands.replay)):
+        begin = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        elapsed = time.perf_counter() - begin
+        print(
+            f"{name}: {elapsed / iterations * 1e6:.2f}us per pass "
+            f"({commands_per_pass} commands)"
+        )
+
+
+if __name__ == "__main__":
+    benchmark_dispatch()
@@ -0,0 +1,100 @@
+# idle-frame elision: the scene and the ui are composited from cached layers
+# - the scene layer (fxaa output of every view) is re-rendered only when its key changes:
+#   cameras, lights, scene objects, quality, see Renderer.scene_state()
+# - the ui layer is redrawn only when its labels change
+# - every frame presents both layers: two textured quads instead of the whole pipeline
+
+import pyray as rl
+
+from gpu_resources import *
+
+
+def vector3_state(v: rl.Vector3):
+    return (v.x, v.y, v.z)
+
+
+def camera_state(camera3d: rl.Camera3D):
+    # everything begin_mode_3d() reads
+    return (
+        vector3_state(camera3d.position),
+        vector3_state(camera3d.target),
+        vector3_state(camera3d.up),
+        camera3d.fovy,
+        camera3d.projection,
+    )
+
+
+class FrameCacheLayer:
+    def __init__(self, target: rl.RenderTexture):
+        self.target = target
+        # key of the cached contents, None: nothing cached
+        self.key = None
+        self.num_updates = 0
+        self.num_reuses = 0
+
+    def needs_update(self, key) -> bool:
+        if key is not None and key == self.key:
+            self.num_reuses += 1
+            return False
+        self.key = key
+        self.num_updates += 1
+        return True
+
+    def invalidate(self):
+        self.key = None
+
+
+class FrameCache:
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.scene = FrameCacheLayer(
+            self._track("scene", rl.load_render_texture(width, height))
+        )
+        self.ui = FrameCacheLayer(
+            self._track("ui", rl.load_render_texture(width, height))
+        )
+        # render texture y is flipped, see rl.draw_texture_rec()
+        self.source = rl.Rectangle(0, 0, width, -height)
+        self.position = rl.Vector2(0, 0)
+
+    def _track(self, name: str, target: rl.RenderTexture) -> rl.RenderTexture:
+        gpu_resources.track(
+            self,
+            name,
+            target,
+            rl.unload_render_texture,
+            GPU_RENDER_TARGETS,
+            render_texture_bytes(target),
+        )
+        return target
+
+    def begin_layer(self, layer: FrameCacheLayer):
+        # draw into the layer, after layer.needs_update(key) returned True
+        rl.begin_texture_mode(layer.target)
+        rl.clear_background(rl.BLANK)
+
+    def end_layer(self):
+        rl.end_texture_mode()
+
+    def invalidate(self):
+        self.scene.invalidate()
+        self.ui.invalidate()
+
+    def present_scene(self):
+        # opaque, covers the whole target
+        rl.rl_disable_color_blend()
+        rl.draw_texture_rec(
+            self.scene.target.texture, self.source, self.position, rl.WHITE
+        )
+        rl.rl_draw_render_batch_active()
+        rl.rl_enable_color_blend()
+
+    def present_ui(self):
+        # blended over the scene
+        rl.draw_texture_rec(
+            self.ui.target.texture, self.source, self.position, rl.WHITE
+        )
+
+    def unload(self):
+        gpu_resources.release_owner(self)
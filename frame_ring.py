@@ -0,0 +1,443 @@
+# shared-memory frame ring: finished frames for consumers on the same node (ml inference)
+# - one publisher (the engine), readers attach by name and get numpy views of the slots
+# - per slot seqlock: the slot's sequence is odd while it is written, 2 * (n + 1) once
+#   frame n is published, readers re-check it after use (FrameRingFrame.valid())
+# - the publisher never waits on readers unless asked to, see FRAME_RING_BLOCK
+# - no pyray import: readers only need numpy
+
+import multiprocessing
+import sys
+import time
+
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+FRAME_RING_MAGIC = 0x53534652  # "SSFR"
+FRAME_RING_VERSION = 1
+
+# backpressure policies:
+# - drop-oldest: the newest frame overwrites the oldest slot, slow readers skip frames
+# - block: unread slots are never overwritten, the publisher waits up to block_timeout
+#   for the reader, then drops the new frame (the render loop uses block_timeout=0)
+FRAME_RING_DROP_OLDEST = "drop-oldest"
+FRAME_RING_BLOCK = "block"
+FRAME_RING_POLICIES = (FRAME_RING_DROP_OLDEST, FRAME_RING_BLOCK)
+
+# parts written per frame: rgba8 color (top row first), raw [0, 1] gbuffer depth
+FRAME_RING_PARTS = ("color", "depth")
+
+FRAME_RING_HEADER = np.dtype(
+    [
+        ("magic", np.uint32),
+        ("version", np.uint32),
+        ("num_slots", np.uint32),
+        ("policy", np.uint32),
+        ("width", np.uint32),
+        ("height", np.uint32),
+        ("depth_width", np.uint32),
+        ("depth_height", np.uint32),
+        ("slot_size", np.uint64),
+        # frames published so far, frame n lives in slot n % num_slots
+        ("write_sequence", np.uint64),
+        # frames released by the reader (block policy)
+        ("read_sequence", np.uint64),
+        # frames the publisher gave up on (ring full or incomplete readbacks)
+        ("dropped", np.uint64),
+        ("closed", np.uint32),
+    ],
+    align=True,
+)
+
+FRAME_RING_SLOT_HEADER = np.dtype(
+    [
+        ("sequence", np.uint64),
+        ("frame_index", np.uint64),
+        ("timestamp", np.float64),
+        # camera clip planes, to linearize depth (see renderer.linearize_gbuffer_depth())
+        ("near", np.float32),
+        ("far", np.float32),
+    ],
+    align=True,
+)
+
+# keeps slot payloads cache-line aligned
+FRAME_RING_ALIGNMENT = 64
+
+
+def _align(size: int) -> int:
+    return (
+        (size + FRAME_RING_ALIGNMENT - 1) // FRAME_RING_ALIGNMENT * FRAME_RING_ALIGNMENT
+    )
+
+
+def frame_ring_slot_size(width, height, depth_width, depth_height) -> int:
+    return (
+        _align(FRAME_RING_SLOT_HEADER.itemsize)
+        + _align(width * height * 4)
+        + _align(depth_width * depth_height * 4)
+    )
+
+
+def frame_ring_size(num_slots, width, height, depth_width, depth_height) -> int:
+    return _align(FRAME_RING_HEADER.itemsize) + num_slots * frame_ring_slot_size(
+        width, height, depth_width, depth_height
+    )
+
+
+class FrameRingSlot:
+    # numpy views of one slot
+    def __init__(self, buffer, index, width, height, depth_width, depth_height):
+        offset = _align(FRAME_RING_HEADER.itemsize) + index * frame_ring_slot_size(
+            width, height, depth_width, depth_height
+        )
+        self.header = np.ndarray(
+            (), dtype=FRAME_RING_SLOT_HEADER, buffer=buffer, offset=offset
+        )
+        offset += _align(FRAME_RING_SLOT_HEADER.itemsize)
+        self.color = np.ndarray(
+            (height, width, 4), dtype=np.uint8, buffer=buffer, offset=offset
+        )
+        offset += _align(width * height * 4)
+        self.depth = np.ndarray(
+            (depth_height, depth_width), dtype=np.float32, buffer=buffer, offset=offset
+        )
+
+
+class _FrameRing:
+    def __init__(self, shm: shared_memory.SharedMemory):
+        self.shm = shm
+        self.header = np.ndarray((), dtype=FRAME_RING_HEADER, buffer=shm.buf)
+        self.num_slots = int(self.header["num_slots"])
+        self.width = int(self.header["width"])
+        self.height = int(self.header["height"])
+        self.depth_width = int(self.header["depth_width"])
+        self.depth_height = int(self.header["depth_height"])
+        self.slots = [
+            FrameRingSlot(
+                shm.buf,
+                index,
+                self.width,
+                self.height,
+                self.depth_width,
+                self.depth_height,
+            )
+            for index in range(self.num_slots)
+        ]
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self):
+        # views must go before the mapping
+        self.header = None
+        self.slots = []
+        self.shm.close()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # attaching registers the segment with this process's resource tracker, which
+    # unlinks it when the process exits (bpo-39959); the publisher owns the segment
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # older versions: skip the registration rather than undo it, a reader started by
+    # the publisher through multiprocessing shares its tracker, and unregistering
+    # there would drop the publisher's own entry
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class FrameRingPublisher(_FrameRing):
+    # engine side: owns the shared memory, unlinked on close()
+    def __init__(
+        self,
+        name: str,
+        width: int,
+        height: int,
+        depth_width: int = None,
+        depth_height: int = None,
+        num_slots: int = 4,
+        policy: str = FRAME_RING_DROP_OLDEST,
+        block_timeout: float = 0.0,
+    ):
+        assert policy in FRAME_RING_POLICIES
+        depth_width = width if depth_width is None else depth_width
+        depth_height = height if depth_height is None else depth_height
+        shm = shared_memory.SharedMemory(
+            name=name,
+            create=True,
+            size=frame_ring_size(num_slots, width, height, depth_width, depth_height),
+        )
+        header = np.ndarray((), dtype=FRAME_RING_HEADER, buffer=shm.buf)
+        header[...] = 0
+        header["num_slots"] = num_slots
+        header["policy"] = FRAME_RING_POLICIES.index(policy)
+        header["width"] = width
+        header["height"] = height
+        header["depth_width"] = depth_width
+        header["depth_height"] = depth_height
+        header["slot_size"] = frame_ring_slot_size(
+            width, height, depth_width, depth_height
+        )
+        del header
+        super().__init__(shm)
+        for slot in self.slots:
+            slot.header[...] = 0
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        # frame being assembled: frame index and parts written so far
+        self.pending_frame = None
+        self.pending_parts = set()
+        # frame dropped for lack of a free slot, its remaining parts are ignored
+        self.dropped_frame = None
+        self.published = 0
+
+        # written last: readers refuse rings without it
+        self.header["version"] = FRAME_RING_VERSION
+        self.header["magic"] = FRAME_RING_MAGIC
+
+    @property
+    def dropped(self) -> int:
+        return int(self.header["dropped"])
+
+    def _has_free_slot(self) -> bool:
+        if self.policy == FRAME_RING_DROP_OLDEST:
+            return True
+        unread = int(self.header["write_sequence"]) - int(self.header["read_sequence"])
+        if unread < self.num_slots:
+            return True
+        deadline = time.perf_counter() + self.block_timeout
+        while time.perf_counter() < deadline:
+            time.sleep(0.0005)
+            unread = int(self.header["write_sequence"]) - int(
+                self.header["read_sequence"]
+            )
+            if unread < self.num_slots:
+                return True
+        return False
+
+    def _begin(self, frame_index: int) -> bool:
+        # claims the next slot for frame_index, an incomplete pending frame is dropped
+        if self.pending_frame is not None:
+            self.header["dropped"] += 1
+            self.pending_frame = None
+        if not self._has_free_slot():
+            self.header["dropped"] += 1
+            self.dropped_frame = frame_index
+            return False
+        sequence = int(self.header["write_sequence"])
+        slot = self.slots[sequence % self.num_slots]
+        slot.header["sequence"] = 2 * sequence + 1
+        slot.header["frame_index"] = frame_index
+        self.pending_frame = frame_index
+        self.pending_parts = set()
+        return True
+
+    def write(self, frame_index: int, part: str, array, clip_planes=None) -> bool:
+        # copies one part of frame_index into its slot, publishes once all parts are in
+        # - array: (h, w, 4) uint8 color or (h, w[, 1]) float32 depth, e.g. a readback view
+        assert part in FRAME_RING_PARTS
+        if frame_index == self.dropped_frame:
+            return False
+        if frame_index != self.pending_frame and not self._begin(frame_index):
+            return False
+        sequence = int(self.header["write_sequence"])
+        slot = self.slots[sequence % self.num_slots]
+        if part == "color":
+            slot.color[...] = array
+        else:
+            slot.depth[...] = array.reshape(slot.depth.shape)
+            if clip_planes is not None:
+                slot.header["near"], slot.header["far"] = clip_planes
+        self.pending_parts.add(part)
+        if len(self.pending_parts) < len(FRAME_RING_PARTS):
+            return True
+
+        slot.header["timestamp"] = time.time()
+        slot.header["sequence"] = 2 * sequence + 2
+        self.header["write_sequence"] = sequence + 1
+        self.pending_frame = None
+        self.published += 1
+        return True
+
+    def publish(self, frame_index: int, color, depth, clip_planes=None) -> bool:
+        return self.write(frame_index, "color", color) and self.write(
+            frame_index, "depth", depth, clip_planes
+        )
+
+    def close(self):
+        # readers see 'closed' and stop waiting
+        self.header["closed"] = 1
+        shm = self.shm
+        super().close()
+        shm.unlink()
+
+
+class FrameRingFrame:
+    # zero-copy views of a published frame, valid while valid() is True
+    def __init__(self, slot: FrameRingSlot, sequence: int):
+        self.slot = slot
+        self.sequence = sequence
+        self.frame_index = int(slot.header["frame_index"])
+        self.timestamp = float(slot.header["timestamp"])
+        self.near = float(slot.header["near"])
+        self.far = float(slot.header["far"])
+        self.color = slot.color
+        self.depth = slot.depth
+
+    def valid(self) -> bool:
+        # False once the publisher started overwriting the slot (drop-oldest)
+        return int(self.slot.header["sequence"]) == 2 * self.sequence + 2
+
+    def copy(self):
+        # (color, depth) copies, None if the slot was overwritten meanwhile
+        color = np.array(self.color, copy=True)
+        depth = np.array(self.depth, copy=True)
+        return (color, depth) if self.valid() else None
+
+
+class FrameRingReader(_FrameRing):
+    # consumer side: every frame in order (block) or catching up to the oldest slot
+    # still holding data (drop-oldest), single reader per ring
+    def __init__(self, name: str, timeout: float = 5.0):
+        shm = _attach(name)
+        # wait for the publisher to finish the header
+        header = np.ndarray((), dtype=FRAME_RING_HEADER, buffer=shm.buf)
+        deadline = time.perf_counter() + timeout
+        while header["magic"] != FRAME_RING_MAGIC:
+            if time.perf_counter() > deadline:
+                del header
+                shm.close()
+                raise RuntimeError(f"frame ring '{name}' is not initialized")
+            time.sleep(0.001)
+        if header["version"] != FRAME_RING_VERSION:
+            version = int(header["version"])
+            del header
+            shm.close()
+            raise RuntimeError(f"frame ring '{name}': unsupported version {version}")
+        del header
+        super().__init__(shm)
+        self.policy = FRAME_RING_POLICIES[int(self.header["policy"])]
+        # next sequence to read, starts at the publisher's current frame
+        self.sequence = int(self.header["write_sequence"])
+        if self.policy == FRAME_RING_BLOCK:
+            # frames published before this reader attached don't hold the publisher
+            self.header["read_sequence"] = self.sequence
+        # frames overwritten before this reader got to them
+        self.skipped = 0
+
+    @property
+    def closed(self) -> bool:
+        return bool(self.header["closed"])
+
+    def poll(self):
+        # next frame or None, never waits
+        while True:
+            write_sequence = int(self.header["write_sequence"])
+            if self.sequence >= write_sequence:
+                return None
+            # the oldest slot may be rewritten right now, start after it
+            oldest = write_sequence - self.num_slots + 1
+            if self.sequence < oldest:
+                self.skipped += oldest - self.sequence
+                self.sequence = oldest
+            frame = FrameRingFrame(
+                self.slots[self.sequence % self.num_slots], self.sequence
+            )
+            self.sequence += 1
+            if frame.valid():
+                return frame
+            # overwritten between the two reads
+            self.skipped += 1
+
+    def wait(self, timeout: float = None, interval: float = 0.0005):
+        # next frame, None on timeout or once the publisher closed the ring
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            frame = self.poll()
+            if frame is not None or self.closed:
+                return frame
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+            time.sleep(interval)
+
+    def release(self, frame: FrameRingFrame):
+        # done with frame and everything before it: its slot may be reused (block)
+        self.header["read_sequence"] = max(
+            int(self.header["read_sequence"]), frame.sequence + 1
+        )
+
+    def close(self):
+        # readers never unlink, the publisher owns the ring
+        super().close()
+
+
+def _benchmark_reader(name, result_queue, read_seconds):
+    reader = FrameRingReader(name)
+    frames = 0
+    checksum = 0
+    while True:
+        frame = reader.wait(timeout=1.0)
+        if frame is None:
+            break
+        checksum += int(frame.color[0, 0, 0])
+        frames += 1
+        # a consumer slower than the publisher
+        time.sleep(read_seconds)
+        reader.release(frame)
+    result_queue.put((frames, reader.skipped, checksum))
+    reader.close()
+
+
+def benchmark_frame_ring(
+    num_frames: int = 300,
+    width: int = 1280,
+    height: int = 720,
+    read_seconds: float = 0.02,
+):
+    # publisher cost per frame with a slow reader in another process, per policy
+    color = np.random.randint(0, 255, (height, width, 4), dtype=np.uint8)
+    depth = np.random.random_sample((height, width, 1)).astype(np.float32)
+    context = multiprocessing.get_context("spawn")
+    for policy in FRAME_RING_POLICIES:
+        publisher = FrameRingPublisher(
+            f"sse_frame_ring_benchmark_{policy}", width, height, policy=policy
+        )
+        result_queue = context.Queue()
+        reader = context.Process(
+            target=_benchmark_reader,
+            args=(publisher.name, result_queue, read_seconds),
+        )
+        reader.start()
+        # reader attached: it starts at the current write sequence
+        time.sleep(1.0)
+
+        begin = time.perf_counter()
+        slowest = 0.0
+        for frame_index in range(num_frames):
+            frame_begin = time.perf_counter()
+            publisher.publish(frame_index, color, depth, (0.01, 1000.0))
+            slowest = max(slowest, time.perf_counter() - frame_begin)
+            # 60Hz render loop
+            time.sleep(max(0.0, 1.0 / 60.0 - (time.perf_counter() - frame_begin)))
+        elapsed = time.perf_counter() - begin
+
+        publisher.header["closed"] = 1
+        frames, skipped, _ = result_queue.get()
+        reader.join()
+        print(
+            f"{policy}: {publisher.published} published, {publisher.dropped} dropped, "
+            f"{frames} read, {skipped} skipped by the reader, "
+            f"publish max {slowest * 1000.0:.2f}ms ({elapsed:.1f}s)"
+        )
+        publisher.close()
+
+
+if __name__ == "__main__":
+    benchmark_frame_ring()
@@ -0,0 +1,225 @@
+# raw OpenGL entry points, for features rlgl does not expose (queries, PBOs, UBOs, syncs,
+# transform feedback)
+# - function pointers are resolved through raylib's loader once a context exists
+
+import re
+
+import raylib as nrl
+
+# raylib's compiled ffi parses types in C, a cffi.FFI() + cdef would pull in pycparser
+# at import time (~20ms of startup)
+ffi = nrl.ffi
+
+# GL typedefs -> builtin C types, applied to the signatures below
+GL_C_TYPES = {
+    "GLenum": "unsigned int",
+    "GLuint": "unsigned int",
+    "GLint": "int",
+    "GLfloat": "float",
+    "GLsizei": "int",
+    "GLbitfield": "unsigned int",
+    "GLboolean": "unsigned char",
+    "GLubyte": "unsigned char",
+    "GLchar": "char",
+    "GLintptr": "ptrdiff_t",
+    "GLsizeiptr": "ptrdiff_t",
+    "GLuint64": "unsigned long long",
+    "GLsync": "void *",
+}
+GL_C_TYPES_PATTERN = re.compile(r"\b(" + "|".join(GL_C_TYPES) + r")\b")
+
+GL_NO_ERROR = 0
+
+# queries
+GL_TIME_ELAPSED = 0x88BF
+GL_TIMESTAMP = 0x8E28
+GL_QUERY_RESULT = 0x8866
+GL_QUERY_RESULT_AVAILABLE = 0x8867
+
+# buffers
+GL_ARRAY_BUFFER = 0x8892
+GL_PIXEL_PACK_BUFFER = 0x88EB
+GL_PIXEL_UNPACK_BUFFER = 0x88EC
+GL_UNIFORM_BUFFER = 0x8A11
+GL_UNIFORM_BUFFER_OFFSET_ALIGNMENT = 0x8A34
+# glGetUniformBlockIndex() of a block the program does not use
+GL_INVALID_INDEX = 0xFFFFFFFF
+GL_TRANSFORM_FEEDBACK_BUFFER = 0x8C8E
+GL_INTERLEAVED_ATTRIBS = 0x8C8C
+GL_STREAM_DRAW = 0x88E0
+GL_STREAM_READ = 0x88E1
+GL_STREAM_COPY = 0x88E2
+GL_DYNAMIC_DRAW = 0x88E8
+GL_MAP_READ_BIT = 0x0001
+GL_MAP_WRITE_BIT = 0x0002
+GL_MAP_INVALIDATE_RANGE_BIT = 0x0004
+GL_MAP_INVALIDATE_BUFFER_BIT = 0x0008
+GL_MAP_UNSYNCHRONIZED_BIT = 0x0020
+
+# framebuffers
+GL_READ_FRAMEBUFFER = 0x8CA8
+GL_DRAW_FRAMEBUFFER = 0x8CA9
+GL_COLOR_ATTACHMENT0 = 0x8CE0
+# default framebuffer's back buffer
+GL_BACK = 0x0405
+# glClearBuffer* buffer
+GL_COLOR = 0x1800
+
+# textures
+GL_TEXTURE_2D = 0x0DE1
+GL_TEXTURE_MAG_FILTER = 0x2800
+GL_TEXTURE_MIN_FILTER = 0x2801
+GL_NEAREST = 0x2600
+
+# primitives
+GL_POINTS = 0x0000
+GL_TRIANGLES = 0x0004
+
+# capabilities
+GL_RASTERIZER_DISCARD = 0x8C89
+
+# pixel formats/types
+GL_RED = 0x1903
+GL_RGBA = 0x1908
+GL_RED_INTEGER = 0x8D94
+GL_R32UI = 0x8236
+GL_DEPTH_COMPONENT = 0x1902
+GL_UNSIGNED_BYTE = 0x1401
+GL_SHORT = 0x1402
+GL_UNSIGNED_SHORT = 0x1403
+GL_UNSIGNED_INT = 0x1405
+GL_HALF_FLOAT = 0x140B
+GL_FLOAT = 0x1406
+GL_PACK_ALIGNMENT = 0x0D05
+
+# shaders
+GL_FRAGMENT_SHADER = 0x8B30
+GL_VERTEX_SHADER = 0x8B31
+GL_COMPILE_STATUS = 0x8B81
+GL_LINK_STATUS = 0x8B82
+GL_INFO_LOG_LENGTH = 0x8B84
+GL_PROGRAM_BINARY_LENGTH = 0x8741
+# KHR_parallel_shader_compile / ARB_parallel_shader_compile
+GL_COMPLETION_STATUS_KHR = 0x91B1
+
+# strings
+GL_EXTENSIONS = 0x1F03
+GL_NUM_EXTENSIONS = 0x821D
+
+# sync objects
+GL_SYNC_GPU_COMMANDS_COMPLETE = 0x9117
+GL_SYNC_FLUSH_COMMANDS_BIT = 0x00000001
+GL_ALREADY_SIGNALED = 0x911A
+GL_TIMEOUT_EXPIRED = 0x911B
+GL_CONDITION_SATISFIED = 0x911C
+GL_WAIT_FAILED = 0x911D
+
+# function signatures resolved on first use
+GL_FUNCTION_TYPES = {
+    "glGetError": "GLenum (*)(void)",
+    "glFinish": "void (*)(void)",
+    "glFlush": "void (*)(void)",
+    "glPixelStorei": "void (*)(GLenum, GLint)",
+    "glGetIntegerv": "void (*)(GLenum, GLint *)",
+    "glGetStringi": "const GLubyte *(*)(GLenum, GLuint)",
+    "glEnable": "void (*)(GLenum)",
+    "glDisable": "void (*)(GLenum)",
+    # queries
+    "glGenQueries": "void (*)(GLsizei, GLuint *)",
+    "glDeleteQueries": "void (*)(GLsizei, const GLuint *)",
+    "glBeginQuery": "void (*)(GLenum, GLuint)",
+    "glEndQuery": "void (*)(GLenum)",
+    "glQueryCounter": "void (*)(GLuint, GLenum)",
+    "glGetQueryObjectiv": "void (*)(GLuint, GLenum, GLint *)",
+    "glGetQueryObjectui64v": "void (*)(GLuint, GLenum, GLuint64 *)",
+    # buffers
+    "glGenBuffers": "void (*)(GLsizei, GLuint *)",
+    "glDeleteBuffers": "void (*)(GLsizei, const GLuint *)",
+    "glBindBuffer": "void (*)(GLenum, GLuint)",
+    "glBindBufferBase": "void (*)(GLenum, GLuint, GLuint)",
+    "glBindBufferRange": "void (*)(GLenum, GLuint, GLuint, GLintptr, GLsizeiptr)",
+    "glBufferData": "void (*)(GLenum, GLsizeiptr, const void *, GLenum)",
+    "glBufferSubData": "void (*)(GLenum, GLintptr, GLsizeiptr, const void *)",
+    "glMapBufferRange": "void *(*)(GLenum, GLintptr, GLsizeiptr, GLbitfield)",
+    "glUnmapBuffer": "GLboolean (*)(GLenum)",
+    # framebuffers
+    "glBindFramebuffer": "void (*)(GLenum, GLuint)",
+    "glReadBuffer": "void (*)(GLenum)",
+    "glReadPixels": "void (*)(GLint, GLint, GLsizei, GLsizei, GLenum, GLenum, void *)",
+    "glClearBufferfv": "void (*)(GLenum, GLint, const GLfloat *)",
+    "glClearBufferuiv": "void (*)(GLenum, GLint, const GLuint *)",
+    # draws
+    "glDrawElements": "void (*)(GLenum, GLsizei, GLenum, const void *)",
+    "glDrawArrays": "void (*)(GLenum, GLint, GLsizei)",
+    # transform feedback
+    "glTransformFeedbackVaryings": "void (*)(GLuint, GLsizei, const GLchar **, GLenum)",
+    "glBeginTransformFeedback": "void (*)(GLenum)",
+    "glEndTransformFeedback": "void (*)(void)",
+    # textures
+    "glGenTextures": "void (*)(GLsizei, GLuint *)",
+    "glBindTexture": "void (*)(GLenum, GLuint)",
+    "glTexImage2D": "void (*)(GLenum, GLint, GLint, GLsizei, GLsizei, GLint, GLenum, GLenum, const void *)",
+    "glTexParameteri": "void (*)(GLenum, GLenum, GLint)",
+    "glGenerateMipmap": "void (*)(GLenum)",
+    # sync objects
+    "glFenceSync": "GLsync (*)(GLenum, GLbitfield)",
+    "glClientWaitSync": "GLenum (*)(GLsync, GLbitfield, GLuint64)",
+    "glDeleteSync": "void (*)(GLsync)",
+    # shaders
+    "glCreateShader": "GLuint (*)(GLenum)",
+    "glShaderSource": "void (*)(GLuint, GLsizei, const GLchar **, const GLint *)",
+    "glCompileShader": "void (*)(GLuint)",
+    "glGetShaderiv": "void (*)(GLuint, GLenum, GLint *)",
+    "glGetShaderInfoLog": "void (*)(GLuint, GLsizei, GLsizei *, GLchar *)",
+    "glDeleteShader": "void (*)(GLuint)",
+    "glCreateProgram": "GLuint (*)(void)",
+    "glAttachShader": "void (*)(GLuint, GLuint)",
+    "glDetachShader": "void (*)(GLuint, GLuint)",
+    "glBindAttribLocation": "void (*)(GLuint, GLuint, const GLchar *)",
+    "glLinkProgram": "void (*)(GLuint)",
+    "glGetProgramiv": "void (*)(GLuint, GLenum, GLint *)",
+    "glGetProgramInfoLog": "void (*)(GLuint, GLsizei, GLsizei *, GLchar *)",
+    "glDeleteProgram": "void (*)(GLuint)",
+    "glMaxShaderCompilerThreadsKHR": "void (*)(GLuint)",
+    "glMaxShaderCompilerThreadsARB": "void (*)(GLuint)",
+    # uniform blocks
+    "glGetUniformBlockIndex": "GLuint (*)(GLuint, const char *)",
+    "glUniformBlockBinding": "void (*)(GLuint, GLuint, GLuint)",
+}
+
+
+class GLFunctions:
+    def __getattr__(self, name):
+        function_type = GL_FUNCTION_TYPES.get(name)
+        if function_type is None:
+            raise AttributeError(name)
+
+        address = nrl.rlGetProcAddress(name.encode())
+        if address == nrl.ffi.NULL:
+            raise RuntimeError(f"OpenGL function is not available: {name}")
+
+        function_type = GL_C_TYPES_PATTERN.sub(
+            lambda match: GL_C_TYPES[match.group(1)], function_type
+        )
+        function = ffi.cast(function_type, address)
+        # cache as attribute so __getattr__ is only hit once per function
+        setattr(self, name, function)
+        return function
+
+
+# resolved lazily, only valid after rl.init_window()
+gl = GLFunctions()
+
+
+def is_gl_function_available(name: str) -> bool:
+    return nrl.rlGetProcAddress(name.encode()) != nrl.ffi.NULL
+
+
+def get_gl_extensions():
+    # set of extension names of the current context
+    count_ptr = ffi.new("int *")
+    gl.glGetIntegerv(GL_NUM_EXTENSIONS, count_ptr)
+    return {
+        ffi.string(ffi.cast("char *", gl.glGetStringi(GL_EXTENSIONS, index))).decode()
+        for index in range(count_ptr[0])
+    }
@@ -0,0 +1,195 @@
+# gpu resource lifetimes: every allocation is tracked with its owner and estimated size
+# - owners release their resources in reverse allocation order (release_owner/scope)
+# - check_leaks() at shutdown reports whatever is still alive, with its allocation site
+
+import contextlib
+import os
+import sys
+
+import pyray as rl
+import raylib as nrl
+
+ffi = nrl.ffi
+
+GPU_RENDER_TARGETS = "render targets"
+GPU_TEXTURES = "textures"
+GPU_BUFFERS = "buffers"
+GPU_MESHES = "meshes"
+GPU_SHADERS = "shaders"
+GPU_RESOURCE_CATEGORIES = (
+    GPU_RENDER_TARGETS,
+    GPU_TEXTURES,
+    GPU_BUFFERS,
+    GPU_MESHES,
+    GPU_SHADERS,
+)
+
+# raylib's depth attachments (format 19) are 24-bit depth, padded to 32 bits
+DEPTH_BYTES_PER_PIXEL = 4
+
+# float3 position + float3 normal + float2 texcoord, see rl.Mesh
+MESH_VERTEX_ATTRIBUTES = (
+    ("vertices", 12),
+    ("normals", 12),
+    ("texcoords", 8),
+    ("texcoords2", 8),
+    ("tangents", 16),
+    ("colors", 4),
+)
+
+
+def texture_bytes(texture: rl.Texture) -> int:
+    if texture.id == 0:
+        return 0
+    total = 0
+    width, height = texture.width, texture.height
+    for _ in range(max(texture.mipmaps, 1)):
+        total += rl.get_pixel_data_size(width, height, texture.format)
+        width, height = max(width // 2, 1), max(height // 2, 1)
+    return total
+
+
+def depth_texture_bytes(texture: rl.Texture) -> int:
+    if texture.id == 0:
+        return 0
+    return texture.width * texture.height * DEPTH_BYTES_PER_PIXEL
+
+
+def render_texture_bytes(target: rl.RenderTexture) -> int:
+    return texture_bytes(target.texture) + depth_texture_bytes(target.depth)
+
+
+def mesh_bytes(mesh) -> int:
+    # QuantizedMesh knows its size, rl.Mesh is estimated from its cpu-side arrays
+    nbytes = getattr(mesh, "nbytes", None)
+    if nbytes is not None:
+        return nbytes
+    total = 0
+    for field, vertex_bytes in MESH_VERTEX_ATTRIBUTES:
+        if getattr(mesh, field) != ffi.NULL:
+            total += mesh.vertexCount * vertex_bytes
+    if mesh.indices != ffi.NULL:
+        total += mesh.triangleCount * 3 * 2
+    return total
+
+
+def model_bytes(model: rl.Model) -> int:
+    return sum(mesh_bytes(model.meshes[index]) for index in range(model.meshCount))
+
+
+def _allocation_site() -> str:
+    # first caller outside this module
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_filename == __file__:
+        frame = frame.f_back
+    if frame is None:
+        return "?"
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+def _owner_name(owner) -> str:
+    return owner if isinstance(owner, str) else type(owner).__name__
+
+
+class GpuResource:
+    def __init__(self, owner, name, obj, release, category, nbytes, site):
+        self.owner = owner
+        self.name = name
+        self.obj = obj
+        # release(obj), called once
+        self.release = release
+        self.category = category
+        self.nbytes = nbytes
+        # "file:line in function" of the allocation, for leak reports
+        self.site = site
+
+
+class GpuResourceManager:
+    def __init__(self):
+        # live resources in allocation order (dicts keep insertion order)
+        self.resources = {}
+        self.total_bytes = 0
+        self.peak_bytes = 0
+
+    def track(
+        self, owner, name: str, obj, release, category: str, nbytes: int = 0
+    ) -> GpuResource:
+        assert category in GPU_RESOURCE_CATEGORIES
+        resource = GpuResource(
+            owner, name, obj, release, category, nbytes, _allocation_site()
+        )
+        self.resources[id(resource)] = resource
+        self.total_bytes += nbytes
+        self.peak_bytes = max(self.peak_bytes, self.total_bytes)
+        return resource
+
+    def release(self, resource: GpuResource):
+        # no-op for resources released already
+        if self.resources.pop(id(resource), None) is not None:
+            self.total_bytes -= resource.nbytes
+            resource.release(resource.obj)
+
+    def release_owner(self, owner):
+        for resource in reversed(self.live(owner)):
+            self.release(resource)
+
+    @contextlib.contextmanager
+    def scope(self, owner):
+        # everything tracked under 'owner' inside the block is released on exit
+        try:
+            yield owner
+        finally:
+            self.release_owner(owner)
+
+    def live(self, owner=None):
+        return [
+            resource
+            for resource in self.resources.values()
+            if owner is None or resource.owner == owner
+        ]
+
+    def live_bytes(self, category: str = None) -> int:
+        if category is None:
+            return self.total_bytes
+        return sum(
+            resource.nbytes
+            for resource in self.resources.values()
+            if resource.category == category
+        )
+
+    def report(self):
+        print(
+            f"gpu resources: {len(self.resources)} live, "
+            f"{self.live_bytes() / 2**20:.1f}MiB (peak {self.peak_bytes / 2**20:.1f}MiB)"
+        )
+        for category in GPU_RESOURCE_CATEGORIES:
+            resources = [
+                resource
+                for resource in self.resources.values()
+                if resource.category == category
+            ]
+            if not resources:
+                continue
+            print(
+                f"  {category:<16} {len(resources):4d} "
+                f"{self.live_bytes(category) / 2**20:8.1f}MiB"
+            )
+
+    def check_leaks(self):
+        # call before rl.close_window(), once every owner has unloaded
+        leaks = self.live()
+        if leaks:
+            print(
+                f"gpu resources: {len(leaks)} leaked, "
+                f"{sum(leak.nbytes for leak in leaks) / 2**20:.1f}MiB"
+            )
+            for leak in leaks:
+                print(
+                    f"  {_owner_name(leak.owner)}.{leak.name} ({leak.category}, "
+                    f"{leak.nbytes / 2**10:.0f}KiB) allocated at {leak.site}"
+                )
+        return leaks
+
+
+# shared by every module, one gl context per process
+gpu_resources = GpuResourceManager()
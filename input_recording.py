@@ -0,0 +1,243 @@
+# session input record/replay: reproduces a reported hitch on any machine
+# - a recording is a header + one fixed-size record per frame holding the loop's frame
+#   input (run.read_frame_input()): get_frame_time(), the camera deltas with the remote
+#   viewport input folded in, F6/F12 and the pick click; records are appended as
+#   frames end, so a crashed session stays readable up to its last whole frame
+# - replay feeds the records to the loop instead of raylib's input: cameras, picking,
+#   F6/F12 and the simulation clock (particles, FrameBlock) see the recorded values,
+#   so frame n of a replay renders what frame n of the session rendered
+# - only imported by run.py with --record-input/--replay-input
+# - pacing: uncapped (as fast as possible, for timings) or paced (frame n starts at
+#   the recorded time of frame n, for hitches that depend on the frame rate)
+# - frame indices match the telemetry's, record with --telemetry-path to line up the
+#   original frame times with the replayed ones
+
+import argparse
+import time
+
+import numpy as np
+
+INPUT_RECORDING_MAGIC = 0x52495353  # "SSIR"
+INPUT_RECORDING_VERSION = 2
+
+INPUT_REPLAY_UNCAPPED = "uncapped"
+INPUT_REPLAY_PACED = "paced"
+INPUT_REPLAY_PACINGS = (INPUT_REPLAY_UNCAPPED, INPUT_REPLAY_PACED)
+
+# keys bits
+INPUT_KEY_F6_PRESSED = 1 << 0
+INPUT_KEY_F12_PRESSED = 1 << 1
+INPUT_PICK = 1 << 2
+
+INPUT_RECORDING_HEADER = np.dtype(
+    [
+        ("magic", "<u4"),
+        ("version", "<u4"),
+        ("record_size", "<u4"),
+        # window size and views of the session, picking positions depend on them
+        ("width", "<u4"),
+        ("height", "<u4"),
+        ("num_views", "<u4"),
+        # wall clock at the start of the recording
+        ("timestamp", "<f8"),
+    ]
+)
+
+# packed, 33 bytes per frame
+INPUT_RECORD = np.dtype(
+    [
+        ("frame_time", "<f4"),
+        # Camera.update() deltas: rotate x/y, pan x/y, wheel
+        ("camera_deltas", "<f4", 5),
+        # click position in window pixels, valid with INPUT_PICK
+        ("pick_position", "<f4", 2),
+        ("keys", "u1"),
+    ]
+)
+
+
+def pack_frame_input(frame_input, record: np.ndarray):
+    # frame input tuple -> shape (1,) INPUT_RECORD
+    frame_time, camera_deltas, quality_pressed, screenshot_pressed, pick_position = (
+        frame_input
+    )
+    record["frame_time"] = frame_time
+    record["camera_deltas"] = camera_deltas
+    keys = 0
+    if quality_pressed:
+        keys |= INPUT_KEY_F6_PRESSED
+    if screenshot_pressed:
+        keys |= INPUT_KEY_F12_PRESSED
+    if pick_position is not None:
+        keys |= INPUT_PICK
+        record["pick_position"] = pick_position
+    else:
+        record["pick_position"] = 0.0
+    record["keys"] = keys
+    return record
+
+
+def unpack_frame_input(record):
+    # INPUT_RECORD -> frame input tuple, see run.read_frame_input()
+    keys = int(record["keys"])
+    pick_position = None
+    if keys & INPUT_PICK:
+        pick_position = tuple(float(value) for value in record["pick_position"])
+    return (
+        float(record["frame_time"]),
+        tuple(float(value) for value in record["camera_deltas"]),
+        bool(keys & INPUT_KEY_F6_PRESSED),
+        bool(keys & INPUT_KEY_F12_PRESSED),
+        pick_position,
+    )
+
+
+class InputRecorder:
+    def __init__(self, path: str, width: int, height: int, num_views: int = 1):
+        header = np.zeros(1, dtype=INPUT_RECORDING_HEADER)
+        header["magic"] = INPUT_RECORDING_MAGIC
+        header["version"] = INPUT_RECORDING_VERSION
+        header["record_size"] = INPUT_RECORD.itemsize
+        header["width"] = width
+        header["height"] = height
+        header["num_views"] = num_views
+        header["timestamp"] = time.time()
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(header.tobytes())
+        self.record = np.zeros(1, dtype=INPUT_RECORD)
+        self.num_frames = 0
+
+    def write(self, frame_input):
+        # buffered by the file object, no syscall per frame
+        self.file.write(pack_frame_input(frame_input, self.record).tobytes())
+        self.num_frames += 1
+
+    def close(self):
+        self.file.close()
+        print(f"input recording: {self.num_frames} frames -> {self.path}")
+
+
+def load_input_recording(path: str):
+    # (header record, records (N,) INPUT_RECORD), a trailing partial record is dropped
+    data = np.fromfile(path, dtype=np.uint8)
+    header_size = INPUT_RECORDING_HEADER.itemsize
+    if data.shape[0] < header_size:
+        raise ValueError(f"{path}: not an input recording")
+    header = data[:header_size].view(INPUT_RECORDING_HEADER)[0]
+    if header["magic"] != INPUT_RECORDING_MAGIC:
+        raise ValueError(f"{path}: not an input recording")
+    if (
+        header["version"] != INPUT_RECORDING_VERSION
+        or header["record_size"] != INPUT_RECORD.itemsize
+    ):
+        raise ValueError(
+            f"{path}: input recording version {header['version']} is not supported"
+        )
+    body = data[header_size:]
+    num_frames = body.shape[0] // INPUT_RECORD.itemsize
+    records = body[: num_frames * INPUT_RECORD.itemsize].view(INPUT_RECORD)
+    return header, records
+
+
+class InputReplay:
+    def __init__(self, path: str, pacing: str = INPUT_REPLAY_UNCAPPED):
+        assert pacing in INPUT_REPLAY_PACINGS
+        self.path = path
+        self.pacing = pacing
+        self.header, self.records = load_input_recording(path)
+        # session clock of each frame, the sum of the frame times so far; frame n
+        # started times[n] - times[0] after frame 0 (frame_time is the previous
+        # frame's duration)
+        self.times = np.cumsum(self.records["frame_time"], dtype=np.float64)
+        self.frame_index = 0
+        self.start = None
+        # frames that started later than recorded (paced only)
+        self.late_frames = 0
+
+    @property
+    def num_frames(self) -> int:
+        return self.records.shape[0]
+
+    @property
+    def time(self) -> float:
+        # session clock of the frame returned by the last next()
+        return float(self.times[max(self.frame_index - 1, 0)])
+
+    @property
+    def recorded_seconds(self) -> float:
+        return float(self.times[-1] - self.times[0]) if self.num_frames else 0.0
+
+    def check_session(self, width: int, height: int, num_views: int):
+        # a different window or view layout moves picks and splits views differently
+        header = self.header
+        if (header["width"], header["height"], header["num_views"]) != (
+            width,
+            height,
+            num_views,
+        ):
+            print(
+                f"input replay: recorded {header['width']}x{header['height']} with "
+                f"{header['num_views']} views, replaying {width}x{height} with "
+                f"{num_views} views"
+            )
+
+    def next(self):
+        # next frame's input tuple, None once the recording is exhausted
+        if self.frame_index >= self.num_frames:
+            return None
+        if self.start is None:
+            self.start = time.perf_counter()
+        elif self.pacing == INPUT_REPLAY_PACED:
+            self._wait(self.start + self.times[self.frame_index] - self.times[0])
+        self.frame_index += 1
+        return unpack_frame_input(self.records[self.frame_index - 1])
+
+    def _wait(self, deadline: float):
+        # sleep most of the way, spin the last millisecond (sleep overshoots)
+        remaining = deadline - time.perf_counter()
+        if remaining < 0.0:
+            self.late_frames += 1
+            return
+        if remaining > 0.002:
+            time.sleep(remaining - 0.001)
+        while time.perf_counter() < deadline:
+            pass
+
+    def report(self):
+        # wall time of the replay against the recorded session
+        wall_seconds = 0.0 if self.start is None else time.perf_counter() - self.start
+        print(
+            f"input replay ({self.pacing}): {self.frame_index}/{self.num_frames} "
+            f"frames in {wall_seconds:.2f}s, recorded {self.recorded_seconds:.2f}s"
+            + (
+                f", {self.late_frames} frames late"
+                if self.pacing == INPUT_REPLAY_PACED
+                else ""
+            )
+        )
+
+
+if __name__ == "__main__":
+    # summary of a recording: duration and the slowest recorded frames, i.e. the
+    # frames to look at when replaying
+    parser = argparse.ArgumentParser(description="SseEngine input recording summary")
+    parser.add_argument("path")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    header, records = load_input_recording(args.path)
+    frame_times = records["frame_time"].astype(np.float64) * 1000.0
+    print(
+        f"{args.path}: {records.shape[0]} frames, {frame_times.sum() / 1000.0:.2f}s, "
+        f"{header['width']}x{header['height']}, {header['num_views']} views, "
+        f"{INPUT_RECORD.itemsize} bytes per frame"
+    )
+    if records.shape[0] > 0:
+        print(
+            f"frame time: p50 {np.percentile(frame_times, 50):.2f}ms, "
+            f"p99 {np.percentile(frame_times, 99):.2f}ms, max {frame_times.max():.2f}ms"
+        )
+        # get_frame_time() of frame n is the duration of frame n - 1
+        for index in np.argsort(frame_times)[::-1][: args.top]:
+            print(f"  frame {max(int(index) - 1, 0):6d}: {frame_times[index]:.2f}ms")
@@ -0,0 +1,449 @@
+import argparse
+import concurrent.futures
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+
+from multiprocessing import shared_memory
+
+import pyray as rl
+
+import numpy as np
+
+from batch_render import *
+
+# per worker frame slots in shared memory, a slot is reused once the server consumed it
+JOB_SLOTS_PER_WORKER = 4
+
+# result messages: (kind, worker_id, generation, payload)
+JOB_MESSAGE_FRAME = 0
+JOB_MESSAGE_SHARD = 1
+JOB_MESSAGE_ERROR = 2
+
+
+class JobFrameSlot:
+    # numpy views of one frame slot: rgba8 color, linear depth, world normal
+    def __init__(self, buffer, index, width, height):
+        color_size = width * height * 4
+        depth_size = width * height * 4
+        normal_size = width * height * 3 * 4
+        offset = index * job_slot_size(width, height)
+        self.color = np.ndarray(
+            (height, width, 4), dtype=np.uint8, buffer=buffer, offset=offset
+        )
+        offset += color_size
+        self.depth = np.ndarray(
+            (height, width), dtype=np.float32, buffer=buffer, offset=offset
+        )
+        offset += depth_size
+        self.normal = np.ndarray(
+            (height, width, 3), dtype=np.float32, buffer=buffer, offset=offset
+        )
+        assert offset + normal_size <= len(buffer)
+
+
+def job_slot_size(width, height):
+    return width * height * (4 + 4 + 3 * 4)
+
+
+class RenderJobStats:
+    def __init__(self):
+        self.num_frames = 0
+        self.num_workers = 0
+        self.seconds = 0.0
+        # shards re-queued after a worker crashed, and frames given up on
+        self.retries = 0
+        self.crashed_workers = 0
+        self.failed_frames = []
+
+    @property
+    def fps(self):
+        return self.num_frames / max(self.seconds, 1e-9)
+
+
+def _render_worker(
+    worker_id,
+    generation,
+    width,
+    height,
+    shm_name,
+    task_queue,
+    free_slots,
+    result_queue,
+    software_threads,
+    ring_size,
+    quality,
+):
+    # one process: own gl context, own pipeline, frames written into shared memory
+    if software_threads is not None:
+        # llvmpipe spawns a thread per core by default, keep workers from oversubscribing
+        os.environ["LP_NUM_THREADS"] = str(software_threads)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = [
+        JobFrameSlot(shm.buf, index, width, height)
+        for index in range(JOB_SLOTS_PER_WORKER)
+    ]
+    try:
+        rl.set_trace_log_level(rl.LOG_WARNING)
+        rl.set_config_flags(rl.FLAG_WINDOW_HIDDEN)
+        rl.init_window(width, height, f"SseEngine Worker {worker_id}".encode())
+        rl.set_target_fps(0)
+
+        renderer = Renderer(width, height, quality)
+        # every frame sees the decoded textures, not the white placeholder
+        renderer.texture_streamer.finish()
+        final = rl.load_render_texture(width, height)
+        final_resource = gpu_resources.track(
+            "render_worker",
+            "final",
+            final,
+            rl.unload_render_texture,
+            GPU_RENDER_TARGETS,
+            render_texture_bytes(final),
+        )
+        readback = AsyncReadback(ring_size=ring_size)
+
+        # frame index -> [slot index, outputs remaining]
+        pending = {}
+
+        def on_readback(frame: ReadbackFrame):
+            entry = pending[frame.frame_index]
+            slot = slots[entry[0]]
+            if frame.name == "color":
+                slot.color[...] = frame.array
+            elif frame.name == "depth":
+                near, far = frame.user_data
+                slot.depth[...] = linearize_gbuffer_depth(
+                    frame.array[..., 0], near, far
+                )
+            else:
+                slot.normal[...] = decode_gbuffer_normal(frame.array)
+            entry[1] -= 1
+            if entry[1] == 0:
+                del pending[frame.frame_index]
+                result_queue.put(
+                    (
+                        JOB_MESSAGE_FRAME,
+                        worker_id,
+                        generation,
+                        (frame.frame_index, entry[0]),
+                    )
+                )
+
+        for name in BATCH_OUTPUTS:
+            readback.add_callback(name, on_readback)
+
+        while True:
+            shard = task_queue.get()
+            if shard is None:
+                break
+            shard_id, frame_indices, poses = shard
+            for frame_index, pose in zip(frame_indices, poses):
+                # wait for a free slot, finishing readbacks meanwhile so none is stuck in flight
+                while True:
+                    try:
+                        slot_index = free_slots.get_nowait()
+                        break
+                    except queue.Empty:
+                        if readback.in_flight:
+                            readback.poll(timeout_ns=1000000)
+                        else:
+                            slot_index = free_slots.get()
+                            break
+                pending[frame_index] = [slot_index, len(BATCH_OUTPUTS)]
+                render_pose(renderer, final, readback, pose, frame_index)
+
+            while readback.in_flight:
+                readback.poll(timeout_ns=1000000)
+            result_queue.put((JOB_MESSAGE_SHARD, worker_id, generation, shard_id))
+
+        readback.unload()
+        gpu_resources.release(final_resource)
+        renderer.unload()
+        gpu_resources.check_leaks()
+        rl.close_window()
+    except BaseException:
+        # the server sees the process exit and re-queues its shards
+        result_queue.put(
+            (JOB_MESSAGE_ERROR, worker_id, generation, traceback.format_exc())
+        )
+        raise
+
+    del slots, on_readback
+    shm.close()
+
+
+class _JobWorker:
+    def __init__(self, worker_id, shm):
+        self.worker_id = worker_id
+        self.shm = shm
+        self.generation = -1
+        self.slots = []
+        self.process = None
+        self.task_queue = None
+        self.free_slots = None
+        # shard ids sent to this worker and not finished yet
+        self.shards = []
+
+
+class RenderJobServer:
+    # shards camera poses over worker processes, each with its own gl context
+    def __init__(
+        self,
+        num_workers: int = None,
+        width: int = 1280,
+        height: int = 720,
+        shard_size: int = 8,
+        max_retries: int = 2,
+        software_threads: int = 1,
+        ring_size: int = 3,
+        quality: str = "medium",
+    ):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.width = width
+        self.height = height
+        self.shard_size = shard_size
+        self.max_retries = max_retries
+        self.software_threads = software_threads
+        self.ring_size = ring_size
+        # shader quality tier of every worker, lower it on weak (software) nodes
+        self.quality = quality
+
+        # spawn: a fresh interpreter per worker, no gl state inherited through fork
+        self.context = multiprocessing.get_context("spawn")
+        self.result_queue = self.context.Queue()
+        self.workers = []
+        return
+
+    def start(self):
+        slot_size = job_slot_size(self.width, self.height)
+        for worker_id in range(self.num_workers):
+            shm = shared_memory.SharedMemory(
+                create=True, size=slot_size * JOB_SLOTS_PER_WORKER
+            )
+            worker = _JobWorker(worker_id, shm)
+            worker.slots = [
+                JobFrameSlot(shm.buf, index, self.width, self.height)
+                for index in range(JOB_SLOTS_PER_WORKER)
+            ]
+            self.workers.append(worker)
+            self._spawn(worker)
+
+    def _spawn(self, worker: _JobWorker):
+        worker.generation += 1
+        worker.task_queue = self.context.Queue()
+        worker.free_slots = self.context.Queue()
+        for index in range(JOB_SLOTS_PER_WORKER):
+            worker.free_slots.put(index)
+        worker.shards = []
+        worker.process = self.context.Process(
+            target=_render_worker,
+            args=(
+                worker.worker_id,
+                worker.generation,
+                self.width,
+                self.height,
+                worker.shm.name,
+                worker.task_queue,
+                worker.free_slots,
+                self.result_queue,
+                self.software_threads,
+                self.ring_size,
+                self.quality,
+            ),
+            daemon=True,
+        )
+        worker.process.start()
+
+    def render(self, poses, on_frame) -> RenderJobStats:
+        # on_frame(frame_index, color, depth, normal): views into shared memory,
+        # only valid during the call
+        poses = np.asarray(poses, dtype=np.float32)
+        stats = RenderJobStats()
+        stats.num_workers = self.num_workers
+
+        # shard id -> frame indices, retries per shard
+        shards = {}
+        for shard_id, begin in enumerate(range(0, poses.shape[0], self.shard_size)):
+            shards[shard_id] = np.arange(
+                begin, min(begin + self.shard_size, poses.shape[0])
+            )
+        retries = {shard_id: 0 for shard_id in shards}
+        waiting = list(shards)
+        completed = np.zeros(poses.shape[0], dtype=bool)
+
+        def dispatch(worker):
+            # keep two shards queued per worker so it never idles between shards
+            while waiting and len(worker.shards) < 2:
+                shard_id = waiting.pop(0)
+                frame_indices = shards[shard_id][~completed[shards[shard_id]]]
+                worker.shards.append(shard_id)
+                worker.task_queue.put((shard_id, frame_indices, poses[frame_indices]))
+
+        begin = time.perf_counter()
+        for worker in self.workers:
+            dispatch(worker)
+
+        while waiting or any(worker.shards for worker in self.workers):
+            try:
+                kind, worker_id, generation, payload = self.result_queue.get(
+                    timeout=0.1
+                )
+            except queue.Empty:
+                kind = None
+
+            if kind is not None:
+                worker = self.workers[worker_id]
+                # late messages of a crashed worker, its frames were re-queued
+                if generation != worker.generation:
+                    continue
+                if kind == JOB_MESSAGE_FRAME:
+                    frame_index, slot_index = payload
+                    slot = worker.slots[slot_index]
+                    if not completed[frame_index]:
+                        on_frame(frame_index, slot.color, slot.depth, slot.normal)
+                        completed[frame_index] = True
+                    worker.free_slots.put(slot_index)
+                elif kind == JOB_MESSAGE_SHARD:
+                    worker.shards.remove(payload)
+                    dispatch(worker)
+                elif kind == JOB_MESSAGE_ERROR:
+                    print(f"render worker {worker_id} failed:\n{payload}")
+
+            # crashed workers: re-queue unfinished frames and respawn
+            for worker in self.workers:
+                if worker.process.is_alive():
+                    continue
+                stats.crashed_workers += 1
+                for shard_id in worker.shards:
+                    if completed[shards[shard_id]].all():
+                        continue
+                    if retries[shard_id] >= self.max_retries:
+                        failed = shards[shard_id][~completed[shards[shard_id]]]
+                        stats.failed_frames.extend(failed.tolist())
+                        continue
+                    retries[shard_id] += 1
+                    stats.retries += 1
+                    waiting.insert(0, shard_id)
+                self._spawn(worker)
+                dispatch(worker)
+
+        stats.seconds = time.perf_counter() - begin
+        stats.num_frames = int(completed.sum())
+        return stats
+
+    def shutdown(self):
+        for worker in self.workers:
+            if worker.process.is_alive():
+                worker.task_queue.put(None)
+        for worker in self.workers:
+            worker.process.join(timeout=10.0)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            # views must go before the mapping is closed
+            worker.slots = []
+            worker.shm.close()
+            worker.shm.unlink()
+        self.workers = []
+
+
+def render_jobs(
+    pose_path: str,
+    output_dir: str,
+    num_workers: int = None,
+    width: int = 1280,
+    height: int = 720,
+    data_format: str = "npz",
+    quality: str = "medium",
+) -> RenderJobStats:
+    poses = load_camera_poses(pose_path)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # file encoding releases the gil (zlib, raylib export), threads are enough here
+    writer = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    futures = []
+
+    def on_frame(frame_index, color, depth, normal):
+        futures.append(
+            writer.submit(
+                write_batch_outputs,
+                os.path.join(output_dir, f"{frame_index:06d}"),
+                color.copy(),
+                depth.copy(),
+                normal.copy(),
+                data_format,
+            )
+        )
+
+    server = RenderJobServer(num_workers, width, height, quality=quality)
+    server.start()
+    try:
+        stats = server.render(poses, on_frame)
+    finally:
+        server.shutdown()
+    for future in futures:
+        future.result()
+    writer.shutdown()
+
+    print(
+        f"jobs: {stats.num_frames} frames, {stats.num_workers} workers, "
+        f"{stats.fps:.1f} fps, {stats.retries} retries, "
+        f"{len(stats.failed_frames)} failed"
+    )
+    return stats
+
+
+def benchmark_job_server(
+    num_poses: int = 256, width: int = 640, height: int = 360, max_workers=None
+):
+    # throughput per worker count, frames are only collected (no file output)
+    poses = generate_orbit_poses(num_poses)
+    max_workers = max_workers or os.cpu_count() or 1
+    num_workers = 1
+    baseline_fps = None
+    while True:
+        server = RenderJobServer(num_workers, width, height)
+        server.start()
+        try:
+            stats = server.render(poses, lambda *frame: None)
+        finally:
+            server.shutdown()
+        baseline_fps = baseline_fps or stats.fps
+        print(
+            f"{num_workers} workers: {stats.fps:.1f} fps "
+            f"(x{stats.fps / baseline_fps:.2f})"
+        )
+        if num_workers >= max_workers:
+            break
+        num_workers = min(num_workers * 2, max_workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="render camera poses on workers")
+    parser.add_argument("poses", nargs="?", help="camera pose file")
+    parser.add_argument("output", nargs="?", help="output directory")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--format", choices=("npz", "exr"), default="npz")
+    parser.add_argument(
+        "--quality", choices=tuple(SHADER_QUALITY_TIERS), default="medium"
+    )
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_job_server(max_workers=args.workers)
+    else:
+        render_jobs(
+            args.poses,
+            args.output,
+            args.workers,
+            args.width,
+            args.height,
+            args.format,
+            args.quality,
+        )
@@ -0,0 +1,500 @@
+import heapq
+import math
+import os
+
+import pyray as rl
+import raylib as nrl
+
+import numpy as np
+
+from gpu_resources import *
+from vertex_formats import *
+
+# retrieve ffi (raylib's compiled ffi, no pycparser at startup)
+ffi = nrl.ffi
+
+
+class MeshData:
+    def __init__(self, positions, normals, texcoords, indices):
+        # vertex positions: (N, 3) float32
+        self.positions = positions
+        # vertex normals: (N, 3) float32
+        self.normals = normals
+        # vertex texcoords: (N, 2) float32
+        self.texcoords = texcoords
+        # triangle indices: (M, 3) uint32
+        self.indices = indices
+
+    @property
+    def vertex_count(self):
+        return self.positions.shape[0]
+
+    @property
+    def triangle_count(self):
+        return self.indices.shape[0]
+
+
+def read_mesh_data(mesh: rl.Mesh) -> MeshData:
+    vertex_count = mesh.vertexCount
+
+    positions = np.frombuffer(
+        ffi.buffer(mesh.vertices, vertex_count * 3 * 4), dtype=np.float32
+    ).reshape(-1, 3)
+
+    if mesh.normals != ffi.NULL:
+        normals = np.frombuffer(
+            ffi.buffer(mesh.normals, vertex_count * 3 * 4), dtype=np.float32
+        ).reshape(-1, 3)
+    else:
+        normals = np.zeros((vertex_count, 3), dtype=np.float32)
+
+    if mesh.texcoords != ffi.NULL:
+        texcoords = np.frombuffer(
+            ffi.buffer(mesh.texcoords, vertex_count * 2 * 4), dtype=np.float32
+        ).reshape(-1, 2)
+    else:
+        texcoords = np.zeros((vertex_count, 2), dtype=np.float32)
+
+    # raylib generators (e.g. gen_mesh_sphere) produce non-indexed triangle lists
+    if mesh.indices != ffi.NULL:
+        indices = np.frombuffer(
+            ffi.buffer(mesh.indices, mesh.triangleCount * 3 * 2), dtype=np.uint16
+        ).reshape(-1, 3)
+    else:
+        indices = np.arange(vertex_count, dtype=np.uint32).reshape(-1, 3)
+
+    # copy out of raylib-owned memory
+    return MeshData(
+        positions.copy(),
+        normals.copy(),
+        texcoords.copy(),
+        indices.astype(np.uint32),
+    )
+
+
+def weld_mesh_data(data: MeshData, epsilon: float = 1e-5) -> MeshData:
+    # merge vertices sharing position, normal and texcoord, so uv/normal seams stay
+    # as (duplicated) boundary vertices and the rest of the surface is connected
+    attributes = np.concatenate([data.positions, data.normals, data.texcoords], axis=1)
+    keys = np.round(attributes / epsilon).astype(np.int64)
+    _, first, remap = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    remap = remap.reshape(-1)
+
+    indices = remap[data.indices].astype(np.uint32)
+
+    # drop triangles which became degenerated by welding
+    valid = (
+        (indices[:, 0] != indices[:, 1])
+        & (indices[:, 1] != indices[:, 2])
+        & (indices[:, 2] != indices[:, 0])
+    )
+
+    return MeshData(
+        data.positions[first],
+        data.normals[first],
+        data.texcoords[first],
+        indices[valid],
+    )
+
+
+def compute_vertex_quadrics(positions, indices, boundary_weight: float = 1000.0):
+    # face planes: (n, d) with n.p + d = 0, weighted by triangle area
+    p0 = positions[indices[:, 0]].astype(np.float64)
+    p1 = positions[indices[:, 1]].astype(np.float64)
+    p2 = positions[indices[:, 2]].astype(np.float64)
+    cross = np.cross(p1 - p0, p2 - p0)
+    double_area = np.linalg.norm(cross, axis=1)
+    normals = cross / np.maximum(double_area, 1e-12)[:, None]
+    planes = np.concatenate(
+        [normals, -np.einsum("ij,ij->i", normals, p0)[:, None]], axis=1
+    )
+    face_quadrics = np.einsum("i,ij,ik->ijk", double_area * 0.5, planes, planes)
+
+    quadrics = np.zeros((positions.shape[0], 4, 4), dtype=np.float64)
+    for corner in range(3):
+        np.add.at(quadrics, indices[:, corner], face_quadrics)
+
+    # boundary edges (used by exactly one triangle) get a perpendicular penalty plane
+    # to keep silhouettes and uv seams from collapsing inwards
+    edges = np.concatenate(
+        [indices[:, [0, 1]], indices[:, [1, 2]], indices[:, [2, 0]]], axis=0
+    )
+    edge_faces = np.tile(np.arange(indices.shape[0]), 3)
+    sorted_edges = np.sort(edges, axis=1)
+    _, inverse, counts = np.unique(
+        sorted_edges, axis=0, return_inverse=True, return_counts=True
+    )
+    boundary = counts[inverse.reshape(-1)] == 1
+    if np.any(boundary):
+        e0 = positions[edges[boundary, 0]].astype(np.float64)
+        e1 = positions[edges[boundary, 1]].astype(np.float64)
+        edge_direction = e1 - e0
+        edge_length = np.linalg.norm(edge_direction, axis=1)
+        side = np.cross(edge_direction, normals[edge_faces[boundary]])
+        side = side / np.maximum(np.linalg.norm(side, axis=1), 1e-12)[:, None]
+        side_planes = np.concatenate(
+            [side, -np.einsum("ij,ij->i", side, e0)[:, None]], axis=1
+        )
+        side_quadrics = np.einsum(
+            "i,ij,ik->ijk",
+            boundary_weight * edge_length * edge_length,
+            side_planes,
+            side_planes,
+        )
+        np.add.at(quadrics, edges[boundary, 0], side_quadrics)
+        np.add.at(quadrics, edges[boundary, 1], side_quadrics)
+
+    return quadrics
+
+
+def _quadric_error(quadric, position):
+    v = np.append(position, 1.0)
+    return float(v @ quadric @ v)
+
+
+def _collapse_target(quadric, p0, p1):
+    # try the optimal position first, fall back to endpoints/midpoint
+    candidates = [p0, p1, (p0 + p1) * 0.5]
+    a = quadric[:3, :3]
+    if abs(np.linalg.det(a)) > 1e-10:
+        optimal = np.linalg.solve(a, -quadric[:3, 3])
+        # reject optimal positions far away from the edge
+        if np.linalg.norm(optimal - (p0 + p1) * 0.5) < np.linalg.norm(p1 - p0) * 2.0:
+            candidates.insert(0, optimal)
+
+    best_cost = math.inf
+    best_position = candidates[-1]
+    for candidate in candidates:
+        cost = _quadric_error(quadric, candidate)
+        if cost < best_cost:
+            best_cost = cost
+            best_position = candidate
+    return max(best_cost, 0.0), best_position
+
+
+def simplify_mesh_data(data: MeshData, target_triangle_count: int) -> MeshData:
+    # quadric error metric edge collapse (Garland-Heckbert)
+    positions = data.positions.astype(np.float64)
+    normals = data.normals.astype(np.float64)
+    texcoords = data.texcoords.astype(np.float64)
+    faces = data.indices.astype(np.int64).copy()
+
+    quadrics = compute_vertex_quadrics(positions, faces)
+
+    vertex_faces = [set() for _ in range(positions.shape[0])]
+    for face_index, face in enumerate(faces):
+        for vertex in face:
+            vertex_faces[vertex].add(face_index)
+
+    face_alive = np.ones(faces.shape[0], dtype=bool)
+    vertex_alive = np.ones(positions.shape[0], dtype=bool)
+    # bump per-vertex version to lazily invalidate heap entries
+    vertex_version = np.zeros(positions.shape[0], dtype=np.int64)
+
+    heap = []
+
+    def push_edge(v0, v1):
+        cost, position = _collapse_target(
+            quadrics[v0] + quadrics[v1], positions[v0], positions[v1]
+        )
+        heapq.heappush(
+            heap,
+            (cost, v0, v1, vertex_version[v0], vertex_version[v1], tuple(position)),
+        )
+
+    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    for v0, v1 in np.unique(np.sort(edges, axis=1), axis=0):
+        push_edge(int(v0), int(v1))
+
+    live_triangle_count = faces.shape[0]
+    while live_triangle_count > target_triangle_count and heap:
+        cost, v0, v1, version0, version1, position = heapq.heappop(heap)
+        if not (vertex_alive[v0] and vertex_alive[v1]):
+            continue
+        if version0 != vertex_version[v0] or version1 != vertex_version[v1]:
+            continue
+
+        position = np.array(position)
+        shared = vertex_faces[v0] & vertex_faces[v1]
+        if not shared:
+            continue
+
+        # reject collapses which flip neighboring triangles
+        flipped = False
+        for face_index in (vertex_faces[v0] | vertex_faces[v1]) - shared:
+            face = faces[face_index]
+            corners = positions[face]
+            before = np.cross(corners[1] - corners[0], corners[2] - corners[0])
+            corners = corners.copy()
+            corners[(face == v0) | (face == v1)] = position
+            after = np.cross(corners[1] - corners[0], corners[2] - corners[0])
+            if np.dot(before, after) <= 0.0:
+                flipped = True
+                break
+        if flipped:
+            continue
+
+        # interpolate attributes along the collapsed edge
+        edge = positions[v1] - positions[v0]
+        edge_length_sq = float(np.dot(edge, edge))
+        t = 0.5
+        if edge_length_sq > 0.0:
+            t = float(
+                np.clip(
+                    np.dot(position - positions[v0], edge) / edge_length_sq, 0.0, 1.0
+                )
+            )
+        normal = normals[v0] * (1.0 - t) + normals[v1] * t
+        normals[v0] = normal / max(np.linalg.norm(normal), 1e-12)
+        texcoords[v0] = texcoords[v0] * (1.0 - t) + texcoords[v1] * t
+        positions[v0] = position
+        quadrics[v0] += quadrics[v1]
+
+        # collapse v1 into v0
+        for face_index in shared:
+            face_alive[face_index] = False
+            for vertex in faces[face_index]:
+                vertex_faces[vertex].discard(face_index)
+            live_triangle_count -= 1
+        for face_index in vertex_faces[v1]:
+            faces[face_index][faces[face_index] == v1] = v0
+            vertex_faces[v0].add(face_index)
+        vertex_faces[v1] = set()
+        vertex_alive[v1] = False
+        vertex_version[v0] += 1
+
+        # re-evaluate edges around the merged vertex
+        neighbors = set()
+        for face_index in vertex_faces[v0]:
+            neighbors.update(int(vertex) for vertex in faces[face_index])
+        neighbors.discard(v0)
+        for neighbor in neighbors:
+            push_edge(min(v0, neighbor), max(v0, neighbor))
+
+    # compact the surviving vertices
+    faces = faces[face_alive]
+    used = np.unique(faces)
+    remap = np.full(positions.shape[0], -1, dtype=np.int64)
+    remap[used] = np.arange(used.shape[0])
+
+    return MeshData(
+        positions[used].astype(np.float32),
+        normals[used].astype(np.float32),
+        texcoords[used].astype(np.float32),
+        remap[faces].astype(np.uint32),
+    )
+
+
+def _alloc_copy(array, c_type: str):
+    array = np.ascontiguousarray(array)
+    ptr = ffi.cast(c_type, rl.mem_alloc(array.nbytes))
+    ffi.memmove(ptr, ffi.from_buffer(array), array.nbytes)
+    return ptr
+
+
+def load_mesh_from_data(data: MeshData) -> rl.Mesh:
+    # raylib meshes use 16-bit indices
+    assert data.vertex_count <= 65535
+
+    mesh = rl.Mesh()
+    mesh.vertexCount = data.vertex_count
+    mesh.triangleCount = data.triangle_count
+
+    # allocate through raylib so rl.unload_mesh() can release the buffers
+    mesh.vertices = _alloc_copy(data.positions.astype(np.float32), "float *")
+    mesh.normals = _alloc_copy(data.normals.astype(np.float32), "float *")
+    mesh.texcoords = _alloc_copy(data.texcoords.astype(np.float32), "float *")
+    mesh.indices = _alloc_copy(data.indices.astype(np.uint16), "unsigned short *")
+
+    rl.upload_mesh(ffi.addressof(mesh), False)
+    return mesh
+
+
+def load_quantized_mesh_from_data(
+    data: MeshData, vertex_format: str = VERTEX_FORMAT_SNORM16
+) -> QuantizedMesh:
+    return load_quantized_mesh(
+        quantize_mesh_data(
+            data.positions, data.normals, data.texcoords, data.indices, vertex_format
+        )
+    )
+
+
+def build_lod_chain(mesh: rl.Mesh, num_levels: int = 4, reduction: float = 0.5):
+    # level 0 is the welded source mesh, each next level keeps 'reduction' of triangles
+    source = weld_mesh_data(read_mesh_data(mesh))
+    chain = [source]
+    for _ in range(1, num_levels):
+        target_triangle_count = max(int(chain[-1].triangle_count * reduction), 4)
+        simplified = simplify_mesh_data(chain[-1], target_triangle_count)
+        if simplified.triangle_count >= chain[-1].triangle_count:
+            break
+        chain.append(simplified)
+    return chain
+
+
+def save_lod_chain(path: str, chain):
+    # offline cache of the generated levels
+    arrays = {}
+    for level, data in enumerate(chain):
+        arrays[f"positions_{level}"] = data.positions
+        arrays[f"normals_{level}"] = data.normals
+        arrays[f"texcoords_{level}"] = data.texcoords
+        arrays[f"indices_{level}"] = data.indices
+    np.savez_compressed(path, num_levels=len(chain), **arrays)
+
+
+def load_lod_chain(path: str):
+    chain = []
+    with np.load(path) as archive:
+        for level in range(int(archive["num_levels"])):
+            chain.append(
+                MeshData(
+                    archive[f"positions_{level}"],
+                    archive[f"normals_{level}"],
+                    archive[f"texcoords_{level}"],
+                    archive[f"indices_{level}"],
+                )
+            )
+    return chain
+
+
+def load_cached_lod_chain(
+    mesh: rl.Mesh, path: str, num_levels: int = 4, reduction: float = 0.5
+):
+    # builds the chain once, later startups read it back from 'path'
+    # - 'path' has to identify the source mesh and parameters, delete it to rebuild
+    if os.path.exists(path):
+        return load_lod_chain(path)[:num_levels]
+    chain = build_lod_chain(mesh, num_levels, reduction)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    save_lod_chain(path, chain)
+    return chain
+
+
+class LodGroup:
+    def __init__(self):
+        # one render mesh per level (rl.Mesh or QuantizedMesh), level 0 is the finest
+        self.meshes = []
+        # models owning the float32 meshes
+        self.models = []
+        # triangle count per level
+        self.triangle_counts = []
+        # screen-size thresholds where level i+1 takes over from level i (descending)
+        self.screen_sizes = np.zeros(0, dtype=np.float32)
+        # local bounding sphere of level 0
+        self.bounding_center = np.zeros(3, dtype=np.float32)
+        self.bounding_radius = 0.0
+
+    @property
+    def num_levels(self):
+        return len(self.meshes)
+
+
+def load_lod_group(
+    mesh: rl.Mesh,
+    num_levels: int = 4,
+    reduction: float = 0.5,
+    screen_size: float = 0.5,
+    screen_size_step: float = 0.5,
+    chain=None,
+    vertex_format: str = VERTEX_FORMAT_FLOAT32,
+):
+    # vertex_format: compact formats quantize every level on load, the group then
+    # owns 'mesh' and releases it (its float32 buffers are not drawn)
+    group = LodGroup()
+
+    if chain is None:
+        chain = build_lod_chain(mesh, num_levels, reduction)
+    if vertex_format == VERTEX_FORMAT_FLOAT32:
+        # keep the original mesh as level 0, simplified levels are uploaded as new meshes
+        group.models.append(rl.load_model_from_mesh(mesh))
+        group.triangle_counts.append(mesh.triangleCount)
+        for data in chain[1:]:
+            group.models.append(rl.load_model_from_mesh(load_mesh_from_data(data)))
+            group.triangle_counts.append(data.triangle_count)
+        group.meshes = [model.meshes[0] for model in group.models]
+    else:
+        # level 0 is the welded chain source, indexed and smaller than the original
+        for data in chain:
+            group.meshes.append(load_quantized_mesh_from_data(data, vertex_format))
+            group.triangle_counts.append(data.triangle_count)
+        rl.unload_mesh(mesh)
+
+    group.screen_sizes = np.array(
+        [
+            screen_size * screen_size_step**level
+            for level in range(group.num_levels - 1)
+        ],
+        dtype=np.float32,
+    )
+
+    positions = chain[0].positions
+    bounds_min = positions.min(axis=0)
+    bounds_max = positions.max(axis=0)
+    group.bounding_center = (bounds_min + bounds_max) * 0.5
+    group.bounding_radius = float(
+        np.linalg.norm(positions - group.bounding_center, axis=1).max()
+    )
+
+    return group
+
+
+def lod_group_bytes(group: LodGroup) -> int:
+    return sum(mesh_bytes(mesh) for mesh in group.meshes)
+
+
+def unload_lod_group(group: LodGroup):
+    # unloading a model also unloads its meshes
+    for model in group.models:
+        rl.unload_model(model)
+    for mesh in group.meshes:
+        if isinstance(mesh, QuantizedMesh):
+            unload_quantized_mesh(mesh)
+    group.models = []
+    group.meshes = []
+
+
+def compute_screen_sizes(camera: rl.Camera3D, centers, radii):
+    # fraction of the screen height covered by each bounding sphere: (N,)
+    eye = np.array(
+        [camera.position.x, camera.position.y, camera.position.z], dtype=np.float32
+    )
+    if camera.projection == rl.CAMERA_PERSPECTIVE:
+        distances = np.linalg.norm(centers - eye, axis=1)
+        half_height = math.tan(camera.fovy * 0.5 * rl.DEG2RAD)
+        return radii / (np.maximum(distances, 1e-4) * half_height)
+
+    # orthographic: fovy is the view height in world units
+    return 2.0 * radii / camera.fovy
+
+
+def select_lod_levels(screen_sizes, thresholds, bias: float = 1.0):
+    # thresholds: (L-1,) shared or (N, L-1) per entity, descending
+    # level = number of thresholds the biased screen size falls below
+    # bias < 1.0 selects coarser levels (e.g. for the shadow pass)
+    biased = (screen_sizes * bias)[:, None]
+    return np.sum(biased < thresholds, axis=-1)
+
+
+def frustum_planes(view_projection):
+    # (6, 4) normalized planes (nx, ny, nz, d) of a row-major numpy view-projection
+    # (clip = view_projection @ p), inside when dot(n, p) + d >= 0
+    m = np.asarray(view_projection, dtype=np.float32)
+    planes = np.stack(
+        [
+            m[3] + m[0],
+            m[3] - m[0],
+            m[3] + m[1],
+            m[3] - m[1],
+            m[3] + m[2],
+            m[3] - m[2],
+        ]
+    )
+    return planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+
+
+def cull_spheres(planes, centers, radii):
+    # (N,) bool, True for bounding spheres intersecting the frustum
+    distances = centers @ planes[:, :3].T + planes[:, 3]
+    return np.all(distances >= -np.asarray(radii)[:, None], axis=1)
@@ -0,0 +1,432 @@
+# gpu particles: the state never leaves the gpu, python only configures emitters
+# - two state buffers (ping-pong): the update pass reads the front one and writes the
+#   back one through transform feedback, one GL_POINTS draw per emitter, rasterizer off
+# - dead particles respawn in the vertex shader from a hashed random, so emission,
+#   integration and recycling cost no cpu work and no uploads
+# - the draw pass binds the front buffer as per-instance attributes: one camera-facing
+#   quad per particle, alpha-tested into the gbuffer so ssao and lighting apply; the
+#   camera comes from the shared camera block (uniform_blocks.py)
+# - transform feedback rather than compute shaders: raylib creates a GL 3.3 context
+
+import argparse
+import math
+import time
+
+import pyray as rl
+import raylib as nrl
+
+import numpy as np
+
+from gl import *
+from gpu_resources import *
+
+ffi = nrl.ffi
+
+# per particle: position + age, velocity + lifetime (see particle_update.vs)
+# - age < 0: not born yet, age >= lifetime: dead
+PARTICLE_STATE_DTYPE = np.dtype(
+    [
+        ("position_age", np.float32, 4),
+        ("velocity_lifetime", np.float32, 4),
+    ]
+)
+PARTICLE_STATE_BYTES = PARTICLE_STATE_DTYPE.itemsize
+# transform feedback outputs of particle_update.vs, in PARTICLE_STATE_DTYPE order
+PARTICLE_VARYINGS = ("ParticlePositionAge", "ParticleVelocityLifetime")
+# layout(location) of the state attributes in particle_update.vs and particle.vs
+PARTICLE_ATTRIBUTES = (
+    (0, 0),
+    (1, PARTICLE_STATE_DTYPE.fields["velocity_lifetime"][1]),
+)
+# two triangles per billboard, corners from gl_VertexID in particle.vs
+PARTICLE_QUAD_VERTICES = 6
+# longer frames are simulated as this, a hitch should not scatter every particle
+PARTICLE_MAX_DELTA_TIME = 1.0 / 15.0
+
+PARTICLE_UPDATE_SHADER = (
+    "./shaders/particle_update.vs",
+    "./shaders/particle_update.fs",
+)
+PARTICLE_SHADER = ("./shaders/particle.vs", "./shaders/particle.fs")
+
+
+class ParticleEmitter:
+    # a contiguous range [first, first + count) of the state buffers
+    # - steady emission rate: count / mean lifetime particles per second
+    def __init__(self, first: int, count: int):
+        self.first = first
+        self.count = count
+        # inactive: dead particles stay dead, the living ones finish their life
+        self.active = True
+
+        # spawn volume: box of half-size extent around position
+        self.position = (0.0, 0.0, 0.0)
+        self.extent = (0.0, 0.0, 0.0)
+        # initial velocity: inside a cone of half-angle spread (radians)
+        self.direction = (0.0, 1.0, 0.0)
+        self.spread = math.radians(20.0)
+        # (min, max), seconds and units per second
+        self.speed = (1.0, 2.0)
+        self.lifetime = (1.0, 2.0)
+        self.gravity = (0.0, -9.81, 0.0)
+        # fraction of the velocity lost per second
+        self.drag = 0.0
+
+        # billboard radius at birth and at death, in world units
+        self.size = (0.05, 0.02)
+        # albedo at birth and at death, like basic.fs' colDiffuse
+        self.color_start = (1.0, 0.8, 0.3)
+        self.color_end = (0.8, 0.2, 0.1)
+        self.specularity = 0.5
+        self.glossiness = 10.0
+
+    def initial_state(self, rng: np.random.Generator) -> np.ndarray:
+        # births staggered over one lifetime, so the emitter starts at its steady rate
+        state = np.zeros(self.count, dtype=PARTICLE_STATE_DTYPE)
+        state["position_age"][:, :3] = self.position
+        state["position_age"][:, 3] = -rng.uniform(0.0, self.lifetime[1], self.count)
+        return state
+
+
+def _unload_particle_state(state):
+    vertex_array, buffer = state
+    nrl.rlUnloadVertexArray(vertex_array)
+    nrl.rlUnloadVertexBuffer(buffer)
+
+
+class ParticleSystem:
+    def __init__(
+        self,
+        update_shader: rl.Shader,
+        draw_shader: rl.Shader,
+        capacity: int,
+        seed: int = 0,
+    ):
+        # capacity: particles over all emitters, both state buffers are allocated now
+        self.update_shader = update_shader
+        self.draw_shader = draw_shader
+        self.capacity = capacity
+        self.emitters = []
+        # particles handed out to emitters, the next emitter starts here
+        self.count = 0
+        # seconds simulated, seeds the respawn randoms
+        self.time = 0.0
+        self.num_updates = 0
+        self.rng = np.random.default_rng(seed)
+
+        # (vertex array, buffer) per state, index self.front is the current one
+        self.vertex_arrays = []
+        self.buffers = []
+        self.front = 0
+        for index in range(2 if capacity > 0 else 0):
+            vertex_array = nrl.rlLoadVertexArray()
+            nrl.rlEnableVertexArray(vertex_array)
+            buffer = nrl.rlLoadVertexBuffer(
+                ffi.NULL, capacity * PARTICLE_STATE_BYTES, True
+            )
+            for location, _ in PARTICLE_ATTRIBUTES:
+                nrl.rlEnableVertexAttribute(location)
+            nrl.rlDisableVertexArray()
+            gpu_resources.track(
+                self,
+                f"state{index}",
+                (vertex_array, buffer),
+                _unload_particle_state,
+                GPU_BUFFERS,
+                capacity * PARTICLE_STATE_BYTES,
+            )
+            self.vertex_arrays.append(vertex_array)
+            self.buffers.append(buffer)
+
+        self.update_locations = self._locations(
+            update_shader,
+            "DeltaTime",
+            "Time",
+            "EmitterFirst",
+            "EmitterActive",
+            "EmitterPosition",
+            "EmitterExtent",
+            "EmitterDirection",
+            "EmitterSpread",
+            "EmitterSpeed",
+            "EmitterLifetime",
+            "EmitterGravity",
+            "EmitterDrag",
+        )
+        self.draw_locations = self._locations(
+            draw_shader,
+            "ParticleSize",
+            "ParticleColorStart",
+            "ParticleColorEnd",
+            "Specularity",
+            "Glossiness",
+        )
+        # scratch uniform values, copied by the glUniform* call
+        self.float_values = ffi.new("float[4]")
+        self.int_values = ffi.new("int[1]")
+
+    def _locations(self, shader: rl.Shader, *names):
+        return {name: rl.get_shader_location(shader, name.encode()) for name in names}
+
+    def _uniform(self, location: int, *values):
+        for index, value in enumerate(values):
+            self.float_values[index] = value
+        nrl.rlSetUniform(
+            location, self.float_values, rl.SHADER_UNIFORM_FLOAT + len(values) - 1, 1
+        )
+
+    def _uniform_int(self, location: int, value: int):
+        self.int_values[0] = value
+        nrl.rlSetUniform(location, self.int_values, rl.SHADER_UNIFORM_INT, 1)
+
+    def _bind_state(self, index: int, first: int, divisor: int):
+        # attributes start at particle 'first': draws always start at vertex/instance 0
+        nrl.rlEnableVertexArray(self.vertex_arrays[index])
+        nrl.rlEnableVertexBuffer(self.buffers[index])
+        for location, offset in PARTICLE_ATTRIBUTES:
+            nrl.rlSetVertexAttribute(
+                location,
+                4,
+                nrl.RL_FLOAT,
+                False,
+                PARTICLE_STATE_BYTES,
+                first * PARTICLE_STATE_BYTES + offset,
+            )
+            nrl.rlSetVertexAttributeDivisor(location, divisor)
+
+    def add_emitter(self, count: int, **settings) -> ParticleEmitter:
+        # settings: ParticleEmitter attributes, may be changed on the emitter later
+        assert count > 0
+        if self.count + count > self.capacity:
+            raise ValueError(
+                f"particle capacity exceeded: {self.count} + {count} > {self.capacity}"
+            )
+        emitter = ParticleEmitter(self.count, count)
+        for name, value in settings.items():
+            if not hasattr(emitter, name):
+                raise AttributeError(f"unknown particle emitter setting: {name}")
+            setattr(emitter, name, value)
+
+        state = emitter.initial_state(self.rng)
+        nrl.rlUpdateVertexBuffer(
+            self.buffers[self.front],
+            ffi.from_buffer(state),
+            state.nbytes,
+            emitter.first * PARTICLE_STATE_BYTES,
+        )
+        self.emitters.append(emitter)
+        self.count += count
+        return emitter
+
+    def update(self, delta_time: float):
+        # advances every emitter by delta_time, then swaps the state buffers
+        if not self.emitters:
+            return
+        delta_time = min(delta_time, PARTICLE_MAX_DELTA_TIME)
+        self.time += delta_time
+        self.num_updates += 1
+        back = 1 - self.front
+
+        # flush raylib's internal batch before issuing our own draws
+        nrl.rlDrawRenderBatchActive()
+        nrl.rlEnableShader(self.update_shader.id)
+        locations = self.update_locations
+        self._uniform(locations["DeltaTime"], delta_time)
+        self._uniform(locations["Time"], self.time)
+
+        gl.glEnable(GL_RASTERIZER_DISCARD)
+        for emitter in self.emitters:
+            self._uniform_int(locations["EmitterFirst"], emitter.first)
+            self._uniform_int(locations["EmitterActive"], int(emitter.active))
+            self._uniform(locations["EmitterPosition"], *emitter.position)
+            self._uniform(locations["EmitterExtent"], *emitter.extent)
+            self._uniform(locations["EmitterDirection"], *emitter.direction)
+            self._uniform(locations["EmitterSpread"], emitter.spread)
+            self._uniform(locations["EmitterSpeed"], *emitter.speed)
+            self._uniform(locations["EmitterLifetime"], *emitter.lifetime)
+            self._uniform(locations["EmitterGravity"], *emitter.gravity)
+            self._uniform(locations["EmitterDrag"], emitter.drag)
+
+            self._bind_state(self.front, emitter.first, 0)
+            gl.glBindBufferRange(
+                GL_TRANSFORM_FEEDBACK_BUFFER,
+                0,
+                self.buffers[back],
+                emitter.first * PARTICLE_STATE_BYTES,
+                emitter.count * PARTICLE_STATE_BYTES,
+            )
+            gl.glBeginTransformFeedback(GL_POINTS)
+            gl.glDrawArrays(GL_POINTS, 0, emitter.count)
+            gl.glEndTransformFeedback()
+        gl.glDisable(GL_RASTERIZER_DISCARD)
+
+        gl.glBindBufferBase(GL_TRANSFORM_FEEDBACK_BUFFER, 0, 0)
+        nrl.rlDisableVertexArray()
+        nrl.rlDisableShader()
+        self.front = back
+
+    def draw(self):
+        # inside begin_gbuffer() with the view's camera block bound, writes
+        # color/normal/depth
+        if not self.emitters:
+            return
+        nrl.rlDrawRenderBatchActive()
+        nrl.rlEnableShader(self.draw_shader.id)
+        locations = self.draw_locations
+
+        for emitter in self.emitters:
+            self._uniform(locations["ParticleSize"], *emitter.size)
+            self._uniform(locations["ParticleColorStart"], *emitter.color_start)
+            self._uniform(locations["ParticleColorEnd"], *emitter.color_end)
+            self._uniform(locations["Specularity"], emitter.specularity)
+            self._uniform(locations["Glossiness"], emitter.glossiness)
+
+            self._bind_state(self.front, emitter.first, 1)
+            nrl.rlDrawVertexArrayInstanced(0, PARTICLE_QUAD_VERTICES, emitter.count)
+
+        nrl.rlDisableVertexArray()
+        nrl.rlDisableShader()
+
+    def unload(self):
+        gpu_resources.release_owner(self)
+
+
+def add_fountain_emitter(
+    particles: ParticleSystem, count: int, position=(0.0, 0.0, 0.0)
+):
+    # sparks thrown up and falling back under gravity
+    return particles.add_emitter(
+        count,
+        position=position,
+        extent=(0.05, 0.0, 0.05),
+        direction=(0.0, 1.0, 0.0),
+        spread=math.radians(15.0),
+        speed=(3.0, 5.0),
+        lifetime=(1.0, 1.8),
+        drag=0.2,
+    )
+
+
+def benchmark_particles(
+    counts=(10_000, 100_000, 1_000_000),
+    width: int = 1280,
+    height: int = 720,
+    warmup_frames: int = 30,
+    frames: int = 240,
+):
+    # gpu time of the update and the gbuffer draw per particle count, one fountain
+    # filling the view; the cpu cost per frame does not depend on the count
+    from renderer import (
+        begin_gbuffer,
+        camera_matrices,
+        end_gbuffer,
+        load_gbuffer,
+        matrix_to_numpy,
+        unload_gbuffer,
+    )
+    from shader_variants import ShaderVariantCache
+    from telemetry import GpuFrameTimer
+    from uniform_blocks import UniformBlocks, bind_uniform_blocks
+
+    rl.set_trace_log_level(rl.LOG_WARNING)
+    rl.set_config_flags(rl.FLAG_WINDOW_HIDDEN)
+    rl.init_window(width, height, b"SseEngine Particles")
+    rl.set_target_fps(0)
+
+    shader_variants = ShaderVariantCache(owner="benchmark_particles")
+    update_shader = shader_variants.get(
+        *PARTICLE_UPDATE_SHADER, varyings=PARTICLE_VARYINGS
+    )
+    draw_shader = shader_variants.get(*PARTICLE_SHADER)
+    bind_uniform_blocks(draw_shader)
+    gbuffer = load_gbuffer(width, height)
+
+    camera3d = rl.Camera3D()
+    camera3d.position = rl.Vector3(0.0, 2.0, 6.0)
+    camera3d.target = rl.Vector3(0.0, 1.5, 0.0)
+    camera3d.up = rl.Vector3(0.0, 1.0, 0.0)
+    camera3d.fovy = 45.0
+    camera3d.projection = rl.CAMERA_PERSPECTIVE
+
+    # the camera never moves, its block is written once
+    uniform_blocks = UniformBlocks()
+    camera_view, camera_projection = camera_matrices(camera3d, width / height)
+    uniform_blocks.set_camera(
+        0,
+        (camera3d.position.x, camera3d.position.y, camera3d.position.z),
+        matrix_to_numpy(camera_view),
+        matrix_to_numpy(camera_projection),
+        rl.rl_get_cull_distance_near(),
+        rl.rl_get_cull_distance_far(),
+    )
+    uniform_blocks.upload()
+
+    print(
+        f"{'particles':>10} {'update ms':>10} {'draw ms':>10} {'cpu ms':>8} {'MiB':>6}"
+    )
+    results = []
+    for count in counts:
+        particles = ParticleSystem(update_shader, draw_shader, count)
+        add_fountain_emitter(particles, count)
+        update_timer = GpuFrameTimer()
+        draw_timer = GpuFrameTimer()
+        update_ms = []
+        draw_ms = []
+        cpu_seconds = 0.0
+
+        for frame_index in range(warmup_frames + frames):
+            rl.begin_drawing()
+            start = time.perf_counter()
+            update_timer.begin(frame_index)
+            particles.update(1.0 / 60.0)
+            update_timer.end()
+
+            begin_gbuffer(gbuffer, camera3d)
+            draw_timer.begin(frame_index)
+            particles.draw()
+            draw_timer.end()
+            end_gbuffer(width, height)
+            if frame_index >= warmup_frames:
+                cpu_seconds += time.perf_counter() - start
+            rl.end_drawing()
+
+            for timer, samples in ((update_timer, update_ms), (draw_timer, draw_ms)):
+                for sample_frame, gpu_ms in timer.resolve():
+                    if sample_frame >= warmup_frames:
+                        samples.append(gpu_ms)
+        for timer, samples in ((update_timer, update_ms), (draw_timer, draw_ms)):
+            for sample_frame, gpu_ms in timer.resolve(block=True):
+                if sample_frame >= warmup_frames:
+                    samples.append(gpu_ms)
+            timer.unload()
+
+        result = (
+            count,
+            float(np.median(update_ms)),
+            float(np.median(draw_ms)),
+            1000.0 * cpu_seconds / frames,
+            2 * count * PARTICLE_STATE_BYTES / 2**20,
+        )
+        results.append(result)
+        print(
+            f"{result[0]:10d} {result[1]:10.3f} {result[2]:10.3f} "
+            f"{result[3]:8.3f} {result[4]:6.1f}"
+        )
+        particles.unload()
+
+    uniform_blocks.unload()
+    unload_gbuffer(gbuffer)
+    shader_variants.unload()
+    gpu_resources.check_leaks()
+    rl.close_window()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SseEngine gpu particle benchmark")
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--frames", type=int, default=240)
+    args = parser.parse_args()
+    benchmark_particles(args.counts, frames=args.frames)
@@ -0,0 +1,164 @@
+# object picking from the gbuffer's object id attachment, no cpu ray casts
+# - a pick copies a small region around the cursor (ids + depth) into PBOs through
+#   AsyncReadback, the result is delivered by poll() once the copies finished,
+#   usually the next frame; the render loop never waits for it
+# - the cost is a (2 * radius + 1)^2 pixel copy, independent of the scene size
+# - needs Renderer(object_ids=True)
+
+import math
+
+import numpy as np
+
+from readback import *
+from renderer import *
+
+PICK_ID_READBACK = "pick_id"
+PICK_DEPTH_READBACK = "pick_depth"
+# color attachment index of the object ids, see load_gbuffer()
+PICK_ID_ATTACHMENT = 2
+
+
+class PickResult:
+    def __init__(self, query_id, frame_index, view, x, y):
+        self.query_id = query_id
+        self.frame_index = frame_index
+        self.view = view
+        # cursor in view pixels, top-left origin
+        self.x = x
+        self.y = y
+        # object under the cursor, or the closest one inside the region
+        self.object_id = OBJECT_ID_NONE
+        # view-space depth of the picked pixel, inf on the background
+        self.distance = math.inf
+        # region around the cursor, top row first
+        self.ids = None
+        self.depths = None
+        # cursor position inside the region (row, column)
+        self.center = (0, 0)
+        self.clip_planes = (view.camera_clip_near, view.camera_clip_far)
+
+    @property
+    def hit(self) -> bool:
+        return self.object_id != OBJECT_ID_NONE
+
+    @property
+    def name(self):
+        return OBJECT_NAMES.get(self.object_id)
+
+    def resolve(self):
+        # the center pixel if it hit something, else the nearest pixel that did
+        row, column = self.center
+        rows, columns = np.nonzero(self.ids)
+        if rows.shape[0] == 0:
+            return
+        nearest = np.argmin((rows - row) ** 2 + (columns - column) ** 2)
+        row, column = int(rows[nearest]), int(columns[nearest])
+        self.object_id = int(self.ids[row, column])
+        self.distance = float(
+            linearize_gbuffer_depth(self.depths[row, column], *self.clip_planes)
+        )
+
+
+def find_view(views, x: int, y: int):
+    # view under a window position (top-left origin), None outside every view
+    for view in views:
+        if view.x <= x < view.x + view.width and view.y <= y < view.y + view.height:
+            return view
+    return None
+
+
+class ObjectPicker:
+    def __init__(self, readback: AsyncReadback, radius: int = 2):
+        # radius: pixels around the cursor, thin objects stay pickable
+        self.readback = readback
+        self.radius = radius
+        readback.add_callback(PICK_ID_READBACK, self._on_ids)
+        readback.add_callback(PICK_DEPTH_READBACK, self._on_depths)
+        self.next_query_id = 0
+        # query id -> PickResult, waiting for its readbacks
+        self.pending = {}
+        # finished results, handed out by poll()
+        self.results = []
+        self.requested = 0
+        self.dropped = 0
+
+    def request(self, view, x: int, y: int, frame_index: int = 0):
+        # view: a RenderView whose gbuffer has object ids, (x, y) in window pixels
+        # returns the query id, None if the readback ring is full (try next frame)
+        gbuffer = view.gbuffer
+        assert gbuffer.object_id.id, "picking needs Renderer(object_ids=True)"
+        x, y = int(x) - view.x, int(y) - view.y
+        if not (0 <= x < view.width and 0 <= y < view.height):
+            return None
+        self.requested += 1
+
+        size = 2 * self.radius + 1
+        width, height = min(size, view.width), min(size, view.height)
+        # GL rows are bottom-up
+        gl_y = view.height - 1 - y
+        region_x = min(max(x - self.radius, 0), view.width - width)
+        region_y = min(max(gl_y - self.radius, 0), view.height - height)
+
+        query_id = self.next_query_id
+        self.next_query_id += 1
+        result = PickResult(query_id, frame_index, view, x, y)
+        # readback arrays are flipped to top row first
+        result.center = (height - 1 - (gl_y - region_y), x - region_x)
+
+        if not self.readback.request(
+            PICK_ID_READBACK,
+            gbuffer.id,
+            PICK_ID_ATTACHMENT,
+            width,
+            height,
+            READBACK_R32UI,
+            frame_index,
+            region_x,
+            region_y,
+            user_data=query_id,
+        ):
+            self.dropped += 1
+            return None
+        self.pending[query_id] = result
+        if not self.readback.request(
+            PICK_DEPTH_READBACK,
+            gbuffer.id,
+            READBACK_ATTACHMENT_DEPTH,
+            width,
+            height,
+            READBACK_DEPTH32F,
+            frame_index,
+            region_x,
+            region_y,
+            user_data=query_id,
+        ):
+            # the id copy is delivered to nobody
+            del self.pending[query_id]
+            self.dropped += 1
+            return None
+        return query_id
+
+    def _on_ids(self, frame: ReadbackFrame):
+        result = self.pending.get(frame.user_data)
+        if result is not None:
+            result.ids = frame.copy()[:, :, 0]
+            self._finish(result)
+
+    def _on_depths(self, frame: ReadbackFrame):
+        result = self.pending.get(frame.user_data)
+        if result is not None:
+            result.depths = frame.copy()[:, :, 0]
+            self._finish(result)
+
+    def _finish(self, result: PickResult):
+        if result.ids is None or result.depths is None:
+            return
+        del self.pending[result.query_id]
+        result.resolve()
+        self.results.append(result)
+
+    def poll(self):
+        # results finished since the last call, after AsyncReadback.poll()
+        results = self.results
+        self.results = []
+        return results
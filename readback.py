@@ -0,0 +1,281 @@
+import os
+import queue
+
+import pyray as rl
+import raylib as nrl
+
+import numpy as np
+
+from gl import *
+from gpu_resources import *
+
+# attachment index used to read the depth attachment of a framebuffer
+READBACK_ATTACHMENT_DEPTH = -1
+
+
+class ReadbackFormat:
+    def __init__(self, gl_format, gl_type, channels, dtype):
+        self.gl_format = gl_format
+        self.gl_type = gl_type
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+
+    def size(self, width, height):
+        return width * height * self.channels * self.dtype.itemsize
+
+
+READBACK_RGBA8 = ReadbackFormat(GL_RGBA, GL_UNSIGNED_BYTE, 4, np.uint8)
+READBACK_RGBA16F = ReadbackFormat(GL_RGBA, GL_HALF_FLOAT, 4, np.float16)
+READBACK_RGBA32F = ReadbackFormat(GL_RGBA, GL_FLOAT, 4, np.float32)
+READBACK_R32F = ReadbackFormat(GL_RED, GL_FLOAT, 1, np.float32)
+READBACK_R32UI = ReadbackFormat(GL_RED_INTEGER, GL_UNSIGNED_INT, 1, np.uint32)
+READBACK_DEPTH32F = ReadbackFormat(GL_DEPTH_COMPONENT, GL_FLOAT, 1, np.float32)
+
+
+class ReadbackFrame:
+    def __init__(
+        self, name, frame_index, x, y, width, height, readback_format, user_data
+    ):
+        self.name = name
+        self.frame_index = frame_index
+        # region of the framebuffer, (x, y) is the lower-left corner in GL convention
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.readback_format = readback_format
+        # zero-copy view into the mapped PBO, top row first
+        # - only valid until release(), use copy() to keep the data
+        self.array = None
+        self.user_data = user_data
+        self.retained = False
+        self.released = False
+
+    def copy(self):
+        return np.array(self.array, copy=True)
+
+    def retain(self):
+        # keep the PBO mapped after the callback returns (release() later)
+        self.retained = True
+
+    def release(self):
+        # safe from any thread, the PBO is unmapped by the next AsyncReadback.poll()
+        self.released = True
+
+
+class _ReadbackSlot:
+    def __init__(self, owner, name, size):
+        self.size = size
+        self.pbo_ptr = ffi.new("unsigned int *")
+        gl.glGenBuffers(1, self.pbo_ptr)
+        gl.glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbo_ptr[0])
+        gl.glBufferData(GL_PIXEL_PACK_BUFFER, size, ffi.NULL, GL_STREAM_READ)
+        gl.glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.resource = gpu_resources.track(
+            owner, f"readback {name}", self, _ReadbackSlot._release, GPU_BUFFERS, size
+        )
+        self.sync = None
+        # in-flight request or mapped frame
+        self.frame = None
+        self.mapped = False
+
+    @property
+    def pbo(self):
+        return self.pbo_ptr[0]
+
+    @property
+    def busy(self):
+        return self.frame is not None
+
+    def unload(self):
+        gpu_resources.release(self.resource)
+
+    def _release(self):
+        if self.sync is not None:
+            gl.glDeleteSync(self.sync)
+            self.sync = None
+        gl.glDeleteBuffers(1, self.pbo_ptr)
+
+
+class AsyncReadback:
+    def __init__(self, ring_size: int = 3, queue_size: int = 8):
+        # per readback name: ring of PBO slots, reallocated if the size changes
+        self.ring_size = ring_size
+        self.rings = {}
+        # in-flight slots in submission order
+        self.in_flight = []
+        # per readback name: callback(frame)
+        self.callbacks = {}
+        # finished frames without a callback, consumers must release() them
+        self.frames = queue.Queue(maxsize=queue_size)
+
+        self.requested = 0
+        self.delivered = 0
+        # requests dropped because every slot of the ring was still busy
+        self.dropped = 0
+        return
+
+    def add_callback(self, name, callback):
+        self.callbacks[name] = callback
+
+    def _acquire_slot(self, name, size):
+        ring = self.rings.get(name)
+        if ring is None or ring[0].size != size:
+            if ring is not None:
+                # size changed: wait until the old ring drains
+                if any(slot.busy for slot in ring):
+                    return None
+                for slot in ring:
+                    slot.unload()
+            ring = [_ReadbackSlot(self, name, size) for _ in range(self.ring_size)]
+            self.rings[name] = ring
+
+        for slot in ring:
+            if not slot.busy:
+                return slot
+        return None
+
+    def request(
+        self,
+        name,
+        framebuffer_id,
+        attachment,
+        width,
+        height,
+        readback_format: ReadbackFormat = READBACK_RGBA8,
+        frame_index: int = 0,
+        x: int = 0,
+        y: int = 0,
+        user_data=None,
+    ) -> bool:
+        # queue a copy of a framebuffer region into a PBO, never waits for the GPU
+        self.requested += 1
+        slot = self._acquire_slot(name, readback_format.size(width, height))
+        if slot is None:
+            self.dropped += 1
+            return False
+
+        # submit pending raylib draws before reading
+        nrl.rlDrawRenderBatchActive()
+
+        gl.glBindFramebuffer(GL_READ_FRAMEBUFFER, framebuffer_id)
+        if attachment != READBACK_ATTACHMENT_DEPTH:
+            gl.glReadBuffer(
+                GL_BACK if framebuffer_id == 0 else GL_COLOR_ATTACHMENT0 + attachment
+            )
+        gl.glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        gl.glBindBuffer(GL_PIXEL_PACK_BUFFER, slot.pbo)
+        gl.glReadPixels(
+            x,
+            y,
+            width,
+            height,
+            readback_format.gl_format,
+            readback_format.gl_type,
+            ffi.NULL,
+        )
+        gl.glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        gl.glBindFramebuffer(GL_READ_FRAMEBUFFER, 0)
+
+        slot.sync = gl.glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        slot.frame = ReadbackFrame(
+            name, frame_index, x, y, width, height, readback_format, user_data
+        )
+        self.in_flight.append(slot)
+        return True
+
+    def _map(self, slot):
+        frame = slot.frame
+        readback_format = frame.readback_format
+        gl.glBindBuffer(GL_PIXEL_PACK_BUFFER, slot.pbo)
+        ptr = gl.glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, slot.size, GL_MAP_READ_BIT)
+        gl.glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        slot.mapped = True
+
+        array = np.frombuffer(ffi.buffer(ptr, slot.size), dtype=readback_format.dtype)
+        array = array.reshape(frame.height, frame.width, readback_format.channels)
+        # GL rows are bottom-up, flip as a view
+        frame.array = array[::-1]
+
+    def _unmap(self, slot):
+        gl.glBindBuffer(GL_PIXEL_PACK_BUFFER, slot.pbo)
+        gl.glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        gl.glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        slot.frame.array = None
+        slot.frame = None
+        slot.mapped = False
+
+    def poll(self, timeout_ns: int = 0):
+        # call once per frame on the render thread (e.g. after rl.end_drawing())
+        # - timeout_ns > 0 waits up to that long for the oldest copy (backpressure)
+
+        # unmap frames released by consumers
+        for ring in self.rings.values():
+            for slot in ring:
+                if slot.mapped and slot.frame.released:
+                    self._unmap(slot)
+
+        # deliver finished copies in submission order
+        while self.in_flight:
+            slot = self.in_flight[0]
+            status = gl.glClientWaitSync(
+                slot.sync, GL_SYNC_FLUSH_COMMANDS_BIT, timeout_ns
+            )
+            timeout_ns = 0
+            if status not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+                break
+            self.in_flight.pop(0)
+            gl.glDeleteSync(slot.sync)
+            slot.sync = None
+
+            self._map(slot)
+            frame = slot.frame
+            self.delivered += 1
+
+            callback = self.callbacks.get(frame.name)
+            if callback is not None:
+                callback(frame)
+                if not frame.retained:
+                    frame.released = True
+            else:
+                try:
+                    self.frames.put_nowait(frame)
+                except queue.Full:
+                    # nobody is consuming: drop instead of stalling the ring
+                    frame.released = True
+                    self.dropped += 1
+
+            if frame.released:
+                self._unmap(slot)
+
+    def unload(self):
+        for ring in self.rings.values():
+            for slot in ring:
+                if slot.mapped:
+                    self._unmap(slot)
+                slot.unload()
+        self.rings = {}
+        self.in_flight = []
+
+
+def export_png(path: str, pixels):
+    # pixels: (height, width, 4) uint8, top row first
+    assert pixels.dtype == np.uint8 and pixels.shape[2] == 4
+    pixels = np.ascontiguousarray(pixels)
+    image = rl.Image(
+        nrl.ffi.cast("void *", nrl.ffi.from_buffer(pixels)),
+        pixels.shape[1],
+        pixels.shape[0],
+        1,
+        rl.PIXELFORMAT_UNCOMPRESSED_R8G8B8A8,
+    )
+    rl.export_image(image, path.encode())
+
+
+def export_readback_frame(frame: ReadbackFrame, path: str):
+    # .npy keeps the raw values, .png goes through raylib for RGBA8 frames
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.endswith(".npy"):
+        np.save(path, frame.array)
+        return
+    export_png(path, frame.array)
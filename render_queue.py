@@ -0,0 +1,336 @@
+import pyray as rl
+import raylib as nrl
+
+import numpy as np
+
+from vertex_formats import *
+
+# use raylib's ffi to cast into raylib types (e.g. Matrix *)
+ffi = nrl.ffi
+
+# render passes, stored in the upper bits of the sort key (executed in this order)
+RENDER_PASS_SHADOW = 0
+RENDER_PASS_GBUFFER = 1
+RENDER_PASS_FORWARD = 2
+
+# 64-bit sort key layout (msb -> lsb):
+# | pass: 4 | shader: 12 | material: 16 | mesh: 16 | depth: 16 |
+SORT_KEY_PASS_SHIFT = 60
+SORT_KEY_SHADER_SHIFT = 48
+SORT_KEY_MATERIAL_SHIFT = 32
+SORT_KEY_MESH_SHIFT = 16
+SORT_KEY_DEPTH_MAX = 0xFFFF
+
+
+def matrix_to_numpy(mat: rl.Matrix):
+    # raylib Matrix memory is (m0, m4, m8, m12, m1, ...) == row-major 4x4
+    return (
+        np.frombuffer(ffi.buffer(ffi.addressof(mat)), dtype=np.float32)
+        .reshape(4, 4)
+        .copy()
+    )
+
+
+def matrix_translate_numpy(x, y, z):
+    transform = np.identity(4, dtype=np.float32)
+    transform[0:3, 3] = (x, y, z)
+    return transform
+
+
+class RenderMaterial:
+    def __init__(self, shader: rl.Shader, color: rl.Color = rl.WHITE, textures=None):
+        self.shader = shader
+        # uploaded to 'colDiffuse' (same as the tint of rl.draw_model)
+        normalized = rl.color_normalize(color)
+        self.color = ffi.new(
+            "float[4]", [normalized.x, normalized.y, normalized.z, normalized.w]
+        )
+        # list of (uniform location, texture id), texture slot == list index
+        self.textures = textures if textures is not None else []
+
+
+class RenderQueueStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.draw_calls = 0
+        self.shader_binds = 0
+        self.material_binds = 0
+        self.texture_binds = 0
+        self.vao_binds = 0
+        # binds skipped because the state was already bound
+        self.skipped_shader_binds = 0
+        self.skipped_texture_binds = 0
+        self.skipped_vao_binds = 0
+
+    def copy_from(self, other):
+        self.__dict__.update(other.__dict__)
+
+
+class RenderQueue:
+    def __init__(self, capacity: int = 1024, depth_range: float = 50.0):
+        # registered resources: compact ids are packed into sort keys
+        self.meshes = []
+        self.materials = []
+        self.shader_ids = {}
+
+        # per-frame draw items (structure of arrays)
+        self.capacity = 0
+        self.count = 0
+        self.keys = np.zeros(0, dtype=np.uint64)
+        self.item_meshes = np.zeros(0, dtype=np.int32)
+        self.item_materials = np.zeros(0, dtype=np.int32)
+        self.transforms = np.zeros((0, 4, 4), dtype=np.float32)
+        # 'ObjectId' uniform of the item, 0: none (see load_gbuffer(object_ids=True))
+        self.item_object_ids = np.zeros(0, dtype=np.uint32)
+        self.reserve(capacity)
+
+        # depth is quantized over [0, depth_range]
+        self.depth_range = depth_range
+
+        # sorted item indices, rebuilt lazily after submission
+        self.order = None
+        self.sorted_passes = None
+
+        self.stats = RenderQueueStats()
+        # counters of the last finished frame (for reporting)
+        self.frame_stats = RenderQueueStats()
+
+        self.slot_ptr = ffi.new("int*")
+        # shader id -> dequantization uniform locations, see QuantizedMesh
+        self.dequantize_locations = {}
+        # shader id -> 'ObjectId' uniform location
+        self.object_id_locations = {}
+        self.object_id_ptr = ffi.new("unsigned int*")
+        return
+
+    def reserve(self, capacity: int):
+        if capacity <= self.capacity:
+            return
+        self.keys = np.resize(self.keys, capacity)
+        self.item_meshes = np.resize(self.item_meshes, capacity)
+        self.item_materials = np.resize(self.item_materials, capacity)
+        self.transforms = np.resize(self.transforms, (capacity, 4, 4))
+        self.item_object_ids = np.resize(self.item_object_ids, capacity)
+        self.capacity = capacity
+
+    def register_mesh(self, mesh) -> int:
+        # rl.Mesh or QuantizedMesh
+        self.meshes.append(mesh)
+        return len(self.meshes) - 1
+
+    def register_material(self, material: RenderMaterial) -> int:
+        if material.shader.id not in self.shader_ids:
+            self.shader_ids[material.shader.id] = len(self.shader_ids)
+        self.materials.append(material)
+        return len(self.materials) - 1
+
+    def begin_frame(self):
+        self.clear()
+        self.stats.reset()
+
+    def clear(self):
+        # drops the submitted items, the frame's stats keep counting (multi-view)
+        self.count = 0
+        self.order = None
+
+    def end_frame(self):
+        self.frame_stats.copy_from(self.stats)
+        return self.frame_stats
+
+    def submit_batch(
+        self, render_pass, mesh_ids, material_ids, transforms, depths, object_ids=None
+    ):
+        mesh_ids = np.asarray(mesh_ids, dtype=np.int32)
+        material_ids = np.asarray(material_ids, dtype=np.int32)
+        num_items = mesh_ids.shape[0]
+        if self.count + num_items > self.capacity:
+            self.reserve(max(self.capacity * 2, self.count + num_items))
+
+        shader_ids = np.array(
+            [self.shader_ids[self.materials[m].shader.id] for m in material_ids],
+            dtype=np.uint64,
+        )
+        quantized_depths = np.clip(
+            np.asarray(depths, dtype=np.float32) / self.depth_range, 0.0, 1.0
+        )
+        quantized_depths = (quantized_depths * SORT_KEY_DEPTH_MAX).astype(np.uint64)
+
+        items = slice(self.count, self.count + num_items)
+        self.keys[items] = (
+            (np.uint64(render_pass) << np.uint64(SORT_KEY_PASS_SHIFT))
+            | (shader_ids << np.uint64(SORT_KEY_SHADER_SHIFT))
+            | (material_ids.astype(np.uint64) << np.uint64(SORT_KEY_MATERIAL_SHIFT))
+            | (mesh_ids.astype(np.uint64) << np.uint64(SORT_KEY_MESH_SHIFT))
+            | quantized_depths
+        )
+        self.item_meshes[items] = mesh_ids
+        self.item_materials[items] = material_ids
+        self.transforms[items] = transforms
+        self.item_object_ids[items] = 0 if object_ids is None else object_ids
+        self.count += num_items
+        self.order = None
+
+    def submit(self, render_pass, mesh_id, material_id, transform, depth, object_id=0):
+        self.submit_batch(
+            render_pass, [mesh_id], [material_id], [transform], [depth], [object_id]
+        )
+
+    def sort(self):
+        if self.order is not None:
+            return
+        keys = self.keys[: self.count]
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_passes = keys[self.order] >> np.uint64(SORT_KEY_PASS_SHIFT)
+
+    def execute(self, render_pass):
+        # draws all items of the pass with matrices set up by the active begin_* call
+        self.sort()
+        start, end = np.searchsorted(
+            self.sorted_passes, [render_pass, render_pass + 1], side="left"
+        )
+        if start == end:
+            return
+
+        # flush raylib's internal batch before issuing our own draws
+        nrl.rlDrawRenderBatchActive()
+
+        items = self.order[start:end]
+        view = matrix_to_numpy(nrl.rlGetMatrixModelview())
+        projection = matrix_to_numpy(nrl.rlGetMatrixProjection())
+        models = np.ascontiguousarray(self.transforms[items])
+        mvps = np.ascontiguousarray(np.matmul(projection @ view, models))
+        mvps_ptr = ffi.cast("Matrix *", ffi.from_buffer(mvps))
+        models_ptr = ffi.cast("Matrix *", ffi.from_buffer(models))
+
+        stats = self.stats
+        bound_textures = {}
+        current_shader = -1
+        current_material = -1
+        current_mesh = -1
+        current_dequantize = -1
+        current_object_id = -1
+        dequantize_locations = None
+        object_id_location = -1
+        shader = None
+
+        for index, item in enumerate(items.tolist()):
+            material_id = int(self.item_materials[item])
+            mesh_id = int(self.item_meshes[item])
+            material = self.materials[material_id]
+
+            if material.shader.id != current_shader:
+                shader = material.shader
+                nrl.rlEnableShader(shader.id)
+                current_shader = shader.id
+                # uniform state is per-program, re-apply the material
+                current_material = -1
+                current_dequantize = -1
+                current_object_id = -1
+                object_id_location = self.object_id_locations.get(shader.id)
+                if object_id_location is None:
+                    object_id_location = nrl.rlGetLocationUniform(
+                        shader.id, b"ObjectId"
+                    )
+                    self.object_id_locations[shader.id] = object_id_location
+                dequantize_locations = self.dequantize_locations.get(shader.id)
+                if dequantize_locations is None:
+                    dequantize_locations = tuple(
+                        nrl.rlGetLocationUniform(shader.id, name)
+                        for name in (
+                            b"PositionScale",
+                            b"PositionOffset",
+                            b"TexCoordScaleOffset",
+                        )
+                    )
+                    self.dequantize_locations[shader.id] = dequantize_locations
+                stats.shader_binds += 1
+            else:
+                stats.skipped_shader_binds += 1
+
+            if material_id != current_material:
+                color_location = shader.locs[rl.SHADER_LOC_COLOR_DIFFUSE]
+                if color_location != -1:
+                    nrl.rlSetUniform(
+                        color_location, material.color, rl.SHADER_UNIFORM_VEC4, 1
+                    )
+                for slot, (location, texture_id) in enumerate(material.textures):
+                    if bound_textures.get(slot) != texture_id:
+                        nrl.rlActiveTextureSlot(slot)
+                        nrl.rlEnableTexture(texture_id)
+                        bound_textures[slot] = texture_id
+                        stats.texture_binds += 1
+                    else:
+                        stats.skipped_texture_binds += 1
+                    self.slot_ptr[0] = slot
+                    nrl.rlSetUniform(location, self.slot_ptr, rl.SHADER_UNIFORM_INT, 1)
+                current_material = material_id
+                stats.material_binds += 1
+
+            mesh = self.meshes[mesh_id]
+            if mesh_id != current_mesh:
+                nrl.rlEnableVertexArray(mesh.vaoId)
+                current_mesh = mesh_id
+                stats.vao_binds += 1
+            else:
+                stats.skipped_vao_binds += 1
+
+            quantized = isinstance(mesh, QuantizedMesh)
+            if quantized and mesh_id != current_dequantize:
+                # per-mesh dequantization of compact vertex formats
+                for location, value, uniform_type in zip(
+                    dequantize_locations,
+                    (
+                        mesh.position_scale,
+                        mesh.position_offset,
+                        mesh.texcoord_scale_offset,
+                    ),
+                    (
+                        rl.SHADER_UNIFORM_VEC3,
+                        rl.SHADER_UNIFORM_VEC3,
+                        rl.SHADER_UNIFORM_VEC4,
+                    ),
+                ):
+                    if location != -1:
+                        nrl.rlSetUniform(
+                            location, ffi.addressof(value), uniform_type, 1
+                        )
+                current_dequantize = mesh_id
+
+            nrl.rlSetUniformMatrices(
+                shader.locs[rl.SHADER_LOC_MATRIX_MVP], mvps_ptr + index, 1
+            )
+            model_location = shader.locs[rl.SHADER_LOC_MATRIX_MODEL]
+            if model_location != -1:
+                nrl.rlSetUniformMatrices(model_location, models_ptr + index, 1)
+            if object_id_location != -1:
+                object_id = int(self.item_object_ids[item])
+                if object_id != current_object_id:
+                    self.object_id_ptr[0] = object_id
+                    nrl.rlSetUniform(
+                        object_id_location,
+                        self.object_id_ptr,
+                        rl.SHADER_UNIFORM_UINT,
+                        1,
+                    )
+                    current_object_id = object_id
+
+            if quantized:
+                # rlgl only draws 16-bit indices
+                gl.glDrawElements(
+                    GL_TRIANGLES, mesh.triangleCount * 3, mesh.index_type, ffi.NULL
+                )
+            elif mesh.indices != ffi.NULL:
+                nrl.rlDrawVertexArrayElements(0, mesh.triangleCount * 3, ffi.NULL)
+            else:
+                nrl.rlDrawVertexArray(0, mesh.vertexCount)
+            stats.draw_calls += 1
+
+        # restore default state for raylib's batch rendering
+        for slot in bound_textures:
+            nrl.rlActiveTextureSlot(slot)
+            nrl.rlDisableTexture()
+        nrl.rlActiveTextureSlot(0)
+        nrl.rlDisableVertexArray()
+        nrl.rlDisableShader()
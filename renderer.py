@@ -0,0 +1,1684 @@
+import math
+
+# use python version raylib as well as raylib's native version
+import pyray as rl
+import raylib as nrl
+
+import numpy as np
+
+from gl import *
+from gpu_resources import *
+from lod import *
+from render_queue import *
+from clustered_lighting import *
+from shader_variants import *
+from command_list import *
+from frame_cache import *
+from texture_streaming import *
+from particles import *
+from uniform_blocks import *
+from startup import *
+
+# retrieve ffi (raylib's compiled ffi, no pycparser at startup)
+ffi = nrl.ffi
+
+
+class GBuffer:
+    def __init__(self):
+        # OpenGL framebuffer object id
+        self.id = 0
+        # color buffer attachment texture
+        self.color = rl.Texture()
+        # normal buffer attachment texture
+        self.normal = rl.Texture()
+        # depth buffer attachment texture
+        self.depth = rl.Texture()
+        # optional object id attachment (R32UI), id 0 when the gbuffer has none
+        self.object_id = rl.Texture()
+
+
+# object id of pixels no object covers (background, particles)
+OBJECT_ID_NONE = 0
+# scene objects, written to the object id attachment
+OBJECT_ID_GROUND = 1
+OBJECT_ID_SPHERE = 2
+OBJECT_NAMES = {OBJECT_ID_GROUND: "ground", OBJECT_ID_SPHERE: "sphere"}
+OBJECT_ID_BYTES_PER_PIXEL = 4
+# glClearBufferuiv value of the object id attachment
+GBUFFER_OBJECT_ID_CLEAR = ffi.new("unsigned int[4]", [OBJECT_ID_NONE] * 4)
+
+
+def load_object_id_texture(width, height):
+    # integer formats are not in raylib's pixel formats, created through raw GL
+    texture_id_ptr = ffi.new("unsigned int *")
+    gl.glGenTextures(1, texture_id_ptr)
+    gl.glBindTexture(GL_TEXTURE_2D, texture_id_ptr[0])
+    gl.glTexImage2D(
+        GL_TEXTURE_2D,
+        0,
+        GL_R32UI,
+        width,
+        height,
+        0,
+        GL_RED_INTEGER,
+        GL_UNSIGNED_INT,
+        ffi.NULL,
+    )
+    # integer textures are incomplete with linear filtering
+    gl.glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    gl.glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+    gl.glBindTexture(GL_TEXTURE_2D, 0)
+    return texture_id_ptr[0]
+
+
+def load_gbuffer(width, height, object_ids: bool = False):
+    # object_ids: adds the R32UI attachment written by basic.fs, see picking.py
+    target = GBuffer()
+    target.id = rl.rl_load_framebuffer()
+    assert target.id
+
+    rl.rl_enable_framebuffer(target.id)
+
+    target.color.id = rl.rl_load_texture(
+        ffi.NULL, width, height, rl.PIXELFORMAT_UNCOMPRESSED_R8G8B8A8, 1
+    )
+    target.color.width = width
+    target.color.height = height
+    target.color.format = rl.PIXELFORMAT_UNCOMPRESSED_R8G8B8A8
+    target.color.mipmaps = 1
+    rl.rl_framebuffer_attach(
+        target.id,
+        target.color.id,
+        rl.RL_ATTACHMENT_COLOR_CHANNEL0,
+        rl.RL_ATTACHMENT_TEXTURE2D,
+        0,
+    )
+
+    target.normal.id = rl.rl_load_texture(
+        ffi.NULL, width, height, rl.PIXELFORMAT_UNCOMPRESSED_R16G16B16A16, 1
+    )
+    target.normal.width = width
+    target.normal.height = height
+    target.normal.format = rl.PIXELFORMAT_UNCOMPRESSED_R16G16B16A16
+    target.normal.mipmaps = 1
+    rl.rl_framebuffer_attach(
+        target.id,
+        target.normal.id,
+        rl.RL_ATTACHMENT_COLOR_CHANNEL1,
+        rl.RL_ATTACHMENT_TEXTURE2D,
+        0,
+    )
+
+    if object_ids:
+        target.object_id.id = load_object_id_texture(width, height)
+        target.object_id.width = width
+        target.object_id.height = height
+        target.object_id.mipmaps = 1
+        rl.rl_framebuffer_attach(
+            target.id,
+            target.object_id.id,
+            rl.RL_ATTACHMENT_COLOR_CHANNEL2,
+            rl.RL_ATTACHMENT_TEXTURE2D,
+            0,
+        )
+
+    target.depth.id = rl.rl_load_texture_depth(width, height, False)
+    target.depth.width = width
+    target.depth.height = height
+    # DEPTH_COMPONENT_24BITS(?)
+    target.depth.format = 19
+    target.depth.mipmaps = 1
+    rl.rl_framebuffer_attach(
+        target.id,
+        target.depth.id,
+        rl.RL_ATTACHMENT_DEPTH,
+        rl.RL_ATTACHMENT_TEXTURE2D,
+        0,
+    )
+
+    # verification by the FBO(frame-buffer-object) with bound attachments
+    assert rl.rl_framebuffer_complete(target.id)
+
+    # disable FBO, return to default framebuffer
+    rl.rl_disable_framebuffer()
+
+    return target
+
+
+def gbuffer_bytes(target: GBuffer) -> int:
+    return (
+        texture_bytes(target.color)
+        + texture_bytes(target.normal)
+        + depth_texture_bytes(target.depth)
+        + target.object_id.width * target.object_id.height * OBJECT_ID_BYTES_PER_PIXEL
+    )
+
+
+def unload_gbuffer(target: GBuffer):
+    # the framebuffer owns the depth attachment, color attachments are released here
+    for texture in (target.color, target.normal, target.object_id):
+        if texture.id > 0:
+            rl.rl_unload_texture(texture.id)
+            texture.id = 0
+    if target.id > 0:
+        rl.rl_unload_framebuffer(target.id)
+        target.id = 0
+
+
+def camera_matrices(camera: rl.Camera3D, aspect: float):
+    # (view, projection) a camera draws with, see begin_gbuffer()
+    # zNear and zFar values are important when computing depth buffer values:
+    near = rl.rl_get_cull_distance_near()
+    far = rl.rl_get_cull_distance_far()
+    if camera.projection == rl.CAMERA_ORTHOGRAPHIC:
+        # setup orthographic projection:
+        top = camera.fovy / 2.0
+        right = top * aspect
+        projection = rl.matrix_ortho(-right, right, -top, top, near, far)
+    else:
+        # setup perspective projection:
+        top = near * np.tan(camera.fovy * 0.5 * rl.DEG2RAD)
+        right = top * aspect
+        projection = rl.matrix_frustum(-right, right, -top, top, near, far)
+
+    # setup camera view
+    view = rl.matrix_look_at(camera.position, camera.target, camera.up)
+    return view, projection
+
+
+def mult_matrix(matrix: rl.Matrix):
+    # multiply the current rlgl matrix by matrix
+    matrix_v = rl.matrix_to_float_v(matrix)
+    rl.rl_mult_matrixf(ffi.addressof(matrix_v.v, 0))
+
+
+def begin_gbuffer(target: GBuffer, camera: rl.Camera3D):
+
+    rl.rl_draw_render_batch_active()
+
+    # enable GBuffer FBO
+    rl.rl_enable_framebuffer(target.id)
+
+    # active MRT(multi-render-target)
+    rl.rl_active_draw_buffers(3 if target.object_id.id else 2)
+
+    # set viewport and RLGL internal frame buffer size
+    nrl.rlViewport(0, 0, target.color.width, target.color.height)
+    rl.rl_set_framebuffer_width(target.color.width)
+    rl.rl_set_framebuffer_height(target.color.height)
+
+    # clear background color:
+    rl.clear_background(rl.BLACK)
+    if target.object_id.id:
+        # glClear's float color is undefined for integer attachments
+        gl.glClearBufferuiv(GL_COLOR, 2, GBUFFER_OBJECT_ID_CLEAR)
+
+    # switch to projection matrix
+    rl.rl_matrix_mode(rl.RL_PROJECTION)
+
+    # save previous matrix, which contains the settings for the 2d otho projection
+    rl.rl_push_matrix()
+
+    # reset current matrix
+    rl.rl_load_identity()
+
+    aspect = float(target.color.width) / float(target.color.height)
+    mat_view, mat_projection = camera_matrices(camera, aspect)
+    mult_matrix(mat_projection)
+
+    # switch back to modelview matrix
+    rl.rl_matrix_mode(rl.RL_MODELVIEW)
+    rl.rl_load_identity()
+
+    # multiply modelview matrix by view matrix (camera)
+    mult_matrix(mat_view)
+
+    # enable depth test
+    rl.rl_enable_depth_test()
+
+    return
+
+
+def end_gbuffer(width, height):
+
+    # update and draw internal render batch
+    rl.rl_draw_render_batch_active()
+
+    # disable DEPTH_TEST:
+    rl.rl_disable_depth_test()
+
+    # deactivate MRT
+    rl.rl_active_draw_buffers(1)
+
+    # disable GBuffer FBO
+    rl.rl_disable_framebuffer()
+
+    # reset projection matrix
+    rl.rl_matrix_mode(rl.RL_PROJECTION)
+    rl.rl_pop_matrix()
+    rl.rl_load_identity()
+    rl.rl_ortho(0.0, float(width), float(height), 0.0, -1.0, 1.0)
+
+    # reset model-view:
+    rl.rl_matrix_mode(rl.RL_MODELVIEW)
+    rl.rl_load_identity()
+
+    return
+
+
+class ShadowLight:
+    def __init__(self):
+        self.target = rl.vector3_zero()
+        self.position = rl.vector3_zero()
+        self.up = rl.Vector3(0.0, 1.0, 0.0)
+        self.target = rl.vector3_zero()
+        self.width = 0
+        self.height = 0
+        self.near = 0.0
+        self.far = 1.0
+
+
+def load_shadow_moments_texture(width, height):
+    # 32-bit float moments: the exponential warp overflows half floats
+    texture = rl.Texture()
+    texture.id = rl.rl_load_texture(
+        ffi.NULL, width, height, rl.PIXELFORMAT_UNCOMPRESSED_R32G32B32A32, 1
+    )
+    texture.width = width
+    texture.height = height
+    texture.format = rl.PIXELFORMAT_UNCOMPRESSED_R32G32B32A32
+    texture.mipmaps = 1
+
+    rl.rl_texture_parameters(
+        texture.id, rl.RL_TEXTURE_MIN_FILTER, rl.RL_TEXTURE_FILTER_MIP_LINEAR
+    )
+    rl.rl_texture_parameters(
+        texture.id, rl.RL_TEXTURE_MAG_FILTER, rl.RL_TEXTURE_FILTER_LINEAR
+    )
+    rl.rl_texture_parameters(texture.id, rl.RL_TEXTURE_WRAP_S, rl.RL_TEXTURE_WRAP_CLAMP)
+    rl.rl_texture_parameters(texture.id, rl.RL_TEXTURE_WRAP_T, rl.RL_TEXTURE_WRAP_CLAMP)
+
+    # allocate the mip chain now, a mipmapped filter on a single level samples black
+    generate_shadow_moments_mipmaps(texture)
+    return texture
+
+
+def generate_shadow_moments_mipmaps(texture):
+    # raw gl: rlGenTextureMipmaps() logs on every call
+    gl.glBindTexture(GL_TEXTURE_2D, texture.id)
+    gl.glGenerateMipmap(GL_TEXTURE_2D)
+    gl.glBindTexture(GL_TEXTURE_2D, 0)
+
+
+def load_shadow_moments(width, height):
+    # color-only target, ping-pong partner of the moments shadow map
+    target = rl.RenderTexture()
+    target.id = rl.rl_load_framebuffer()
+    assert target.id != 0
+
+    rl.rl_enable_framebuffer(target.id)
+
+    target.texture = load_shadow_moments_texture(width, height)
+    rl.rl_framebuffer_attach(
+        target.id,
+        target.texture.id,
+        rl.RL_ATTACHMENT_COLOR_CHANNEL0,
+        rl.RL_ATTACHMENT_TEXTURE2D,
+        0,
+    )
+    assert rl.rl_framebuffer_complete(target.id)
+
+    rl.rl_disable_framebuffer()
+    return target
+
+
+def load_shadow_map(width, height, moments: bool = False):
+    # moments: adds an evsm color attachment next to the depth
+    target = rl.RenderTexture()
+    target.id = rl.rl_load_framebuffer()
+    target.texture.width = width
+    target.texture.height = height
+    assert target.id != 0
+
+    rl.rl_enable_framebuffer(target.id)
+
+    if moments:
+        target.texture = load_shadow_moments_texture(width, height)
+        rl.rl_framebuffer_attach(
+            target.id,
+            target.texture.id,
+            rl.RL_ATTACHMENT_COLOR_CHANNEL0,
+            rl.RL_ATTACHMENT_TEXTURE2D,
+            0,
+        )
+
+    target.depth.id = rl.rl_load_texture_depth(width, height, False)
+    target.depth.width = width
+    target.depth.height = height
+    target.depth.format = 19
+    target.depth.mipmaps = 1
+
+    rl.rl_framebuffer_attach(
+        target.id,
+        target.depth.id,
+        rl.RL_ATTACHMENT_DEPTH,
+        rl.RL_ATTACHMENT_TEXTURE2D,
+        0,
+    )
+    assert rl.rl_framebuffer_complete(target.id)
+
+    rl.rl_disable_framebuffer()
+    return target
+
+
+def unload_shadow_map(target):
+    # the framebuffer owns the depth attachment (rlUnloadFramebuffer() deletes it),
+    # color textures are released here
+    if target.texture.id > 0:
+        rl.rl_unload_texture(target.texture.id)
+        target.texture.id = 0
+    if target.id > 0:
+        rl.rl_unload_framebuffer(target.id)
+        target.id = 0
+
+
+def shadow_light_matrices(shadow_light: ShadowLight):
+    # (view, projection) the shadow map is rendered with
+    projection = rl.matrix_ortho(
+        -shadow_light.width / 2,
+        shadow_light.width / 2,
+        -shadow_light.height / 2,
+        shadow_light.height / 2,
+        shadow_light.near,
+        shadow_light.far,
+    )
+    view = rl.matrix_look_at(
+        shadow_light.position, shadow_light.target, shadow_light.up
+    )
+    return view, projection
+
+
+def begin_shadow_map(target, shadow_light: ShadowLight):
+
+    rl.begin_texture_mode(target)
+    rl.clear_background(rl.WHITE)
+
+    # update and draw internal render batch
+    rl.rl_draw_render_batch_active()
+
+    # switch to projection matrix:
+    rl.rl_matrix_mode(rl.RL_PROJECTION)
+    # save previous matrix, which contains the settings for the 2d ortho projection
+    rl.rl_push_matrix()
+    # reset current matrix(projection)
+    rl.rl_load_identity()
+
+    mat_view, mat_projection = shadow_light_matrices(shadow_light)
+    mult_matrix(mat_projection)
+
+    rl.rl_matrix_mode(rl.RL_MODELVIEW)
+    rl.rl_load_identity()
+
+    # multiply model-view matrix by view matrix (camera)
+    mult_matrix(mat_view)
+
+    rl.rl_enable_depth_test()
+
+
+def end_shadow_map():
+    # update and draw internal render batch:
+    rl.rl_draw_render_batch_active()
+
+    # switch to projection matrix
+    rl.rl_matrix_mode(rl.RL_PROJECTION)
+    # restore previous matrix (projection) from matrix stack
+    rl.rl_pop_matrix()
+
+    # switch back to modelview matrix
+    rl.rl_matrix_mode(rl.RL_MODELVIEW)
+    rl.rl_load_identity()
+
+    rl.rl_disable_depth_test()
+    rl.end_texture_mode()
+
+
+def set_shader_value_shader_map(shader: rl.Shader, loc_index: int, target):
+    if loc_index > -1:
+        rl.rl_enable_shader(shader.id)
+
+        slot_ptr = ffi.new("int*")
+        slot_ptr[0] = 10
+
+        rl.rl_active_texture_slot(slot_ptr[0])
+        rl.rl_enable_texture(target.depth.id)
+        rl.rl_set_uniform(loc_index, slot_ptr, rl.SHADER_UNIFORM_INT, 1)
+
+
+def set_shader_value_texture_slot(
+    shader: rl.Shader, loc_index: int, texture_id: int, slot: int
+):
+    # bind outside of raylib's batch texture units (limited to 4)
+    if loc_index > -1:
+        rl.rl_enable_shader(shader.id)
+
+        slot_ptr = ffi.new("int*", slot)
+
+        rl.rl_active_texture_slot(slot)
+        rl.rl_enable_texture(texture_id)
+        rl.rl_set_uniform(loc_index, slot_ptr, rl.SHADER_UNIFORM_INT, 1)
+        rl.rl_active_texture_slot(0)
+
+
+def linearize_gbuffer_depth(depth, near, far):
+    # gbuffer depth -> view-space distance along the view axis, background is inf
+    depth = np.asarray(depth, dtype=np.float32)
+    window_depth = (((2.0 * near) / np.maximum(depth, 1e-7)) - far - near) / (
+        near - far
+    )
+    ndc_depth = window_depth * 2.0 - 1.0
+    view_depth = (2.0 * near * far) / (far + near - ndc_depth * (far - near))
+    return np.where(depth < 1.0, view_depth, np.inf).astype(np.float32)
+
+
+def decode_gbuffer_normal(normal):
+    # [0, 1] encoded world-space normal -> unit vector, background is zero
+    normal = np.asarray(normal, dtype=np.float32)[..., :3] * 2.0 - 1.0
+    length = np.linalg.norm(normal, axis=-1, keepdims=True)
+    return np.where(length > 0.5, normal / np.maximum(length, 1e-7), 0.0).astype(
+        np.float32
+    )
+
+
+# evsm exponents (positive, negative), passed to shaders/shadow_moments.glsl
+SHADOW_EVSM_EXPONENTS = (40.0, 5.0)
+
+# shaders drawing scene meshes, decode compact vertex formats when enabled
+QUANTIZED_VERTEX_SHADERS = ("shadow", "basic")
+
+# shader name -> (vertex, fragment) sources
+RENDERER_SHADERS = {
+    "shadow": ("./shaders/shadow.vs", "./shaders/shadow.fs"),
+    "basic": ("./shaders/basic.vs", "./shaders/basic.fs"),
+    "lighting": ("./shaders/quad.vs", "./shaders/lighting.fs"),
+    "ssao": ("./shaders/quad.vs", "./shaders/ssao.fs"),
+    "blur": ("./shaders/quad.vs", "./shaders/blur.fs"),
+    "fxaa": ("./shaders/quad.vs", "./shaders/fxaa.fs"),
+    "shadow_blur": ("./shaders/quad.vs", "./shaders/shadow_blur.fs"),
+    "particle_update": PARTICLE_UPDATE_SHADER,
+    "particle": PARTICLE_SHADER,
+}
+# transform feedback outputs, bound before linking
+RENDERER_SHADER_VARYINGS = {
+    "particle_update": PARTICLE_VARYINGS,
+}
+
+# sun shadow filtering:
+# - hard: one jittered depth compare in the ssao pass, smoothed by the ssao blur
+# - evsm: exponential variance moments blurred and mipmapped at shadow map
+#   resolution, the lighting pass does a single filtered fetch
+SHADOW_FILTERS = ("hard", "evsm")
+SHADOW_FILTER_DEFINES = {
+    "hard": {},
+    "evsm": {
+        "shadow": {
+            "SHADOW_MOMENTS": 1,
+            "EVSM_POSITIVE_EXPONENT": SHADOW_EVSM_EXPONENTS[0],
+            "EVSM_NEGATIVE_EXPONENT": SHADOW_EVSM_EXPONENTS[1],
+        },
+        "ssao": {"SHADOW_MOMENTS": 1},
+        "lighting": {
+            "SHADOW_MOMENTS": 1,
+            "EVSM_POSITIVE_EXPONENT": SHADOW_EVSM_EXPONENTS[0],
+            "EVSM_NEGATIVE_EXPONENT": SHADOW_EVSM_EXPONENTS[1],
+        },
+    },
+}
+
+
+# repeats of the ground albedo over the ground, ALBEDO_TILING in basic.fs
+GROUND_ALBEDO_TILING = 4.0
+
+# near/far of every camera, see rl.rl_set_clip_planes()
+CAMERA_CLIP_PLANES = (0.01, 50.0)
+
+# sun direction before normalization
+SCENE_LIGHT_DIRECTION = (0.35, -1.0, -0.35)
+
+# constant LightBlock fields of the scene (see uniform_blocks.py), colors in gamma space
+SCENE_LIGHTING = {
+    "sun_color": (253.0 / 255.0, 255.0 / 255.0, 232.0 / 255.0),
+    "sun_intensity": 0.25,
+    "sky_color": (174.0 / 255.0, 183.0 / 255.0, 190.0 / 255.0),
+    "sky_intensity": 0.15,
+    "ground_intensity": 0.1,
+    "ambient_intensity": 1.0,
+    "exposure": 0.9,
+}
+
+
+def scene_local_lights(num_point_lights: int = 128) -> LocalLights:
+    # scattered point lights over the ground and a spot on the sphere
+    lights = LocalLights(capacity=1024)
+    rng = np.random.default_rng(0)
+    for _ in range(num_point_lights):
+        lights.add_point_light(
+            (
+                rng.uniform(-10.0, 10.0),
+                rng.uniform(0.1, 0.6),
+                rng.uniform(-10.0, 10.0),
+            ),
+            rng.uniform(0.5, 1.5),
+            rng.uniform(0.2, 1.0, 3),
+            2.0,
+        )
+    lights.add_spot_light(
+        (0.0, 3.0, 0.0),
+        (0.0, -1.0, 0.0),
+        4.0,
+        (1.0, 0.9, 0.7),
+        4.0,
+        math.radians(15.0),
+        math.radians(25.0),
+    )
+    return lights
+
+
+def scene_shadow_light(light_direction: rl.Vector3) -> ShadowLight:
+    # orthographic sun frustum around the origin
+    shadow_light = ShadowLight()
+    shadow_light.target = rl.vector3_zero()
+    shadow_light.position = rl.vector3_scale(light_direction, -5.0)
+    shadow_light.up = rl.Vector3(0.0, 1.0, 0.0)
+    shadow_light.width = 5.0
+    shadow_light.height = 5.0
+    shadow_light.near = 0.01
+    shadow_light.far = 10.0
+    return shadow_light
+
+
+def procedural_albedo(size: int = 2048, tiles: int = 8, seed: int = 7):
+    # seamless stone tiles: per-tile tint, mortar lines and grain, (size, size, 4) uint8
+    rng = np.random.default_rng(seed)
+    tile_size = size // tiles
+    y, x = np.mgrid[0:size, 0:size]
+    tint = rng.uniform(0.75, 1.0, (tiles, tiles, 3)).astype(np.float32)
+    albedo = tint[y // tile_size, x // tile_size]
+    local_x = (x % tile_size) / tile_size
+    local_y = (y % tile_size) / tile_size
+    edge = np.minimum(
+        np.minimum(local_x, 1.0 - local_x), np.minimum(local_y, 1.0 - local_y)
+    )
+    albedo *= np.where(edge < 0.02, 0.55, 1.0)[..., None]
+    # whole periods over the texture: tiles seamlessly
+    grain = np.sin(2.0 * np.pi * 37.0 * x / size) * np.sin(
+        2.0 * np.pi * 23.0 * y / size
+    )
+    albedo *= (0.92 + 0.08 * grain)[..., None]
+    pixels = np.empty((size, size, 4), dtype=np.uint8)
+    pixels[..., :3] = np.clip(albedo * 255.0, 0.0, 255.0)
+    pixels[..., 3] = 255
+    return pixels
+
+
+def grid_view_layout(width: int, height: int, num_views: int):
+    # (x, y, width, height) of num_views viewports tiling the screen, row-major
+    columns = math.ceil(math.sqrt(num_views))
+    rows = math.ceil(num_views / columns)
+    view_width = width // columns
+    view_height = height // rows
+    return [
+        ((index % columns) * view_width, (index // columns) * view_height)
+        + (view_width, view_height)
+        for index in range(num_views)
+    ]
+
+
+class RenderView:
+    # one camera's view-dependent state: targets, per-frame uniforms, recorded passes
+    # - (x, y, width, height): viewport on the final target, see Renderer.render_final()
+    def __init__(self, x: int, y: int, width: int, height: int):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        # camera block of this view, see UniformBlocks.bind_camera()
+        self.index = 0
+
+        # render targets, sized to the viewport (loaded by Renderer.add_view())
+        self.gbuffer = None
+        self.lighted = None
+        self.ssao_front = None
+        self.ssao_back = None
+
+        # per-frame values outside the uniform blocks, read by the recorded passes
+        # at replay
+        self.frame_uniforms = LiveUniforms(
+            cluster_depth_scale="float",
+            cluster_depth_bias="float",
+        )
+        # full-screen passes: recorded on first use, again after a shader change
+        self.ssao_commands = CommandList()
+        self.blur_commands = CommandList()
+        self.lighting_commands = CommandList()
+        self.fxaa_commands = CommandList()
+
+        # per-frame camera state, valid after Renderer.render()
+        self.camera_view = rl.matrix_identity()
+        self.camera_projection = rl.matrix_identity()
+        self.camera_clip_near = rl.rl_get_cull_distance_near()
+        self.camera_clip_far = rl.rl_get_cull_distance_far()
+        # objects left after frustum culling in the last frame
+        self.visible_objects = 0
+
+
+class Renderer:
+    # deferred pipeline: shadow -> gbuffer -> ssao/shadows -> blur -> lighting -> fxaa
+    # - owns shaders, scene and render targets, must be created after rl.init_window()
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        quality: str = "medium",
+        shadow_filter: str = "hard",
+        vertex_format: str = VERTEX_FORMAT_FLOAT32,
+        num_views: int = 1,
+        texture_budget: int = 64 * 2**20,
+        max_particles: int = 0,
+        object_ids: bool = False,
+    ):
+        # num_views: cameras rendered per frame (render_views()), tiled over the screen
+        # max_particles: gpu particle capacity, emitters are added to self.particles
+        # object_ids: gbuffers get an object id attachment for picking (picking.py)
+        assert shadow_filter in SHADOW_FILTERS
+        assert vertex_format in VERTEX_FORMATS
+        assert num_views >= 1
+        self.width = width
+        self.height = height
+        self.shadow_filter = shadow_filter
+        self.object_ids = object_ids
+        # float32: raylib's vertex layout, otherwise meshes are quantized on load
+        self.vertex_format = vertex_format
+        # AllocationProfiler, set while profiling (see begin_pass())
+        self.alloc_profiler = None
+
+        # shaders: submitted first, the driver compiles them while the scene loads
+        # - ssao/blur/shadow blur variants depend on the quality tier, see set_quality()
+        with startup_profiler.section("shader submit"):
+            self.quality = quality
+            self.shader_variants = ShaderVariantCache(owner=self)
+            for name in self.shader_names():
+                self.shader_variants.submit(
+                    *RENDERER_SHADERS[name],
+                    self.shader_defines(name),
+                    RENDERER_SHADER_VARYINGS.get(name, ()),
+                )
+
+        # lights:
+        self.light_direction = rl.vector3_normalize(rl.Vector3(*SCENE_LIGHT_DIRECTION))
+        self.local_lights = scene_local_lights()
+
+        # light clusters: froxel grid over the camera frustum
+        self.light_clusters = LightClusters(tiles_x=16, tiles_y=9, slices=24)
+        self.light_cluster_textures = self.track(
+            "light_cluster_textures",
+            load_light_cluster_textures(
+                self.light_clusters, max_lights=self.local_lights.capacity
+            ),
+            unload_light_cluster_textures,
+            GPU_TEXTURES,
+            light_cluster_textures_bytes,
+        )
+        self.cluster_dimensions = rl.Vector3(
+            self.light_clusters.tiles_x,
+            self.light_clusters.tiles_y,
+            self.light_clusters.slices,
+        )
+        self.cluster_index_width_ptr = ffi.new("int*", CLUSTER_INDEX_WIDTH)
+        # gbuffer material constants, pushed every view without allocating
+        self.specularity_ptr = ffi.new("float*", 0.5)
+        self.glossiness_ptr = ffi.new("float*", 10.0)
+
+        # objects:
+        ground_mesh = rl.gen_mesh_plane(20.0, 20.0, 10, 10)
+        if vertex_format == VERTEX_FORMAT_FLOAT32:
+            self.ground_model = self.track(
+                "ground_model",
+                rl.load_model_from_mesh(ground_mesh),
+                rl.unload_model,
+                GPU_MESHES,
+                model_bytes,
+            )
+            self.ground_mesh = self.ground_model.meshes[0]
+        else:
+            self.ground_model = None
+            self.ground_mesh = self.track(
+                "ground_mesh",
+                load_quantized_mesh_from_data(
+                    read_mesh_data(ground_mesh), vertex_format
+                ),
+                unload_quantized_mesh,
+                GPU_MESHES,
+                mesh_bytes,
+            )
+            rl.unload_mesh(ground_mesh)
+        self.ground_position = rl.Vector3(0.0, -0.01, 0.0)
+        # bounding sphere of the 20x20 plane
+        self.ground_radius = math.sqrt(2.0) * 10.0
+
+        # lod chain simplification is the slowest step, cached on disk after the first run
+        sphere_mesh = rl.gen_mesh_sphere(0.5, 32, 32)
+        with startup_profiler.section("sphere lods"):
+            sphere_lod_chain = load_cached_lod_chain(
+                sphere_mesh, "./cache/sphere_lods_0.5_32_32_0.5.npz", num_levels=4
+            )
+            self.sphere_lods = self.track(
+                "sphere_lods",
+                load_lod_group(
+                    sphere_mesh,
+                    num_levels=4,
+                    chain=sphere_lod_chain,
+                    vertex_format=vertex_format,
+                ),
+                unload_lod_group,
+                GPU_MESHES,
+                lod_group_bytes,
+            )
+        self.sphere_position = rl.Vector3(0.0, 0.5, 0.0)
+
+        # lods: bounding spheres of the lod-ed objects in world-space
+        self.lod_centers = (
+            np.array(
+                [
+                    [
+                        self.sphere_position.x,
+                        self.sphere_position.y,
+                        self.sphere_position.z,
+                    ]
+                ],
+                dtype=np.float32,
+            )
+            + self.sphere_lods.bounding_center
+        )
+        self.lod_radii = np.array([self.sphere_lods.bounding_radius], dtype=np.float32)
+        self.lod_bias = 1.0
+        # shadow map texels are coarser than screen pixels, prefer coarser levels
+        self.shadow_lod_bias = 0.5
+
+        # camera clip planes:
+        rl.rl_set_clip_planes(*CAMERA_CLIP_PLANES)
+
+        # shadows:
+        self.shadow_light = scene_shadow_light(self.light_direction)
+
+        self.shadow_width = 1024
+        self.shadow_height = 1024
+        self.shadow_inv_resolution = rl.Vector2(
+            1.0 / self.shadow_width, 1.0 / self.shadow_height
+        )
+        self.shadow_map = self.track(
+            "shadow_map",
+            load_shadow_map(
+                self.shadow_width, self.shadow_height, moments=shadow_filter == "evsm"
+            ),
+            unload_shadow_map,
+            GPU_RENDER_TARGETS,
+            render_texture_bytes,
+        )
+        self.shadow_moments_back = None
+        if shadow_filter == "evsm":
+            self.shadow_moments_back = self.track(
+                "shadow_moments_back",
+                load_shadow_moments(self.shadow_width, self.shadow_height),
+                unload_shadow_map,
+                GPU_RENDER_TARGETS,
+                render_texture_bytes,
+            )
+            # moments of the far plane (depth 1.0), e^80 still fits a float
+            positive = math.exp(SHADOW_EVSM_EXPONENTS[0])
+            negative = -math.exp(-SHADOW_EVSM_EXPONENTS[1])
+            self.shadow_moments_clear = ffi.new(
+                "float[4]",
+                [positive, positive * positive, negative, negative * negative],
+            )
+
+        # frame, light and per-view camera uniforms, shared by every program
+        self.uniform_blocks = UniformBlocks(num_views)
+        light = self.uniform_blocks.light
+        for name, value in SCENE_LIGHTING.items():
+            light[name] = value
+        light["shadow_inv_resolution"] = (
+            self.shadow_inv_resolution.x,
+            self.shadow_inv_resolution.y,
+        )
+
+        # views: gbuffer and render textures per camera
+        with startup_profiler.section("render targets"):
+            self.views = [
+                self.add_view(*viewport)
+                for viewport in grid_view_layout(width, height, num_views)
+            ]
+        self.main_view = self.views[0]
+
+        # shader link: waits for the programs, then queries the parameter locations
+        with startup_profiler.section("shader link"):
+            self.shader_variants.finish_all()
+
+            # *** shadow-shader
+            self.shadow_shader = self.get_shader("shadow")
+
+            # *** basic-shader
+            self.basic_shader = self.get_shader("basic")
+            self.basic_shader_specularity_parameter = rl.get_shader_location(
+                self.basic_shader, b"Specularity"
+            )
+            self.basic_shader_glossiness_parameter = rl.get_shader_location(
+                self.basic_shader, b"Glossiness"
+            )
+            self.basic_shader_albedo_texture_parameter = rl.get_shader_location(
+                self.basic_shader, b"AlbedoTexture"
+            )
+
+            # *** lighting-shader
+            self.lighting_shader = self.get_shader("lighting")
+            self.lighting_shader_gbuffer_color_parameter = rl.get_shader_location(
+                self.lighting_shader, b"GBufferColor"
+            )
+            self.lighting_shader_gbuffer_normal_parameter = rl.get_shader_location(
+                self.lighting_shader, b"GBufferNormal"
+            )
+            self.lighting_shader_gbuffer_depth_parameter = rl.get_shader_location(
+                self.lighting_shader, b"GBufferDepth"
+            )
+            self.lighting_shader_ssao_parameter = rl.get_shader_location(
+                self.lighting_shader, b"SSAO"
+            )
+            self.lighting_shader_light_data_parameter = rl.get_shader_location(
+                self.lighting_shader, b"LightData"
+            )
+            self.lighting_shader_cluster_grid_parameter = rl.get_shader_location(
+                self.lighting_shader, b"ClusterGrid"
+            )
+            self.lighting_shader_cluster_light_indices_parameter = (
+                rl.get_shader_location(self.lighting_shader, b"ClusterLightIndices")
+            )
+            self.lighting_shader_cluster_dimensions_parameter = rl.get_shader_location(
+                self.lighting_shader, b"ClusterDimensions"
+            )
+            self.lighting_shader_cluster_depth_scale_parameter = rl.get_shader_location(
+                self.lighting_shader, b"ClusterDepthScale"
+            )
+            self.lighting_shader_cluster_depth_bias_parameter = rl.get_shader_location(
+                self.lighting_shader, b"ClusterDepthBias"
+            )
+            self.lighting_shader_cluster_index_width_parameter = rl.get_shader_location(
+                self.lighting_shader, b"ClusterIndexWidth"
+            )
+            self.lighting_shader_shadow_moments_parameter = rl.get_shader_location(
+                self.lighting_shader, b"ShadowMoments"
+            )
+
+            # *** ssao, blur and shadow blur shaders
+            self.load_quality_shaders()
+
+            # *** fxaa shader
+            self.fxaa_shader = self.get_shader("fxaa")
+            self.fxaa_shader_input_texture_parameter = rl.get_shader_location(
+                self.fxaa_shader, b"InputTexture"
+            )
+            self.fxaa_shader_inv_texture_resolution_parameter = rl.get_shader_location(
+                self.fxaa_shader, b"InvTextureResolution"
+            )
+
+        # render queue:
+        self.render_queue = RenderQueue(depth_range=50.0)
+        self.shadow_material_id = self.render_queue.register_material(
+            RenderMaterial(self.shadow_shader)
+        )
+        ground_material = RenderMaterial(
+            self.basic_shader, rl.Color(190, 190, 190, 255)
+        )
+        sphere_material = RenderMaterial(
+            self.basic_shader,
+            rl.ORANGE,
+            [
+                (
+                    self.basic_shader_albedo_texture_parameter,
+                    rl.rl_get_texture_id_default(),
+                )
+            ],
+        )
+        self.ground_material_id = self.render_queue.register_material(ground_material)
+        self.sphere_material_id = self.render_queue.register_material(sphere_material)
+
+        # textures: decoded in the background, mips streamed by screen footprint
+        self.texture_streamer = TextureStreamer(budget_bytes=texture_budget)
+        self.ground_albedo = self.texture_streamer.load(
+            "ground_albedo", procedural_albedo
+        )
+        self.ground_albedo.bind(
+            ground_material, self.basic_shader_albedo_texture_parameter
+        )
+
+        self.ground_mesh_id = self.render_queue.register_mesh(self.ground_mesh)
+        self.sphere_mesh_ids = [
+            self.render_queue.register_mesh(mesh) for mesh in self.sphere_lods.meshes
+        ]
+        self.ground_transform = matrix_translate_numpy(
+            self.ground_position.x, self.ground_position.y, self.ground_position.z
+        )
+        self.sphere_transform = matrix_translate_numpy(
+            self.sphere_position.x, self.sphere_position.y, self.sphere_position.z
+        )
+
+        # object positions to compute sort depths (ground, sphere)
+        self.object_positions = np.array(
+            [
+                [
+                    self.ground_position.x,
+                    self.ground_position.y,
+                    self.ground_position.z,
+                ],
+                [
+                    self.sphere_position.x,
+                    self.sphere_position.y,
+                    self.sphere_position.z,
+                ],
+            ],
+            dtype=np.float32,
+        )
+        self.shadow_depths = np.linalg.norm(
+            self.object_positions
+            - np.array(
+                [
+                    self.shadow_light.position.x,
+                    self.shadow_light.position.y,
+                    self.shadow_light.position.z,
+                ],
+                dtype=np.float32,
+            ),
+            axis=1,
+        )
+
+        # bounding spheres for per-view frustum culling (ground, sphere)
+        self.object_centers = np.array(
+            [self.object_positions[0], self.lod_centers[0]], dtype=np.float32
+        )
+        self.object_radii = np.array(
+            [self.ground_radius, self.sphere_lods.bounding_radius], dtype=np.float32
+        )
+        # object ids for picking (ground, sphere)
+        self.object_id_values = np.array(
+            [OBJECT_ID_GROUND, OBJECT_ID_SPHERE], dtype=np.uint32
+        )
+
+        # particles: simulated and drawn on the gpu, no emitter until one is added
+        self.particles = ParticleSystem(
+            self.get_shader("particle_update"),
+            self.get_shader("particle"),
+            max_particles,
+        )
+
+        # per-frame light state, valid after render()
+        self.light_view_projection = rl.matrix_identity()
+        return
+
+    def add_view(self, x: int, y: int, width: int, height: int) -> RenderView:
+        # view-dependent targets, released with the renderer
+        view = RenderView(x, y, width, height)
+        view.index = len(getattr(self, "views", ()))
+        prefix = f"view{view.index}"
+        view.gbuffer = self.track(
+            f"{prefix}.gbuffer",
+            load_gbuffer(width, height, self.object_ids),
+            unload_gbuffer,
+            GPU_RENDER_TARGETS,
+            gbuffer_bytes,
+        )
+        for name in ("lighted", "ssao_front", "ssao_back"):
+            setattr(
+                view,
+                name,
+                self.track(
+                    f"{prefix}.{name}",
+                    rl.load_render_texture(width, height),
+                    rl.unload_render_texture,
+                    GPU_RENDER_TARGETS,
+                    render_texture_bytes,
+                ),
+            )
+        return view
+
+    # single-view api: the main view's targets and camera state
+
+    @property
+    def gbuffer(self) -> GBuffer:
+        return self.main_view.gbuffer
+
+    @property
+    def lighted(self) -> rl.RenderTexture:
+        return self.main_view.lighted
+
+    @property
+    def ssao_front(self) -> rl.RenderTexture:
+        return self.main_view.ssao_front
+
+    @property
+    def ssao_back(self) -> rl.RenderTexture:
+        return self.main_view.ssao_back
+
+    @property
+    def camera_clip_near(self) -> float:
+        return self.main_view.camera_clip_near
+
+    @property
+    def camera_clip_far(self) -> float:
+        return self.main_view.camera_clip_far
+
+    def begin_pass(self, name: str):
+        # allocation profiling per pass, see alloc_profiler.py
+        if self.alloc_profiler is not None:
+            self.alloc_profiler.begin_pass(name)
+
+    def track(self, name: str, obj, release, category: str, size):
+        # registers obj with gpu_resources, released by unload(); size(obj) -> bytes
+        gpu_resources.track(self, name, obj, release, category, size(obj))
+        return obj
+
+    def shader_names(self):
+        # the moments blur only exists with evsm shadows
+        return [
+            name
+            for name in RENDERER_SHADERS
+            if name != "shadow_blur" or self.shadow_filter == "evsm"
+        ]
+
+    def shader_defines(self, name: str):
+        defines = dict(SHADER_QUALITY_TIERS[self.quality].get(name, {}))
+        defines.update(SHADOW_FILTER_DEFINES[self.shadow_filter].get(name, {}))
+        if (
+            self.vertex_format != VERTEX_FORMAT_FLOAT32
+            and name in QUANTIZED_VERTEX_SHADERS
+        ):
+            defines["QUANTIZED_VERTICES"] = 1
+        return defines
+
+    def get_shader(self, name: str) -> rl.Shader:
+        shader = self.shader_variants.get(
+            *RENDERER_SHADERS[name],
+            self.shader_defines(name),
+            RENDERER_SHADER_VARYINGS.get(name, ()),
+        )
+        # every program reads frame, light and camera data from the shared blocks
+        bind_uniform_blocks(shader)
+        return shader
+
+    def load_quality_shaders(self):
+        # shaders whose variant depends on the quality tier
+        # *** ssao shader
+        self.ssao_shader = self.get_shader("ssao")
+        self.ssao_shader_gbuffer_depth_parameter = rl.get_shader_location(
+            self.ssao_shader, b"GBufferDepth"
+        )
+        self.ssao_shader_gbuffer_normal_parameter = rl.get_shader_location(
+            self.ssao_shader, b"GBufferNormal"
+        )
+        self.ssao_shader_shadow_map_parameter = rl.get_shader_location(
+            self.ssao_shader, b"ShadowMap"
+        )
+
+        # *** blur shader
+        self.blur_shader = self.get_shader("blur")
+        self.blur_shader_gbuffer_normal_parameter = rl.get_shader_location(
+            self.blur_shader, b"GBufferNormal"
+        )
+        self.blur_shader_gbuffer_depth_parameter = rl.get_shader_location(
+            self.blur_shader, b"GBufferDepth"
+        )
+        self.blur_shader_input_texture_parameter = rl.get_shader_location(
+            self.blur_shader, b"InputTexture"
+        )
+        self.blur_shader_inv_texture_resolution_parameter = rl.get_shader_location(
+            self.blur_shader, b"InvTextureResolution"
+        )
+        self.blur_shader_blur_direction_parameter = rl.get_shader_location(
+            self.blur_shader, b"BlurDirection"
+        )
+
+        # *** shadow moments blur shader
+        if self.shadow_filter == "evsm":
+            self.shadow_blur_shader = self.get_shader("shadow_blur")
+            self.shadow_blur_shader_input_texture_parameter = rl.get_shader_location(
+                self.shadow_blur_shader, b"InputTexture"
+            )
+            self.shadow_blur_shader_inv_texture_resolution_parameter = (
+                rl.get_shader_location(self.shadow_blur_shader, b"InvTextureResolution")
+            )
+            self.shadow_blur_shader_blur_direction_parameter = rl.get_shader_location(
+                self.shadow_blur_shader, b"BlurDirection"
+            )
+
+    def filter_shadow_moments(self):
+        # separable gaussian of the moments at shadow map resolution, then mips so
+        # the lighting pass gets a pre-filtered footprint from one trilinear fetch
+        for source, target, blur_direction in (
+            (self.shadow_map, self.shadow_moments_back, rl.Vector2(1.0, 0.0)),
+            (self.shadow_moments_back, self.shadow_map, rl.Vector2(0.0, 1.0)),
+        ):
+            rl.begin_texture_mode(target)
+            rl.begin_shader_mode(self.shadow_blur_shader)
+
+            rl.set_shader_value_texture(
+                self.shadow_blur_shader,
+                self.shadow_blur_shader_input_texture_parameter,
+                source.texture,
+            )
+            rl.set_shader_value(
+                self.shadow_blur_shader,
+                self.shadow_blur_shader_inv_texture_resolution_parameter,
+                ffi.addressof(self.shadow_inv_resolution),
+                rl.SHADER_UNIFORM_VEC2,
+            )
+            rl.set_shader_value(
+                self.shadow_blur_shader,
+                self.shadow_blur_shader_blur_direction_parameter,
+                ffi.addressof(blur_direction),
+                rl.SHADER_UNIFORM_VEC2,
+            )
+
+            rl.draw_texture_rec(
+                target.texture,
+                rl.Rectangle(0, 0, target.texture.width, -target.texture.height),
+                rl.Vector2(0, 0),
+                rl.WHITE,
+            )
+
+            rl.end_shader_mode()
+            rl.end_texture_mode()
+
+        generate_shadow_moments_mipmaps(self.shadow_map.texture)
+
+    def set_quality(self, quality: str):
+        # switch tier at runtime, variants built before are reused from the cache
+        if quality == self.quality:
+            return
+        assert quality in SHADER_QUALITY_TIERS
+        self.quality = quality
+        self.load_quality_shaders()
+
+    def scene_state(self):
+        # everything the frame depends on besides the cameras (see frame_cache.py):
+        # an unchanged state and cameras means the previous frame can be reused
+        shadow_light = self.shadow_light
+        lights = self.local_lights
+        count = lights.count
+        return (
+            self.quality,
+            vector3_state(self.light_direction),
+            vector3_state(shadow_light.position),
+            vector3_state(shadow_light.target),
+            vector3_state(shadow_light.up),
+            (shadow_light.width, shadow_light.height),
+            (shadow_light.near, shadow_light.far),
+            count,
+            lights.positions[:count].tobytes(),
+            lights.radii[:count].tobytes(),
+            lights.colors[:count].tobytes(),
+            lights.intensities[:count].tobytes(),
+            lights.directions[:count].tobytes(),
+            lights.cos_inner[:count].tobytes(),
+            lights.cos_outer[:count].tobytes(),
+            self.ground_transform.tobytes(),
+            self.sphere_transform.tobytes(),
+            # keeps rendering while mips stream in
+            self.texture_streamer.version,
+            self.texture_streamer.busy and self.texture_streamer.frame_index,
+            # living particles move every frame
+            self.particles.count and self.particles.time,
+        )
+
+    def render(self, camera3d: rl.Camera3D):
+        # renders the scene into self.lighted, call inside rl.begin_drawing()
+        self.render_views([camera3d])
+
+    def render_views(self, cameras, delta_time: float = None, time: float = None):
+        # one camera per view (self.views order): the shadow map is rendered once,
+        # culling, gbuffer, ssao and lighting run per view into its own targets
+        # - delta_time/time: simulation clock, raylib's by default (a replayed session
+        #   passes the recorded one, see input_recording.py)
+        if delta_time is None:
+            delta_time = rl.get_frame_time()
+        if time is None:
+            time = rl.get_time()
+
+        # residency for the footprints requested last frame:
+        self.begin_pass("textures")
+        self.texture_streamer.update()
+
+        # particle simulation, shared by every view:
+        self.begin_pass("particles")
+        self.particles.update(delta_time)
+
+        # frame, light and camera data of every pass and view, one upload:
+        self.begin_pass("uniforms")
+        self.update_uniform_blocks(cameras, delta_time, time)
+
+        # select lods by projected screen-size:
+        self.begin_pass("lods")
+        lod_screen_sizes = [
+            compute_screen_sizes(camera3d, self.lod_centers, self.lod_radii)
+            for camera3d in cameras
+        ]
+        # the shadow map serves every view: the finest level any of them selects
+        sphere_shadow_lod = min(
+            select_lod_levels(
+                screen_sizes, self.sphere_lods.screen_sizes, self.shadow_lod_bias
+            )[0]
+            for screen_sizes in lod_screen_sizes
+        )
+
+        # submit draw items:
+        self.render_queue.begin_frame()
+        self.render_queue.submit_batch(
+            RENDER_PASS_SHADOW,
+            [self.ground_mesh_id, self.sphere_mesh_ids[sphere_shadow_lod]],
+            [self.shadow_material_id, self.shadow_material_id],
+            [self.ground_transform, self.sphere_transform],
+            self.shadow_depths,
+        )
+
+        # passes below write every pixel, no blending
+        rl.rl_disable_color_blend()
+
+        # render shadow maps:
+        self.begin_pass("shadow")
+        begin_shadow_map(self.shadow_map, self.shadow_light)
+        if self.shadow_filter == "evsm":
+            # uncovered texels hold the far plane's moments, not white
+            gl.glClearBufferfv(GL_COLOR, 0, self.shadow_moments_clear)
+
+        self.render_queue.execute(RENDER_PASS_SHADOW)
+
+        end_shadow_map()
+
+        if self.shadow_filter == "evsm":
+            self.filter_shadow_moments()
+
+        for camera3d, view, screen_sizes in zip(cameras, self.views, lod_screen_sizes):
+            self.render_view(camera3d, view, screen_sizes)
+
+    def update_uniform_blocks(self, cameras, delta_time: float, time: float):
+        # fills the blocks before any pass draws, each view's camera in its own range
+        blocks = self.uniform_blocks
+
+        light_view, light_projection = shadow_light_matrices(self.shadow_light)
+        self.light_view_projection = rl.matrix_multiply(light_view, light_projection)
+        write_light_block(
+            blocks.light,
+            matrix_to_numpy(self.light_view_projection),
+            vector3_state(self.light_direction),
+            rl.rl_get_cull_distance_near(),
+            rl.rl_get_cull_distance_far(),
+        )
+
+        for camera3d, view in zip(cameras, self.views):
+            view.camera_view, view.camera_projection = camera_matrices(
+                camera3d, float(view.width) / float(view.height)
+            )
+            view.camera_clip_near = rl.rl_get_cull_distance_near()
+            view.camera_clip_far = rl.rl_get_cull_distance_far()
+            blocks.set_camera(
+                view.index,
+                vector3_state(camera3d.position),
+                matrix_to_numpy(view.camera_view),
+                matrix_to_numpy(view.camera_projection),
+                view.camera_clip_near,
+                view.camera_clip_far,
+            )
+
+        blocks.set_frame(time, delta_time, blocks.num_uploads)
+        blocks.upload()
+
+    def render_view(self, camera3d: rl.Camera3D, view: RenderView, lod_screen_sizes):
+        # view-dependent passes, into view's targets
+        sphere_lod = select_lod_levels(
+            lod_screen_sizes, self.sphere_lods.screen_sizes, self.lod_bias
+        )[0]
+
+        # render to view.gbuffer:
+        self.begin_pass("gbuffer")
+        begin_gbuffer(view.gbuffer, camera3d)
+
+        # this view's camera block, read by every pass below
+        self.uniform_blocks.bind_camera(view.index)
+        uniforms = view.frame_uniforms
+        camera_view = matrix_to_numpy(view.camera_view)
+        camera_projection = matrix_to_numpy(view.camera_projection)
+
+        # bin local lights into clusters:
+        # - the cluster textures are shared, each view rebuilds them before its lighting
+        self.begin_pass("clusters")
+        build_light_clusters(
+            self.light_clusters,
+            self.local_lights.positions[: self.local_lights.count],
+            self.local_lights.radii[: self.local_lights.count],
+            camera_view,
+            camera_projection,
+            view.camera_clip_near,
+            view.camera_clip_far,
+        )
+        update_light_cluster_textures(
+            self.light_cluster_textures, self.light_clusters, self.local_lights
+        )
+        uniforms.cluster_depth_scale[0] = self.light_clusters.depth_scale
+        uniforms.cluster_depth_bias[0] = self.light_clusters.depth_bias
+
+        rl.set_shader_value(
+            self.basic_shader,
+            self.basic_shader_specularity_parameter,
+            self.specularity_ptr,
+            rl.SHADER_UNIFORM_FLOAT,
+        )
+        rl.set_shader_value(
+            self.basic_shader,
+            self.basic_shader_glossiness_parameter,
+            self.glossiness_ptr,
+            rl.SHADER_UNIFORM_FLOAT,
+        )
+
+        # cull and submit draw items:
+        self.begin_pass("culling")
+        visible = cull_spheres(
+            frustum_planes(camera_projection @ camera_view),
+            self.object_centers,
+            self.object_radii,
+        )
+        view.visible_objects = int(np.count_nonzero(visible))
+
+        # texture footprints: pixels across one albedo repeat
+        if visible[0]:
+            ground_screen_size = compute_screen_sizes(
+                camera3d, self.object_centers[:1], self.object_radii[:1]
+            )[0]
+            self.texture_streamer.request(
+                self.ground_albedo,
+                ground_screen_size * view.height / GROUND_ALBEDO_TILING,
+            )
+
+        camera_depths = np.linalg.norm(
+            self.object_positions
+            - np.array(
+                [
+                    camera3d.position.x,
+                    camera3d.position.y,
+                    camera3d.position.z,
+                ],
+                dtype=np.float32,
+            ),
+            axis=1,
+        )
+        # the shadow items are drawn already, keep the frame's stats
+        self.render_queue.clear()
+        self.render_queue.submit_batch(
+            RENDER_PASS_GBUFFER,
+            np.array([self.ground_mesh_id, self.sphere_mesh_ids[sphere_lod]])[visible],
+            np.array([self.ground_material_id, self.sphere_material_id])[visible],
+            np.stack([self.ground_transform, self.sphere_transform])[visible],
+            camera_depths[visible],
+            self.object_id_values[visible],
+        )
+
+        # draw ground and sphere models:
+        self.begin_pass("gbuffer")
+        self.render_queue.execute(RENDER_PASS_GBUFFER)
+
+        # draw particles, opaque billboards lit like the scene:
+        self.begin_pass("particles")
+        self.particles.draw()
+
+        # end drawing to view.gbuffer
+        end_gbuffer(self.width, self.height)
+
+        # render ssao and shadows:
+        self.begin_pass("ssao")
+        if view.ssao_commands.needs_recording(self.ssao_shader.id):
+            self.record_ssao(view.ssao_commands, view)
+        view.ssao_commands.replay()
+
+        # blur horizontal + vertical:
+        self.begin_pass("blur")
+        if view.blur_commands.needs_recording(self.blur_shader.id):
+            self.record_blur(view.blur_commands, view)
+        view.blur_commands.replay()
+
+        # light view.gbuffer:
+        self.begin_pass("lighting")
+        if view.lighting_commands.needs_recording(self.lighting_shader.id):
+            self.record_lighting(view.lighting_commands, view)
+        view.lighting_commands.replay()
+
+    def record_ssao(self, commands: CommandList, view: RenderView):
+        commands.begin_texture_mode(view.ssao_front)
+
+        commands.begin_shader_mode(self.ssao_shader)
+
+        commands.uniform_texture(
+            self.ssao_shader_gbuffer_normal_parameter, view.gbuffer.normal
+        )
+        commands.uniform_texture(
+            self.ssao_shader_gbuffer_depth_parameter, view.gbuffer.depth
+        )
+        commands.uniform_texture_slot(
+            self.ssao_shader_shadow_map_parameter, self.shadow_map.depth.id, 10
+        )
+
+        commands.clear_background(rl.WHITE)
+
+        commands.draw_texture_rec(
+            view.ssao_front.texture,
+            rl.Rectangle(
+                0, 0, view.ssao_front.texture.width, -view.ssao_front.texture.height
+            ),
+            rl.Vector2(0, 0),
+            rl.WHITE,
+        )
+
+        commands.end_shader_mode()
+
+        commands.end_texture_mode()
+
+    def record_blur(self, commands: CommandList, view: RenderView):
+        # blur-horizontal
+        commands.begin_texture_mode(view.ssao_back)
+        commands.begin_shader_mode(self.blur_shader)
+
+        commands.uniform_texture(
+            self.blur_shader_gbuffer_normal_parameter, view.gbuffer.normal
+        )
+        commands.uniform_texture(
+            self.blur_shader_gbuffer_depth_parameter, view.gbuffer.depth
+        )
+        commands.uniform_texture(
+            self.blur_shader_input_texture_parameter, view.ssao_front.texture
+        )
+        commands.uniform_value(
+            self.blur_shader_inv_texture_resolution_parameter,
+            "Vector2",
+            (
+                1.0 / view.ssao_front.texture.width,
+                1.0 / view.ssao_front.texture.height,
+            ),
+            rl.SHADER_UNIFORM_VEC2,
+        )
+        commands.uniform_value(
+            self.blur_shader_blur_direction_parameter,
+            "Vector2",
+            (1.0, 0.0),
+            rl.SHADER_UNIFORM_VEC2,
+        )
+
+        commands.draw_texture_rec(
+            view.ssao_back.texture,
+            rl.Rectangle(
+                0, 0, view.ssao_back.texture.width, -view.ssao_back.texture.height
+            ),
+            rl.Vector2(0, 0),
+            rl.WHITE,
+        )
+
+        commands.end_shader_mode()
+        commands.end_texture_mode()
+
+        # blur vertical:
+        commands.begin_texture_mode(view.ssao_front)
+        commands.begin_shader_mode(self.blur_shader)
+
+        commands.uniform_texture(
+            self.blur_shader_input_texture_parameter, view.ssao_back.texture
+        )
+        commands.uniform_value(
+            self.blur_shader_blur_direction_parameter,
+            "Vector2",
+            (0.0, 1.0),
+            rl.SHADER_UNIFORM_VEC2,
+        )
+
+        commands.draw_texture_rec(
+            view.ssao_front.texture,
+            rl.Rectangle(
+                0, 0, view.ssao_front.texture.width, -view.ssao_front.texture.height
+            ),
+            rl.Vector2(0, 0),
+            rl.WHITE,
+        )
+
+        commands.end_shader_mode()
+        commands.end_texture_mode()
+
+    def record_lighting(self, commands: CommandList, view: RenderView):
+        uniforms = view.frame_uniforms
+        commands.begin_texture_mode(view.lighted)
+
+        commands.begin_shader_mode(self.lighting_shader)
+
+        commands.uniform_texture(
+            self.lighting_shader_gbuffer_color_parameter, view.gbuffer.color
+        )
+        commands.uniform_texture(
+            self.lighting_shader_gbuffer_normal_parameter, view.gbuffer.normal
+        )
+        commands.uniform_texture(
+            self.lighting_shader_gbuffer_depth_parameter, view.gbuffer.depth
+        )
+        commands.uniform_texture(
+            self.lighting_shader_ssao_parameter, view.ssao_front.texture
+        )
+        commands.uniform_texture_slot(
+            self.lighting_shader_light_data_parameter,
+            self.light_cluster_textures.light_data.id,
+            11,
+        )
+        commands.uniform_texture_slot(
+            self.lighting_shader_cluster_grid_parameter,
+            self.light_cluster_textures.grid.id,
+            12,
+        )
+        commands.uniform_texture_slot(
+            self.lighting_shader_cluster_light_indices_parameter,
+            self.light_cluster_textures.light_indices.id,
+            13,
+        )
+        commands.uniform(
+            self.lighting_shader_cluster_dimensions_parameter,
+            ffi.addressof(self.cluster_dimensions),
+            rl.SHADER_UNIFORM_VEC3,
+        )
+        commands.uniform(
+            self.lighting_shader_cluster_depth_scale_parameter,
+            uniforms.cluster_depth_scale,
+            rl.SHADER_UNIFORM_FLOAT,
+        )
+        commands.uniform(
+            self.lighting_shader_cluster_depth_bias_parameter,
+            uniforms.cluster_depth_bias,
+            rl.SHADER_UNIFORM_FLOAT,
+        )
+        commands.uniform(
+            self.lighting_shader_cluster_index_width_parameter,
+            self.cluster_index_width_ptr,
+            rl.SHADER_UNIFORM_INT,
+        )
+        if self.shadow_filter == "evsm":
+            commands.uniform_texture_slot(
+                self.lighting_shader_shadow_moments_parameter,
+                self.shadow_map.texture.id,
+                10,
+            )
+
+        commands.clear_background(rl.RAYWHITE)
+
+        commands.draw_texture_rec(
+            view.gbuffer.color,
+            rl.Rectangle(0, 0, view.gbuffer.color.width, -view.gbuffer.color.height),
+            rl.Vector2(0, 0),
+            rl.WHITE,
+        )
+
+        commands.end_shader_mode()
+
+        commands.end_texture_mode()
+
+    def render_final(self, view: RenderView = None):
+        # fxaa resolve of view.lighted (default: main view) into the current target
+        # (backbuffer or texture), at the view's viewport
+        # render final with fxaa:
+        self.begin_pass("fxaa")
+        view = view if view is not None else self.main_view
+        if view.fxaa_commands.needs_recording(self.fxaa_shader.id):
+            self.record_fxaa(view.fxaa_commands, view)
+        view.fxaa_commands.replay()
+
+    def record_fxaa(self, commands: CommandList, view: RenderView):
+        commands.begin_shader_mode(self.fxaa_shader)
+
+        commands.uniform_texture(
+            self.fxaa_shader_input_texture_parameter, view.lighted.texture
+        )
+        commands.uniform_value(
+            self.fxaa_shader_inv_texture_resolution_parameter,
+            "Vector2",
+            (1.0 / view.lighted.texture.width, 1.0 / view.lighted.texture.height),
+            rl.SHADER_UNIFORM_VEC2,
+        )
+
+        commands.draw_texture_rec(
+            view.lighted.texture,
+            rl.Rectangle(
+                0, 0, view.lighted.texture.width, -view.lighted.texture.height
+            ),
+            rl.Vector2(view.x, view.y),
+            rl.WHITE,
+        )
+
+        commands.end_shader_mode()
+
+    def unload(self):
+        # every shader variant built so far, including other quality tiers
+        self.shader_variants.unload()
+
+        # streamed textures and the decoding thread
+        self.texture_streamer.unload()
+
+        # particle state buffers
+        self.particles.unload()
+
+        # shared uniform buffer
+        self.uniform_blocks.unload()
+
+        # render targets, light clusters and models, in reverse allocation order
+        gpu_resources.release_owner(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.unload()
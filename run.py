@@ -1,19 +1,30 @@
+# first import: its import time is the origin of the startup profile
+from startup import *
+
+import argparse
 import math
+import os
 import platform
 
-# wrapper from calling c to python or vice versa
-import cffi
-
 # use python version raylib as well as raylib's native version
 import pyray as rl
 import raylib as nrl
 
-import numpy as np
-
 from sse import *
+from renderer import *
+from telemetry import *
+from readback import *
+
+# alloc_profiler, frame_ring, viewport_stream, picking and input_recording are imported
+# where their command line flags enable them, a plain launch never pays for them
 
-# retrieve ffi
-ffi = cffi.FFI()
+# frame_ring.FRAME_RING_POLICIES and input_recording.INPUT_REPLAY_PACINGS, spelled out
+# so parsing the command line imports neither (tests/test_run.py keeps them in sync)
+FRAME_RING_POLICY_CHOICES = ("drop-oldest", "block")
+REPLAY_PACING_CHOICES = ("uncapped", "paced")
+
+# retrieve ffi (raylib's compiled ffi, no pycparser at startup)
+ffi = nrl.ffi
 
 
 class Camera:
@@ -80,304 +91,59 @@ class Camera:
         self.camera3d.target = camera_target
 
 
-class GBuffer:
-    def __init__(self):
-        # OpenGL framebuffer object id
-        self.id = 0
-        # color buffer attachment texture
-        self.color = rl.Texture()
-        # normal buffer attachment texture
-        self.normal = rl.Texture()
-        # depth buffer attachment texture
-        self.depth = rl.Texture()
-
-
-def load_gbuffer(width, height):
-    target = GBuffer()
-    target.id = rl.rl_load_framebuffer()
-    assert target.id
-
-    rl.rl_enable_framebuffer(target.id)
-
-    target.color.id = rl.rl_load_texture(
-        ffi.NULL, width, height, rl.PIXELFORMAT_UNCOMPRESSED_R8G8B8A8, 1
-    )
-    target.color.width = width
-    target.color.height = height
-    target.color.format = rl.PIXELFORMAT_UNCOMPRESSED_R8G8B8A8
-    target.color.mipmaps = 1
-    rl.rl_framebuffer_attach(
-        target.id,
-        target.color.id,
-        rl.RL_ATTACHMENT_COLOR_CHANNEL0,
-        rl.RL_ATTACHMENT_TEXTURE2D,
-        0,
-    )
-
-    target.normal.id = rl.rl_load_texture(
-        ffi.NULL, width, height, rl.PIXELFORMAT_UNCOMPRESSED_R16G16B16A16, 1
-    )
-    target.normal.width = width
-    target.normal.height = height
-    target.normal.format = rl.PIXELFORMAT_UNCOMPRESSED_R16G16B16A16
-    target.normal.mipmaps = 1
-    rl.rl_framebuffer_attach(
-        target.id,
-        target.normal.id,
-        rl.RL_ATTACHMENT_COLOR_CHANNEL1,
-        rl.RL_ATTACHMENT_TEXTURE2D,
-        0,
-    )
-
-    target.depth.id = rl.rl_load_texture_depth(width, height, False)
-    target.depth.width = width
-    target.depth.height = height
-    # DEPTH_COMPONENT_24BITS(?)
-    target.depth.format = 19
-    target.depth.mipmaps = 1
-    rl.rl_framebuffer_attach(
-        target.id,
-        target.depth.id,
-        rl.RL_ATTACHMENT_DEPTH,
-        rl.RL_ATTACHMENT_TEXTURE2D,
-        0,
-    )
-
-    # verification by the FBO(frame-buffer-object) with bound attachments
-    assert rl.rl_framebuffer_complete(target.id)
-
-    # disable FBO, return to default framebuffer
-    rl.rl_disable_framebuffer()
-
-    return target
-
-
-def unload_gbuffer(target: GBuffer):
-    if target.id > 0:
-        rl.rl_unload_framebuffer(target.id)
-
-
-def begin_gbuffer(target: GBuffer, camera: rl.Camera3D):
-
-    rl.rl_draw_render_batch_active()
-
-    # enable GBuffer FBO
-    rl.rl_enable_framebuffer(target.id)
-
-    # active MRT(multi-render-target)
-    rl.rl_active_draw_buffers(2)
-
-    # set viewport and RLGL internal frame buffer size
-    nrl.rlViewport(0, 0, target.color.width, target.color.height)
-    rl.rl_set_framebuffer_width(target.color.width)
-    rl.rl_set_framebuffer_height(target.color.height)
-
-    # clear background color:
-    rl.clear_background(rl.BLACK)
-
-    # switch to projection matrix
-    rl.rl_matrix_mode(rl.RL_PROJECTION)
-
-    # save previous matrix, which contains the settings for the 2d otho projection
-    rl.rl_push_matrix()
-
-    # reset current matrix
-    rl.rl_load_identity()
-
-    aspect = float(target.color.width) / float(target.color.height)
-
-    # zNear and zFar values are important when computing depth buffer values:
-    if camera.projection == rl.CAMERA_PERSPECTIVE:
-        # setup perspective projection:
-        top = rl.rl_get_cull_distance_near() * np.tan(camera.fovy * 0.5 * rl.DEG2RAD)
-        right = top * aspect
-        rl.rl_frustum(
-            -right,
-            right,
-            -top,
-            top,
-            rl.rl_get_cull_distance_near(),
-            rl.rl_get_cull_distance_far(),
-        )
-
-    elif camera.projection == rl.CAMERA_ORTHOGRAPHIC:
-        # setup orthographic projection:
-        top = camera.fovy / 2.0
-        right = top * aspect
-        rl.rl_ortho(
-            -right,
-            right,
-            -top,
-            top,
-            rl.rl_get_cull_distance_near(),
-            rl.rl_get_cull_distance_far(),
-        )
-
-    # switch back to modelview matrix
-    rl.rl_matrix_mode(rl.RL_MODELVIEW)
-    rl.rl_load_identity()
-
-    # setup camera view
-    mat_view = rl.matrix_look_at(camera.position, camera.target, camera.up)
-
-    # multiply modelview matrix by view matrix (camera)
-    mat_view_v = rl.matrix_to_float_v(mat_view)
-    mat_view_v_ptr = ffi.addressof(mat_view_v.v, 0)
-    rl.rl_mult_matrixf(mat_view_v_ptr)
-
-    # enable depth test
-    rl.rl_enable_depth_test()
-
-    return
-
-
-def end_gbuffer(width, height):
-
-    # update and draw internal render batch
-    rl.rl_draw_render_batch_active()
-
-    # disable DEPTH_TEST:
-    rl.rl_disable_depth_test()
-
-    # deactivate MRT
-    rl.rl_active_draw_buffers(1)
-
-    # disable GBuffer FBO
-    rl.rl_disable_framebuffer()
-
-    # reset projection matrix
-    rl.rl_matrix_mode(rl.RL_PROJECTION)
-    rl.rl_pop_matrix()
-    rl.rl_load_identity()
-    rl.rl_ortho(0.0, float(width), float(height), 0.0, -1.0, 1.0)
-
-    # reset model-view:
-    rl.rl_matrix_mode(rl.RL_MODELVIEW)
-    rl.rl_load_identity()
-
-    return
-
-
-class ShadowLight:
-    def __init__(self):
-        self.target = rl.vector3_zero()
-        self.position = rl.vector3_zero()
-        self.up = rl.Vector3(0.0, 1.0, 0.0)
-        self.target = rl.vector3_zero()
-        self.width = 0
-        self.height = 0
-        self.near = 0.0
-        self.far = 1.0
-
-
-def load_shadow_map(width, height):
-    target = rl.RenderTexture()
-    target.id = rl.rl_load_framebuffer()
-    target.texture.width = width
-    target.texture.height = height
-    assert target.id != 0
-
-    rl.rl_enable_framebuffer(target.id)
-
-    target.depth.id = rl.rl_load_texture_depth(width, height, False)
-    target.depth.width = width
-    target.depth.height = height
-    target.depth.format = 19
-    target.depth.mipmaps = 1
-
-    rl.rl_framebuffer_attach(
-        target.id,
-        target.depth.id,
-        rl.RL_ATTACHMENT_DEPTH,
-        rl.RL_ATTACHMENT_TEXTURE2D,
-        0,
-    )
-    assert rl.rl_framebuffer_complete(target.id)
-
-    rl.rl_disable_framebuffer()
-    return target
-
-
-def unload_shadow_map(target):
-    if target.id > 0:
-        rl.rl_unload_framebuffer(target.id)
-
-
-def begin_shadow_map(target, shadow_light: ShadowLight):
-
-    rl.begin_texture_mode(target)
-    rl.clear_background(rl.WHITE)
-
-    # update and draw internal render batch
-    rl.rl_draw_render_batch_active()
-
-    # switch to projection matrix:
-    rl.rl_matrix_mode(rl.RL_PROJECTION)
-    # save previous matrix, which contains the settings for the 2d ortho projection
-    rl.rl_push_matrix()
-    # reset current matrix(projection)
-    rl.rl_load_identity()
-
-    rl.rl_ortho(
-        -shadow_light.width / 2,
-        shadow_light.width / 2,
-        -shadow_light.height / 2,
-        shadow_light.height / 2,
-        shadow_light.near,
-        shadow_light.far,
-    )
-
-    rl.rl_matrix_mode(rl.RL_MODELVIEW)
-    rl.rl_load_identity()
-
-    # setup camera view:
-    mat_view = rl.matrix_look_at(
-        shadow_light.position, shadow_light.target, shadow_light.up
-    )
-
-    # multiply model-view matrix by view matrix (camera)
-    mat_view_v = rl.matrix_to_float_v(mat_view)
-    mat_view_v_ptr = ffi.addressof(mat_view_v.v, 0)
-    rl.rl_mult_matrixf(mat_view_v_ptr)
-
-    rl.rl_enable_depth_test()
-
-
-def end_shadow_map():
-    # update and draw internal render batch:
-    rl.rl_draw_render_batch_active()
-
-    # switch to projection matrix
-    rl.rl_matrix_mode(rl.RL_PROJECTION)
-    # restore previous matrix (projection) from matrix stack
-    rl.rl_pop_matrix()
-
-    # switch back to modelview matrix
-    rl.rl_matrix_mode(rl.RL_MODELVIEW)
-    rl.rl_load_identity()
-
-    rl.rl_disable_depth_test()
-    rl.end_texture_mode()
-
-
-def set_shader_value_shader_map(shader: rl.Shader, loc_index: int, target):
-    if loc_index > -1:
-        rl.rl_enable_shader(shader.id)
-
-        slot_ptr = ffi.new("int*")
-        slot_ptr[0] = 10
-
-        rl.rl_active_texture_slot(slot_ptr[0])
-        rl.rl_enable_texture(target.depth.id)
-        rl.rl_set_uniform(loc_index, slot_ptr, rl.SHADER_UNIFORM_INT, 1)
-
-
-def run(use_renderdoc: bool = False):
-
-    # cache renderdoc object
-    rd = None
-    if use_renderdoc:
-        rd = RenderDocInstance.instance().rd
+def read_frame_input(remote_input):
+    # this frame's input as the loop consumes it, and as input_recording.py stores it:
+    # (frame time, Camera.update() deltas, F6 pressed, F12 pressed, click or None)
+    # - ctrl + left drag rotates, ctrl + right drag pans, the wheel zooms, a click
+    #   without ctrl picks; the remote viewport input adds to the camera deltas
+    mouse_delta = rl.get_mouse_delta()
+    control = rl.is_key_down(rl.KEY_LEFT_CONTROL)
+    rotate = control and rl.is_mouse_button_down(0)
+    pan = control and rl.is_mouse_button_down(1)
+    local_deltas = (
+        mouse_delta.x if rotate else 0.0,
+        mouse_delta.y if rotate else 0.0,
+        mouse_delta.x if pan else 0.0,
+        mouse_delta.y if pan else 0.0,
+        rl.get_mouse_wheel_move(),
+    )
+    pick_position = None
+    if rl.is_mouse_button_pressed(0) and not control:
+        mouse_position = rl.get_mouse_position()
+        pick_position = (mouse_position.x, mouse_position.y)
+    return (
+        rl.get_frame_time(),
+        tuple(local + remote for local, remote in zip(local_deltas, remote_input)),
+        rl.is_key_pressed(rl.KEY_F6),
+        rl.is_key_pressed(rl.KEY_F12),
+        pick_position,
+    )
+
+
+def run(
+    capture: str = "none",
+    uncapped: bool = False,
+    telemetry_path: str = None,
+    telemetry_port: int = None,
+    capture_threshold_ms: float = None,
+    screenshot_dir: str = "./screenshots",
+    quality: str = "medium",
+    shadow_filter: str = "hard",
+    vertex_format: str = "float32",
+    alloc_profile: bool = False,
+    num_views: int = 1,
+    idle_elision: bool = True,
+    frame_ring_name: str = None,
+    frame_ring_policy: str = FRAME_RING_POLICY_CHOICES[0],
+    stream_port: int = None,
+    stream_host: str = "127.0.0.1",
+    texture_budget_mb: float = 64.0,
+    num_particles: int = 0,
+    picking: bool = False,
+    record_input_path: str = None,
+    replay_input_path: str = None,
+    replay_pacing: str = REPLAY_PACING_CHOICES[0],
+):
 
     # maximize log levels:
     rl.set_trace_log_level(rl.LOG_TRACE)
@@ -389,655 +155,412 @@ def run(use_renderdoc: bool = False):
     screen_width = 1280
     screen_height = 720
 
-    rl.set_config_flags(rl.FLAG_VSYNC_HINT)
-    rl.init_window(screen_width, screen_height, b"SseEngine")
-    rl.set_target_fps(60)
-
-    # shaders:
-
-    # *** shadow-shader
-    shadow_shader = rl.load_shader(b"./shaders/shadow.vs", b"./shaders/shadow.fs")
-    shadow_shader_light_clip_near_parameter = rl.get_shader_location(
-        shadow_shader, b"LightClipNear"
-    )
-    shadow_shader_light_clip_far_parameter = rl.get_shader_location(
-        shadow_shader, b"LightClipFar"
-    )
-
-    # *** basic-shader
-    basic_shader = rl.load_shader(b"./shaders/basic.vs", b"./shaders/basic.fs")
-    basic_shader_specularity_parameter = rl.get_shader_location(
-        basic_shader, b"Specularity"
-    )
-    basic_shader_glossiness_parameter = rl.get_shader_location(
-        basic_shader, b"Glossiness"
-    )
-    basic_shader_camera_clip_near_parameter = rl.get_shader_location(
-        basic_shader, b"CameraClipNear"
-    )
-    basic_shader_camera_clip_far_parameter = rl.get_shader_location(
-        basic_shader, b"CameraClipFar"
-    )
-
-    # *** lighting-shader
-    lighting_shader = rl.load_shader(b"./shaders/quad.vs", b"./shaders/lighting.fs")
-    lighting_shader_gbuffer_color_parameter = rl.get_shader_location(
-        lighting_shader, b"GBufferColor"
-    )
-    lighting_shader_gbuffer_normal_parameter = rl.get_shader_location(
-        lighting_shader, b"GBufferNormal"
-    )
-    lighting_shader_gbuffer_depth_parameter = rl.get_shader_location(
-        lighting_shader, b"GBufferDepth"
-    )
-    lighting_shader_ssao_parameter = rl.get_shader_location(lighting_shader, b"SSAO")
-    lighting_shader_camera_position_parameter = rl.get_shader_location(
-        lighting_shader, b"CameraPosition"
-    )
-    lighting_shader_camera_inv_view_projection_parameter = rl.get_shader_location(
-        lighting_shader, b"CameraInvViewProjection"
-    )
-    lighting_shader_light_direction_parameter = rl.get_shader_location(
-        lighting_shader, b"LightDirection"
-    )
-    lighting_shader_sun_color_parameter = rl.get_shader_location(
-        lighting_shader, b"SunColor"
-    )
-    lighting_shader_sun_intensity_parameter = rl.get_shader_location(
-        lighting_shader, b"SunIntensity"
-    )
-    lighting_shader_sky_color_parameter = rl.get_shader_location(
-        lighting_shader, b"SkyColor"
-    )
-    lighting_shader_sky_intensity_parameter = rl.get_shader_location(
-        lighting_shader, b"SkyIntensity"
-    )
-    lighting_shader_ground_intensity_parameter = rl.get_shader_location(
-        lighting_shader, b"GroundIntensity"
-    )
-    lighting_shader_ambient_intensity_parameter = rl.get_shader_location(
-        lighting_shader, b"AmbientIntensity"
-    )
-    lighting_shader_exposure_parameter = rl.get_shader_location(
-        lighting_shader, b"Exposure"
-    )
-    lighting_shader_camera_clip_near_parameter = rl.get_shader_location(
-        lighting_shader, b"CameraClipNear"
-    )
-    lighting_shader_camera_clip_far_parameter = rl.get_shader_location(
-        lighting_shader, b"CameraClipFar"
-    )
-
-    # *** ssao shader
-    ssao_shader = rl.load_shader(b"./shaders/quad.vs", b"./shaders/ssao.fs")
-    ssao_shader_gbuffer_depth_parameter = rl.get_shader_location(
-        ssao_shader, b"GBufferDepth"
-    )
-    ssao_shader_gbuffer_normal_parameter = rl.get_shader_location(
-        ssao_shader, b"GBufferNormal"
-    )
-    ssao_shader_camera_view_parameter = rl.get_shader_location(
-        ssao_shader, b"CameraView"
-    )
-    ssao_shader_camera_projection_parameter = rl.get_shader_location(
-        ssao_shader, b"CameraProjection"
-    )
-    ssao_shader_camera_inv_projection_parameter = rl.get_shader_location(
-        ssao_shader, b"CameraInvProjection"
-    )
-    ssao_shader_camera_inv_view_projection_parameter = rl.get_shader_location(
-        ssao_shader, b"CameraInvViewProjection"
-    )
-    ssao_shader_light_view_projection_parameter = rl.get_shader_location(
-        ssao_shader, b"LightViewProjection"
-    )
-    ssao_shader_shadow_map_parameter = rl.get_shader_location(ssao_shader, b"ShadowMap")
-    ssao_shader_shadow_inv_resolution_parameter = rl.get_shader_location(
-        ssao_shader, b"ShadowInvResolution"
-    )
-    ssao_shader_camera_clip_near_parameter = rl.get_shader_location(
-        ssao_shader, b"CameraClipNear"
-    )
-    ssao_shader_camera_clip_far_parameter = rl.get_shader_location(
-        ssao_shader, b"CameraClipFar"
-    )
-    ssao_shader_light_clip_near_parameter = rl.get_shader_location(
-        ssao_shader, b"LightClipNear"
-    )
-    ssao_shader_light_clip_far_parameter = rl.get_shader_location(
-        ssao_shader, b"LightClipFar"
-    )
-    ssao_shader_light_direction_parameter = rl.get_shader_location(
-        ssao_shader, b"LightDirection"
-    )
-
-    # *** blur shader
-    blur_shader = rl.load_shader(b"./shaders/quad.vs", b"./shaders/blur.fs")
-    blur_shader_gbuffer_normal_parameter = rl.get_shader_location(
-        blur_shader, b"GBufferNormal"
-    )
-    blur_shader_gbuffer_depth_parameter = rl.get_shader_location(
-        blur_shader, b"GBufferDepth"
-    )
-    blur_shader_input_texture_parameter = rl.get_shader_location(
-        blur_shader, b"InputTexture"
-    )
-    blur_shader_camera_inv_projection_parameter = rl.get_shader_location(
-        blur_shader, b"CameraInvProjection"
-    )
-    blur_shader_camera_clip_near_parameter = rl.get_shader_location(
-        blur_shader, b"CameraClipNear"
-    )
-    blur_shader_camera_clip_far_parameter = rl.get_shader_location(
-        blur_shader, b"CameraClipFar"
-    )
-    blur_shader_inv_texture_resolution_parameter = rl.get_shader_location(
-        blur_shader, b"InvTextureResolution"
-    )
-    blur_shader_blur_direction_parameter = rl.get_shader_location(
-        blur_shader, b"BlurDirection"
-    )
-
-    # *** fxaa shader
-    fxaa_shader = rl.load_shader(b"./shaders/quad.vs", b"./shaders/fxaa.fs")
-    fxaa_shader_input_texture_parameter = rl.get_shader_location(
-        fxaa_shader, b"InputTexture"
-    )
-    fxaa_shader_inv_texture_resolution_parameter = rl.get_shader_location(
-        fxaa_shader, b"InvTextureResolution"
-    )
+    # input replay: recorded input instead of raylib's, paced by the replay itself
+    input_replay = None
+    if replay_input_path is not None:
+        from input_recording import InputReplay
+
+        input_replay = InputReplay(replay_input_path, replay_pacing)
+        uncapped = True
+
+    # uncapped: no vsync and no frame limiter, to measure the real frame cost
+    if not uncapped:
+        rl.set_config_flags(rl.FLAG_VSYNC_HINT)
+    with startup_profiler.section("window"):
+        rl.init_window(screen_width, screen_height, b"SseEngine")
+    rl.set_target_fps(0 if uncapped else 60)
+
+    # telemetry:
+    telemetry = FrameTelemetry(window=1000, hitch_threshold_ms=1000.0 / 30.0)
+    if telemetry_path is not None:
+        telemetry.add_sink(CsvTelemetrySink(telemetry_path))
+    if telemetry_port is not None:
+        telemetry.add_sink(UdpTelemetrySink(port=telemetry_port))
+
+    # capture backend: renderdoc, built-in frame dump or none (never imported)
+    capture_backend = load_capture_backend(capture)
+    if capture_threshold_ms is not None:
+        # the spike itself is gone, capture the following frame
+        telemetry.add_slow_frame_callback(
+            SlowFrameCapture(capture_backend), capture_threshold_ms
+        )
+    telemetry_stats = telemetry.stats()
+
+    # async readback: F12 exports color/depth/ssao a few frames later without stalling
+    readback = AsyncReadback(ring_size=3)
+    for readback_name, readback_extension in (
+        ("color", ".png"),
+        ("depth", ".npy"),
+        ("ssao", ".png"),
+    ):
+        readback.add_callback(
+            readback_name,
+            lambda frame, extension=readback_extension: export_readback_frame(
+                frame,
+                os.path.join(
+                    screenshot_dir, f"{frame.frame_index:06d}_{frame.name}{extension}"
+                ),
+            ),
+        )
 
-    # lights:
-    light_direction = rl.vector3_normalize(rl.Vector3(0.35, -1.0, -0.35))
-
-    # objects:
-    ground_mesh = rl.gen_mesh_plane(20.0, 20.0, 10, 10)
-    ground_model = rl.load_model_from_mesh(ground_mesh)
-    ground_position = rl.Vector3(0.0, -0.01, 0.0)
-
-    sphere_mesh = rl.gen_mesh_sphere(0.5, 32, 32)
-    sphere_model = rl.load_model_from_mesh(sphere_mesh)
-    sphere_position = rl.Vector3(0.0, 0.5, 0.0)
-
-    # camera:
-    camera = Camera()
-    rl.rl_set_clip_planes(0.01, 50.0)
-
-    # shadows:
-    shadow_light = ShadowLight()
-    shadow_light.target = rl.vector3_zero()
-    shadow_light.position = rl.vector3_scale(light_direction, -5.0)
-    shadow_light.up = rl.Vector3(0.0, 1.0, 0.0)
-    shadow_light.width = 5.0
-    shadow_light.height = 5.0
-    shadow_light.near = 0.01
-    shadow_light.far = 10.0
-
-    shadow_width = 1024
-    shadow_height = 1024
-    shadow_inv_resolution = rl.Vector2(1.0 / shadow_width, 1.0 / shadow_height)
-    shadow_map = load_shadow_map(shadow_width, shadow_height)
-
-    # gbuffer and render textures:
-    gbuffer = load_gbuffer(screen_width, screen_height)
-    lighted = rl.load_render_texture(screen_width, screen_height)
-    ssao_front = rl.load_render_texture(screen_width, screen_height)
-    ssao_back = rl.load_render_texture(screen_width, screen_height)
+    # renderer: shaders, scene and render targets
+    renderer = Renderer(
+        screen_width,
+        screen_height,
+        quality,
+        shadow_filter,
+        vertex_format,
+        num_views=num_views,
+        texture_budget=int(texture_budget_mb * 2**20),
+        max_particles=num_particles,
+        object_ids=picking,
+    )
+    if num_particles > 0:
+        add_fountain_emitter(renderer.particles, num_particles, (1.5, 0.0, 1.0))
+
+    # frame ring: every rendered frame's color and depth in shared memory, written from
+    # readbacks so neither the render loop nor a slow consumer waits on the other
+    frame_ring = None
+    if frame_ring_name is not None:
+        from frame_ring import FRAME_RING_PARTS, FrameRingPublisher
+
+        frame_ring = FrameRingPublisher(
+            frame_ring_name,
+            screen_width,
+            screen_height,
+            renderer.main_view.width,
+            renderer.main_view.height,
+            policy=frame_ring_policy,
+        )
+        for ring_part in FRAME_RING_PARTS:
+            readback.add_callback(
+                f"ring_{ring_part}",
+                lambda frame, part=ring_part: frame_ring.write(
+                    frame.frame_index, part, frame.array, frame.user_data
+                ),
+            )
+
+    # remote viewport: scene frames streamed as tile deltas, camera input comes back
+    # - clients are not authenticated and drive the cameras, only listen beyond
+    #   localhost on a trusted network
+    stream_server = None
+    if stream_port is not None:
+        from viewport_stream import ViewportStreamServer
+
+        stream_server = ViewportStreamServer(host=stream_host, port=stream_port).start()
+        readback.add_callback(
+            "stream_color",
+            lambda frame: stream_server.submit(frame.frame_index, frame.copy()),
+        )
+
+    # picking: left click reads the object id under the cursor a frame later
+    picker = None
+    picked_label = "Pick: -"
+    if picking:
+        from picking import ObjectPicker, find_view
+
+        picker = ObjectPicker(readback)
+
+    # allocation profiling: tracemalloc + gc callbacks, report printed at exit
+    alloc_profiler = None
+    if alloc_profile:
+        from alloc_profiler import AllocationProfiler
+
+        alloc_profiler = AllocationProfiler()
+        alloc_profiler.start()
+        renderer.alloc_profiler = alloc_profiler
+
+    # idle-frame elision: cached scene and ui layers, see frame_cache.py
+    frame_cache = FrameCache(screen_width, screen_height)
+
+    # cameras: one per view, spread around the target, driven by the same input
+    cameras = [Camera() for _ in range(num_views)]
+    for index, camera in enumerate(cameras):
+        camera.azimuth = 2.0 * math.pi * index / num_views
+
+    # input recording: every frame's input, replayable with --replay-input
+    input_recorder = None
+    if record_input_path is not None:
+        from input_recording import InputRecorder
+
+        input_recorder = InputRecorder(
+            record_input_path, screen_width, screen_height, num_views
+        )
+    if input_replay is not None:
+        input_replay.check_session(screen_width, screen_height, num_views)
+    # simulation clock, the sum of the frame times: identical when replayed
+    session_time = 0.0
 
     while not rl.window_should_close():
 
-        # update camera:
-        camera.update(
-            rl.Vector3(0.0, 0.0, 0.0),
-            (
-                rl.get_mouse_delta().x
-                if rl.is_key_down(rl.KEY_LEFT_CONTROL) and rl.is_mouse_button_down(0)
-                else 0.0
-            ),
-            (
-                rl.get_mouse_delta().y
-                if rl.is_key_down(rl.KEY_LEFT_CONTROL) and rl.is_mouse_button_down(0)
-                else 0.0
-            ),
-            (
-                rl.get_mouse_delta().x
-                if rl.is_key_down(rl.KEY_LEFT_CONTROL) and rl.is_mouse_button_down(1)
-                else 0.0
-            ),
-            (
-                rl.get_mouse_delta().y
-                if rl.is_key_down(rl.KEY_LEFT_CONTROL) and rl.is_mouse_button_down(1)
-                else 0.0
-            ),
-            rl.get_mouse_wheel_move(),
-            rl.get_frame_time(),
-        )
-
-        if use_renderdoc:
-            begin_renderdoc()
+        # input: live (remote viewport input adds to the local one) or replayed
+        if input_replay is not None:
+            frame_input = input_replay.next()
+            if frame_input is None:
+                break
+        else:
+            frame_input = read_frame_input(
+                stream_server.poll_input()
+                if stream_server is not None
+                else (0.0, 0.0, 0.0, 0.0, 0.0)
+            )
+        if input_recorder is not None:
+            input_recorder.write(frame_input)
+        (
+            frame_time,
+            camera_deltas,
+            quality_pressed,
+            screenshot_requested,
+            pick_position,
+        ) = frame_input
+        session_time += frame_time
+
+        telemetry.begin_frame()
+        if alloc_profiler is not None:
+            alloc_profiler.begin_frame()
+
+        # F6: cycle shader quality tiers (low -> medium -> high)
+        if quality_pressed:
+            quality_tiers = tuple(SHADER_QUALITY_TIERS)
+            renderer.set_quality(
+                quality_tiers[
+                    (quality_tiers.index(renderer.quality) + 1) % len(quality_tiers)
+                ]
+            )
+
+        # update cameras:
+        for camera in cameras:
+            camera.update(rl.Vector3(0.0, 0.0, 0.0), *camera_deltas, frame_time)
+
+        if picker is not None and pick_position is not None:
+            mouse_x, mouse_y = pick_position
+            pick_view = find_view(renderer.views, mouse_x, mouse_y)
+            if pick_view is not None:
+                picker.request(pick_view, mouse_x, mouse_y, telemetry.frame_index)
 
         # render(begin):
-        rl.rl_disable_color_blend()
         rl.begin_drawing()
 
-        # render shadow maps:
-        begin_shadow_map(shadow_map, shadow_light)
-
-        light_view_projection = rl.matrix_multiply(
-            rl.rl_get_matrix_modelview(), rl.rl_get_matrix_projection()
-        )
-        light_clip_near = rl.rl_get_cull_distance_near()
-        light_clip_far = rl.rl_get_cull_distance_far()
-        light_clip_near_ptr = ffi.new("float*")
-        light_clip_near_ptr[0] = light_clip_near
-        light_clip_far_ptr = ffi.new("float*")
-        light_clip_far_ptr[0] = light_clip_far
-
-        rl.set_shader_value(
-            shadow_shader,
-            shadow_shader_light_clip_near_parameter,
-            light_clip_near_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            shadow_shader,
-            shadow_shader_light_clip_far_parameter,
-            light_clip_far_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-
-        ground_model.materials[0].shader = shadow_shader
-        rl.draw_model(ground_model, ground_position, 1.0, rl.WHITE)
-
-        sphere_model.materials[0].shader = shadow_shader
-        rl.draw_model(sphere_model, sphere_position, 1.0, rl.WHITE)
-
-        end_shadow_map()
+        capture_backend.begin_frame()
+
+        # scene: re-rendered only when the cameras, lights or scene objects changed,
+        # otherwise the previous frame's fxaa output is presented again
+        scene_key = (
+            tuple(camera_state(camera.camera3d) for camera in cameras),
+            renderer.scene_state(),
+        )
+        if frame_cache.scene.needs_update(scene_key if idle_elision else None):
+            renderer.render_views(
+                [camera.camera3d for camera in cameras], frame_time, session_time
+            )
+
+            frame_cache.begin_layer(frame_cache.scene)
+            for view in renderer.views:
+                renderer.render_final(view)
+            frame_cache.end_layer()
+
+            if frame_ring is not None:
+                readback.request(
+                    "ring_color",
+                    frame_cache.scene.target.id,
+                    0,
+                    screen_width,
+                    screen_height,
+                    READBACK_RGBA8,
+                    telemetry.frame_index,
+                )
+                readback.request(
+                    "ring_depth",
+                    renderer.gbuffer.id,
+                    READBACK_ATTACHMENT_DEPTH,
+                    renderer.main_view.width,
+                    renderer.main_view.height,
+                    READBACK_DEPTH32F,
+                    telemetry.frame_index,
+                    user_data=(renderer.camera_clip_near, renderer.camera_clip_far),
+                )
+
+            if stream_server is not None and stream_server.num_clients > 0:
+                readback.request(
+                    "stream_color",
+                    frame_cache.scene.target.id,
+                    0,
+                    screen_width,
+                    screen_height,
+                    READBACK_RGBA8,
+                    telemetry.frame_index,
+                )
+        else:
+            # nothing was drawn this frame
+            renderer.render_queue.begin_frame()
+
+        if screenshot_requested:
+            readback.request(
+                "depth",
+                renderer.gbuffer.id,
+                READBACK_ATTACHMENT_DEPTH,
+                renderer.main_view.width,
+                renderer.main_view.height,
+                READBACK_DEPTH32F,
+                telemetry.frame_index,
+            )
+            readback.request(
+                "ssao",
+                renderer.ssao_front.id,
+                0,
+                renderer.main_view.width,
+                renderer.main_view.height,
+                READBACK_RGBA8,
+                telemetry.frame_index,
+            )
+
+        frame_cache.present_scene()
+
+        # final color without the UI
+        if screenshot_requested:
+            readback.request(
+                "color",
+                0,
+                0,
+                screen_width,
+                screen_height,
+                READBACK_RGBA8,
+                telemetry.frame_index,
+            )
+
+        # UI: redrawn into its layer only when a label changed
+        renderer.begin_pass("ui")
+        render_queue_stats = renderer.render_queue.end_frame()
+        vram_label = f"VRAM: {gpu_resources.live_bytes() / 2**20:.1f}MiB"
+        texture_stats = renderer.texture_streamer.stats
+        texture_label = (
+            f"Textures: {texture_stats.resident_bytes / 2**20:.1f}"
+            f"/{texture_stats.budget_bytes / 2**20:.0f}MiB"
+        )
+        # refresh percentiles twice a second
+        if telemetry.frame_index % 30 == 0:
+            telemetry_stats = telemetry.stats()
+        ui_key = (
+            renderer.quality,
+            vram_label,
+            texture_label,
+            render_queue_stats.draw_calls,
+            render_queue_stats.shader_binds,
+            render_queue_stats.texture_binds,
+            render_queue_stats.vao_binds,
+            id(telemetry_stats),
+            picked_label,
+        )
+        if frame_cache.ui.needs_update(ui_key if idle_elision else None):
+            frame_cache.begin_layer(frame_cache.ui)
+            rl.rl_enable_color_blend()
+            rl.gui_group_box(rl.Rectangle(20, 10, 190, 180), b"Camera")
+            rl.gui_label(rl.Rectangle(30, 20, 150, 20), b"Ctrl + Left Click - Rotate")
+            rl.gui_label(rl.Rectangle(30, 40, 150, 20), b"Ctrl + Right Click - Pan")
+            rl.gui_label(rl.Rectangle(30, 60, 150, 20), b"Mouse Scroll - Zoom")
+            rl.gui_label(
+                rl.Rectangle(30, 80, 150, 20),
+                f"F6 - Quality: {renderer.quality}".encode(),
+            )
+            rl.gui_label(rl.Rectangle(30, 100, 150, 20), vram_label.encode())
+            rl.gui_label(rl.Rectangle(30, 120, 150, 20), texture_label.encode())
+            if picker is not None:
+                rl.gui_label(rl.Rectangle(30, 140, 170, 20), picked_label.encode())
+
+            rl.gui_group_box(rl.Rectangle(20, 200, 190, 100), b"Render Queue")
+            rl.gui_label(
+                rl.Rectangle(30, 210, 170, 20),
+                f"Draws: {render_queue_stats.draw_calls}".encode(),
+            )
+            rl.gui_label(
+                rl.Rectangle(30, 230, 170, 20),
+                f"Shader Binds: {render_queue_stats.shader_binds}".encode(),
+            )
+            rl.gui_label(
+                rl.Rectangle(30, 250, 170, 20),
+                f"Texture Binds: {render_queue_stats.texture_binds}".encode(),
+            )
+            rl.gui_label(
+                rl.Rectangle(30, 270, 170, 20),
+                f"VAO Binds: {render_queue_stats.vao_binds}".encode(),
+            )
+
+            rl.gui_group_box(rl.Rectangle(20, 320, 190, 80), b"Telemetry (ms)")
+            for row, metric in enumerate(TELEMETRY_METRICS):
+                percentiles = telemetry_stats.percentiles.get(metric)
+                if percentiles is None:
+                    continue
+                rl.gui_label(
+                    rl.Rectangle(30, 330 + row * 20, 170, 20),
+                    f"{metric}: {percentiles['p50']:.1f} / {percentiles['p95']:.1f} / {percentiles['p99']:.1f}".encode(),
+                )
+            frame_cache.end_layer()
+        frame_cache.present_ui()
+
+        telemetry.end_frame()
+
+        capture_backend.end_frame()
 
-        # render to gbuffer:
-        begin_gbuffer(gbuffer, camera.camera3d)
-
-        camera_view = rl.rl_get_matrix_modelview()
-        camera_projection = rl.rl_get_matrix_projection()
-        camera_inv_projection = rl.matrix_invert(camera_projection)
-        camera_inv_view_projection = rl.matrix_invert(
-            rl.matrix_multiply(camera_view, camera_projection)
-        )
-        camera_clip_near = rl.rl_get_cull_distance_near()
-        camera_clip_far = rl.rl_get_cull_distance_far()
-        camera_clip_near_ptr = ffi.new("float*", camera_clip_near)
-        camera_clip_far_ptr = ffi.new("float*", camera_clip_far)
-        specularity_ptr = ffi.new("float*", 0.5)
-        glossiness_ptr = ffi.new("float*", 10.0)
-
-        rl.set_shader_value(
-            basic_shader,
-            basic_shader_specularity_parameter,
-            specularity_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            basic_shader,
-            basic_shader_glossiness_parameter,
-            glossiness_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            basic_shader,
-            basic_shader_camera_clip_near_parameter,
-            camera_clip_near_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            basic_shader,
-            basic_shader_camera_clip_far_parameter,
-            camera_clip_far_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-
-        # draw ground model:
-        ground_model.materials[0].shader = basic_shader
-        rl.draw_model(ground_model, ground_position, 1.0, rl.Color(190, 190, 190, 255))
-
-        sphere_model.materials[0].shader = basic_shader
-        rl.draw_model(sphere_model, sphere_position, 1.0, rl.ORANGE)
-
-        # end drawing to gbuffer
-        end_gbuffer(screen_width, screen_height)
-
-        # render ssao and shadows:
-        rl.begin_texture_mode(ssao_front)
-
-        rl.begin_shader_mode(ssao_shader)
-
-        rl.set_shader_value_texture(
-            ssao_shader, ssao_shader_gbuffer_normal_parameter, gbuffer.normal
-        )
-        rl.set_shader_value_texture(
-            ssao_shader, ssao_shader_gbuffer_depth_parameter, gbuffer.depth
-        )
-        rl.set_shader_value_matrix(
-            ssao_shader, ssao_shader_camera_view_parameter, camera_view
-        )
-        rl.set_shader_value_matrix(
-            ssao_shader, ssao_shader_camera_projection_parameter, camera_projection
-        )
-        rl.set_shader_value_matrix(
-            ssao_shader,
-            ssao_shader_camera_inv_projection_parameter,
-            camera_inv_projection,
-        )
-        rl.set_shader_value_matrix(
-            ssao_shader,
-            ssao_shader_camera_inv_view_projection_parameter,
-            camera_inv_view_projection,
-        )
-        rl.set_shader_value_matrix(
-            ssao_shader,
-            ssao_shader_light_view_projection_parameter,
-            light_view_projection,
-        )
-        set_shader_value_shader_map(
-            ssao_shader, ssao_shader_shadow_map_parameter, shadow_map
-        )
-
-        rl.set_shader_value(
-            ssao_shader,
-            ssao_shader_shadow_inv_resolution_parameter,
-            ffi.addressof(shadow_inv_resolution),
-            rl.SHADER_UNIFORM_VEC2,
-        )
-        rl.set_shader_value(
-            ssao_shader,
-            ssao_shader_camera_clip_near_parameter,
-            camera_clip_near_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            ssao_shader,
-            ssao_shader_camera_clip_far_parameter,
-            camera_clip_far_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            ssao_shader,
-            ssao_shader_light_clip_near_parameter,
-            light_clip_near_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            ssao_shader,
-            ssao_shader_light_clip_far_parameter,
-            light_clip_far_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            ssao_shader,
-            ssao_shader_light_direction_parameter,
-            ffi.addressof(light_direction),
-            rl.SHADER_UNIFORM_VEC3,
-        )
-
-        rl.clear_background(rl.WHITE)
-
-        rl.draw_texture_rec(
-            ssao_front.texture,
-            rl.Rectangle(0, 0, ssao_front.texture.width, -ssao_front.texture.height),
-            rl.Vector2(0, 0),
-            rl.WHITE,
-        )
+        # render(end):
+        rl.end_drawing()
 
-        rl.end_shader_mode()
+        # time-to-first-frame breakdown, printed once
+        startup_profiler.first_frame()
 
-        rl.end_texture_mode()
+        telemetry.present()
 
-        # blur-horizontal
-        rl.begin_texture_mode(ssao_back)
-        rl.begin_shader_mode(blur_shader)
+        # deliver finished readbacks
+        readback.poll()
+        if picker is not None:
+            for pick in picker.poll():
+                picked_label = (
+                    f"Pick: {pick.name} ({pick.distance:.2f})"
+                    if pick.hit
+                    else "Pick: none"
+                )
 
-        blur_direction = rl.Vector2(1.0, 0.0)
-        blur_inv_texture_resolution = rl.Vector2(
-            1.0 / ssao_front.texture.width, 1.0 / ssao_front.texture.height
-        )
+        if alloc_profiler is not None:
+            alloc_profiler.end_frame()
 
-        rl.set_shader_value_texture(
-            blur_shader, blur_shader_gbuffer_normal_parameter, gbuffer.normal
-        )
-        rl.set_shader_value_texture(
-            blur_shader, blur_shader_gbuffer_depth_parameter, gbuffer.depth
-        )
-        rl.set_shader_value_texture(
-            blur_shader, blur_shader_input_texture_parameter, ssao_front.texture
-        )
-        rl.set_shader_value_matrix(
-            blur_shader,
-            blur_shader_camera_inv_projection_parameter,
-            camera_inv_projection,
-        )
-        rl.set_shader_value(
-            blur_shader,
-            blur_shader_camera_clip_near_parameter,
-            camera_clip_near_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            blur_shader,
-            blur_shader_camera_clip_far_parameter,
-            camera_clip_far_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            blur_shader,
-            blur_shader_inv_texture_resolution_parameter,
-            ffi.addressof(blur_inv_texture_resolution),
-            rl.SHADER_UNIFORM_VEC2,
-        )
-        rl.set_shader_value(
-            blur_shader,
-            blur_shader_blur_direction_parameter,
-            ffi.addressof(blur_direction),
-            rl.SHADER_UNIFORM_VEC2,
-        )
+    if input_recorder is not None:
+        input_recorder.close()
+    if input_replay is not None:
+        input_replay.report()
 
-        rl.draw_texture_rec(
-            ssao_back.texture,
-            rl.Rectangle(0, 0, ssao_back.texture.width, -ssao_back.texture.height),
-            rl.Vector2(0, 0),
-            rl.WHITE,
+    # flush and close telemetry
+    telemetry.close()
+    telemetry_stats = telemetry.stats()
+    print(f"frames: {telemetry_stats.num_frames}, hitches: {telemetry_stats.hitches}")
+    for metric, percentiles in telemetry_stats.percentiles.items():
+        print(
+            f"{metric}: p50 {percentiles['p50']:.2f}ms, p95 {percentiles['p95']:.2f}ms, p99 {percentiles['p99']:.2f}ms"
         )
 
-        rl.end_shader_mode()
-        rl.end_texture_mode()
-
-        # blur vertical:
-        rl.begin_texture_mode(ssao_front)
-        rl.begin_shader_mode(blur_shader)
+    if alloc_profiler is not None:
+        alloc_profiler.stop()
+        alloc_profiler.report()
 
-        blur_direction = rl.Vector2(0.0, 1.0)
-
-        rl.set_shader_value_texture(
-            blur_shader, blur_shader_input_texture_parameter, ssao_back.texture
-        )
-        rl.set_shader_value(
-            blur_shader,
-            blur_shader_blur_direction_parameter,
-            ffi.addressof(blur_direction),
-            rl.SHADER_UNIFORM_VEC2,
-        )
+    if stream_server is not None:
+        stream_server.report()
+        stream_server.stop()
 
-        rl.draw_texture_rec(
-            ssao_front.texture,
-            rl.Rectangle(0, 0, ssao_front.texture.width, -ssao_front.texture.height),
-            rl.Vector2(0, 0),
-            rl.WHITE,
+    # unload readback buffers
+    readback.unload()
+    if frame_ring is not None:
+        print(
+            f"frame ring: {frame_ring.published} published, {frame_ring.dropped} dropped"
         )
+        frame_ring.close()
+    capture_backend.unload()
 
-        rl.end_shader_mode()
-        rl.end_texture_mode()
+    # unload renderer: shaders, scene and render targets
+    gpu_resources.report()
+    renderer.texture_streamer.report()
+    frame_cache.unload()
+    renderer.unload()
 
-        # light gbuffer:
-        rl.begin_texture_mode(lighted)
-
-        rl.begin_shader_mode(lighting_shader)
-
-        sun_color = rl.Vector3(253.0 / 255.0, 255.0 / 255.0, 232.0 / 255.0)
-        sun_intensity_ptr = ffi.new("float*", 0.25)
-        sky_color = rl.Vector3(174.0 / 255.0, 183.0 / 255.0, 190.0 / 255.0)
-        sky_intensity_ptr = ffi.new("float*", 0.15)
-        ground_intensity_ptr = ffi.new("float*", 0.1)
-        ambient_intensity_ptr = ffi.new("float*", 1.0)
-        exposure_ptr = ffi.new("float*", 0.9)
-
-        rl.set_shader_value_texture(
-            lighting_shader, lighting_shader_gbuffer_color_parameter, gbuffer.color
-        )
-        rl.set_shader_value_texture(
-            lighting_shader, lighting_shader_gbuffer_normal_parameter, gbuffer.normal
-        )
-        rl.set_shader_value_texture(
-            lighting_shader, lighting_shader_gbuffer_depth_parameter, gbuffer.depth
-        )
-        rl.set_shader_value_texture(
-            lighting_shader, lighting_shader_ssao_parameter, ssao_front.texture
-        )
-        rl.set_shader_value(
-            lighting_shader,
-            lighting_shader_camera_position_parameter,
-            ffi.addressof(camera.camera3d.position),
-            rl.SHADER_UNIFORM_VEC3,
-        )
-        rl.set_shader_value_matrix(
-            lighting_shader,
-            lighting_shader_camera_inv_view_projection_parameter,
-            camera_inv_projection,
-        )
-        rl.set_shader_value(
-            lighting_shader,
-            lighting_shader_light_direction_parameter,
-            ffi.addressof(light_direction),
-            rl.SHADER_UNIFORM_VEC3,
-        )
-        rl.set_shader_value(
-            lighting_shader,
-            lighting_shader_sun_color_parameter,
-            ffi.addressof(sun_color),
-            rl.SHADER_UNIFORM_VEC3,
-        )
-        rl.set_shader_value(
-            lighting_shader,
-            lighting_shader_sun_intensity_parameter,
-            sun_intensity_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            lighting_shader,
-            lighting_shader_sky_color_parameter,
-            ffi.addressof(sky_color),
-            rl.SHADER_UNIFORM_VEC3,
-        )
-        rl.set_shader_value(
-            lighting_shader,
-            lighting_shader_sky_intensity_parameter,
-            sky_intensity_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            lighting_shader,
-            lighting_shader_ground_intensity_parameter,
-            ground_intensity_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            lighting_shader,
-            lighting_shader_ambient_intensity_parameter,
-            ambient_intensity_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            lighting_shader,
-            lighting_shader_exposure_parameter,
-            exposure_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            lighting_shader,
-            lighting_shader_camera_clip_near_parameter,
-            camera_clip_near_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-        rl.set_shader_value(
-            lighting_shader,
-            lighting_shader_camera_clip_far_parameter,
-            camera_clip_far_ptr,
-            rl.SHADER_UNIFORM_FLOAT,
-        )
-
-        rl.clear_background(rl.RAYWHITE)
-
-        rl.draw_texture_rec(
-            gbuffer.color,
-            rl.Rectangle(0, 0, gbuffer.color.width, -gbuffer.color.height),
-            rl.Vector2(0, 0),
-            rl.WHITE,
-        )
-
-        rl.end_shader_mode()
-
-        rl.end_texture_mode()
-
-        # render final with fxaa:
-        rl.begin_shader_mode(fxaa_shader)
-
-        fxaa_inv_texture_resolution = rl.Vector2(
-            1.0 / lighted.texture.width, 1.0 / lighted.texture.height
-        )
-
-        rl.set_shader_value_texture(
-            fxaa_shader, fxaa_shader_input_texture_parameter, lighted.texture
-        )
-        rl.set_shader_value(
-            fxaa_shader,
-            fxaa_shader_inv_texture_resolution_parameter,
-            ffi.addressof(fxaa_inv_texture_resolution),
-            rl.SHADER_UNIFORM_VEC2,
-        )
-
-        rl.draw_texture_rec(
-            lighted.texture,
-            rl.Rectangle(0, 0, lighted.texture.width, -lighted.texture.height),
-            rl.Vector2(0, 0),
-            rl.WHITE,
-        )
-
-        rl.end_shader_mode()
-
-        # UI:
-        rl.rl_enable_color_blend()
-        rl.gui_group_box(rl.Rectangle(20, 10, 190, 180), b"Camera")
-        rl.gui_label(rl.Rectangle(30, 20, 150, 20), b"Ctrl + Left Click - Rotate")
-        rl.gui_label(rl.Rectangle(30, 40, 150, 20), b"Ctrl + Right Click - Pan")
-        rl.gui_label(rl.Rectangle(30, 60, 150, 20), b"Mouse Scroll - Zoom")
-
-        # render(end):
-        rl.end_drawing()
-
-        if use_renderdoc:
-            end_renderdoc()
-
-    # unload gbuffer and render textures:
-    rl.unload_render_texture(lighted)
-    unload_gbuffer(gbuffer)
-
-    # unload shadow map
-    unload_shadow_map(shadow_map)
-
-    # unload models
-    rl.unload_model(ground_model)
-
-    # unload shader
-    rl.unload_shader(shadow_shader)
-    rl.unload_shader(basic_shader)
-    rl.unload_shader(lighting_shader)
+    # everything is unloaded by now, anything left is a leak
+    gpu_resources.check_leaks()
 
     rl.close_window()
 
@@ -1062,6 +585,115 @@ def render_doc_test():
 
 
 if __name__ == "__main__":
-    use_renderdoc: bool = True
-    run(use_renderdoc)
+    parser = argparse.ArgumentParser(description="SseEngine")
+    parser.add_argument("--capture", choices=tuple(CAPTURE_BACKENDS), default="none")
+    parser.add_argument(
+        "--capture-threshold-ms",
+        type=float,
+        default=None,
+        help="capture the frame after a cpu frame slower than this",
+    )
+    parser.add_argument("--uncapped", action="store_true")
+    parser.add_argument(
+        "--quality", choices=tuple(SHADER_QUALITY_TIERS), default="medium"
+    )
+    parser.add_argument("--shadow-filter", choices=SHADOW_FILTERS, default="hard")
+    parser.add_argument("--vertex-format", choices=VERTEX_FORMATS, default="float32")
+    parser.add_argument("--telemetry-path", default=None)
+    parser.add_argument("--telemetry-port", type=int, default=None)
+    parser.add_argument(
+        "--alloc-profile",
+        action="store_true",
+        help="count python allocations per frame and pass, report at exit",
+    )
+    parser.add_argument(
+        "--views",
+        type=int,
+        default=1,
+        help="cameras rendered per frame, tiled over the window",
+    )
+    parser.add_argument(
+        "--no-idle-elision",
+        action="store_true",
+        help="render every frame, even when nothing changed (profiling, captures)",
+    )
+    parser.add_argument(
+        "--frame-ring",
+        default=None,
+        help="publish color/depth of every rendered frame to this shared-memory ring",
+    )
+    parser.add_argument(
+        "--frame-ring-policy",
+        choices=FRAME_RING_POLICY_CHOICES,
+        default=FRAME_RING_POLICY_CHOICES[0],
+    )
+    parser.add_argument(
+        "--stream-port",
+        type=int,
+        default=None,
+        help="stream the viewport to clients on this port (viewport_stream.py --connect)",
+    )
+    parser.add_argument(
+        "--stream-host",
+        default="127.0.0.1",
+        help="interface the viewport stream listens on, 0.0.0.0 for remote clients",
+    )
+    parser.add_argument(
+        "--texture-budget-mb",
+        type=float,
+        default=64.0,
+        help="vram budget of streamed texture mips",
+    )
+    parser.add_argument(
+        "--particles",
+        type=int,
+        default=0,
+        help="gpu-simulated particles in a fountain next to the sphere",
+    )
+    parser.add_argument(
+        "--picking",
+        action="store_true",
+        help="object id gbuffer attachment, left click picks the object under the cursor",
+    )
+    parser.add_argument(
+        "--record-input",
+        default=None,
+        help="record every frame's input and frame time to this file",
+    )
+    parser.add_argument(
+        "--replay-input",
+        default=None,
+        help="drive the session from a recording made with --record-input, exit at its end",
+    )
+    parser.add_argument(
+        "--replay-pacing",
+        choices=REPLAY_PACING_CHOICES,
+        default=REPLAY_PACING_CHOICES[0],
+        help="uncapped: as fast as possible, paced: at the recorded frame times",
+    )
+    args = parser.parse_args()
+
+    run(
+        args.capture,
+        args.uncapped,
+        args.telemetry_path,
+        args.telemetry_port,
+        args.capture_threshold_ms,
+        quality=args.quality,
+        shadow_filter=args.shadow_filter,
+        vertex_format=args.vertex_format,
+        alloc_profile=args.alloc_profile,
+        num_views=args.views,
+        idle_elision=not args.no_idle_elision,
+        frame_ring_name=args.frame_ring,
+        frame_ring_policy=args.frame_ring_policy,
+        stream_port=args.stream_port,
+        stream_host=args.stream_host,
+        texture_budget_mb=args.texture_budget_mb,
+        num_particles=args.particles,
+        picking=args.picking,
+        record_input_path=args.record_input,
+        replay_input_path=args.replay_input,
+        replay_pacing=args.replay_pacing,
+    )
     # render_doc_test()
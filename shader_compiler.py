@@ -0,0 +1,191 @@
+# shader programs compiled through raw GL, so every compile is submitted before the
+# first status query: drivers with KHR_parallel_shader_compile build them on worker
+# threads while the cpu does other startup work (mesh generation, lod chains, ...)
+
+import pyray as rl
+import raylib as nrl
+
+from gl import *
+
+# attribute bindings done by raylib before linking (vertex arrays rely on them)
+SHADER_ATTRIBUTES = (
+    ("POSITION", "VERTEX_POSITION"),
+    ("TEXCOORD", "VERTEX_TEXCOORD01"),
+    ("TEXCOORD2", "VERTEX_TEXCOORD02"),
+    ("NORMAL", "VERTEX_NORMAL"),
+    ("TANGENT", "VERTEX_TANGENT"),
+    ("COLOR", "VERTEX_COLOR"),
+    ("BONEINDICES", "VERTEX_BONEIDS"),
+    ("BONEWEIGHTS", "VERTEX_BONEWEIGHTS"),
+    ("INSTANCETRANSFORM", "VERTEX_INSTANCETRANSFORM"),
+)
+
+# default uniform locations filled by raylib's LoadShader()
+SHADER_UNIFORMS = (
+    ("UNIFORM_NAME_MVP", "MATRIX_MVP"),
+    ("UNIFORM_NAME_VIEW", "MATRIX_VIEW"),
+    ("UNIFORM_NAME_PROJECTION", "MATRIX_PROJECTION"),
+    ("UNIFORM_NAME_MODEL", "MATRIX_MODEL"),
+    ("UNIFORM_NAME_NORMAL", "MATRIX_NORMAL"),
+    ("UNIFORM_NAME_BONEMATRICES", "MATRIX_BONETRANSFORMS"),
+    ("UNIFORM_NAME_COLOR", "COLOR_DIFFUSE"),
+    ("SAMPLER2D_NAME_TEXTURE0", "MAP_DIFFUSE"),
+    ("SAMPLER2D_NAME_TEXTURE1", "MAP_SPECULAR"),
+    ("SAMPLER2D_NAME_TEXTURE2", "MAP_NORMAL"),
+)
+
+
+class ShaderJob:
+    def __init__(self, name, vertex_id, fragment_id, program_id):
+        self.name = name
+        self.vertex_id = vertex_id
+        self.fragment_id = fragment_id
+        self.program_id = program_id
+
+
+def _read_source(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def _info_log(get_iv, get_log, object_id) -> str:
+    length_ptr = ffi.new("int *")
+    get_iv(object_id, GL_INFO_LOG_LENGTH, length_ptr)
+    if length_ptr[0] <= 1:
+        return ""
+    log = ffi.new("char[]", length_ptr[0])
+    get_log(object_id, length_ptr[0], ffi.NULL, log)
+    return ffi.string(log).decode(errors="replace")
+
+
+class ShaderCompiler:
+    def __init__(self):
+        extensions = get_gl_extensions()
+        self.parallel = False
+        for extension, function in (
+            ("GL_KHR_parallel_shader_compile", "glMaxShaderCompilerThreadsKHR"),
+            ("GL_ARB_parallel_shader_compile", "glMaxShaderCompilerThreadsARB"),
+        ):
+            if extension in extensions:
+                # 0xFFFFFFFF: let the driver pick the thread count
+                getattr(gl, function)(0xFFFFFFFF)
+                self.parallel = True
+                break
+        self.status_ptr = ffi.new("int *")
+
+    def _compile(self, source: bytes, shader_type):
+        shader_id = gl.glCreateShader(shader_type)
+        source_buffer = ffi.new("char[]", source)
+        source_ptr = ffi.new("char *[1]", [source_buffer])
+        gl.glShaderSource(shader_id, 1, source_ptr, ffi.NULL)
+        gl.glCompileShader(shader_id)
+        return shader_id
+
+    def submit(self, vs_path: str, fs_path: str, name: str = None) -> ShaderJob:
+        return self.submit_source(
+            _read_source(vs_path), _read_source(fs_path), name or fs_path
+        )
+
+    def submit_source(
+        self, vs_source: bytes, fs_source: bytes, name: str, varyings=()
+    ) -> ShaderJob:
+        # compile + link without querying any status, so nothing waits here
+        # - varyings: vertex outputs captured by transform feedback, interleaved
+        vertex_id = self._compile(vs_source, GL_VERTEX_SHADER)
+        fragment_id = self._compile(fs_source, GL_FRAGMENT_SHADER)
+
+        program_id = gl.glCreateProgram()
+        gl.glAttachShader(program_id, vertex_id)
+        gl.glAttachShader(program_id, fragment_id)
+        for attribute, _ in SHADER_ATTRIBUTES:
+            location = getattr(
+                nrl, f"RL_DEFAULT_SHADER_ATTRIB_LOCATION_{attribute}", None
+            )
+            if location is None:
+                continue
+            gl.glBindAttribLocation(
+                program_id,
+                location,
+                getattr(nrl, f"RL_DEFAULT_SHADER_ATTRIB_NAME_{attribute}").encode(),
+            )
+        if varyings:
+            # fixed at link time, the names have to outlive the call
+            varying_names = [
+                ffi.new("char[]", varying.encode()) for varying in varyings
+            ]
+            gl.glTransformFeedbackVaryings(
+                program_id,
+                len(varying_names),
+                ffi.new("char *[]", varying_names),
+                GL_INTERLEAVED_ATTRIBS,
+            )
+        gl.glLinkProgram(program_id)
+        return ShaderJob(name, vertex_id, fragment_id, program_id)
+
+    def is_ready(self, job: ShaderJob) -> bool:
+        # without the extension any status query blocks, report ready
+        if not self.parallel:
+            return True
+        gl.glGetProgramiv(job.program_id, GL_COMPLETION_STATUS_KHR, self.status_ptr)
+        return bool(self.status_ptr[0])
+
+    def finish(self, job: ShaderJob) -> rl.Shader:
+        # waits for the link, then builds the rl.Shader raylib's LoadShader would
+        gl.glGetProgramiv(job.program_id, GL_LINK_STATUS, self.status_ptr)
+        linked = bool(self.status_ptr[0])
+        if not linked:
+            logs = [
+                _info_log(gl.glGetShaderiv, gl.glGetShaderInfoLog, job.vertex_id),
+                _info_log(gl.glGetShaderiv, gl.glGetShaderInfoLog, job.fragment_id),
+                _info_log(gl.glGetProgramiv, gl.glGetProgramInfoLog, job.program_id),
+            ]
+
+        gl.glDetachShader(job.program_id, job.vertex_id)
+        gl.glDetachShader(job.program_id, job.fragment_id)
+        gl.glDeleteShader(job.vertex_id)
+        gl.glDeleteShader(job.fragment_id)
+
+        if not linked:
+            gl.glDeleteProgram(job.program_id)
+            raise RuntimeError(
+                f"failed to build shader {job.name}:\n"
+                + "\n".join(log for log in logs if log)
+            )
+
+        shader = rl.Shader()
+        shader.id = job.program_id
+        # allocated by raylib's allocator, released by rl.unload_shader()
+        shader.locs = ffi.cast(
+            "int *", rl.mem_alloc(nrl.RL_MAX_SHADER_LOCATIONS * ffi.sizeof("int"))
+        )
+        for index in range(nrl.RL_MAX_SHADER_LOCATIONS):
+            shader.locs[index] = -1
+        for attribute, location in SHADER_ATTRIBUTES:
+            name = getattr(nrl, f"RL_DEFAULT_SHADER_ATTRIB_NAME_{attribute}", None)
+            index = getattr(rl, f"SHADER_LOC_{location}", None)
+            if name is None or index is None:
+                continue
+            shader.locs[index] = nrl.rlGetLocationAttrib(shader.id, name.encode())
+        for uniform, location in SHADER_UNIFORMS:
+            name = getattr(nrl, f"RL_DEFAULT_SHADER_{uniform}", None)
+            index = getattr(rl, f"SHADER_LOC_{location}", None)
+            if name is None or index is None:
+                continue
+            shader.locs[index] = nrl.rlGetLocationUniform(shader.id, name.encode())
+        return shader
+
+    def binary_length(self, shader: rl.Shader) -> int:
+        # driver's program binary size, the closest estimate of a program's memory
+        gl.glGetProgramiv(shader.id, GL_PROGRAM_BINARY_LENGTH, self.status_ptr)
+        return max(self.status_ptr[0], 0)
+
+    def finish_all(self, jobs):
+        # ready programs first, so a slow one does not hold back the others
+        shaders = {}
+        pending = list(jobs)
+        while pending:
+            ready = [job for job in pending if self.is_ready(job)] or pending[:1]
+            for job in ready:
+                shaders[job.name] = self.finish(job)
+                pending.remove(job)
+        return shaders
@@ -0,0 +1,164 @@
+# shader variants: '#include' expansion plus define permutations on top of the
+# raw-GL compiler, each (vertex, fragment, defines) combination is built once
+
+import os
+import re
+
+import pyray as rl
+
+from gpu_resources import *
+from shader_compiler import *
+
+SHADER_INCLUDE_PATTERN = re.compile(r'^\s*#\s*include\s+"([^"]+)"\s*$')
+SHADER_VERSION_PATTERN = re.compile(r"^\s*#\s*version[^\n]*\n")
+
+# quality tiers: per shader name, defines overriding the defaults in the sources
+# - medium matches the defaults baked in the shaders
+SHADER_QUALITY_TIERS = {
+    "low": {
+        "ssao": {"SSAO_SAMPLE_NUM": 4},
+        "blur": {"BLUR_RADIUS": 1, "BLUR_STRIDE": 3.0},
+        "shadow_blur": {"SHADOW_BLUR_RADIUS": 1},
+    },
+    "medium": {
+        "ssao": {"SSAO_SAMPLE_NUM": 9},
+        "blur": {"BLUR_RADIUS": 3, "BLUR_STRIDE": 2.0},
+        "shadow_blur": {"SHADOW_BLUR_RADIUS": 2},
+    },
+    "high": {
+        "ssao": {"SSAO_SAMPLE_NUM": 16},
+        "blur": {"BLUR_RADIUS": 5, "BLUR_STRIDE": 1.5},
+        "shadow_blur": {"SHADOW_BLUR_RADIUS": 4},
+    },
+}
+
+
+def _define_value(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return str(value)
+
+
+def _expand_includes(path: str, included: set) -> str:
+    # each file is pasted once, later includes of the same file are dropped
+    path = os.path.normpath(path)
+    if path in included:
+        return ""
+    included.add(path)
+
+    with open(path, "r") as file:
+        source = file.read()
+
+    lines = []
+    for line_number, line in enumerate(source.split("\n"), start=1):
+        match = SHADER_INCLUDE_PATTERN.match(line)
+        if match is None:
+            lines.append(line)
+            continue
+        # includes are relative to the including file
+        include_path = os.path.join(os.path.dirname(path), match.group(1))
+        if not os.path.exists(include_path):
+            raise FileNotFoundError(
+                f"{path}:{line_number}: cannot include '{match.group(1)}'"
+            )
+        lines.append(_expand_includes(include_path, included))
+    return "\n".join(lines)
+
+
+def preprocess_shader(path: str, defines: dict = None) -> str:
+    source = _expand_includes(path, set())
+    header = "".join(
+        f"#define {name} {_define_value(value)}\n"
+        for name, value in sorted((defines or {}).items())
+    )
+    # '#version' has to stay the first directive
+    version = SHADER_VERSION_PATTERN.match(source)
+    if version is not None:
+        return source[: version.end()] + header + source[version.end() :]
+    return header + source
+
+
+def shader_variant_key(vs_path: str, fs_path: str, defines: dict = None):
+    return (
+        vs_path,
+        fs_path,
+        tuple(
+            sorted(
+                (name, _define_value(value)) for name, value in (defines or {}).items()
+            )
+        ),
+    )
+
+
+class ShaderVariantCache:
+    def __init__(self, compiler: ShaderCompiler = None, owner=None):
+        self.compiler = compiler if compiler is not None else ShaderCompiler()
+        # gpu_resources owner of the built programs
+        self.owner = owner if owner is not None else self
+        # key -> rl.Shader
+        self.variants = {}
+        # key -> GpuResource
+        self.resources = {}
+        # key -> ShaderJob, submitted but not linked yet
+        self.pending = {}
+
+    def submit(self, vs_path: str, fs_path: str, defines: dict = None, varyings=()):
+        # starts compiling a variant, a no-op if it is built or in flight
+        # - varyings: transform feedback outputs, fixed per vertex shader (not in the key)
+        key = shader_variant_key(vs_path, fs_path, defines)
+        if key in self.variants or key in self.pending:
+            return key
+        name = fs_path + "".join(f" {name}={value}" for name, value in key[2])
+        self.pending[key] = self.compiler.submit_source(
+            preprocess_shader(vs_path, defines).encode(),
+            preprocess_shader(fs_path, defines).encode(),
+            name,
+            varyings,
+        )
+        return key
+
+    def finish_all(self):
+        # ready programs first, see ShaderCompiler.finish_all()
+        while self.pending:
+            ready = [
+                key for key, job in self.pending.items() if self.compiler.is_ready(job)
+            ] or list(self.pending)[:1]
+            for key in ready:
+                self._finish(key)
+
+    def get(
+        self, vs_path: str, fs_path: str, defines: dict = None, varyings=()
+    ) -> rl.Shader:
+        key = self.submit(vs_path, fs_path, defines, varyings)
+        if key in self.pending:
+            self._finish(key)
+        return self.variants[key]
+
+    def _finish(self, key):
+        job = self.pending.pop(key)
+        shader = self.compiler.finish(job)
+        self.variants[key] = shader
+        self.resources[key] = gpu_resources.track(
+            self.owner,
+            job.name,
+            shader,
+            rl.unload_shader,
+            GPU_SHADERS,
+            self.compiler.binary_length(shader),
+        )
+
+    def unload(self):
+        self.finish_all()
+        for resource in self.resources.values():
+            gpu_resources.release(resource)
+        self.variants = {}
+        self.resources = {}
+
+
+if __name__ == "__main__":
+    # print the expanded sources of every tier, no gl context needed
+    for tier, shader_defines in SHADER_QUALITY_TIERS.items():
+        for shader_name, defines in shader_defines.items():
+            source = preprocess_shader(f"./shaders/{shader_name}.fs", defines)
+            print(f"// {tier} {shader_name}: {len(source.splitlines())} lines")
+            print(source)
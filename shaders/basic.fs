@@ -12,11 +12,21 @@ uniform vec4 colDiffuse;
 // user-defined variables
 uniform float Specularity;
 uniform float Glossiness;
-uniform float CameraClipNear;
-uniform float CameraClipFar;
+// streamed albedo (see texture_streaming.py), white when the material has none
+uniform sampler2D AlbedoTexture;
+// picking id of the drawn object, see RenderQueue.submit_batch()
+uniform uint ObjectId;
 
 layout (location = 0) out vec4 GBufferColor;
 layout (location = 1) out vec4 GBufferNormal;
+// only stored when the gbuffer has an object id attachment
+layout (location = 2) out uint GBufferObjectId;
+
+#include "common.glsl"
+#include "uniform_blocks.glsl"
+
+// repeats of AlbedoTexture over the uv range, GROUND_ALBEDO_TILING in renderer.py
+#define ALBEDO_TILING 4.0
 
 float Grid(in vec2 Uv, in float LineWidth)
 {
@@ -42,16 +52,6 @@ float Checker(in vec2 Uv)
     return 0.5 - 0.5 * I.x * I.y;
 }
 
-vec3 FromGamma(in vec3 Color)
-{
-    return vec3(pow(Color.x, 1.0 / 2.2), pow(Color.y, 1.0 / 2.2), pow(Color.z, 1.0 / 2.2));
-}
-
-float LinearDepth(float Depth, float Near, float Far)
-{
-    return (2.0 * Near) / (Far + Near - Depth * (Far - Near));
-}
-
 void main()
 {
     float GridFine = Grid(20.0 * 10.0 * fragTexCoord, 0.025);
@@ -59,9 +59,11 @@ void main()
     float Check = Checker(2.0 * 10.0 * fragTexCoord);
 
     vec3 Albedo = FromGamma(fragColor.xyz * colDiffuse.xyz) * mix(mix(mix(0.9, 0.95, Check), 0.85, GridFine), 1.0, GridCoarse);
+    Albedo *= FromGamma(texture(AlbedoTexture, ALBEDO_TILING * fragTexCoord).rgb);
     float Specular = Specularity * mix(mix(0.5, 0.75, Check), 1.0, GridCoarse);
 
     GBufferColor = vec4(Albedo, Specular);
     GBufferNormal = vec4(fragNormal * 0.5f + 0.5f, Glossiness / 100.0f);
+    GBufferObjectId = ObjectId;
     gl_FragDepth = LinearDepth(gl_FragCoord.z, CameraClipNear, CameraClipFar);
 }
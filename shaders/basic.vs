@@ -3,11 +3,20 @@
 // - https://github.com/raysan5/raylib/wiki/raylib-default-shader
 in vec3 vertexPosition;
 in vec2 vertexTexCoord;
+#ifdef QUANTIZED_VERTICES
+// octahedral encoded
+in vec2 vertexNormal;
+#else
 in vec3 vertexNormal;
+#endif
 in vec4 vertexColor;
 
 uniform mat4 mvp;
 
+#ifdef QUANTIZED_VERTICES
+#include "quantized_vertex.glsl"
+#endif
+
 out vec3 fragPosition;
 out vec2 fragTexCoord;
 out vec4 fragColor;
@@ -15,10 +24,16 @@ out vec3 fragNormal;
 
 void main()
 {
+#ifdef QUANTIZED_VERTICES
+    fragPosition = DecodePosition(vertexPosition);
+    fragTexCoord = DecodeTexCoord(vertexTexCoord);
+    fragNormal = DecodeOctahedral(vertexNormal);
+#else
     fragPosition = vertexPosition;
     fragTexCoord = vertexTexCoord;
-    fragColor = vertexColor;
     fragNormal = vertexNormal;
+#endif
+    fragColor = vertexColor;
 
     gl_Position = mvp * vec4(fragPosition, 1.0f);
-}
\ No newline at end of file
+}
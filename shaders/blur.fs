@@ -6,23 +6,18 @@ in vec2 fragTexCoord;
 uniform sampler2D GBufferNormal;
 uniform sampler2D GBufferDepth;
 uniform sampler2D InputTexture;
-uniform mat4 CameraInvProjection;
-uniform float CameraClipNear;
-uniform float CameraClipFar;
 uniform vec2 InvTextureResolution;
 uniform vec2 BlurDirection;
 
-float NonLinearDepth(float Depth, float Near, float Far)
-{
-    return (((2.0 * Near) / Depth) - Far - Near) / (Near - Far);
-}
+// quality: taps on each side of the pixel and texel distance between taps
+#ifndef BLUR_RADIUS
+#define BLUR_RADIUS 3
+#endif
+#ifndef BLUR_STRIDE
+#define BLUR_STRIDE 2.0
+#endif
 
-vec3 CameraSpace(vec2 TexCoord, float Depth)
-{
-    vec4 PositionClip = vec4(vec3(TexCoord, NonLinearDepth(Depth, CameraClipNear, CameraClipFar)) * 2.0 - 1.0, 1.0);
-    vec4 Position = CameraInvProjection * PositionClip;
-    return Position.xyz / Position.w;
-}
+#include "camera_space.glsl"
 
 float FastNegExp(float X)
 {
@@ -41,9 +36,9 @@ void main()
     
     vec4 TotalColor = vec4(0.0f, 0.0f, 0.0f, 0.0f);
     float TotalWeight = 0.0f;
-    float Stride = 2.0f;
+    float Stride = BLUR_STRIDE;
 
-    for (int X = -3; X <= 3; ++X)
+    for (int X = -BLUR_RADIUS; X <= BLUR_RADIUS; ++X)
     {
         vec2 SampleTexCoord = fragTexCoord + float(X) * Stride * BlurDirection * InvTextureResolution;
         vec4 SampleColor = texture(InputTexture, SampleTexCoord);
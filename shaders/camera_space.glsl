@@ -0,0 +1,11 @@
+// view-space position from the gbuffer's linear depth
+
+#include "common.glsl"
+#include "uniform_blocks.glsl"
+
+vec3 CameraSpace(vec2 TexCoord, float Depth)
+{
+    vec4 PositionClip = vec4(vec3(TexCoord, NonLinearDepth(Depth, CameraClipNear, CameraClipFar)) * 2.0 - 1.0, 1.0);
+    vec4 Position = CameraInvProjection * PositionClip;
+    return Position.xyz / Position.w;
+}
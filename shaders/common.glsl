@@ -0,0 +1,23 @@
+// shared helpers, included once per shader by shader_variants.preprocess_shader()
+
+#define PI 3.14159265358979323846264338327950288
+
+vec3 ToGamma(in vec3 Color)
+{
+    return vec3(pow(Color.x, 2.2), pow(Color.y, 2.2), pow(Color.z, 2.2));
+}
+
+vec3 FromGamma(in vec3 Color)
+{
+    return vec3(pow(Color.x, 1.0 / 2.2), pow(Color.y, 1.0 / 2.2), pow(Color.z, 1.0 / 2.2));
+}
+
+float LinearDepth(float Depth, float Near, float Far)
+{
+    return (2.0 * Near) / (Far + Near - Depth * (Far - Near));
+}
+
+float NonLinearDepth(float Depth, float Near, float Far)
+{
+    return (((2.0 * Near) / Depth) - Far - Near) / (Near - Far);
+}
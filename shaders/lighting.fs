@@ -11,41 +11,82 @@ uniform sampler2D GBufferNormal;
 uniform sampler2D GBufferDepth;
 uniform sampler2D SSAO;
 
-uniform vec3 CameraPosition;
-uniform mat4 CameraInvViewProjection;
-uniform vec3 LightDirection;
-uniform vec3 SunColor;
-uniform float SunIntensity;
-uniform vec3 SkyColor;
-uniform float SkyIntensity;
-uniform float GroundIntensity;
-uniform float AmbientIntensity;
-uniform float Exposure;
-uniform float CameraClipNear;
-uniform float CameraClipFar;
+// clustered local lights
+uniform sampler2D LightData;
+uniform sampler2D ClusterGrid;
+uniform sampler2D ClusterLightIndices;
+uniform vec3 ClusterDimensions;
+uniform float ClusterDepthScale;
+uniform float ClusterDepthBias;
+uniform int ClusterIndexWidth;
+
+#ifdef SHADOW_MOMENTS
+// prefiltered sun shadow
+uniform sampler2D ShadowMoments;
+#endif
 
 out vec4 finalColor;
 
-#define PI 3.14159265358979323846264338327950288
+#include "common.glsl"
+#include "uniform_blocks.glsl"
 
-vec3 ToGamma(in vec3 Color)
-{
-    return vec3(pow(Color.x, 2.2), pow(Color.y, 2.2), pow(Color.z, 2.2));
-}
+#ifdef SHADOW_MOMENTS
+#include "shadow_moments.glsl"
 
-vec3 FromGamma(in vec3 Color)
+float SunShadowVisibility(vec3 PixelPosition, vec3 PixelNormal)
 {
-    return vec3(pow(Color.x, 1.0 / 2.2), pow(Color.y, 1.0 / 2.2), pow(Color.z, 1.0 / 2.2));
-}
+    float ShadowNormalBias = 0.01;
+    vec4 PositionLight = LightViewProjection * vec4(PixelPosition + ShadowNormalBias * PixelNormal, 1.0);
+    PositionLight.xyz = (PositionLight.xyz / PositionLight.w + 1.0) * 0.5;
 
-float LinearDepth(float Depth, float Near, float Far)
-{
-    return (2.0 * Near) / (Far + Near - Depth * (Far - Near));
+    // trilinear fetch of the blurred moments, before any branch to keep derivatives valid
+    vec4 Moments = texture(ShadowMoments, PositionLight.xy);
+
+    // outside the shadow map is lit
+    if (any(lessThan(PositionLight.xy, vec2(0.0))) || any(greaterThan(PositionLight.xy, vec2(1.0)))) { return 1.0; }
+    return ShadowMomentsVisibility(Moments, LinearDepth(PositionLight.z, LightClipNear, LightClipFar));
 }
+#endif
 
-float NonLinearDepth(float Depth, float Near, float Far)
+vec3 LocalLighting(vec3 PixelPosition, vec3 PixelNormal, vec3 EyeDirection, vec3 Albedo, float Specularity, float Glossiness, float DepthClip)
 {
-    return (((2.0 * Near) / Depth) - Far - Near) / (Near - Far);
+    // view-space depth -> exponential depth slice
+    float ViewDepth = (2.0 * CameraClipNear * CameraClipFar) / (CameraClipFar + CameraClipNear - DepthClip * (CameraClipFar - CameraClipNear));
+    vec3 Cluster = vec3(floor(fragTexCoord * ClusterDimensions.xy), floor(log(ViewDepth) * ClusterDepthScale + ClusterDepthBias));
+    ivec3 ClusterIndex = ivec3(clamp(Cluster, vec3(0.0), ClusterDimensions - 1.0));
+
+    vec4 OffsetAndCount = texelFetch(ClusterGrid, ivec2(ClusterIndex.y * int(ClusterDimensions.x) + ClusterIndex.x, ClusterIndex.z), 0);
+    int Offset = int(OffsetAndCount.r);
+    int Count = int(OffsetAndCount.g);
+
+    // evaluate only the lights binned into this pixel's cluster
+    vec3 Result = vec3(0.0);
+    for (int Index = Offset; Index < Offset + Count; ++Index)
+    {
+        int LightIndex = int(texelFetch(ClusterLightIndices, ivec2(Index % ClusterIndexWidth, Index / ClusterIndexWidth), 0).r);
+        vec4 PositionAndRadius = texelFetch(LightData, ivec2(0, LightIndex), 0);
+        vec4 ColorAndIntensity = texelFetch(LightData, ivec2(1, LightIndex), 0);
+        vec4 DirectionAndCosOuter = texelFetch(LightData, ivec2(2, LightIndex), 0);
+        float CosInner = texelFetch(LightData, ivec2(3, LightIndex), 0).r;
+
+        vec3 ToLight = PositionAndRadius.xyz - PixelPosition;
+        float Distance = length(ToLight);
+        vec3 LightDir = ToLight / max(Distance, 0.0001);
+
+        // windowed inverse square falloff, zero at the light radius
+        float Window = clamp(1.0 - pow(Distance / PositionAndRadius.w, 4.0), 0.0, 1.0);
+        float Attenuation = Window * Window / (Distance * Distance + 1.0);
+
+        // point lights store cos ranges below -1.0 so the cone term is always 1.0
+        float Cone = smoothstep(DirectionAndCosOuter.w, CosInner, dot(-LightDir, DirectionAndCosOuter.xyz));
+
+        vec3 LightHalf = normalize(LightDir - EyeDirection);
+        float FactorDiff = max(dot(PixelNormal, LightDir), 0.0);
+        float FactorSpec = Specularity * ((Glossiness + 2.0) / (8.0 * PI)) * pow(max(dot(PixelNormal, LightHalf), 0.0), Glossiness);
+
+        Result += FromGamma(ColorAndIntensity.rgb) * ColorAndIntensity.a * Attenuation * Cone * (Albedo + FactorSpec) * FactorDiff;
+    }
+    return Result;
 }
 
 void main()
@@ -65,7 +106,11 @@ void main()
     vec3 Albedo = ColorAndSpecular.rgb;
     float Specularity = ColorAndSpecular.a;
     float Glossiness = NormalAndGlossiness.a * 100.0f;
+#ifdef SHADOW_MOMENTS
+    float SunShadow = SunShadowVisibility(PixelPosition, PixelNormal);
+#else
     float SunShadow = SSAOData.g;
+#endif
     float AmbientShadow = SSAOData.r;
     
     // compute lighting
@@ -89,7 +134,9 @@ void main()
                 + SkyIntensity * LightSkyColor * Albedo * SkyFactorDiff;
     float Specular = SunShadow * SunIntensity * SkyFactorSpec + SkyIntensity * SkyFactorSpec;
     
-    vec3 Final = Diffuse + Specular + Ambient;
+    vec3 Local = LocalLighting(PixelPosition, PixelNormal, EyeDirection, Albedo, Specularity, Glossiness, PositionClip.z);
+
+    vec3 Final = Diffuse + Specular + Ambient + Local;
     finalColor = vec4(ToGamma(Exposure * Final), 1.0f);
     gl_FragDepth = NonLinearDepth(Depth, CameraClipNear, CameraClipFar);
 }
\ No newline at end of file
@@ -0,0 +1,33 @@
+precision highp float;
+
+in vec2 fragCorner;
+in vec3 fragColor;
+
+uniform float Specularity;
+uniform float Glossiness;
+
+layout (location = 0) out vec4 GBufferColor;
+layout (location = 1) out vec4 GBufferNormal;
+// particles are not pickable: OBJECT_ID_NONE
+layout (location = 2) out uint GBufferObjectId;
+
+#include "common.glsl"
+#include "uniform_blocks.glsl"
+
+void main()
+{
+    // round sprite: alpha-tested so it stays an opaque gbuffer surface
+    float Radius2 = dot(fragCorner, fragCorner);
+    if (Radius2 > 1.0)
+    {
+        discard;
+    }
+
+    // sphere-like normal facing the camera, view-space -> world-space
+    vec3 Normal = transpose(mat3(CameraView)) * vec3(fragCorner, sqrt(1.0 - Radius2));
+
+    GBufferColor = vec4(FromGamma(fragColor), Specularity);
+    GBufferNormal = vec4(Normal * 0.5f + 0.5f, Glossiness / 100.0f);
+    GBufferObjectId = 0u;
+    gl_FragDepth = LinearDepth(gl_FragCoord.z, CameraClipNear, CameraClipFar);
+}
@@ -0,0 +1,45 @@
+// camera-facing quads, one instance per particle: the state buffer is bound as
+// per-instance attributes (divisor 1), the corner comes from gl_VertexID
+layout (location = 0) in vec4 PositionAge;
+layout (location = 1) in vec4 VelocityLifetime;
+
+// radius at birth and at death
+uniform vec2 ParticleSize;
+uniform vec3 ParticleColorStart;
+uniform vec3 ParticleColorEnd;
+
+out vec2 fragCorner;
+out vec3 fragColor;
+
+#include "uniform_blocks.glsl"
+
+const vec2 Corners[6] = vec2[6](
+    vec2(-1.0, -1.0), vec2(1.0, -1.0), vec2(1.0, 1.0),
+    vec2(-1.0, -1.0), vec2(1.0, 1.0), vec2(-1.0, 1.0)
+);
+
+void main()
+{
+    float Age = PositionAge.w;
+    float Lifetime = VelocityLifetime.w;
+    fragCorner = Corners[gl_VertexID];
+    fragColor = ParticleColorStart;
+
+    // unborn and dead particles: every corner outside the clip volume, nothing rasterized
+    if (Age < 0.0 || Age >= Lifetime)
+    {
+        gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+        return;
+    }
+
+    float Life = Age / Lifetime;
+    fragColor = mix(ParticleColorStart, ParticleColorEnd, Life);
+
+    // camera right/up axes: rows of the view rotation
+    vec3 Right = vec3(CameraView[0][0], CameraView[1][0], CameraView[2][0]);
+    vec3 Up = vec3(CameraView[0][1], CameraView[1][1], CameraView[2][1]);
+    float Size = mix(ParticleSize.x, ParticleSize.y, Life);
+    vec3 Position = PositionAge.xyz + (Right * fragCorner.x + Up * fragCorner.y) * Size;
+
+    gl_Position = CameraProjection * CameraView * vec4(Position, 1.0);
+}
@@ -0,0 +1,4 @@
+// never runs: the update pass draws with GL_RASTERIZER_DISCARD, see particles.py
+void main()
+{
+}
@@ -0,0 +1,78 @@
+// particle simulation: one vertex per particle, drawn as GL_POINTS with the rasterizer
+// off, the outputs are captured by transform feedback into the back state buffer
+// - age < 0: not born yet, age >= lifetime: dead (respawned while the emitter is active)
+layout (location = 0) in vec4 PositionAge;
+layout (location = 1) in vec4 VelocityLifetime;
+
+uniform float DeltaTime;
+uniform float Time;
+
+// see ParticleEmitter in particles.py
+uniform int EmitterFirst;
+uniform int EmitterActive;
+uniform vec3 EmitterPosition;
+uniform vec3 EmitterExtent;
+uniform vec3 EmitterDirection;
+uniform float EmitterSpread;
+uniform vec2 EmitterSpeed;
+uniform vec2 EmitterLifetime;
+uniform vec3 EmitterGravity;
+uniform float EmitterDrag;
+
+// captured varyings, PARTICLE_VARYINGS in particles.py
+out vec4 ParticlePositionAge;
+out vec4 ParticleVelocityLifetime;
+
+#include "common.glsl"
+
+uint Hash(uint X)
+{
+    X ^= X >> 16;
+    X *= 0x7feb352du;
+    X ^= X >> 15;
+    X *= 0x846ca68bu;
+    X ^= X >> 16;
+    return X;
+}
+
+float Random(inout uint Seed)
+{
+    Seed = Hash(Seed);
+    return float(Seed) / 4294967295.0;
+}
+
+void main()
+{
+    vec3 Position = PositionAge.xyz;
+    float Age = PositionAge.w + DeltaTime;
+    vec3 Velocity = VelocityLifetime.xyz;
+    float Lifetime = VelocityLifetime.w;
+
+    if (Age >= Lifetime && EmitterActive != 0)
+    {
+        // respawn, the overshoot is kept so the emission rate stays even
+        uint Seed = Hash(uint(EmitterFirst + gl_VertexID)) ^ Hash(floatBitsToUint(Time));
+        Age = min(Age - Lifetime, DeltaTime);
+        Lifetime = mix(EmitterLifetime.x, EmitterLifetime.y, Random(Seed));
+
+        Position = EmitterPosition + EmitterExtent * (vec3(Random(Seed), Random(Seed), Random(Seed)) * 2.0 - 1.0);
+
+        // uniform direction inside the cone around EmitterDirection
+        float CosTheta = mix(1.0, cos(EmitterSpread), Random(Seed));
+        float SinTheta = sqrt(max(1.0 - CosTheta * CosTheta, 0.0));
+        float Phi = 2.0 * PI * Random(Seed);
+        vec3 Axis = abs(EmitterDirection.y) < 0.999 ? vec3(0.0, 1.0, 0.0) : vec3(1.0, 0.0, 0.0);
+        vec3 Tangent = normalize(cross(Axis, EmitterDirection));
+        vec3 Bitangent = cross(EmitterDirection, Tangent);
+        vec3 Direction = (Tangent * cos(Phi) + Bitangent * sin(Phi)) * SinTheta + EmitterDirection * CosTheta;
+        Velocity = Direction * mix(EmitterSpeed.x, EmitterSpeed.y, Random(Seed));
+    }
+    else if (Age >= 0.0 && Age < Lifetime)
+    {
+        Velocity = (Velocity + EmitterGravity * DeltaTime) * max(1.0 - EmitterDrag * DeltaTime, 0.0);
+        Position += Velocity * DeltaTime;
+    }
+
+    ParticlePositionAge = vec4(Position, Age);
+    ParticleVelocityLifetime = vec4(Velocity, Lifetime);
+}
@@ -0,0 +1,27 @@
+// decode of vertex_formats.py's compact layouts (QUANTIZED_VERTICES)
+// - positions/texcoords arrive in [-1, 1] (normalized snorm16 or half), the render
+//   queue sets the per-mesh dequantization before each mesh
+
+uniform vec3 PositionScale;
+uniform vec3 PositionOffset;
+// (scale.xy, offset.xy)
+uniform vec4 TexCoordScaleOffset;
+
+vec3 DecodePosition(vec3 Position)
+{
+    return Position * PositionScale + PositionOffset;
+}
+
+vec2 DecodeTexCoord(vec2 TexCoord)
+{
+    return TexCoord * TexCoordScaleOffset.xy + TexCoordScaleOffset.zw;
+}
+
+vec3 DecodeOctahedral(vec2 Encoded)
+{
+    vec3 Normal = vec3(Encoded, 1.0 - abs(Encoded.x) - abs(Encoded.y));
+    float Fold = max(-Normal.z, 0.0);
+    Normal.x += Normal.x >= 0.0 ? -Fold : Fold;
+    Normal.y += Normal.y >= 0.0 ? -Fold : Fold;
+    return normalize(Normal);
+}
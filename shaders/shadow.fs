@@ -1,15 +1,19 @@
 
 precision highp float;
 
-uniform float LightClipNear;
-uniform float LightClipFar;
+#include "common.glsl"
+#include "uniform_blocks.glsl"
 
-float LinearDepth(float Depth, float Near, float Far)
-{
-    return (2.0 * Near) / (Far + Near - Depth * (Far - Near));
-}
+#ifdef SHADOW_MOMENTS
+#include "shadow_moments.glsl"
+
+out vec4 finalColor;
+#endif
 
 void main()
 {
     gl_FragDepth = LinearDepth(gl_FragCoord.z, LightClipNear, LightClipFar);
+#ifdef SHADOW_MOMENTS
+    finalColor = ShadowMoments(gl_FragDepth);
+#endif
 }
@@ -3,7 +3,15 @@ in vec3 vertexPosition;
 
 uniform mat4 mvp;
 
+#ifdef QUANTIZED_VERTICES
+#include "quantized_vertex.glsl"
+#endif
+
 void main()
 {
+#ifdef QUANTIZED_VERTICES
+    gl_Position = mvp * vec4(DecodePosition(vertexPosition), 1.0f);
+#else
     gl_Position = mvp * vec4(vertexPosition, 1.0f);
+#endif
 }
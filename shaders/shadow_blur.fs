@@ -0,0 +1,34 @@
+
+precision highp float;
+
+in vec2 fragTexCoord;
+
+uniform sampler2D InputTexture;
+uniform vec2 InvTextureResolution;
+uniform vec2 BlurDirection;
+
+// quality: gaussian taps on each side of the texel
+#ifndef SHADOW_BLUR_RADIUS
+#define SHADOW_BLUR_RADIUS 2
+#endif
+
+out vec4 finalColor;
+
+void main()
+{
+    // separable gaussian over shadow moments, runs at shadow map resolution
+    float Sigma = 0.5 * float(SHADOW_BLUR_RADIUS) + 0.5;
+
+    vec4 TotalMoments = vec4(0.0f, 0.0f, 0.0f, 0.0f);
+    float TotalWeight = 0.0f;
+
+    for (int X = -SHADOW_BLUR_RADIUS; X <= SHADOW_BLUR_RADIUS; ++X)
+    {
+        vec2 SampleTexCoord = fragTexCoord + float(X) * BlurDirection * InvTextureResolution;
+        float Weight = exp(-float(X * X) / (2.0 * Sigma * Sigma));
+        TotalMoments += Weight * texture(InputTexture, SampleTexCoord);
+        TotalWeight += Weight;
+    }
+
+    finalColor = TotalMoments / TotalWeight;
+}
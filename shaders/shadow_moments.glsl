@@ -0,0 +1,51 @@
+// exponential variance shadow maps (EVSM): the shadow map stores
+// (e^(c+ d), e^(2 c+ d), -e^(-c- d), e^(-2 c- d)), which stays meaningful after
+// blurring and mipmapping, so one filtered fetch gives a soft shadow
+
+// exponents for 32-bit float moments, e^(2 * 42) is close to the float range
+#ifndef EVSM_POSITIVE_EXPONENT
+#define EVSM_POSITIVE_EXPONENT 40.0
+#endif
+#ifndef EVSM_NEGATIVE_EXPONENT
+#define EVSM_NEGATIVE_EXPONENT 5.0
+#endif
+// cuts the [0, LIGHT_BLEEDING_REDUCTION] tail of the visibility to hide light leaks
+#ifndef EVSM_LIGHT_BLEEDING_REDUCTION
+#define EVSM_LIGHT_BLEEDING_REDUCTION 0.25
+#endif
+#ifndef EVSM_VARIANCE_BIAS
+#define EVSM_VARIANCE_BIAS 0.0001
+#endif
+
+vec2 ShadowWarp(float Depth)
+{
+    // [0, 1] -> [-1, 1] spreads precision over both exponentials
+    Depth = 2.0 * Depth - 1.0;
+    return vec2(exp(EVSM_POSITIVE_EXPONENT * Depth), -exp(-EVSM_NEGATIVE_EXPONENT * Depth));
+}
+
+vec4 ShadowMoments(float Depth)
+{
+    vec2 Warped = ShadowWarp(Depth);
+    return vec4(Warped.x, Warped.x * Warped.x, Warped.y, Warped.y * Warped.y);
+}
+
+float Chebyshev(vec2 Moments, float Mean, float MinVariance)
+{
+    float Variance = max(Moments.y - Moments.x * Moments.x, MinVariance);
+    float Difference = Mean - Moments.x;
+    float PMax = Variance / (Variance + Difference * Difference);
+    PMax = clamp((PMax - EVSM_LIGHT_BLEEDING_REDUCTION) / (1.0 - EVSM_LIGHT_BLEEDING_REDUCTION), 0.0, 1.0);
+    return Mean <= Moments.x ? 1.0 : PMax;
+}
+
+float ShadowMomentsVisibility(vec4 Moments, float Depth)
+{
+    vec2 Warped = ShadowWarp(Depth);
+    // variance floor scaled by the warp derivative
+    vec2 DepthScale = EVSM_VARIANCE_BIAS * vec2(EVSM_POSITIVE_EXPONENT, EVSM_NEGATIVE_EXPONENT) * abs(Warped);
+    vec2 MinVariance = DepthScale * DepthScale;
+    float Positive = Chebyshev(Moments.xy, Warped.x, MinVariance.x);
+    float Negative = Chebyshev(Moments.zw, Warped.y, MinVariance.y);
+    return min(Positive, Negative);
+}
@@ -1,42 +1,18 @@
 
 precision highp float;
 
-#define PI 3.14159265358979323846264338327950288
+// quality: spiral samples per pixel
+#ifndef SSAO_SAMPLE_NUM
 #define SSAO_SAMPLE_NUM 9
+#endif
 
 in vec2 fragTexCoord;
 
 uniform sampler2D GBufferNormal;
 uniform sampler2D GBufferDepth;
-uniform mat4 CameraView;
-uniform mat4 CameraProjection;
-uniform mat4 CameraInvProjection;
-uniform mat4 CameraInvViewProjection;
-uniform mat4 LightViewProjection;
 uniform sampler2D ShadowMap;
-uniform vec2 ShadowInvResolution;
-uniform float CameraClipNear;
-uniform float CameraClipFar;
-uniform float LightClipNear;
-uniform float LightClipFar;
-uniform vec3 LightDirection;
-
-float LinearDepth(float Depth, float Near, float Far)
-{
-    return (2.0 * Near) / (Far + Near - Depth * (Far - Near));
-}
 
-float NonLinearDepth(float Depth, float Near, float Far)
-{
-    return (((2.0 * Near) / Depth) - Far - Near) / (Near - Far);
-}
-
-vec3 CameraSpace(vec2 TexCoord, float Depth)
-{
-    vec4 PositionClip = vec4(vec3(TexCoord, NonLinearDepth(Depth, CameraClipNear, CameraClipFar)) * 2.0 - 1.0, 1.0);
-    vec4 Position = CameraInvProjection * PositionClip;
-    return Position.xyz / Position.w;
-}
+#include "camera_space.glsl"
 
 vec3 Rand(vec2 Seed)
 {
@@ -57,13 +33,17 @@ void main()
     float Depth = texture(GBufferDepth, fragTexCoord).r;
     if (Depth == 1.0f) { discard; }
 
+    vec3 FragNormal = texture(GBufferNormal, fragTexCoord).xyz * 2.0 - 1.0;
+    vec3 Seed = Rand(fragTexCoord);
+
+#ifdef SHADOW_MOMENTS
+    // filtered shadow moments are looked up by the lighting pass
+    float Shadow = 1.0;
+#else
     // compute shadows
     vec3 PositionClip = vec3(fragTexCoord, NonLinearDepth(Depth, CameraClipNear, CameraClipFar)) * 2.0f - 1.0f;
     vec4 FragPositionHomo = CameraInvViewProjection * vec4(PositionClip, 1.0);
     vec3 FragPosition = FragPositionHomo.xyz / FragPositionHomo.w;
-    vec3 FragNormal = texture(GBufferNormal, fragTexCoord).xyz * 2.0 - 1.0;
-
-    vec3 Seed = Rand(fragTexCoord);
 
     float ShadowNormalBias = 0.01;
 
@@ -81,6 +61,7 @@ void main()
     float Shadow = 1.0 - ShadowClip * float(
         LinearDepth(FragPositionLightSpace.z, LightClipNear, LightClipFar) - ShadowDepthBias > texture(ShadowMap, FragPositionLightSpace.xy + ShadowInvResolution * Seed.xy).r
     );
+#endif
 
     // compute SSAO:
     float Bias = 0.025f;
@@ -0,0 +1,38 @@
+// std140 blocks shared by every program, written once per frame by uniform_blocks.py
+// - members are global names: shaders use CameraView, LightDirection, ... unchanged
+// - layouts must match FRAME/LIGHT/CAMERA_BLOCK_DTYPE
+
+layout (std140) uniform FrameBlock
+{
+    float FrameTime;
+    float FrameDeltaTime;
+    uint FrameIndex;
+};
+
+layout (std140) uniform LightBlock
+{
+    mat4 LightViewProjection;
+    vec3 LightDirection;
+    float LightClipNear;
+    vec3 SunColor;
+    float LightClipFar;
+    vec3 SkyColor;
+    float SunIntensity;
+    float SkyIntensity;
+    float GroundIntensity;
+    float AmbientIntensity;
+    float Exposure;
+    vec2 ShadowInvResolution;
+};
+
+// the view being rendered, bound per view
+layout (std140) uniform CameraBlock
+{
+    mat4 CameraView;
+    mat4 CameraProjection;
+    mat4 CameraInvProjection;
+    mat4 CameraInvViewProjection;
+    vec3 CameraPosition;
+    float CameraClipNear;
+    float CameraClipFar;
+};
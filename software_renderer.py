@@ -0,0 +1,1276 @@
+# numpy implementation of the deferred view passes, for nodes without any GL
+# - ssao + shadow mask (ssao.fs), bilateral blur (blur.fs), lighting (lighting.fs) and
+#   fxaa (fxaa.fs) over gbuffer arrays, with the inputs the shaders get: the
+#   LightBlock/CameraBlock records of uniform_blocks.py and the light clusters
+# - doubles as the reference for shader changes: the math follows the shaders line by
+#   line, textures are fetched nearest like the gpu targets and rgba8 targets are
+#   quantized; expect differences from the sin() hash noise and 1/255 rounding
+#   (compare_with_gpu(), --compare: the passes on a gbuffer the Renderer drew)
+# - arrays are top row first (as readback.py returns them), texcoord v points up
+# - output rows are independent: a pass splits them into tiles, optionally run on a
+#   concurrent.futures executor (threads share the arrays, processes copy them)
+# - hard shadows only: the evsm moments need the blurred mip chain of the shadow pass
+# - without a gbuffer, rasterize_gbuffer() and rasterize_shadow_map() draw MeshData
+#   with flat materials (no grid, checker or albedo texture of basic.fs)
+
+import argparse
+import concurrent.futures
+import math
+import os
+import time
+
+import pyray as rl
+
+import numpy as np
+
+from renderer import *
+from batch_render import *
+from uniform_blocks import *
+
+SOFTWARE_WRAP_CLAMP = "clamp"
+SOFTWARE_WRAP_REPEAT = "repeat"
+
+# output rows per tile
+SOFTWARE_TILE_ROWS = 64
+
+# clear colors of the ssao and lighting targets (rl.WHITE, rl.RAYWHITE)
+SOFTWARE_SSAO_CLEAR = (1.0, 1.0, 1.0, 1.0)
+SOFTWARE_LIGHTING_CLEAR = (245.0 / 255.0, 245.0 / 255.0, 245.0 / 255.0, 1.0)
+
+# allowed difference to a gpu frame, per channel
+SOFTWARE_TOLERANCE = 2.0 / 255.0
+
+# ssao.fs constants
+SSAO_BIAS = 0.025
+SSAO_RADIUS = 0.5
+SSAO_TURNS = 7.0
+SSAO_INTENSITY = 0.15
+SHADOW_NORMAL_BIAS = 0.01
+SHADOW_DEPTH_BIAS = 0.000005
+
+# fxaa.fs constants
+FXAA_SPAN_MAX = 4.0
+FXAA_REDUCE_AMOUNT = 1.0 / 4.0
+FXAA_REDUCE_MIN = 1.0 / 64.0
+FXAA_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+class SoftwareGBuffer:
+    # gbuffer attachments as float32 arrays, top row first
+    # - fill it with rasterize_gbuffer(), or assign arrays read back from a gpu frame
+    #   (see software_gbuffer())
+    def __init__(self, width: int, height: int):
+        # linear albedo + specularity, as GBufferColor
+        self.color = np.zeros((height, width, 4), dtype=np.float32)
+        # world normal * 0.5 + 0.5 + glossiness / 100, as GBufferNormal
+        self.normal = np.zeros((height, width, 4), dtype=np.float32)
+        # LinearDepth() of the window depth, 1.0 on the background
+        self.depth = np.ones((height, width), dtype=np.float32)
+        self.object_id = np.zeros((height, width), dtype=np.uint32)
+
+    @property
+    def width(self) -> int:
+        return self.depth.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.depth.shape[0]
+
+
+def software_gbuffer(color, normal, depth, object_id=None) -> SoftwareGBuffer:
+    # gbuffer from readback arrays: rgba8 color, rgba16f normal, depth with or
+    # without a channel axis
+    depth = np.asarray(depth, dtype=np.float32)
+    if depth.ndim == 3:
+        depth = depth[..., 0]
+    gbuffer = SoftwareGBuffer(depth.shape[1], depth.shape[0])
+    color = np.asarray(color)
+    if color.dtype == np.uint8:
+        color = color / np.float32(255.0)
+    gbuffer.color = color.astype(np.float32)
+    gbuffer.normal = np.asarray(normal, dtype=np.float32)
+    gbuffer.depth = depth
+    if object_id is not None:
+        gbuffer.object_id = np.asarray(object_id, dtype=np.uint32).reshape(depth.shape)
+    return gbuffer
+
+
+def block_values(block) -> dict:
+    # uniform block record -> {field: float32 value}, matrices back to row-major
+    record = np.atleast_1d(block)[0]
+    values = {}
+    for name in record.dtype.names:
+        value = np.array(record[name], dtype=np.float32)
+        values[name] = std140_matrix(value) if value.shape == (4, 4) else value
+    return values
+
+
+"""
+shader helpers, float32 like the gpu
+"""
+
+
+def _linear_depth(depth, near, far):
+    return (2.0 * near) / (far + near - depth * (far - near))
+
+
+def _non_linear_depth(depth, near, far):
+    return (((2.0 * near) / depth) - far - near) / (near - far)
+
+
+def _to_gamma(color):
+    return np.power(color, np.float32(2.2))
+
+
+def _from_gamma(color):
+    return np.power(color, np.float32(1.0 / 2.2))
+
+
+def _dot(a, b):
+    return np.einsum("...k,...k->...", a, b)
+
+
+def _normalize(v):
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+def _smoothstep(edge0, edge1, x):
+    t = np.clip((x - edge0) / (edge1 - edge0), 0.0, 1.0)
+    return t * t * (3.0 - 2.0 * t)
+
+
+def _transform(matrix, points):
+    # row-major 4x4 times (..., 3) points with w = 1 -> (..., 4)
+    return points @ matrix[:, 0:3].T + matrix[:, 3]
+
+
+def _project(matrix, points):
+    homogeneous = _transform(matrix, points)
+    return homogeneous[..., 0:3] / homogeneous[..., 3:4]
+
+
+def _unorm8(color):
+    # store into an rgba8 target
+    return (np.round(np.clip(color, 0.0, 1.0) * 255.0) / 255.0).astype(np.float32)
+
+
+def sample_nearest(texture, u, v, wrap: str = SOFTWARE_WRAP_CLAMP):
+    # GL_NEAREST fetch at texcoords (u, v) of a top-row-first texture
+    height, width = texture.shape[:2]
+    x = np.nan_to_num(np.floor(u * width))
+    y = np.nan_to_num(np.floor(v * height))
+    if wrap == SOFTWARE_WRAP_REPEAT:
+        x = np.mod(x, width)
+        y = np.mod(y, height)
+    else:
+        x = np.clip(x, 0, width - 1)
+        y = np.clip(y, 0, height - 1)
+    return texture[height - 1 - y.astype(np.intp), x.astype(np.intp)]
+
+
+def _texcoords(width: int, height: int, rows: slice):
+    # fragTexCoord of the pixel centers in rows, (rows, width) each
+    u = (np.arange(width, dtype=np.float32) + 0.5) / width
+    v = 1.0 - (np.arange(rows.start, rows.stop, dtype=np.float32) + 0.5) / height
+    shape = (rows.stop - rows.start, width)
+    return np.broadcast_to(u, shape), np.broadcast_to(v[:, None], shape)
+
+
+def _camera_space(u, v, depth, camera):
+    # camera_space.glsl
+    near, far = camera["camera_clip_near"], camera["camera_clip_far"]
+    clip = np.stack([u, v, _non_linear_depth(depth, near, far)], axis=-1) * 2.0 - 1.0
+    return _project(camera["camera_inv_projection"], clip)
+
+
+def _rand(u, v):
+    # ssao.fs Rand(): hashed noise in [-1, 1]^3
+    hashed = np.sin(u * np.float32(12.9898) + v * np.float32(78.233))[:, None]
+    scale = np.array([43758.5453, 21383.21227, 20431.20563], dtype=np.float32)
+    hashed = hashed * scale
+    return 2.0 * (hashed - np.floor(hashed)) - 1.0
+
+
+def _fast_neg_exp(x):
+    return 1.0 / (1.0 + x + 0.48 * x * x + 0.235 * x * x * x)
+
+
+def _run_tiles(executor, tile_rows: int, height: int, function, *args):
+    # function(rows, *args) -> output rows, concatenated top to bottom
+    tiles = [
+        slice(start, min(start + tile_rows, height))
+        for start in range(0, height, tile_rows)
+    ]
+    if executor is None:
+        parts = [function(rows, *args) for rows in tiles]
+    else:
+        parts = list(
+            executor.map(function, tiles, *[[arg] * len(tiles) for arg in args])
+        )
+    return np.concatenate(parts, axis=0)
+
+
+"""
+passes: a *_rows() function per shader computes a tile, module level so a process
+pool can pickle it
+"""
+
+
+def _ssao_rows(rows, normal, depth, shadow_map, camera, light, sample_num):
+    height, width = depth.shape
+    output = np.empty((rows.stop - rows.start, width, 4), dtype=np.float32)
+    output[:] = SOFTWARE_SSAO_CLEAR
+    u, v = _texcoords(width, height, rows)
+    frag_depth = depth[rows]
+    # discard the background
+    mask = frag_depth != 1.0
+    u, v, frag_depth = u[mask], v[mask], frag_depth[mask]
+    frag_normal = normal[rows][mask][:, 0:3] * 2.0 - 1.0
+    seed = _rand(u, v)
+    near, far = camera["camera_clip_near"], camera["camera_clip_far"]
+
+    # compute shadows
+    position_clip = (
+        np.stack([u, v, _non_linear_depth(frag_depth, near, far)], axis=-1) * 2.0 - 1.0
+    )
+    frag_position = _project(camera["camera_inv_view_projection"], position_clip)
+    light_space = _project(
+        light["light_view_projection"],
+        frag_position + SHADOW_NORMAL_BIAS * frag_normal,
+    )
+    light_space = (light_space + 1.0) / 2.0
+    shadow_clip = (
+        (light_space[:, 0] < 1.0)
+        & (light_space[:, 0] > 0.0)
+        & (light_space[:, 1] < 1.0)
+        & (light_space[:, 1] > 0.0)
+    )
+    inv_resolution = light["shadow_inv_resolution"]
+    occluder = sample_nearest(
+        shadow_map,
+        light_space[:, 0] + inv_resolution[0] * seed[:, 0],
+        light_space[:, 1] + inv_resolution[1] * seed[:, 1],
+    )
+    shadowed = (
+        _linear_depth(
+            light_space[:, 2], light["light_clip_near"], light["light_clip_far"]
+        )
+        - SHADOW_DEPTH_BIAS
+        > occluder
+    )
+    shadow = 1.0 - (shadow_clip & shadowed)
+
+    # compute SSAO
+    view_normal = frag_normal @ camera["camera_view"][0:3, 0:3].T
+    base = _camera_space(u, v, frag_depth, camera)
+    occlusion = np.zeros(base.shape[0], dtype=np.float32)
+    for index in range(sample_num):
+        alpha = (index + 0.5) / sample_num
+        angle = alpha * (SSAO_TURNS * 2.0 * math.pi) + 2.0 * math.pi * seed[:, 2]
+        sample = base.copy()
+        sample[:, 0] += SSAO_RADIUS * alpha * np.cos(angle)
+        sample[:, 1] += SSAO_RADIUS * alpha * np.sin(angle)
+        sample_tex = _transform(camera["camera_projection"], sample)
+        sample_u = (sample_tex[:, 0] / sample_tex[:, 3]) * 0.5 + 0.5
+        sample_v = (sample_tex[:, 1] / sample_tex[:, 3]) * 0.5 + 0.5
+        sample_position = _camera_space(
+            sample_u, sample_v, sample_nearest(depth, sample_u, sample_v), camera
+        )
+        difference = sample_position - base
+
+        vv = _dot(difference, difference)
+        vn = _dot(difference, view_normal) - SSAO_BIAS
+        falloff = np.maximum(SSAO_RADIUS * SSAO_RADIUS - vv, 0.0)
+        occlusion += falloff * falloff * falloff * np.maximum(vn / (0.001 + vv), 0.0)
+    occlusion = occlusion / SSAO_RADIUS**6
+
+    ssao = np.maximum(0.0, 1.0 - occlusion * SSAO_INTENSITY * (5.0 / sample_num))
+    values = np.zeros((ssao.shape[0], 4), dtype=np.float32)
+    values[:, 0] = ssao
+    values[:, 1] = shadow
+    values[:, 3] = 1.0
+    output[mask] = _unorm8(values)
+    return output
+
+
+def _blur_rows(rows, normal, depth, source, target, camera, direction, radius, stride):
+    height, width = depth.shape
+    # discarded pixels keep the target's content
+    output = target[rows].copy()
+    u, v = _texcoords(width, height, rows)
+    frag_depth = depth[rows]
+    mask = frag_depth != 1.0
+    u, v, frag_depth = u[mask], v[mask], frag_depth[mask]
+
+    base_normal = normal[rows][mask][:, 0:3] * 2.0 - 1.0
+    base_position = _camera_space(u, v, frag_depth, camera)
+    step_u = stride * direction[0] / source.shape[1]
+    step_v = stride * direction[1] / source.shape[0]
+
+    total_color = np.zeros((u.shape[0], 4), dtype=np.float32)
+    total_weight = np.zeros(u.shape[0], dtype=np.float32)
+    for x in range(-radius, radius + 1):
+        sample_u = u + x * step_u
+        sample_v = v + x * step_v
+        sample_color = sample_nearest(source, sample_u, sample_v, SOFTWARE_WRAP_REPEAT)
+        sample_normal = (
+            sample_nearest(normal, sample_u, sample_v, SOFTWARE_WRAP_REPEAT)[:, 0:3]
+            * 2.0
+            - 1.0
+        )
+        sample_position = _camera_space(
+            sample_u, sample_v, sample_nearest(depth, sample_u, sample_v), camera
+        )
+        difference = (sample_position - base_position) / 0.05
+
+        weight = _fast_neg_exp(_dot(difference, difference)) * np.maximum(
+            _dot(sample_normal, base_normal), 0.0
+        )
+        total_color += weight[:, None] * sample_color
+        total_weight += weight
+
+    output[mask] = _unorm8(total_color / total_weight[:, None])
+    return output
+
+
+def _shade_local_lights(
+    positions, normals, eye, albedo, specularity, glossiness, lights, indices
+):
+    # lighting.fs LocalLighting() loop body, pixels x lights
+    to_light = lights.positions[indices][None, :, :] - positions[:, None, :]
+    distance = np.linalg.norm(to_light, axis=2)
+    light_direction = to_light / np.maximum(distance, 0.0001)[..., None]
+
+    # windowed inverse square falloff, zero at the light radius
+    window = np.clip(1.0 - (distance / lights.radii[indices]) ** 4, 0.0, 1.0)
+    attenuation = window * window / (distance * distance + 1.0)
+    cone = _smoothstep(
+        lights.cos_outer[indices],
+        lights.cos_inner[indices],
+        _dot(-light_direction, lights.directions[indices][None, :, :]),
+    )
+
+    half = _normalize(light_direction - eye[:, None, :])
+    factor_diffuse = np.maximum(_dot(normals[:, None, :], light_direction), 0.0)
+    factor_specular = (
+        specularity[:, None]
+        * ((glossiness[:, None] + 2.0) / (8.0 * math.pi))
+        * np.power(
+            np.maximum(_dot(normals[:, None, :], half), 0.0), glossiness[:, None]
+        )
+    )
+    radiance = (
+        _from_gamma(lights.colors[indices]) * lights.intensities[indices][:, None]
+    )
+    return np.einsum(
+        "pl,lk,plk->pk",
+        attenuation * cone * factor_diffuse,
+        radiance,
+        albedo[:, None, :] + factor_specular[..., None],
+    )
+
+
+def _local_lighting(
+    u, v, positions, normals, eye, albedo, specularity, glossiness, depth_clip,
+    camera, lights, clusters,
+):  # fmt: skip
+    # lighting.fs LocalLighting(): the pixels of a cluster shade its light list
+    near, far = camera["camera_clip_near"], camera["camera_clip_far"]
+    view_depth = (2.0 * near * far) / (far + near - depth_clip * (far - near))
+    cluster_x = np.clip(np.floor(u * clusters.tiles_x), 0, clusters.tiles_x - 1)
+    cluster_y = np.clip(np.floor(v * clusters.tiles_y), 0, clusters.tiles_y - 1)
+    cluster_z = np.clip(
+        np.floor(np.log(view_depth) * clusters.depth_scale + clusters.depth_bias),
+        0,
+        clusters.slices - 1,
+    )
+    pixel_clusters = (
+        (cluster_z * clusters.tiles_y + cluster_y) * clusters.tiles_x + cluster_x
+    ).astype(np.int64)
+
+    result = np.zeros(positions.shape, dtype=np.float32)
+    pixel_order = np.argsort(pixel_clusters, kind="stable")
+    unique_clusters, cluster_starts = np.unique(
+        pixel_clusters[pixel_order], return_index=True
+    )
+    cluster_ends = np.append(cluster_starts[1:], pixel_order.shape[0])
+    for cluster, begin, end in zip(unique_clusters, cluster_starts, cluster_ends):
+        count = clusters.counts[cluster]
+        if count == 0:
+            continue
+        offset = clusters.offsets[cluster]
+        pixels = pixel_order[begin:end]
+        result[pixels] = _shade_local_lights(
+            positions[pixels],
+            normals[pixels],
+            eye[pixels],
+            albedo[pixels],
+            specularity[pixels],
+            glossiness[pixels],
+            lights,
+            clusters.light_indices[offset : offset + count],
+        )
+    return result
+
+
+def _lighting_rows(rows, color, normal, depth, ssao, camera, light, lights, clusters):
+    height, width = depth.shape
+    output = np.empty((rows.stop - rows.start, width, 4), dtype=np.float32)
+    output[:] = SOFTWARE_LIGHTING_CLEAR
+    u, v = _texcoords(width, height, rows)
+    frag_depth = depth[rows]
+    mask = frag_depth != 1.0
+    u, v, frag_depth = u[mask], v[mask], frag_depth[mask]
+    near, far = camera["camera_clip_near"], camera["camera_clip_far"]
+
+    # unpack GBuffer
+    color_and_specular = color[rows][mask]
+    normal_and_glossiness = normal[rows][mask]
+    position_clip = (
+        np.stack([u, v, _non_linear_depth(frag_depth, near, far)], axis=-1) * 2.0 - 1.0
+    )
+    pixel_position = _project(camera["camera_inv_view_projection"], position_clip)
+    pixel_normal = normal_and_glossiness[:, 0:3] * 2.0 - 1.0
+    ssao_data = ssao[rows][mask]
+    albedo = color_and_specular[:, 0:3]
+    specularity = color_and_specular[:, 3]
+    glossiness = normal_and_glossiness[:, 3] * 100.0
+    sun_shadow = ssao_data[:, 1:2]
+    ambient_shadow = ssao_data[:, 0:1]
+
+    # compute lighting
+    light_direction = light["light_direction"]
+    eye_direction = _normalize(pixel_position - camera["camera_position"])
+    sun_color = _from_gamma(light["sun_color"])
+    sun_half = _normalize(-light_direction - eye_direction)
+    sky_color = _from_gamma(light["sky_color"])
+    sky_direction = np.array([0.0, -1.0, 0.0], dtype=np.float32)
+
+    sky_factor_diffuse = np.maximum(_dot(pixel_normal, -light_direction), 0.0)[:, None]
+    sky_factor_specular = (
+        specularity
+        * ((glossiness + 2.0) / (8.0 * math.pi))
+        * np.power(np.maximum(_dot(pixel_normal, sun_half), 0.0), glossiness)
+    )[:, None]
+    ground_factor_diffuse = np.maximum(_dot(pixel_normal, sky_direction), 0.0)[:, None]
+
+    # combining:
+    ambient = ambient_shadow * light["ambient_intensity"] * sky_color * albedo
+    diffuse = (
+        sun_shadow * light["sun_intensity"] * sun_color * albedo * sky_factor_diffuse
+        + light["ground_intensity"] * sky_color * albedo * ground_factor_diffuse
+        + light["sky_intensity"] * sky_color * albedo * sky_factor_diffuse
+    )
+    specular = (
+        sun_shadow * light["sun_intensity"] * sky_factor_specular
+        + light["sky_intensity"] * sky_factor_specular
+    )
+    local = _local_lighting(
+        u,
+        v,
+        pixel_position,
+        pixel_normal,
+        eye_direction,
+        albedo,
+        specularity,
+        glossiness,
+        position_clip[:, 2],
+        camera,
+        lights,
+        clusters,
+    )
+
+    final = diffuse + specular + ambient + local
+    values = np.ones((final.shape[0], 4), dtype=np.float32)
+    values[:, 0:3] = _to_gamma(light["exposure"] * final)
+    output[mask] = _unorm8(values)
+    return output
+
+
+def _fxaa_rows(rows, source):
+    height, width = source.shape[:2]
+    u, v = _texcoords(width, height, rows)
+    inv_width, inv_height = 1.0 / width, 1.0 / height
+
+    def fetch(offset_u, offset_v):
+        return sample_nearest(source, u + offset_u, v + offset_v, SOFTWARE_WRAP_REPEAT)[
+            ..., 0:3
+        ]
+
+    luma_nw = fetch(-inv_width, -inv_height) @ FXAA_LUMA
+    luma_ne = fetch(inv_width, -inv_height) @ FXAA_LUMA
+    luma_sw = fetch(-inv_width, inv_height) @ FXAA_LUMA
+    luma_se = fetch(inv_width, inv_height) @ FXAA_LUMA
+    luma_mi = fetch(0.0, 0.0) @ FXAA_LUMA
+
+    luma_min = np.minimum(
+        luma_mi, np.minimum(np.minimum(luma_nw, luma_ne), np.minimum(luma_sw, luma_se))
+    )
+    luma_max = np.maximum(
+        luma_mi, np.maximum(np.maximum(luma_nw, luma_ne), np.maximum(luma_sw, luma_se))
+    )
+
+    direction_u = -((luma_nw + luma_ne) - (luma_sw + luma_se))
+    direction_v = (luma_nw + luma_sw) - (luma_ne + luma_se)
+    direction_reduce = np.maximum(
+        (luma_nw + luma_ne + luma_sw + luma_se) * (0.25 * FXAA_REDUCE_AMOUNT),
+        FXAA_REDUCE_MIN,
+    )
+    direction_rcp_min = 1.0 / (
+        np.minimum(np.abs(direction_u), np.abs(direction_v)) + direction_reduce
+    )
+    direction_u = (
+        np.clip(direction_u * direction_rcp_min, -FXAA_SPAN_MAX, FXAA_SPAN_MAX)
+        * inv_width
+    )
+    direction_v = (
+        np.clip(direction_v * direction_rcp_min, -FXAA_SPAN_MAX, FXAA_SPAN_MAX)
+        * inv_height
+    )
+
+    rgba0 = fetch(direction_u * (1.0 / 3.0 - 0.5), direction_v * (1.0 / 3.0 - 0.5))
+    rgba1 = fetch(direction_u * (2.0 / 3.0 - 0.5), direction_v * (2.0 / 3.0 - 0.5))
+    rgba2 = fetch(direction_u * (0.0 / 3.0 - 0.5), direction_v * (0.0 / 3.0 - 0.5))
+    rgba3 = fetch(direction_u * (3.0 / 3.0 - 0.5), direction_v * (3.0 / 3.0 - 0.5))
+
+    rgb0 = (1.0 / 2.0) * (rgba0 + rgba1)
+    rgb1 = rgb0 * (1.0 / 2.0) + (1.0 / 4.0) * (rgba2 + rgba3)
+
+    luma_b = rgb1 @ FXAA_LUMA
+    outside = (luma_b < luma_min) | (luma_b > luma_max)
+    output = np.ones(u.shape + (4,), dtype=np.float32)
+    output[..., 0:3] = np.where(outside[..., None], rgb0, rgb1)
+    return _unorm8(output)
+
+
+def software_ssao(
+    gbuffer: SoftwareGBuffer,
+    camera,
+    light,
+    shadow_map,
+    sample_num: int = 9,
+    executor=None,
+    tile_rows: int = SOFTWARE_TILE_ROWS,
+):
+    # ssao.fs: (height, width, 4) with r = ambient occlusion, g = sun shadow
+    # - camera/light: CameraBlock/LightBlock records, shadow_map: light depths
+    return _run_tiles(
+        executor,
+        tile_rows,
+        gbuffer.height,
+        _ssao_rows,
+        gbuffer.normal,
+        gbuffer.depth,
+        shadow_map,
+        block_values(camera),
+        block_values(light),
+        sample_num,
+    )
+
+
+def software_blur(
+    gbuffer: SoftwareGBuffer,
+    camera,
+    source,
+    target,
+    direction,
+    radius: int = 3,
+    stride: float = 2.0,
+    executor=None,
+    tile_rows: int = SOFTWARE_TILE_ROWS,
+):
+    # blur.fs along direction ((1, 0) or (0, 1)), returns a new target: background
+    # pixels keep target's values like the gpu keeps the render texture's
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _run_tiles(
+            executor,
+            tile_rows,
+            gbuffer.height,
+            _blur_rows,
+            gbuffer.normal,
+            gbuffer.depth,
+            source,
+            target,
+            block_values(camera),
+            direction,
+            radius,
+            stride,
+        )
+
+
+def software_lighting(
+    gbuffer: SoftwareGBuffer,
+    camera,
+    light,
+    ssao,
+    lights: LocalLights,
+    clusters: LightClusters,
+    executor=None,
+    tile_rows: int = SOFTWARE_TILE_ROWS,
+):
+    # lighting.fs with the hard shadow mask of ssao, clusters built for this camera
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _run_tiles(
+            executor,
+            tile_rows,
+            gbuffer.height,
+            _lighting_rows,
+            gbuffer.color,
+            gbuffer.normal,
+            gbuffer.depth,
+            ssao,
+            block_values(camera),
+            block_values(light),
+            lights,
+            clusters,
+        )
+
+
+def software_fxaa(source, executor=None, tile_rows: int = SOFTWARE_TILE_ROWS):
+    # fxaa.fs over every pixel of source
+    return _run_tiles(executor, tile_rows, source.shape[0], _fxaa_rows, source)
+
+
+def reference_difference(reference, image, tolerance: float = SOFTWARE_TOLERANCE):
+    # (largest channel difference, fraction of pixels beyond tolerance)
+    # - uint8 images are compared in [0, 1]
+    def normalized(array):
+        array = np.asarray(array)
+        if array.dtype == np.uint8:
+            return array / np.float32(255.0)
+        return array.astype(np.float32)
+
+    difference = np.abs(normalized(reference) - normalized(image))
+    if difference.ndim == 3:
+        difference = difference.max(axis=2)
+    return float(difference.max()), float(np.mean(difference > tolerance))
+
+
+"""
+cpu rasterizer: homogeneous (2d) rasterization, no clipping needed for triangles
+crossing the camera plane; one vectorized pass per triangle over its bounding box
+"""
+
+
+class SoftwareObject:
+    def __init__(
+        self,
+        mesh: MeshData,
+        transform,
+        color,
+        specularity: float = 0.5,
+        glossiness: float = 10.0,
+        object_id: int = OBJECT_ID_NONE,
+    ):
+        self.mesh = mesh
+        # row-major 4x4 model matrix, rotation and translation only
+        self.transform = np.asarray(transform, dtype=np.float32)
+        # rgb 0-255 in gamma space, like the material's diffuse color
+        self.color = color
+        self.specularity = specularity
+        self.glossiness = glossiness
+        self.object_id = object_id
+
+
+def plane_mesh_data(width: float, length: float, res_x: int, res_z: int) -> MeshData:
+    # xz plane facing +y, the layout of rl.gen_mesh_plane()
+    x = np.linspace(-width / 2.0, width / 2.0, res_x + 1, dtype=np.float32)
+    z = np.linspace(-length / 2.0, length / 2.0, res_z + 1, dtype=np.float32)
+    grid_x, grid_z = np.meshgrid(x, z)
+    positions = np.stack(
+        [grid_x.ravel(), np.zeros(grid_x.size, np.float32), grid_z.ravel()], axis=1
+    )
+    normals = np.tile(np.array([0.0, 1.0, 0.0], dtype=np.float32), (grid_x.size, 1))
+    texcoords = np.stack(
+        [
+            (grid_x.ravel() + width / 2.0) / width,
+            (grid_z.ravel() + length / 2.0) / length,
+        ],
+        axis=1,
+    ).astype(np.float32)
+    corner = (np.arange(res_z)[:, None] * (res_x + 1) + np.arange(res_x)).ravel()
+    a, b = corner, corner + 1
+    c, d = corner + res_x + 1, corner + res_x + 2
+    indices = np.concatenate(
+        [np.stack([a, c, b], axis=1), np.stack([b, c, d], axis=1)]
+    ).astype(np.uint32)
+    return MeshData(positions, normals, texcoords, indices)
+
+
+def sphere_mesh_data(radius: float, rings: int, slices: int) -> MeshData:
+    # uv sphere, counter-clockwise seen from outside
+    theta = np.linspace(0.0, math.pi, rings + 1, dtype=np.float32)
+    phi = np.linspace(0.0, 2.0 * math.pi, slices + 1, dtype=np.float32)
+    grid_theta, grid_phi = np.meshgrid(theta, phi, indexing="ij")
+    normals = np.stack(
+        [
+            np.sin(grid_theta) * np.cos(grid_phi),
+            np.cos(grid_theta),
+            np.sin(grid_theta) * np.sin(grid_phi),
+        ],
+        axis=-1,
+    ).reshape(-1, 3)
+    texcoords = np.stack(
+        [grid_phi / (2.0 * math.pi), grid_theta / math.pi], axis=-1
+    ).reshape(-1, 2)
+    corner = (np.arange(rings)[:, None] * (slices + 1) + np.arange(slices)).ravel()
+    a, b = corner, corner + 1
+    c, d = corner + slices + 1, corner + slices + 2
+    indices = np.concatenate([np.stack([a, b, c], axis=1), np.stack([b, d, c], axis=1)])
+    # orient outwards, the pole triangles are degenerate either way
+    positions = (radius * normals).astype(np.float32)
+    triangles = positions[indices]
+    facing = _dot(
+        np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]),
+        triangles.sum(axis=1),
+    )
+    indices[facing < 0.0] = indices[facing < 0.0][:, ::-1]
+    return MeshData(
+        positions,
+        normals.astype(np.float32),
+        texcoords.astype(np.float32),
+        indices.astype(np.uint32),
+    )
+
+
+def software_scene():
+    # the Renderer's scene: ground plane and sphere with flat materials
+    return [
+        SoftwareObject(
+            plane_mesh_data(20.0, 20.0, 10, 10),
+            matrix_translate_numpy(0.0, -0.01, 0.0),
+            (190, 190, 190),
+            object_id=OBJECT_ID_GROUND,
+        ),
+        SoftwareObject(
+            sphere_mesh_data(0.5, 32, 32),
+            matrix_translate_numpy(0.0, 0.5, 0.0),
+            rl.ORANGE[0:3],
+            object_id=OBJECT_ID_SPHERE,
+        ),
+    ]
+
+
+def _rasterize(window_depth, view_projection, objects):
+    # depth-tested fragments of objects' front faces, window_depth is updated
+    # - yields (object, triangle vertices, rows, columns, mask, barycentrics) per
+    #   triangle; mask selects the written pixels of window_depth[rows, columns]
+    height, width = window_depth.shape
+    ndc_x = (np.arange(width, dtype=np.float32) + 0.5) / width * 2.0 - 1.0
+    ndc_y = 1.0 - (np.arange(height, dtype=np.float32) + 0.5) / height * 2.0
+
+    for obj in objects:
+        mesh = obj.mesh
+        clip = _transform(
+            view_projection @ obj.transform, mesh.positions.astype(np.float32)
+        )
+        triangles = mesh.indices.astype(np.intp)
+        # rows x, y, w of the three vertices: det > 0 for front faces
+        setup = clip[triangles][:, :, [0, 1, 3]].transpose(0, 2, 1).astype(np.float64)
+        front = np.linalg.det(setup) > 1e-12
+        triangles, setup = triangles[front], setup[front]
+        if triangles.shape[0] == 0:
+            continue
+        # inverse rows: barycentrics over w at a pixel, all positive inside
+        edges = np.linalg.inv(setup).astype(np.float32)
+        in_front = np.all(setup[:, 2, :] > 0.0, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            projected_x = setup[:, 0, :] / setup[:, 2, :]
+            projected_y = setup[:, 1, :] / setup[:, 2, :]
+
+        for index in range(triangles.shape[0]):
+            if in_front[index]:
+                # bounding box in pixels, triangles crossing w = 0 use the screen
+                x = (projected_x[index] + 1.0) * 0.5 * width - 0.5
+                y = (1.0 - projected_y[index]) * 0.5 * height - 0.5
+                column_min = max(int(np.floor(x.min())), 0)
+                column_max = min(int(np.ceil(x.max())), width - 1)
+                row_min = max(int(np.floor(y.min())), 0)
+                row_max = min(int(np.ceil(y.max())), height - 1)
+                if column_min > column_max or row_min > row_max:
+                    continue
+            else:
+                column_min, column_max, row_min, row_max = 0, width - 1, 0, height - 1
+            rows = slice(row_min, row_max + 1)
+            columns = slice(column_min, column_max + 1)
+
+            edge = edges[index]
+            px = ndc_x[columns][None, :]
+            py = ndc_y[rows][:, None]
+            b0 = edge[0, 0] * px + edge[0, 1] * py + edge[0, 2]
+            b1 = edge[1, 0] * px + edge[1, 1] * py + edge[1, 2]
+            b2 = edge[2, 0] * px + edge[2, 1] * py + edge[2, 2]
+            inside = (b0 > 0.0) & (b1 > 0.0) & (b2 > 0.0)
+            if not inside.any():
+                continue
+
+            # perspective-correct barycentrics of the covered pixels
+            barycentrics = np.stack([b0[inside], b1[inside], b2[inside]], axis=1)
+            barycentrics /= barycentrics.sum(axis=1, keepdims=True)
+            vertices = triangles[index]
+            clip_z = barycentrics @ clip[vertices, 2]
+            clip_w = barycentrics @ clip[vertices, 3]
+            ndc_z = clip_z / clip_w
+
+            target = window_depth[rows, columns]
+            depth = ndc_z * 0.5 + 0.5
+            passed = (ndc_z >= -1.0) & (ndc_z <= 1.0) & (depth < target[inside])
+            if not passed.any():
+                continue
+            mask = np.zeros(inside.shape, dtype=bool)
+            mask[inside] = passed
+            target[mask] = depth[passed]
+            yield obj, vertices, rows, columns, mask, barycentrics[passed]
+
+
+def rasterize_gbuffer(gbuffer: SoftwareGBuffer, camera, objects):
+    # basic.fs with flat materials into gbuffer (cleared first)
+    values = block_values(camera)
+    view_projection = values["camera_projection"] @ values["camera_view"]
+    window_depth = np.ones(gbuffer.depth.shape, dtype=np.float32)
+    gbuffer.color[:] = 0.0
+    gbuffer.normal[:] = 0.0
+    gbuffer.object_id[:] = OBJECT_ID_NONE
+
+    normal_matrices = {}
+    for obj, vertices, rows, columns, mask, barycentrics in _rasterize(
+        window_depth, view_projection, objects
+    ):
+        if obj not in normal_matrices:
+            normal_matrices[obj] = obj.mesh.normals @ obj.transform[0:3, 0:3].T
+        normal = _normalize(barycentrics @ normal_matrices[obj][vertices])
+        albedo = _from_gamma(np.asarray(obj.color, dtype=np.float32) / 255.0)
+
+        color = gbuffer.color[rows, columns]
+        color[mask, 0:3] = albedo
+        color[mask, 3] = obj.specularity
+        normal_target = gbuffer.normal[rows, columns]
+        normal_target[mask, 0:3] = normal * 0.5 + 0.5
+        normal_target[mask, 3] = obj.glossiness / 100.0
+        gbuffer.object_id[rows, columns][mask] = obj.object_id
+
+    # LinearDepth() of the fragments, the background keeps the cleared 1.0
+    covered = window_depth != 1.0
+    gbuffer.depth[:] = 1.0
+    gbuffer.depth[covered] = _linear_depth(
+        window_depth[covered], values["camera_clip_near"], values["camera_clip_far"]
+    )
+    return gbuffer
+
+
+def rasterize_shadow_map(shadow_map, light, objects):
+    # shadow.fs (hard filter) into shadow_map (height, width) float32
+    values = block_values(light)
+    window_depth = np.ones(shadow_map.shape, dtype=np.float32)
+    for _ in _rasterize(window_depth, values["light_view_projection"], objects):
+        pass
+    covered = window_depth != 1.0
+    shadow_map[:] = 1.0
+    shadow_map[covered] = _linear_depth(
+        window_depth[covered], values["light_clip_near"], values["light_clip_far"]
+    )
+    return shadow_map
+
+
+def software_camera_block(camera3d: rl.Camera3D, width: int, height: int):
+    # CameraBlock record of camera3d, with the current rlgl clip planes
+    view, projection = camera_matrices(camera3d, float(width) / float(height))
+    camera = np.zeros(1, dtype=CAMERA_BLOCK_DTYPE)
+    write_camera_block(
+        camera,
+        vector3_state(camera3d.position),
+        matrix_to_numpy(view),
+        matrix_to_numpy(projection),
+        rl.rl_get_cull_distance_near(),
+        rl.rl_get_cull_distance_far(),
+    )
+    return camera
+
+
+def software_light_block(shadow_size: int = 1024):
+    # LightBlock record of the Renderer's sun and shadow light
+    light_direction = rl.vector3_normalize(rl.Vector3(*SCENE_LIGHT_DIRECTION))
+    light_view, light_projection = shadow_light_matrices(
+        scene_shadow_light(light_direction)
+    )
+    light = np.zeros(1, dtype=LIGHT_BLOCK_DTYPE)
+    for name, value in SCENE_LIGHTING.items():
+        light[name] = value
+    light["shadow_inv_resolution"] = (1.0 / shadow_size, 1.0 / shadow_size)
+    write_light_block(
+        light,
+        matrix_to_numpy(rl.matrix_multiply(light_view, light_projection)),
+        vector3_state(light_direction),
+        rl.rl_get_cull_distance_near(),
+        rl.rl_get_cull_distance_far(),
+    )
+    return light
+
+
+class SoftwareRenderer:
+    # Renderer.render_view() on the cpu: ssao -> blur -> lighting -> fxaa
+    # - executor: optional concurrent.futures pool the passes tile over
+    def __init__(
+        self,
+        quality: str = "medium",
+        executor=None,
+        tile_rows: int = SOFTWARE_TILE_ROWS,
+    ):
+        assert quality in SHADER_QUALITY_TIERS
+        defines = SHADER_QUALITY_TIERS[quality]
+        self.ssao_sample_num = defines["ssao"]["SSAO_SAMPLE_NUM"]
+        self.blur_radius = defines["blur"]["BLUR_RADIUS"]
+        self.blur_stride = defines["blur"]["BLUR_STRIDE"]
+        self.executor = executor
+        self.tile_rows = tile_rows
+
+        # same clip planes as the Renderer, read by software_camera_block()
+        rl.rl_set_clip_planes(*CAMERA_CLIP_PLANES)
+        self.light_clusters = LightClusters(tiles_x=16, tiles_y=9, slices=24)
+
+        # pass targets, valid after render_view()
+        self.ssao_front = None
+        self.ssao_back = None
+        self.lighted = None
+        self.final = None
+        # milliseconds per pass of the last render_view()
+        self.timings = {}
+
+    def render_view(
+        self,
+        gbuffer: SoftwareGBuffer,
+        camera,
+        light,
+        shadow_map,
+        lights: LocalLights,
+    ):
+        # final color (height, width, 4) of gbuffer seen by camera
+        timings = {}
+        shape = (gbuffer.height, gbuffer.width, 4)
+        if self.ssao_back is None or self.ssao_back.shape != shape:
+            self.ssao_back = np.ones(shape, dtype=np.float32)
+        tiling = {"executor": self.executor, "tile_rows": self.tile_rows}
+
+        start = time.perf_counter()
+        values = block_values(camera)
+        build_light_clusters(
+            self.light_clusters,
+            lights.positions[: lights.count],
+            lights.radii[: lights.count],
+            values["camera_view"],
+            values["camera_projection"],
+            float(values["camera_clip_near"]),
+            float(values["camera_clip_far"]),
+        )
+        timings["clusters"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.ssao_front = software_ssao(
+            gbuffer, camera, light, shadow_map, self.ssao_sample_num, **tiling
+        )
+        timings["ssao"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.ssao_back = software_blur(
+            gbuffer,
+            camera,
+            self.ssao_front,
+            self.ssao_back,
+            (1.0, 0.0),
+            self.blur_radius,
+            self.blur_stride,
+            **tiling,
+        )
+        self.ssao_front = software_blur(
+            gbuffer,
+            camera,
+            self.ssao_back,
+            self.ssao_front,
+            (0.0, 1.0),
+            self.blur_radius,
+            self.blur_stride,
+            **tiling,
+        )
+        timings["blur"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.lighted = software_lighting(
+            gbuffer,
+            camera,
+            light,
+            self.ssao_front,
+            lights,
+            self.light_clusters,
+            **tiling,
+        )
+        timings["lighting"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.final = software_fxaa(self.lighted, **tiling)
+        timings["fxaa"] = time.perf_counter() - start
+
+        self.timings = {name: 1000.0 * seconds for name, seconds in timings.items()}
+        return self.final
+
+
+def render_batch_software(
+    pose_path: str,
+    output_dir: str,
+    width: int = 1280,
+    height: int = 720,
+    data_format: str = "npz",
+    num_workers: int = None,
+    quality: str = "medium",
+) -> BatchRenderStats:
+    # render_batch() without GL: same files per pose, passes tiled over threads
+    poses = load_camera_poses(pose_path)
+    os.makedirs(output_dir, exist_ok=True)
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+
+    stats = BatchRenderStats()
+    stats.num_workers = num_workers
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_workers)
+    renderer = SoftwareRenderer(quality, executor)
+
+    objects = software_scene()
+    lights = scene_local_lights()
+    light = software_light_block()
+    shadow_map = rasterize_shadow_map(
+        np.ones((1024, 1024), dtype=np.float32), light, objects
+    )
+    gbuffer = SoftwareGBuffer(width, height)
+
+    begin = time.perf_counter()
+    encodes = []
+    for frame_index, pose in enumerate(poses):
+        camera = software_camera_block(camera_from_pose(pose), width, height)
+        rasterize_gbuffer(gbuffer, camera, objects)
+        final = renderer.render_view(gbuffer, camera, light, shadow_map, lights)
+        color = np.round(final * 255.0).astype(np.uint8)
+        encodes.append(
+            executor.submit(
+                encode_batch_frame,
+                output_dir,
+                frame_index,
+                color,
+                gbuffer.depth[..., None].copy(),
+                gbuffer.normal.copy(),
+                float(camera["camera_clip_near"][0]),
+                float(camera["camera_clip_far"][0]),
+                data_format,
+            )
+        )
+    stats.render_seconds = time.perf_counter() - begin
+    for encode in encodes:
+        encode.result()
+    executor.shutdown()
+    stats.total_seconds = time.perf_counter() - begin
+    stats.num_frames = len(poses)
+
+    print(
+        f"software batch: {stats.num_frames} frames, {stats.num_workers} workers, "
+        f"render {stats.render_fps:.2f} fps, total {stats.fps:.2f} fps"
+    )
+    return stats
+
+
+"""
+gpu comparison: the software passes run on the gbuffer the Renderer drew, so only
+the pass math differs from the gpu frame (not the rasterization or the materials)
+"""
+
+
+def compare_with_gpu(
+    pose, width: int = 1280, height: int = 720, quality: str = "medium"
+) -> dict:
+    # renders pose with the Renderer (hidden window), reads back its gbuffer, lit and
+    # final color and runs the software passes on that gbuffer
+    # - {output: reference_difference()} for "lighted" and "final"
+    # - the software shadows are hard: expect differences at shadow edges with evsm
+    rl.set_trace_log_level(rl.LOG_WARNING)
+    rl.set_config_flags(rl.FLAG_WINDOW_HIDDEN)
+    rl.init_window(width, height, b"SseEngine Software Compare")
+    rl.set_target_fps(0)
+
+    renderer = Renderer(width, height, quality)
+    renderer.texture_streamer.finish()
+    final = rl.load_render_texture(width, height)
+    final_resource = gpu_resources.track(
+        "software_compare",
+        "final",
+        final,
+        rl.unload_render_texture,
+        GPU_RENDER_TARGETS,
+        render_texture_bytes(final),
+    )
+
+    arrays = {}
+
+    def on_readback(frame):
+        arrays[frame.name] = frame.array.copy()
+
+    # one slot per output: render_pose() returns once its readbacks are delivered
+    readback = AsyncReadback(ring_size=1)
+    for name in BATCH_OUTPUTS + ("albedo", "lighted"):
+        readback.add_callback(name, on_readback)
+    render_pose(renderer, final, readback, pose, 0)
+    readback.request("albedo", renderer.gbuffer.id, 0, width, height, READBACK_RGBA8)
+    readback.request("lighted", renderer.lighted.id, 0, width, height, READBACK_RGBA8)
+    while readback.in_flight:
+        readback.poll(timeout_ns=1000000)
+
+    near, far = renderer.camera_clip_near, renderer.camera_clip_far
+    gbuffer = software_gbuffer(
+        arrays["albedo"],
+        arrays["normal"],
+        _linear_depth(arrays["depth"][..., 0], near, far),
+    )
+    camera = software_camera_block(camera_from_pose(pose), width, height)
+    light = software_light_block(renderer.shadow_width)
+    shadow_map = rasterize_shadow_map(
+        np.ones((renderer.shadow_height, renderer.shadow_width), dtype=np.float32),
+        light,
+        software_scene(),
+    )
+    software = SoftwareRenderer(quality)
+    software.render_view(gbuffer, camera, light, shadow_map, renderer.local_lights)
+
+    readback.unload()
+    gpu_resources.release(final_resource)
+    renderer.unload()
+    gpu_resources.check_leaks()
+    rl.close_window()
+
+    results = {}
+    for name, reference, image in (
+        ("lighted", arrays["lighted"], software.lighted),
+        ("final", arrays["color"], software.final),
+    ):
+        results[name] = reference_difference(reference, image)
+        max_difference, fraction = results[name]
+        print(
+            f"{name}: max difference {255.0 * max_difference:.1f}/255, "
+            f"{100.0 * fraction:.2f}% of pixels beyond "
+            f"{255.0 * SOFTWARE_TOLERANCE:.0f}/255"
+        )
+    return results
+
+
+"""
+benchmark: milliseconds per pass and resolution, serial vs tiled over threads
+"""
+
+
+def benchmark_software_passes(
+    resolutions=((640, 360), (1280, 720), (1920, 1080)),
+    worker_counts=(1, os.cpu_count() or 1),
+    quality: str = "medium",
+    repeats: int = 3,
+):
+    renderer = SoftwareRenderer(quality)
+    objects = software_scene()
+    lights = scene_local_lights()
+    light = software_light_block()
+    shadow_map = rasterize_shadow_map(
+        np.ones((1024, 1024), dtype=np.float32), light, objects
+    )
+
+    camera3d = rl.Camera3D()
+    camera3d.position = rl.Vector3(2.0, 3.0, 5.0)
+    camera3d.target = rl.Vector3(-0.5, 1.0, 0.0)
+    camera3d.up = rl.Vector3(0.0, 1.0, 0.0)
+    camera3d.fovy = 45.0
+    camera3d.projection = rl.CAMERA_PERSPECTIVE
+
+    passes = ("raster", "clusters", "ssao", "blur", "lighting", "fxaa")
+    print(
+        f"{'resolution':>10} {'workers':>7} "
+        + " ".join(f"{name:>8}" for name in passes)
+        + f" {'Mpix/s':>7}"
+    )
+    results = []
+    for width, height in resolutions:
+        camera = software_camera_block(camera3d, width, height)
+        gbuffer = SoftwareGBuffer(width, height)
+        start = time.perf_counter()
+        rasterize_gbuffer(gbuffer, camera, objects)
+        raster_ms = 1000.0 * (time.perf_counter() - start)
+
+        for num_workers in worker_counts:
+            executor = None
+            if num_workers > 1:
+                executor = concurrent.futures.ThreadPoolExecutor(num_workers)
+            renderer.executor = executor
+            samples = {name: [] for name in passes[1:]}
+            for _ in range(repeats):
+                renderer.render_view(gbuffer, camera, light, shadow_map, lights)
+                for name in samples:
+                    samples[name].append(renderer.timings[name])
+            if executor is not None:
+                executor.shutdown()
+
+            timings = {"raster": raster_ms}
+            timings.update({name: float(np.median(samples[name])) for name in samples})
+            view_ms = sum(timings[name] for name in passes[1:])
+            result = (width, height, num_workers, timings)
+            results.append(result)
+            print(
+                f"{f'{width}x{height}':>10} {num_workers:7d} "
+                + " ".join(f"{timings[name]:8.1f}" for name in passes)
+                + f" {width * height / (1000.0 * view_ms):7.2f}"
+            )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="SseEngine software (numpy) deferred passes"
+    )
+    parser.add_argument(
+        "--resolutions", nargs="+", default=["640x360", "1280x720", "1920x1080"]
+    )
+    parser.add_argument("--workers", type=int, nargs="+", default=None)
+    parser.add_argument(
+        "--quality", choices=tuple(SHADER_QUALITY_TIERS), default="medium"
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--poses", help="render a pose file instead of benchmarking")
+    parser.add_argument("--output", default="./software_batch")
+    parser.add_argument("--format", choices=("npz", "exr"), default="npz")
+    parser.add_argument(
+        "--compare",
+        type=int,
+        metavar="POSE",
+        help="compare pose POSE of --poses (of an 8 pose orbit without) with the gpu",
+    )
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        width, height = (int(size) for size in args.resolutions[0].split("x"))
+        if args.poses:
+            pose = load_camera_poses(args.poses)[args.compare]
+        else:
+            pose = generate_orbit_poses(8)[args.compare]
+        compare_with_gpu(pose, width, height, args.quality)
+    elif args.poses:
+        width, height = (int(size) for size in args.resolutions[0].split("x"))
+        render_batch_software(
+            args.poses,
+            args.output,
+            width,
+            height,
+            args.format,
+            args.workers[0] if args.workers else None,
+            args.quality,
+        )
+    else:
+        benchmark_software_passes(
+            [
+                tuple(int(size) for size in value.split("x"))
+                for value in args.resolutions
+            ],
+            args.workers or (1, os.cpu_count() or 1),
+            args.quality,
+            args.repeats,
+        )
@@ -1,7 +1,13 @@
+import math
+import os
+import time
+
 import pyray as rl
 
-# renderdoc:
-from pyRenderdocApp import load_render_doc
+from startup import *
+
+# only needed by the frame dump backend
+json = lazy_import("json")
 
 
 # singleton instance for sse
@@ -22,6 +28,9 @@ class SingletonInstance:
 # renderdoc singleton
 class RenderDocInstance(SingletonInstance):
     def __init__(self):
+        # imported on first use, so runs without renderdoc never load it
+        from pyRenderdocApp import load_render_doc
+
         # retrieve renderdoc instance
         self.rd = load_render_doc()
 
@@ -69,3 +78,138 @@ def end_renderdoc():
 
         # if no renderdoc instance exists, open the renderdoc
         launch_renderdoc()
+
+
+def trigger_renderdoc_capture():
+    rd = RenderDocInstance.instance().rd
+
+    # capture the next frame, e.g. on a frame-time spike
+    rd.trigger_capture()
+
+
+# capture backends: begin_frame() after the frame starts, end_frame() right before
+# rl.end_drawing(), trigger_capture() records the next frame
+class NullCaptureBackend:
+    def begin_frame(self):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def trigger_capture(self, reason: str = "manual"):
+        pass
+
+    def unload(self):
+        pass
+
+
+class RenderDocCaptureBackend:
+    # F8: one frame, F9/F10: start/end a multi-frame capture
+    def __init__(self):
+        self.rd = RenderDocInstance.instance().rd
+
+    def begin_frame(self):
+        begin_renderdoc()
+
+    def end_frame(self):
+        end_renderdoc()
+
+    def trigger_capture(self, reason: str = "manual"):
+        trigger_renderdoc_capture()
+
+    def unload(self):
+        pass
+
+
+class FrameDumpCaptureBackend:
+    # built-in capture: backbuffer png + json metadata, read back without stalling
+    def __init__(self, output_dir: str = "./captures"):
+        from readback import AsyncReadback, READBACK_RGBA8, export_readback_frame
+
+        self.output_dir = output_dir
+        self.readback_format = READBACK_RGBA8
+        self.export_readback_frame = export_readback_frame
+        self.readback = AsyncReadback(ring_size=2)
+        self.readback.add_callback("capture", self._on_capture)
+        self.frame_index = -1
+        # reason of the capture requested for the next/current frame
+        self.pending_reason = None
+        self.capture_reason = None
+
+    def begin_frame(self):
+        self.frame_index += 1
+        if rl.is_key_pressed(rl.KEY_F8):
+            self.trigger_capture()
+        self.capture_reason = self.pending_reason
+        self.pending_reason = None
+
+    def end_frame(self):
+        if self.capture_reason is not None:
+            self.readback.request(
+                "capture",
+                0,
+                0,
+                rl.get_render_width(),
+                rl.get_render_height(),
+                self.readback_format,
+                self.frame_index,
+                user_data=(self.capture_reason, time.time()),
+            )
+            self.capture_reason = None
+        self.readback.poll()
+
+    def trigger_capture(self, reason: str = "manual"):
+        self.pending_reason = reason
+
+    def _on_capture(self, frame):
+        reason, timestamp = frame.user_data
+        path = os.path.join(self.output_dir, f"frame_{frame.frame_index:06d}")
+        self.export_readback_frame(frame, path + ".png")
+        with open(path + ".json", "w") as file:
+            json.dump(
+                {
+                    "frame": frame.frame_index,
+                    "reason": reason,
+                    "time": timestamp,
+                    "width": frame.width,
+                    "height": frame.height,
+                },
+                file,
+                indent=2,
+            )
+
+    def unload(self):
+        while self.readback.in_flight:
+            self.readback.poll(timeout_ns=1000000)
+        self.readback.unload()
+
+
+CAPTURE_BACKENDS = {
+    "none": NullCaptureBackend,
+    "renderdoc": RenderDocCaptureBackend,
+    "dump": FrameDumpCaptureBackend,
+}
+
+
+def load_capture_backend(name: str = "none", **kwargs):
+    return CAPTURE_BACKENDS[name or "none"](**kwargs)
+
+
+class SlowFrameCapture:
+    # telemetry slow-frame callback: capture the frame after a spike, rate limited
+    def __init__(self, backend, cooldown_seconds: float = 5.0, max_captures: int = 10):
+        self.backend = backend
+        self.cooldown_seconds = cooldown_seconds
+        self.max_captures = max_captures
+        self.num_captures = 0
+        self.last_capture = -math.inf
+
+    def __call__(self, frame_index, milliseconds):
+        now = time.perf_counter()
+        if self.num_captures >= self.max_captures:
+            return
+        if now - self.last_capture < self.cooldown_seconds:
+            return
+        self.num_captures += 1
+        self.last_capture = now
+        self.backend.trigger_capture(f"slow frame {frame_index}: {milliseconds:.2f}ms")
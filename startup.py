@@ -0,0 +1,68 @@
+# startup helpers: lazy imports and a time-to-first-frame profiler
+# - import this module first, its import time is the profiler's origin
+
+import contextlib
+import importlib.util
+import sys
+import time
+
+STARTUP_ORIGIN = time.perf_counter()
+
+
+def lazy_import(name: str):
+    # module object that is only executed on first attribute access
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+class StartupProfiler:
+    def __init__(self, origin: float = STARTUP_ORIGIN):
+        self.origin = origin
+        # (name, begin, end) in seconds since origin
+        self.sections = []
+        self.first_frame_time = None
+
+    @contextlib.contextmanager
+    def section(self, name: str):
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections.append(
+                (name, begin - self.origin, time.perf_counter() - self.origin)
+            )
+
+    def first_frame(self):
+        # call after the first rl.end_drawing(), reports once
+        if self.first_frame_time is not None:
+            return
+        self.first_frame_time = time.perf_counter() - self.origin
+        self.report()
+
+    def report(self):
+        total = self.first_frame_time or (time.perf_counter() - self.origin)
+        print(f"startup: {total * 1000.0:.1f}ms to first frame")
+        # everything before the first section is module imports
+        imports = self.sections[0][1] if self.sections else total
+        rows = [("imports", 0.0, imports)] + self.sections
+        accounted = imports
+        for name, begin, end in rows[1:]:
+            accounted += end - begin
+        for name, begin, end in rows:
+            milliseconds = (end - begin) * 1000.0
+            print(
+                f"  {name:<24} {milliseconds:8.1f}ms  {100.0 * (end - begin) / total:5.1f}%"
+            )
+        other = max(total - accounted, 0.0)
+        print(f"  {'other':<24} {other * 1000.0:8.1f}ms  {100.0 * other / total:5.1f}%")
+
+
+startup_profiler = StartupProfiler()
@@ -0,0 +1,241 @@
+import math
+import time
+
+import raylib as nrl
+
+import numpy as np
+
+from gl import *
+from startup import *
+
+# only needed when a sink is added
+csv = lazy_import("csv")
+socket = lazy_import("socket")
+
+# metrics recorded per frame (milliseconds)
+TELEMETRY_METRICS = ("cpu", "gpu", "present")
+
+
+class CsvTelemetrySink:
+    def __init__(self, path: str):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(("frame", "cpu_ms", "gpu_ms", "present_ms"))
+
+    def write(self, frame_index, cpu_ms, gpu_ms, present_ms):
+        self.writer.writerow(
+            (frame_index, f"{cpu_ms:.4f}", f"{gpu_ms:.4f}", f"{present_ms:.4f}")
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class UdpTelemetrySink:
+    # one csv line per datagram, for local dashboards
+    def __init__(self, host: str = "127.0.0.1", port: int = 9870):
+        self.address = (host, port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+    def write(self, frame_index, cpu_ms, gpu_ms, present_ms):
+        line = f"{frame_index},{cpu_ms:.4f},{gpu_ms:.4f},{present_ms:.4f}\n"
+        try:
+            self.socket.sendto(line.encode(), self.address)
+        except (BlockingIOError, ConnectionRefusedError):
+            # never stall the render loop on a slow or missing listener
+            pass
+
+    def close(self):
+        self.socket.close()
+
+
+class TelemetryStats:
+    def __init__(self):
+        self.num_frames = 0
+        self.hitches = 0
+        # per metric: {"p50": .., "p95": .., "p99": .., "max": ..}
+        self.percentiles = {}
+
+
+class GpuFrameTimer:
+    # ring of GL_TIME_ELAPSED queries, results are read back a few frames later
+    def __init__(self, latency: int = 3):
+        self.latency = latency
+        self.query_ids = ffi.new("unsigned int[]", latency)
+        gl.glGenQueries(latency, self.query_ids)
+        # frame index issued on each query slot, -1 if free
+        self.query_frames = [-1] * latency
+        self.result_ptr = ffi.new("unsigned long long *")
+        self.available_ptr = ffi.new("int *")
+
+    def begin(self, frame_index):
+        slot = frame_index % self.latency
+        gl.glBeginQuery(GL_TIME_ELAPSED, self.query_ids[slot])
+        self.query_frames[slot] = frame_index
+
+    def end(self):
+        gl.glEndQuery(GL_TIME_ELAPSED)
+
+    def resolve(self, block: bool = False):
+        # yields (frame_index, gpu_ms) of finished queries without stalling
+        results = []
+        for slot in range(self.latency):
+            frame_index = self.query_frames[slot]
+            if frame_index < 0:
+                continue
+            if not block:
+                gl.glGetQueryObjectiv(
+                    self.query_ids[slot], GL_QUERY_RESULT_AVAILABLE, self.available_ptr
+                )
+                if not self.available_ptr[0]:
+                    continue
+            gl.glGetQueryObjectui64v(
+                self.query_ids[slot], GL_QUERY_RESULT, self.result_ptr
+            )
+            results.append((frame_index, self.result_ptr[0] / 1.0e6))
+            self.query_frames[slot] = -1
+        return results
+
+    def unload(self):
+        gl.glDeleteQueries(self.latency, self.query_ids)
+
+
+class FrameTelemetry:
+    def __init__(
+        self,
+        window: int = 1000,
+        hitch_threshold_ms: float = 1000.0 / 30.0,
+        gpu_timing: bool = True,
+    ):
+        # rolling window of samples, NaN until a value is known
+        self.window = window
+        self.samples = {
+            metric: np.full(window, np.nan, dtype=np.float64)
+            for metric in TELEMETRY_METRICS
+        }
+        self.hitch_threshold_ms = hitch_threshold_ms
+        self.frame_index = -1
+
+        self.cpu_begin = 0.0
+        self.last_present = None
+
+        self.gpu_timer = GpuFrameTimer() if gpu_timing else None
+
+        # frames waiting for their gpu time before being streamed
+        self.pending_frames = {}
+        self.sinks = []
+        # (threshold_ms, metric, callback(frame_index, milliseconds))
+        self.slow_frame_callbacks = []
+        return
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def add_slow_frame_callback(self, callback, threshold_ms: float, metric="cpu"):
+        assert metric in TELEMETRY_METRICS
+        self.slow_frame_callbacks.append((threshold_ms, metric, callback))
+
+    def begin_frame(self):
+        self.frame_index += 1
+        self.cpu_begin = time.perf_counter()
+        if self.gpu_timer is not None:
+            self.gpu_timer.begin(self.frame_index)
+
+    def end_frame(self):
+        # call right before rl.end_drawing(), so swap/vsync waits are excluded
+        if self.gpu_timer is not None:
+            # make sure batched draws are submitted inside the query
+            nrl.rlDrawRenderBatchActive()
+            self.gpu_timer.end()
+        cpu_ms = (time.perf_counter() - self.cpu_begin) * 1000.0
+        self._record(self.frame_index, "cpu", cpu_ms)
+
+    def present(self):
+        # call right after rl.end_drawing()
+        now = time.perf_counter()
+        present_ms = math.nan
+        if self.last_present is not None:
+            present_ms = (now - self.last_present) * 1000.0
+        self.last_present = now
+        self._record(self.frame_index, "present", present_ms)
+
+        if self.gpu_timer is not None:
+            for frame_index, gpu_ms in self.gpu_timer.resolve():
+                self._record(frame_index, "gpu", gpu_ms)
+        self._flush_pending()
+
+    def _record(self, frame_index, metric, milliseconds):
+        # drop results for frames already out of the window
+        if self.frame_index - frame_index >= self.window:
+            return
+        self.samples[metric][frame_index % self.window] = milliseconds
+        if metric != "gpu":
+            self.pending_frames.setdefault(frame_index, {})[metric] = milliseconds
+        elif frame_index in self.pending_frames:
+            self.pending_frames[frame_index][metric] = milliseconds
+
+        if not math.isnan(milliseconds):
+            for threshold_ms, callback_metric, callback in self.slow_frame_callbacks:
+                if callback_metric == metric and milliseconds > threshold_ms:
+                    callback(frame_index, milliseconds)
+
+    def _flush_pending(self, force: bool = False):
+        required = 3 if self.gpu_timer is not None else 2
+        for frame_index in sorted(self.pending_frames):
+            sample = self.pending_frames[frame_index]
+            # gpu results that never arrive are given up after the query ring wraps
+            stale = self.gpu_timer is not None and (
+                self.frame_index - frame_index >= self.gpu_timer.latency
+            )
+            if len(sample) < required and not (force or stale):
+                continue
+            for sink in self.sinks:
+                sink.write(
+                    frame_index,
+                    sample.get("cpu", math.nan),
+                    sample.get("gpu", math.nan),
+                    sample.get("present", math.nan),
+                )
+            del self.pending_frames[frame_index]
+
+    def histogram(self, metric: str = "cpu", bins=None):
+        # rolling histogram over the window, default bins of 1ms up to the max sample
+        values = self.samples[metric]
+        values = values[~np.isnan(values)]
+        if bins is None:
+            bins = np.arange(0.0, max(math.ceil(values.max()), 1.0) + 1.0, 1.0)
+        return np.histogram(values, bins=bins)
+
+    def stats(self) -> TelemetryStats:
+        result = TelemetryStats()
+        for metric in TELEMETRY_METRICS:
+            values = self.samples[metric]
+            values = values[~np.isnan(values)]
+            if values.shape[0] == 0:
+                continue
+            p50, p95, p99 = np.percentile(values, (50.0, 95.0, 99.0))
+            result.percentiles[metric] = {
+                "p50": p50,
+                "p95": p95,
+                "p99": p99,
+                "max": values.max(),
+            }
+            if metric == "cpu":
+                result.num_frames = values.shape[0]
+
+        # hitch: a presented frame (or cpu frame if not presented) above the threshold
+        frame_times = np.fmax(self.samples["present"], self.samples["cpu"])
+        result.hitches = int(np.sum(frame_times > self.hitch_threshold_ms))
+        return result
+
+    def close(self):
+        if self.gpu_timer is not None:
+            for frame_index, gpu_ms in self.gpu_timer.resolve(block=True):
+                self._record(frame_index, "gpu", gpu_ms)
+            self.gpu_timer.unload()
+            self.gpu_timer = None
+        self._flush_pending(force=True)
+        for sink in self.sinks:
+            sink.close()
+        self.sinks = []
@@ -0,0 +1,40 @@
+from alloc_profiler import *
+
+
+def _summary(cdata=10.0, passes=None):
+    return {
+        "frames": 100,
+        "cdata": cdata,
+        "blocks": 0.0,
+        "peak_kib": 64.0,
+        "gc_collections": 0.0,
+        "passes": {"gbuffer": 4.0, "ssao": 2.0} if passes is None else passes,
+    }
+
+
+def test_missing_baseline_fails(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    assert not check_allocation_baseline(_summary(), path)
+    assert not os.path.exists(path)
+
+
+def test_update_writes_the_baseline(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    assert check_allocation_baseline(_summary(), path, update=True)
+    assert check_allocation_baseline(_summary(), path)
+
+
+def test_frame_regression_fails(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    check_allocation_baseline(_summary(), path, update=True)
+    assert check_allocation_baseline(_summary(cdata=10.4), path)
+    assert not check_allocation_baseline(_summary(cdata=11.0), path)
+
+
+def test_pass_regression_fails(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    check_allocation_baseline(_summary(), path, update=True)
+    # same frame total, one pass allocates more
+    assert not check_allocation_baseline(
+        _summary(passes={"gbuffer": 6.0, "ssao": 2.0}), path
+    )
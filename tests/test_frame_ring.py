@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from frame_ring import *
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# an external consumer: its own interpreter, so its own resource tracker
+READER_SCRIPT = """
+import sys
+from frame_ring import FrameRingReader
+
+reader = FrameRingReader(sys.argv[1], timeout=1.0)
+reader.sequence = 0
+frame = reader.poll()
+print(frame.frame_index, int(frame.color[0, 0, 0]))
+reader.close()
+"""
+
+
+def test_external_reader_leaves_the_ring_attached():
+    name = f"sse_frame_ring_test_{os.getpid()}"
+    publisher = FrameRingPublisher(name, 4, 2)
+    try:
+        color = np.full((2, 4, 4), 7, dtype=np.uint8)
+        depth = np.zeros((2, 4), dtype=np.float32)
+        assert publisher.publish(3, color, depth)
+
+        result = subprocess.run(
+            [sys.executable, "-c", READER_SCRIPT, name],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.split() == ["3", "7"]
+
+        # the reader's exit must not have unlinked the publisher's segment
+        reader = FrameRingReader(name, timeout=1.0)
+        assert reader.width == 4 and reader.height == 2
+        reader.close()
+    finally:
+        publisher.close()
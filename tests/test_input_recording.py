@@ -0,0 +1,58 @@
+import pytest
+
+from input_recording import *
+
+# (frame time, camera deltas, F6 pressed, F12 pressed, click or None), values exact
+# in float32
+FRAMES = [
+    (0.015625, (0.0, 0.0, 0.0, 0.0, 0.0), False, False, None),
+    (0.0166015625, (2.5, -1.0, 0.0, 0.0, 0.0), True, False, (320.5, 180.0)),
+    (0.03125, (0.0, 0.0, -3.0, 4.25, 1.0), False, True, None),
+    (0.0078125, (0.0, 0.0, 0.0, 0.0, -2.0), True, True, (0.0, 359.0)),
+]
+
+
+def _record(path):
+    recorder = InputRecorder(str(path), 640, 360, 2)
+    for frame_input in FRAMES:
+        recorder.write(frame_input)
+    recorder.close()
+
+
+def _patch_header(path, field, value):
+    data = np.fromfile(str(path), dtype=np.uint8)
+    header = data[: INPUT_RECORDING_HEADER.itemsize].view(INPUT_RECORDING_HEADER)
+    header[field] = value
+    data.tofile(str(path))
+
+
+def test_replay_returns_the_recorded_frames(tmp_path):
+    path = tmp_path / "session.ssir"
+    _record(path)
+    # a session that crashed mid-write: the partial record is dropped
+    with open(path, "ab") as file:
+        file.write(b"\x01" * (INPUT_RECORD.itemsize - 1))
+
+    replay = InputReplay(str(path))
+    assert replay.num_frames == len(FRAMES)
+    assert tuple(replay.header[["width", "height", "num_views"]]) == (640, 360, 2)
+    for frame_input in FRAMES:
+        assert replay.next() == frame_input
+    assert replay.next() is None
+    assert replay.time == pytest.approx(sum(frame[0] for frame in FRAMES))
+
+
+def test_wrong_magic_is_rejected(tmp_path):
+    path = tmp_path / "session.ssir"
+    _record(path)
+    _patch_header(path, "magic", 0)
+    with pytest.raises(ValueError):
+        InputReplay(str(path))
+
+
+def test_wrong_version_is_rejected(tmp_path):
+    path = tmp_path / "session.ssir"
+    _record(path)
+    _patch_header(path, "version", INPUT_RECORDING_VERSION - 1)
+    with pytest.raises(ValueError):
+        InputReplay(str(path))
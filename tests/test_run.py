@@ -0,0 +1,11 @@
+import frame_ring
+import input_recording
+import run
+
+
+def test_argparse_choices_match_their_modules():
+    # spelled out in run.py to keep the modules unimported while parsing
+    assert run.FRAME_RING_POLICY_CHOICES == frame_ring.FRAME_RING_POLICIES
+    assert run.FRAME_RING_POLICY_CHOICES[0] == frame_ring.FRAME_RING_DROP_OLDEST
+    assert run.REPLAY_PACING_CHOICES == input_recording.INPUT_REPLAY_PACINGS
+    assert run.REPLAY_PACING_CHOICES[0] == input_recording.INPUT_REPLAY_UNCAPPED
@@ -0,0 +1,54 @@
+from software_renderer import *
+
+
+def _camera(inv_projection):
+    camera = np.zeros(1, dtype=CAMERA_BLOCK_DTYPE)
+    camera["camera_inv_projection"] = inv_projection
+    camera["camera_clip_near"] = 0.1
+    camera["camera_clip_far"] = 100.0
+    return camera
+
+
+def test_fxaa_keeps_a_flat_image():
+    # equal lumas: no edge direction, every tap fetches the pixel's own color
+    source = np.empty((4, 6, 4), dtype=np.float32)
+    source[:] = (51.0 / 255.0, 102.0 / 255.0, 153.0 / 255.0, 0.5)
+    expected = source.copy()
+    expected[..., 3] = 1.0
+    np.testing.assert_array_equal(software_fxaa(source), expected)
+    np.testing.assert_array_equal(software_fxaa(source, tile_rows=1), expected)
+
+
+def test_blur_averages_facing_samples():
+    # one row of 4 pixels, the last one background (cleared normal and depth 1.0)
+    gbuffer = SoftwareGBuffer(4, 1)
+    gbuffer.normal[0, 0:3] = (0.5, 0.5, 1.0, 0.0)
+    gbuffer.depth[0, 0:3] = 0.5
+    # every fragment at the same camera space position: position weights are 1,
+    # only the normal weight rejects samples (the background faces away)
+    camera = _camera(np.diag([0.0, 0.0, 1.0, 1.0]).astype(np.float32))
+
+    source = np.empty((1, 4, 4), dtype=np.float32)
+    source[0, :, :] = np.array([0.0, 6.0, 12.0, 99.0])[:, None] / 255.0
+    target = np.full((1, 4, 4), 0.5, dtype=np.float32)
+
+    # radius 1, stride 1: samples x - 1, x, x + 1, repeating at the edges
+    blurred = software_blur(gbuffer, camera, source, target, (1.0, 0.0), 1, 1.0)
+    expected = np.empty((1, 4, 4), dtype=np.float32)
+    expected[0, 0] = (0.0 + 6.0) / 2.0 / 255.0
+    expected[0, 1] = (0.0 + 6.0 + 12.0) / 3.0 / 255.0
+    expected[0, 2] = (6.0 + 12.0) / 2.0 / 255.0
+    # discarded: keeps the target's value
+    expected[0, 3] = 0.5
+    np.testing.assert_allclose(blurred, expected, atol=1e-6)
+    # a new target, the passed one is untouched
+    np.testing.assert_array_equal(target, 0.5)
+
+
+def test_reference_difference_compares_uint8_in_unit_range():
+    reference = np.zeros((2, 2, 4), dtype=np.uint8)
+    image = np.zeros((2, 2, 4), dtype=np.float32)
+    image[0, 0, 1] = 3.0 / 255.0
+    max_difference, fraction = reference_difference(reference, image)
+    assert abs(max_difference - 3.0 / 255.0) < 1e-6
+    assert fraction == 0.25
@@ -0,0 +1,372 @@
+# texture streaming: mip residency against a fixed vram budget
+# - sources are decoded and their mip chains built on a background thread, the coarse
+#   tail (<= tail_size) is uploaded as soon as it is ready
+# - rendering requests a mip per texture from its screen-space footprint (request()),
+#   update() uploads finer chains for the most recently used textures
+# - over budget, the least recently used textures drop their finest mips first
+# - a texture's gl object holds mips [resident_mip, 1x1] only: changing the residency
+#   re-creates it and patches the RenderMaterials using it
+
+import concurrent.futures
+import math
+
+import pyray as rl
+import raylib as nrl
+
+import numpy as np
+
+from gpu_resources import *
+
+ffi = nrl.ffi
+
+
+def build_mip_chain(pixels):
+    # (h, w, 4) uint8 -> [level 0, .., 1x1], 2x2 box filter
+    # - gl level sizes: max(size // 2, 1), odd last rows/columns are dropped
+    mips = [np.ascontiguousarray(pixels, dtype=np.uint8)]
+    while mips[-1].shape[0] > 1 or mips[-1].shape[1] > 1:
+        level = mips[-1].astype(np.uint16)
+        height, width = level.shape[:2]
+        if height > 1:
+            level = level[0 : height // 2 * 2 : 2] + level[1 : height // 2 * 2 : 2]
+        else:
+            level = level * 2
+        if width > 1:
+            level = level[:, 0 : width // 2 * 2 : 2] + level[:, 1 : width // 2 * 2 : 2]
+        else:
+            level = level * 2
+        mips.append(((level + 2) // 4).astype(np.uint8))
+    return mips
+
+
+def load_image_pixels(path: str):
+    # (h, w, 4) uint8, cpu only (safe off the render thread)
+    image = rl.load_image(path.encode())
+    rl.image_format(image, rl.PIXELFORMAT_UNCOMPRESSED_R8G8B8A8)
+    pixels = np.frombuffer(
+        ffi.buffer(image.data, image.width * image.height * 4), dtype=np.uint8
+    ).reshape(image.height, image.width, 4)
+    pixels = pixels.copy()
+    rl.unload_image(image)
+    return pixels
+
+
+def mip_chain_bytes(mips, first_mip: int) -> int:
+    return sum(mip.nbytes for mip in mips[first_mip:])
+
+
+class StreamedTexture:
+    def __init__(self, name: str, source):
+        self.name = name
+        # image path or callable returning (h, w, 4) uint8 pixels
+        self.source = source
+        # cpu mip chain, None until decoded
+        self.mips = None
+        self.width = 0
+        self.height = 0
+        self.num_mips = 0
+        # finest mip uploaded, num_mips: nothing resident yet
+        self.resident_mip = 0
+        self.resident_bytes = 0
+        # finest mip asked for by request() (0: full resolution)
+        self.requested_mip = 0
+        # frame of the last request(), for lru eviction
+        self.last_used = -1
+        # current gl texture (texture.id == 0: nothing resident) and its gpu_resources entry
+        self.texture = rl.Texture()
+        self.resource = None
+        # (RenderMaterial, texture slot) patched on residency changes
+        self.users = []
+
+    @property
+    def tail_mip(self) -> int:
+        # coarsest level, always resident once decoded
+        return self.num_mips - 1
+
+    def bind(self, material, location: int):
+        # adds the texture to material.textures, kept up to date by the streamer
+        # white until the first mips are resident
+        slot = len(material.textures)
+        material.textures.append(
+            (location, self.texture.id or rl.rl_get_texture_id_default())
+        )
+        self.users.append((material, slot))
+
+
+class TextureStreamingStats:
+    def __init__(self):
+        self.num_textures = 0
+        self.pending_loads = 0
+        self.resident_bytes = 0
+        self.budget_bytes = 0
+        # bytes every texture would take at its requested mip
+        self.requested_bytes = 0
+        # textures whose resident mip is coarser than requested
+        self.starved = 0
+        self.uploads = 0
+        self.uploaded_bytes = 0
+        self.evictions = 0
+
+
+class TextureStreamer:
+    def __init__(
+        self,
+        budget_bytes: int = 64 * 2**20,
+        tail_size: int = 64,
+        max_uploads_per_update: int = 2,
+        num_workers: int = 1,
+    ):
+        self.budget_bytes = budget_bytes
+        # mips up to tail_size x tail_size are uploaded right after decoding
+        self.tail_size = tail_size
+        # re-created textures per update(), spreads the upload cost over frames
+        self.max_uploads_per_update = max_uploads_per_update
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=num_workers)
+
+        self.textures = []
+        # StreamedTexture -> future of its decoded mip chain
+        self.loads = {}
+        self.resident_bytes = 0
+        self.frame_index = 0
+        # bumped on every residency change: the rendered image changes with it
+        self.version = 0
+        # True while loads or uploads are outstanding, see Renderer.scene_state()
+        self.busy = False
+
+        self.stats = TextureStreamingStats()
+        self.stats.budget_bytes = budget_bytes
+
+    def load(self, name: str, source) -> StreamedTexture:
+        # decodes in the background, nothing is resident until the next update()s
+        texture = StreamedTexture(name, source)
+        self.textures.append(texture)
+        self.loads[texture] = self.pool.submit(self._decode, source)
+        self.busy = True
+        return texture
+
+    @staticmethod
+    def _decode(source):
+        # pool thread
+        pixels = source() if callable(source) else load_image_pixels(source)
+        return build_mip_chain(pixels)
+
+    def request(self, texture: StreamedTexture, pixels: float):
+        # footprint of the texture on screen (pixels across its uv range), max over calls
+        # of the frame: mip = log2(texels / pixels)
+        if texture.mips is None:
+            texture.last_used = self.frame_index
+            return
+        mip = int(
+            math.floor(math.log2(max(texture.width, texture.height) / max(pixels, 1.0)))
+        )
+        mip = min(max(mip, 0), texture.tail_mip)
+        if texture.last_used != self.frame_index:
+            texture.requested_mip = mip
+            texture.last_used = self.frame_index
+        else:
+            texture.requested_mip = min(texture.requested_mip, mip)
+
+    def update(self):
+        # render thread, once per frame before drawing: applies the previous frame's
+        # requests (finished loads, uploads, evictions)
+        uploads = 0
+        for texture, future in list(self.loads.items()):
+            if not future.done():
+                continue
+            del self.loads[texture]
+            self._on_decoded(texture, future.result())
+            uploads += 1
+
+        # finer chains, most recently used first
+        candidates = sorted(
+            (
+                texture
+                for texture in self.textures
+                if texture.mips is not None
+                and texture.requested_mip < texture.resident_mip
+            ),
+            key=lambda texture: (
+                -texture.last_used,
+                texture.requested_mip - texture.resident_mip,
+            ),
+        )
+        pending_uploads = False
+        for texture in candidates:
+            if uploads >= self.max_uploads_per_update:
+                pending_uploads = True
+                break
+            mip = self._fit_budget(texture, texture.requested_mip)
+            if mip < texture.resident_mip:
+                self._upload(texture, mip)
+                uploads += 1
+
+        self.busy = bool(self.loads) or pending_uploads
+        self._update_stats()
+        self.frame_index += 1
+
+    def finish(self):
+        # waits for every load and uploads its tail (offline rendering: deterministic
+        # first frames), finer mips still follow the requests
+        concurrent.futures.wait(list(self.loads.values()))
+        self.update()
+
+    def _on_decoded(self, texture: StreamedTexture, mips):
+        texture.mips = mips
+        texture.height, texture.width = mips[0].shape[:2]
+        texture.num_mips = len(mips)
+        texture.resident_mip = texture.num_mips
+        # refined once the next frame requested a mip
+        texture.requested_mip = texture.tail_mip
+        # low mips first: everything up to tail_size right away
+        tail = texture.tail_mip
+        while tail > 0 and max(mips[tail - 1].shape[:2]) <= self.tail_size:
+            tail -= 1
+        self._upload(texture, self._fit_budget(texture, tail))
+
+    def _fit_budget(self, texture: StreamedTexture, mip: int) -> int:
+        # finest mip <= texture.tail_mip that fits the budget after evicting lru textures
+        # not used this frame, texture.resident_mip if nothing finer fits
+        while mip < texture.resident_mip:
+            needed = mip_chain_bytes(texture.mips, mip) - texture.resident_bytes
+            if self.resident_bytes + needed <= self.budget_bytes or self._evict(
+                self.resident_bytes + needed - self.budget_bytes, texture
+            ):
+                return mip
+            mip += 1
+        return texture.resident_mip
+
+    def _evict(self, nbytes: int, keep: StreamedTexture) -> bool:
+        # frees nbytes, least recently used first: textures not used last frame can drop
+        # to their tail, the others only the mips finer than they requested
+        victims = []
+        for texture in self.textures:
+            if texture is keep or texture.mips is None:
+                continue
+            floor = (
+                texture.tail_mip
+                if texture.last_used < self.frame_index
+                else texture.requested_mip
+            )
+            if texture.resident_mip < floor:
+                victims.append((texture.last_used, id(texture), texture, floor))
+        victims.sort()
+        # only evict if it can free enough, never thrash for a partial win
+        available = sum(
+            texture.resident_bytes - mip_chain_bytes(texture.mips, floor)
+            for _, _, texture, floor in victims
+        )
+        if available < nbytes:
+            return False
+        for _, _, texture, floor in victims:
+            # one re-creation per victim: the finest mip that frees enough, or its floor
+            mip = texture.resident_mip + 1
+            while (
+                mip < floor
+                and texture.resident_bytes - mip_chain_bytes(texture.mips, mip) < nbytes
+            ):
+                mip += 1
+            freed = texture.resident_bytes - mip_chain_bytes(texture.mips, mip)
+            self._upload(texture, mip)
+            self.stats.evictions += 1
+            nbytes -= freed
+            if nbytes <= 0:
+                break
+        return True
+
+    def _upload(self, texture: StreamedTexture, mip: int):
+        # re-creates the gl texture with mips [mip, 1x1]
+        if mip >= texture.num_mips or mip == texture.resident_mip:
+            return
+        mips = texture.mips[mip:]
+        data = np.concatenate([level.reshape(-1) for level in mips])
+        height, width = mips[0].shape[:2]
+
+        gl_texture = rl.Texture()
+        gl_texture.id = rl.rl_load_texture(
+            ffi.from_buffer(data),
+            width,
+            height,
+            rl.PIXELFORMAT_UNCOMPRESSED_R8G8B8A8,
+            len(mips),
+        )
+        gl_texture.width = width
+        gl_texture.height = height
+        gl_texture.mipmaps = len(mips)
+        gl_texture.format = rl.PIXELFORMAT_UNCOMPRESSED_R8G8B8A8
+        rl.rl_texture_parameters(
+            gl_texture.id, rl.RL_TEXTURE_MIN_FILTER, rl.RL_TEXTURE_FILTER_MIP_LINEAR
+        )
+        rl.rl_texture_parameters(
+            gl_texture.id, rl.RL_TEXTURE_MAG_FILTER, rl.RL_TEXTURE_FILTER_LINEAR
+        )
+        rl.rl_texture_parameters(
+            gl_texture.id, rl.RL_TEXTURE_WRAP_S, rl.RL_TEXTURE_WRAP_REPEAT
+        )
+        rl.rl_texture_parameters(
+            gl_texture.id, rl.RL_TEXTURE_WRAP_T, rl.RL_TEXTURE_WRAP_REPEAT
+        )
+
+        if texture.resource is not None:
+            gpu_resources.release(texture.resource)
+        texture.resource = gpu_resources.track(
+            self,
+            texture.name,
+            gl_texture,
+            rl.unload_texture,
+            GPU_TEXTURES,
+            data.nbytes,
+        )
+        texture.texture = gl_texture
+        self.resident_bytes += data.nbytes - texture.resident_bytes
+        texture.resident_bytes = data.nbytes
+        texture.resident_mip = mip
+        for material, slot in texture.users:
+            material.textures[slot] = (material.textures[slot][0], gl_texture.id)
+
+        self.version += 1
+        self.stats.uploads += 1
+        self.stats.uploaded_bytes += data.nbytes
+
+    def _update_stats(self):
+        stats = self.stats
+        stats.num_textures = len(self.textures)
+        stats.pending_loads = len(self.loads)
+        stats.resident_bytes = self.resident_bytes
+        stats.budget_bytes = self.budget_bytes
+        stats.requested_bytes = sum(
+            mip_chain_bytes(texture.mips, texture.requested_mip)
+            for texture in self.textures
+            if texture.mips is not None
+        )
+        stats.starved = sum(
+            1
+            for texture in self.textures
+            if texture.mips is not None and texture.resident_mip > texture.requested_mip
+        )
+
+    def report(self):
+        stats = self.stats
+        print(
+            f"texture streaming: {stats.num_textures} textures, "
+            f"{stats.resident_bytes / 2**20:.1f}/{stats.budget_bytes / 2**20:.1f}MiB "
+            f"resident ({stats.requested_bytes / 2**20:.1f}MiB requested), "
+            f"{stats.uploads} uploads, {stats.evictions} evictions"
+        )
+        for texture in self.textures:
+            if texture.mips is None:
+                print(f"  {texture.name}: loading")
+                continue
+            print(
+                f"  {texture.name} {texture.width}x{texture.height}: "
+                f"mip {texture.resident_mip} resident, {texture.requested_mip} requested, "
+                f"{texture.resident_bytes / 2**10:.0f}KiB"
+            )
+
+    def unload(self):
+        self.pool.shutdown(cancel_futures=True)
+        self.loads = {}
+        gpu_resources.release_owner(self)
+        for texture in self.textures:
+            texture.resource = None
+            texture.texture = rl.Texture()
+        self.resident_bytes = 0
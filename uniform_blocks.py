@@ -0,0 +1,267 @@
+# std140 uniform blocks shared by every program: frame, light and per-view camera data
+# - one buffer holds [frame | light | camera of view 0 | camera of view 1 | ...], each
+#   block at a GL_UNIFORM_BUFFER_OFFSET_ALIGNMENT multiple
+# - the blocks are filled in numpy and uploaded once per frame through one mapped write,
+#   frame and light stay bound, each view binds the range of its camera block
+# - programs map the block names to the binding points once, see bind_uniform_blocks()
+# - layouts must match shaders/uniform_blocks.glsl
+
+import pyray as rl
+import raylib as nrl
+
+import numpy as np
+
+from gl import *
+from gpu_resources import *
+
+ffi = nrl.ffi
+
+# block name -> binding point
+UNIFORM_BLOCK_FRAME = 0
+UNIFORM_BLOCK_LIGHT = 1
+UNIFORM_BLOCK_CAMERA = 2
+UNIFORM_BLOCK_BINDINGS = {
+    "FrameBlock": UNIFORM_BLOCK_FRAME,
+    "LightBlock": UNIFORM_BLOCK_LIGHT,
+    "CameraBlock": UNIFORM_BLOCK_CAMERA,
+}
+
+# std140: vec3 aligns to 16 bytes (a float may follow in the same slot), mat4 is four
+# vec4 columns, block sizes round up to 16 bytes
+FRAME_BLOCK_DTYPE = np.dtype(
+    {
+        "names": ["frame_time", "frame_delta_time", "frame_index"],
+        "formats": [np.float32, np.float32, np.uint32],
+        "offsets": [0, 4, 8],
+        "itemsize": 16,
+    }
+)
+LIGHT_BLOCK_DTYPE = np.dtype(
+    {
+        "names": [
+            "light_view_projection",
+            "light_direction",
+            "light_clip_near",
+            "sun_color",
+            "light_clip_far",
+            "sky_color",
+            "sun_intensity",
+            "sky_intensity",
+            "ground_intensity",
+            "ambient_intensity",
+            "exposure",
+            "shadow_inv_resolution",
+        ],
+        "formats": [
+            (np.float32, (4, 4)),
+            (np.float32, 3),
+            np.float32,
+            (np.float32, 3),
+            np.float32,
+            (np.float32, 3),
+            np.float32,
+            np.float32,
+            np.float32,
+            np.float32,
+            np.float32,
+            (np.float32, 2),
+        ],
+        "offsets": [0, 64, 76, 80, 92, 96, 108, 112, 116, 120, 124, 128],
+        "itemsize": 144,
+    }
+)
+CAMERA_BLOCK_DTYPE = np.dtype(
+    {
+        "names": [
+            "camera_view",
+            "camera_projection",
+            "camera_inv_projection",
+            "camera_inv_view_projection",
+            "camera_position",
+            "camera_clip_near",
+            "camera_clip_far",
+        ],
+        "formats": [
+            (np.float32, (4, 4)),
+            (np.float32, (4, 4)),
+            (np.float32, (4, 4)),
+            (np.float32, (4, 4)),
+            (np.float32, 3),
+            np.float32,
+            np.float32,
+        ],
+        "offsets": [0, 64, 128, 192, 256, 268, 272],
+        "itemsize": 288,
+    }
+)
+
+
+def std140_matrix(matrix: np.ndarray) -> np.ndarray:
+    # row-major 4x4 (see matrix_to_numpy()) -> std140 column-major, and back
+    return np.asarray(matrix, dtype=np.float32).T
+
+
+def write_camera_block(
+    camera: np.ndarray,
+    position,
+    view: np.ndarray,
+    projection: np.ndarray,
+    clip_near: float,
+    clip_far: float,
+):
+    # camera: CAMERA_BLOCK_DTYPE record, view/projection: row-major numpy matrices,
+    # the inverses are derived here
+    camera["camera_view"] = std140_matrix(view)
+    camera["camera_projection"] = std140_matrix(projection)
+    camera["camera_inv_projection"] = std140_matrix(np.linalg.inv(projection))
+    camera["camera_inv_view_projection"] = std140_matrix(
+        np.linalg.inv(projection @ view)
+    )
+    camera["camera_position"] = position
+    camera["camera_clip_near"] = clip_near
+    camera["camera_clip_far"] = clip_far
+
+
+def write_light_block(
+    light: np.ndarray,
+    view_projection: np.ndarray,
+    direction,
+    clip_near: float,
+    clip_far: float,
+):
+    # light: LIGHT_BLOCK_DTYPE record, the per-frame fields; colors, intensities and
+    # the shadow resolution are set once by the owner
+    light["light_view_projection"] = std140_matrix(view_projection)
+    light["light_direction"] = direction
+    light["light_clip_near"] = clip_near
+    light["light_clip_far"] = clip_far
+
+
+def bind_uniform_blocks(shader: rl.Shader):
+    # blocks a program does not use are skipped
+    for name, binding in UNIFORM_BLOCK_BINDINGS.items():
+        index = gl.glGetUniformBlockIndex(shader.id, name.encode())
+        if index != GL_INVALID_INDEX:
+            gl.glUniformBlockBinding(shader.id, index, binding)
+
+
+def _align(offset: int, alignment: int) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _release_buffer(buffer_ptr):
+    gl.glDeleteBuffers(1, buffer_ptr)
+
+
+class UniformBlocks:
+    def __init__(self, num_views: int = 1):
+        alignment_ptr = ffi.new("int *")
+        gl.glGetIntegerv(GL_UNIFORM_BUFFER_OFFSET_ALIGNMENT, alignment_ptr)
+        alignment = max(alignment_ptr[0], 16)
+
+        # (offset, size) per block inside the buffer
+        self.frame_range = (0, FRAME_BLOCK_DTYPE.itemsize)
+        offset = _align(FRAME_BLOCK_DTYPE.itemsize, alignment)
+        self.light_range = (offset, LIGHT_BLOCK_DTYPE.itemsize)
+        offset = _align(offset + LIGHT_BLOCK_DTYPE.itemsize, alignment)
+        self.camera_ranges = []
+        for _ in range(num_views):
+            self.camera_ranges.append((offset, CAMERA_BLOCK_DTYPE.itemsize))
+            offset = _align(offset + CAMERA_BLOCK_DTYPE.itemsize, alignment)
+        self.size = offset
+
+        # cpu copy of the whole buffer, the block records below are views into it
+        self.data = np.zeros(self.size, dtype=np.uint8)
+        self.frame = self._record(self.frame_range, FRAME_BLOCK_DTYPE)
+        self.light = self._record(self.light_range, LIGHT_BLOCK_DTYPE)
+        self.cameras = [
+            self._record(camera_range, CAMERA_BLOCK_DTYPE)
+            for camera_range in self.camera_ranges
+        ]
+        self.data_ptr = ffi.from_buffer(self.data)
+
+        self.buffer_ptr = ffi.new("unsigned int *")
+        gl.glGenBuffers(1, self.buffer_ptr)
+        gl.glBindBuffer(GL_UNIFORM_BUFFER, self.buffer_ptr[0])
+        gl.glBufferData(GL_UNIFORM_BUFFER, self.size, ffi.NULL, GL_DYNAMIC_DRAW)
+        gl.glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        gpu_resources.track(
+            self,
+            "uniform_blocks",
+            self.buffer_ptr,
+            _release_buffer,
+            GPU_BUFFERS,
+            self.size,
+        )
+        self.num_uploads = 0
+
+    def _record(self, block_range, dtype) -> np.ndarray:
+        # shape (1,) structured view: block["field"] = value writes into self.data
+        offset, size = block_range
+        return self.data[offset : offset + size].view(dtype)
+
+    @property
+    def buffer(self) -> int:
+        return self.buffer_ptr[0]
+
+    def set_frame(self, time: float, delta_time: float, frame_index: int):
+        frame = self.frame
+        frame["frame_time"] = time
+        frame["frame_delta_time"] = delta_time
+        frame["frame_index"] = frame_index
+
+    def set_camera(
+        self,
+        index: int,
+        position,
+        view: np.ndarray,
+        projection: np.ndarray,
+        clip_near: float,
+        clip_far: float,
+    ):
+        write_camera_block(
+            self.cameras[index], position, view, projection, clip_near, clip_far
+        )
+
+    def upload(self):
+        # one write of every block, the previous contents are orphaned instead of
+        # synchronized with draws still reading them
+        gl.glBindBuffer(GL_UNIFORM_BUFFER, self.buffer)
+        ptr = gl.glMapBufferRange(
+            GL_UNIFORM_BUFFER,
+            0,
+            self.size,
+            GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_BUFFER_BIT,
+        )
+        ffi.memmove(ptr, self.data_ptr, self.size)
+        gl.glUnmapBuffer(GL_UNIFORM_BUFFER)
+        gl.glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        self.num_uploads += 1
+
+        for binding, (offset, size) in (
+            (UNIFORM_BLOCK_FRAME, self.frame_range),
+            (UNIFORM_BLOCK_LIGHT, self.light_range),
+        ):
+            gl.glBindBufferRange(GL_UNIFORM_BUFFER, binding, self.buffer, offset, size)
+        self.bind_camera(0)
+
+    def bind_camera(self, index: int):
+        offset, size = self.camera_ranges[index]
+        gl.glBindBufferRange(
+            GL_UNIFORM_BUFFER, UNIFORM_BLOCK_CAMERA, self.buffer, offset, size
+        )
+
+    def unload(self):
+        gpu_resources.release_owner(self)
+
+
+if __name__ == "__main__":
+    # std140 offsets of the blocks, compare with shaders/uniform_blocks.glsl
+    for dtype_name, dtype in (
+        ("FrameBlock", FRAME_BLOCK_DTYPE),
+        ("LightBlock", LIGHT_BLOCK_DTYPE),
+        ("CameraBlock", CAMERA_BLOCK_DTYPE),
+    ):
+        print(f"{dtype_name}: {dtype.itemsize} bytes")
+        for field_name, (field_dtype, offset) in dtype.fields.items():
+            print(f"  {offset:4d} {field_name} {field_dtype}")
@@ -0,0 +1,288 @@
+# compact vertex formats: 16 bytes per vertex instead of raylib's 32 (float3 position,
+# float3 normal, float2 texcoord), decoded in the vertex shader (QUANTIZED_VERTICES)
+#
+# interleaved layout, all formats:
+# | position: 4 x 16-bit (w unused) | normal: 2 x snorm16 octahedral | texcoord: 2 x 16-bit |
+# - snorm16: positions/texcoords normalized to [-1, 1] by per-mesh bounds, 16-bit steps
+# - float16: positions normalized the same way but stored as half floats, half texcoords
+
+import pyray as rl
+import raylib as nrl
+
+import numpy as np
+
+from gl import *
+
+VERTEX_FORMAT_FLOAT32 = "float32"
+VERTEX_FORMAT_SNORM16 = "snorm16"
+VERTEX_FORMAT_FLOAT16 = "float16"
+VERTEX_FORMATS = (VERTEX_FORMAT_FLOAT32, VERTEX_FORMAT_SNORM16, VERTEX_FORMAT_FLOAT16)
+
+QUANTIZED_VERTEX_DTYPE = {
+    VERTEX_FORMAT_SNORM16: np.dtype(
+        [("position", "<i2", 4), ("normal", "<i2", 2), ("texcoord", "<i2", 2)]
+    ),
+    VERTEX_FORMAT_FLOAT16: np.dtype(
+        [("position", "<f2", 4), ("normal", "<i2", 2), ("texcoord", "<f2", 2)]
+    ),
+}
+
+SNORM16_MAX = 32767.0
+
+
+def encode_snorm16(values):
+    return np.round(np.clip(values, -1.0, 1.0) * SNORM16_MAX).astype(np.int16)
+
+
+def decode_snorm16(values):
+    # same rule as gl's normalized signed integers
+    return np.maximum(values.astype(np.float32) / SNORM16_MAX, -1.0)
+
+
+def encode_octahedral(normals):
+    # unit vectors -> [-1, 1]^2 by projecting on the octahedron and folding the lower half
+    normals = np.asarray(normals, dtype=np.float32)
+    normals = normals / np.maximum(np.abs(normals).sum(axis=1, keepdims=True), 1e-12)
+    encoded = normals[:, :2].copy()
+    lower = normals[:, 2] < 0.0
+    signs = np.where(encoded[lower] >= 0.0, 1.0, -1.0)
+    encoded[lower] = (1.0 - np.abs(normals[lower][:, ::-1][:, 1:])) * signs
+    return encoded
+
+
+def decode_octahedral(encoded):
+    # numpy mirror of DecodeOctahedral() in shaders/quantized_vertex.glsl
+    encoded = np.asarray(encoded, dtype=np.float32)
+    normals = np.concatenate(
+        [encoded, 1.0 - np.abs(encoded).sum(axis=1, keepdims=True)], axis=1
+    )
+    fold = np.maximum(-normals[:, 2:3], 0.0)
+    normals[:, :2] += np.where(normals[:, :2] >= 0.0, -fold, fold)
+    return normals / np.linalg.norm(normals, axis=1, keepdims=True)
+
+
+def _normalize_range(values):
+    # per-axis scale/offset mapping the values to [-1, 1]
+    low = values.min(axis=0)
+    high = values.max(axis=0)
+    offset = (low + high) * 0.5
+    scale = np.maximum((high - low) * 0.5, 1e-8)
+    return scale.astype(np.float32), offset.astype(np.float32)
+
+
+class QuantizedMeshData:
+    def __init__(
+        self,
+        vertex_format,
+        vertices,
+        indices,
+        position_scale,
+        position_offset,
+        texcoord_scale,
+        texcoord_offset,
+    ):
+        self.vertex_format = vertex_format
+        # interleaved vertices: (N,) QUANTIZED_VERTEX_DTYPE[vertex_format]
+        self.vertices = vertices
+        # triangle indices: (M, 3) uint16 or uint32
+        self.indices = indices
+        # dequantization: value = stored * scale + offset
+        self.position_scale = position_scale
+        self.position_offset = position_offset
+        self.texcoord_scale = texcoord_scale
+        self.texcoord_offset = texcoord_offset
+
+    @property
+    def vertex_count(self):
+        return self.vertices.shape[0]
+
+    @property
+    def triangle_count(self):
+        return self.indices.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.vertices.nbytes + self.indices.nbytes
+
+
+def quantize_mesh_data(
+    positions, normals, texcoords, indices, vertex_format=VERTEX_FORMAT_SNORM16
+) -> QuantizedMeshData:
+    vertices = np.zeros(positions.shape[0], dtype=QUANTIZED_VERTEX_DTYPE[vertex_format])
+
+    position_scale, position_offset = _normalize_range(positions)
+    normalized_positions = (positions - position_offset) / position_scale
+
+    vertices["normal"] = encode_snorm16(encode_octahedral(normals))
+
+    if vertex_format == VERTEX_FORMAT_SNORM16:
+        texcoord_scale, texcoord_offset = _normalize_range(texcoords)
+        vertices["position"][:, :3] = encode_snorm16(normalized_positions)
+        vertices["texcoord"] = encode_snorm16(
+            (texcoords - texcoord_offset) / texcoord_scale
+        )
+    else:
+        # half texcoords are stored as-is
+        texcoord_scale = np.ones(2, dtype=np.float32)
+        texcoord_offset = np.zeros(2, dtype=np.float32)
+        vertices["position"][:, :3] = normalized_positions.astype(np.float16)
+        vertices["texcoord"] = texcoords.astype(np.float16)
+
+    # 16-bit indices whenever they fit, halves the index bandwidth too
+    index_dtype = np.uint16 if positions.shape[0] <= 0x10000 else np.uint32
+    return QuantizedMeshData(
+        vertex_format,
+        vertices,
+        np.ascontiguousarray(indices, dtype=index_dtype),
+        position_scale,
+        position_offset,
+        texcoord_scale,
+        texcoord_offset,
+    )
+
+
+def dequantize_mesh_data(data: QuantizedMeshData):
+    # cpu decode, same math as the vertex shader: (positions, normals, texcoords)
+    if data.vertex_format == VERTEX_FORMAT_SNORM16:
+        positions = decode_snorm16(data.vertices["position"][:, :3])
+        texcoords = decode_snorm16(data.vertices["texcoord"])
+    else:
+        positions = data.vertices["position"][:, :3].astype(np.float32)
+        texcoords = data.vertices["texcoord"].astype(np.float32)
+    return (
+        positions * data.position_scale + data.position_offset,
+        decode_octahedral(decode_snorm16(data.vertices["normal"])),
+        texcoords * data.texcoord_scale + data.texcoord_offset,
+    )
+
+
+class QuantizedMesh:
+    # gpu side of QuantizedMeshData, drawn by the render queue like an rl.Mesh
+    def __init__(self):
+        self.vaoId = 0
+        self.vertex_buffer_id = 0
+        self.index_buffer_id = 0
+        self.vertexCount = 0
+        self.triangleCount = 0
+        self.index_type = GL_UNSIGNED_SHORT
+        self.vertex_format = VERTEX_FORMAT_SNORM16
+        self.position_scale = rl.Vector3(1.0, 1.0, 1.0)
+        self.position_offset = rl.Vector3(0.0, 0.0, 0.0)
+        # (scale.xy, offset.xy)
+        self.texcoord_scale_offset = rl.Vector4(1.0, 1.0, 0.0, 0.0)
+        # vertex + index buffer bytes
+        self.nbytes = 0
+
+
+def load_quantized_mesh(data: QuantizedMeshData) -> QuantizedMesh:
+    mesh = QuantizedMesh()
+    mesh.vertexCount = data.vertex_count
+    mesh.triangleCount = data.triangle_count
+    mesh.vertex_format = data.vertex_format
+    mesh.nbytes = data.nbytes
+    mesh.index_type = (
+        GL_UNSIGNED_SHORT if data.indices.dtype == np.uint16 else GL_UNSIGNED_INT
+    )
+    mesh.position_scale = rl.Vector3(*data.position_scale.tolist())
+    mesh.position_offset = rl.Vector3(*data.position_offset.tolist())
+    mesh.texcoord_scale_offset = rl.Vector4(
+        *data.texcoord_scale.tolist(), *data.texcoord_offset.tolist()
+    )
+
+    mesh.vaoId = rl.rl_load_vertex_array()
+    assert mesh.vaoId != 0
+    rl.rl_enable_vertex_array(mesh.vaoId)
+
+    vertices = np.ascontiguousarray(data.vertices)
+    mesh.vertex_buffer_id = rl.rl_load_vertex_buffer(
+        ffi.from_buffer(vertices), vertices.nbytes, False
+    )
+
+    # half floats are read as they are, 16-bit integers as normalized [-1, 1]
+    component_type = (
+        GL_SHORT if data.vertex_format == VERTEX_FORMAT_SNORM16 else GL_HALF_FLOAT
+    )
+    stride = vertices.dtype.itemsize
+    for location, size, attribute_type, field in (
+        (nrl.RL_DEFAULT_SHADER_ATTRIB_LOCATION_POSITION, 3, component_type, "position"),
+        (nrl.RL_DEFAULT_SHADER_ATTRIB_LOCATION_NORMAL, 2, GL_SHORT, "normal"),
+        (nrl.RL_DEFAULT_SHADER_ATTRIB_LOCATION_TEXCOORD, 2, component_type, "texcoord"),
+    ):
+        rl.rl_set_vertex_attribute(
+            location,
+            size,
+            attribute_type,
+            attribute_type == GL_SHORT,
+            stride,
+            vertices.dtype.fields[field][1],
+        )
+        rl.rl_enable_vertex_attribute(location)
+
+    indices = np.ascontiguousarray(data.indices)
+    mesh.index_buffer_id = rl.rl_load_vertex_buffer_element(
+        ffi.from_buffer(indices), indices.nbytes, False
+    )
+
+    rl.rl_disable_vertex_array()
+    return mesh
+
+
+def unload_quantized_mesh(mesh: QuantizedMesh):
+    if mesh.vaoId > 0:
+        rl.rl_unload_vertex_array(mesh.vaoId)
+        rl.rl_unload_vertex_buffer(mesh.vertex_buffer_id)
+        rl.rl_unload_vertex_buffer(mesh.index_buffer_id)
+    mesh.vaoId = 0
+
+
+def benchmark_vertex_formats(rings: int = 512, slices: int = 1024):
+    # cpu-only: size and decode error per format on a uv sphere
+    theta = np.linspace(0.0, np.pi, rings + 1, dtype=np.float32)
+    phi = np.linspace(0.0, 2.0 * np.pi, slices + 1, dtype=np.float32)
+    theta, phi = np.meshgrid(theta, phi, indexing="ij")
+    normals = np.stack(
+        [np.sin(theta) * np.cos(phi), np.cos(theta), np.sin(theta) * np.sin(phi)],
+        axis=-1,
+    ).reshape(-1, 3)
+    positions = normals * 25.0 + np.array([100.0, 5.0, -40.0], dtype=np.float32)
+    texcoords = np.stack([phi / (2.0 * np.pi), theta / np.pi], axis=-1).reshape(-1, 2)
+
+    grid = np.arange(rings * (slices + 1)).reshape(rings, slices + 1)[:, :-1]
+    quads = np.stack(
+        [
+            grid,
+            grid + slices + 1,
+            grid + 1,
+            grid + 1,
+            grid + slices + 1,
+            grid + slices + 2,
+        ],
+        axis=-1,
+    )
+    indices = quads.reshape(-1, 3).astype(np.uint32)
+
+    float_bytes = positions.nbytes + normals.nbytes + texcoords.nbytes
+    print(
+        f"vertices: {positions.shape[0]}, triangles: {indices.shape[0]}, "
+        f"float32 vertices: {float_bytes / 2**20:.1f}MiB"
+    )
+    for vertex_format in (VERTEX_FORMAT_SNORM16, VERTEX_FORMAT_FLOAT16):
+        data = quantize_mesh_data(positions, normals, texcoords, indices, vertex_format)
+        decoded_positions, decoded_normals, decoded_texcoords = dequantize_mesh_data(
+            data
+        )
+        position_error = np.abs(decoded_positions - positions).max()
+        normal_error = np.degrees(
+            np.arccos(np.clip((decoded_normals * normals).sum(axis=1), -1.0, 1.0)).max()
+        )
+        texcoord_error = np.abs(decoded_texcoords - texcoords).max()
+        print(
+            f"{vertex_format} vertices: {data.vertices.nbytes / 2**20:.1f}MiB "
+            f"({100.0 * data.vertices.nbytes / float_bytes:.0f}%), "
+            f"position error {position_error:.5f}, normal error {normal_error:.4f}deg, "
+            f"texcoord error {texcoord_error:.6f}"
+        )
+
+
+if __name__ == "__main__":
+    benchmark_vertex_formats()
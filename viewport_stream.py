@@ -0,0 +1,519 @@
+# remote viewport: read-back frames streamed to clients as compressed tile deltas
+# - the render thread submits frames (never waits), an asyncio loop on its own thread
+#   serves the clients
+# - per client: 16x16 tiles that changed since the last frame sent to that client,
+#   zlib-compressed in chunks by a thread pool (zlib releases the gil)
+# - slow clients get the latest frame once their socket drained, older ones are skipped
+# - clients send camera input back, polled by the render loop (see run.py)
+#
+# python viewport_stream.py --self-test: server + reference client over localhost
+# python viewport_stream.py --connect HOST:PORT: reference viewer (raylib window)
+
+import argparse
+import asyncio
+import concurrent.futures
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+STREAM_MAGIC = b"SSEV"
+STREAM_TILE_SIZE = 16
+STREAM_DEFAULT_PORT = 9871
+
+# message: magic, type, payload size
+STREAM_MESSAGE_HEADER = struct.Struct("<4sBI")
+STREAM_MESSAGE_FRAME = 1
+STREAM_MESSAGE_INPUT = 2
+
+# frame payload: frame index, width, height, tile size, number of chunks,
+# then per chunk: tile count, compressed size, tile indices (uint32), zlib data
+STREAM_FRAME_HEADER = struct.Struct("<IHHBI")
+STREAM_CHUNK_HEADER = struct.Struct("<II")
+
+# input payload: Camera.update() deltas, accumulated over the client's frames
+STREAM_INPUT = struct.Struct("<5f")
+STREAM_INPUT_FIELDS = (
+    "azimuth_delta",
+    "altitude_delta",
+    "offset_delta_x",
+    "offset_delta_y",
+    "mouse_wheel",
+)
+
+
+def _padded_shape(height, width, tile_size):
+    return (
+        (height + tile_size - 1) // tile_size * tile_size,
+        (width + tile_size - 1) // tile_size * tile_size,
+    )
+
+
+def pad_frame(frame, tile_size: int = STREAM_TILE_SIZE):
+    # (h, w, c) -> a multiple of tile_size, no copy when it already is one
+    height, width = frame.shape[:2]
+    padded_height, padded_width = _padded_shape(height, width, tile_size)
+    if (padded_height, padded_width) == (height, width):
+        return frame
+    padded = np.zeros((padded_height, padded_width) + frame.shape[2:], frame.dtype)
+    padded[:height, :width] = frame
+    return padded
+
+
+def tile_view(frame, tile_size: int = STREAM_TILE_SIZE):
+    # padded (h, w, c) -> (rows, columns, tile_size, tile_size, c) view
+    height, width, channels = frame.shape
+    return frame.reshape(
+        height // tile_size, tile_size, width // tile_size, tile_size, channels
+    ).swapaxes(1, 2)
+
+
+def changed_tiles(previous, frame, tile_size: int = STREAM_TILE_SIZE):
+    # flat indices (row-major) of the tiles that differ, all of them without 'previous'
+    rows = frame.shape[0] // tile_size
+    columns = frame.shape[1] // tile_size
+    if previous is None or previous.shape != frame.shape:
+        return np.arange(rows * columns, dtype=np.uint32)
+    # compare as uint32 pixels: one comparison per rgba8 pixel
+    difference = frame.view(np.uint32) != previous.view(np.uint32)
+    changed = difference.reshape(rows, tile_size, columns, tile_size).any(axis=(1, 3))
+    return np.flatnonzero(changed).astype(np.uint32)
+
+
+def gather_tiles(frame, indices, tile_size: int = STREAM_TILE_SIZE):
+    # (n, tile_size, tile_size, c) contiguous copy of the indexed tiles
+    tiles = tile_view(frame, tile_size)
+    columns = tiles.shape[1]
+    return np.ascontiguousarray(tiles[indices // columns, indices % columns])
+
+
+def scatter_tiles(frame, indices, tiles, tile_size: int = STREAM_TILE_SIZE):
+    view = tile_view(frame, tile_size)
+    columns = view.shape[1]
+    view[indices // columns, indices % columns] = tiles
+
+
+def _compress_chunk(indices, tiles, level):
+    # runs on the pool
+    data = zlib.compress(tiles.tobytes(), level)
+    return (
+        STREAM_CHUNK_HEADER.pack(len(indices), len(data))
+        + indices.astype("<u4").tobytes()
+        + data
+    )
+
+
+def stream_message(message_type: int, payload: bytes) -> bytes:
+    return (
+        STREAM_MESSAGE_HEADER.pack(STREAM_MAGIC, message_type, len(payload)) + payload
+    )
+
+
+async def read_stream_message(reader: asyncio.StreamReader):
+    # (type, payload), raises asyncio.IncompleteReadError once the peer is gone
+    magic, message_type, size = STREAM_MESSAGE_HEADER.unpack(
+        await reader.readexactly(STREAM_MESSAGE_HEADER.size)
+    )
+    if magic != STREAM_MAGIC:
+        raise ConnectionError("viewport stream: bad message magic")
+    return message_type, await reader.readexactly(size)
+
+
+class ViewportStreamStats:
+    def __init__(self):
+        self.frames_submitted = 0
+        self.frames_sent = 0
+        self.tiles_sent = 0
+        self.bytes_sent = 0
+        # bytes the sent frames would have taken uncompressed and complete
+        self.raw_bytes = 0
+
+
+class _StreamClient:
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        # padded copy of the last frame sent to this client, None: send a keyframe
+        self.previous = None
+        self.new_frame = asyncio.Event()
+
+
+class ViewportStreamServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = STREAM_DEFAULT_PORT,
+        tile_size: int = STREAM_TILE_SIZE,
+        num_workers: int = None,
+        compression_level: int = 1,
+        tiles_per_chunk: int = 256,
+    ):
+        self.host = host
+        self.port = port
+        self.tile_size = tile_size
+        self.compression_level = compression_level
+        self.tiles_per_chunk = tiles_per_chunk
+        self.pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=num_workers or min(4, os.cpu_count() or 1)
+        )
+        self.stats = ViewportStreamStats()
+
+        # (frame index, (h, w, 4) uint8) submitted last, read by every client
+        self.latest = None
+        self.clients = []
+
+        # camera input from the clients, summed until the render loop polls it
+        self.input_lock = threading.Lock()
+        self.input = [0.0] * len(STREAM_INPUT_FIELDS)
+
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        # serves on a background thread, returns once the socket listens
+        started = threading.Event()
+        failure = []
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            try:
+                self.server = self.loop.run_until_complete(
+                    asyncio.start_server(self._serve_client, self.host, self.port)
+                )
+            except OSError as error:
+                failure.append(error)
+                started.set()
+                self.loop.close()
+                return
+            # port 0: the os picked one
+            self.port = self.server.sockets[0].getsockname()[1]
+            started.set()
+            self.loop.run_forever()
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, name="viewport_stream", daemon=True)
+        self.thread.start()
+        started.wait()
+        if failure:
+            raise failure[0]
+        return self
+
+    def submit(self, frame_index: int, frame):
+        # render thread: frame is owned by the server from now on (pass a copy)
+        self.stats.frames_submitted += 1
+        self.loop.call_soon_threadsafe(self._on_frame, frame_index, frame)
+
+    def poll_input(self):
+        # render thread: input deltas since the last poll, in STREAM_INPUT_FIELDS order
+        with self.input_lock:
+            deltas = tuple(self.input)
+            self.input = [0.0] * len(STREAM_INPUT_FIELDS)
+        return deltas
+
+    @property
+    def num_clients(self) -> int:
+        return len(self.clients)
+
+    def _on_frame(self, frame_index, frame):
+        self.latest = (frame_index, frame)
+        for client in self.clients:
+            client.new_frame.set()
+
+    async def _serve_client(self, reader, writer):
+        client = _StreamClient(writer)
+        self.clients.append(client)
+        if self.latest is not None:
+            client.new_frame.set()
+        sender = asyncio.create_task(self._send_frames(client))
+        try:
+            while True:
+                message_type, payload = await read_stream_message(reader)
+                if message_type == STREAM_MESSAGE_INPUT:
+                    deltas = STREAM_INPUT.unpack(payload)
+                    with self.input_lock:
+                        for index, delta in enumerate(deltas):
+                            self.input[index] += delta
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            sender.cancel()
+            self.clients.remove(client)
+            writer.close()
+
+    async def _send_frames(self, client: _StreamClient):
+        try:
+            while True:
+                await client.new_frame.wait()
+                client.new_frame.clear()
+                frame_index, frame = self.latest
+                message, client.previous = await self._encode(
+                    client.previous, frame_index, frame
+                )
+                client.writer.write(message)
+                # frames submitted meanwhile collapse into the latest one
+                await client.writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _encode(self, previous, frame_index, frame):
+        # delta against the client's previous frame, chunks compressed in parallel
+        height, width = frame.shape[:2]
+        padded, indices, tiles = await self.loop.run_in_executor(
+            self.pool, self._diff, previous, frame
+        )
+        chunks = await asyncio.gather(
+            *[
+                self.loop.run_in_executor(
+                    self.pool,
+                    _compress_chunk,
+                    indices[begin : begin + self.tiles_per_chunk],
+                    tiles[begin : begin + self.tiles_per_chunk],
+                    self.compression_level,
+                )
+                for begin in range(0, len(indices), self.tiles_per_chunk)
+            ]
+        )
+        payload = b"".join(
+            [
+                STREAM_FRAME_HEADER.pack(
+                    frame_index, width, height, self.tile_size, len(chunks)
+                )
+            ]
+            + chunks
+        )
+
+        stats = self.stats
+        stats.frames_sent += 1
+        stats.tiles_sent += len(indices)
+        stats.bytes_sent += STREAM_MESSAGE_HEADER.size + len(payload)
+        stats.raw_bytes += frame.nbytes
+        # the padded frame is the client's next reference, it is never written again
+        return stream_message(STREAM_MESSAGE_FRAME, payload), padded
+
+    def _diff(self, previous, frame):
+        # pool thread
+        padded = pad_frame(frame, self.tile_size)
+        indices = changed_tiles(previous, padded, self.tile_size)
+        return padded, indices, gather_tiles(padded, indices, self.tile_size)
+
+    def report(self):
+        stats = self.stats
+        print(
+            f"viewport stream: {stats.frames_sent} frames sent "
+            f"({stats.frames_submitted} submitted), "
+            f"{stats.bytes_sent / max(stats.frames_sent, 1) / 1024:.1f}KiB per frame, "
+            f"{stats.raw_bytes / max(stats.bytes_sent, 1):.1f}x smaller than raw"
+        )
+
+    def stop(self):
+        async def shutdown():
+            self.server.close()
+            for client in list(self.clients):
+                client.writer.close()
+            await self.server.wait_closed()
+
+        if self.loop is not None and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(timeout=5.0)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+        self.pool.shutdown()
+
+
+class ViewportStreamClient:
+    # reference client: rebuilds the frames, sends camera input
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        # padded (h, w, 4) uint8, see image()
+        self.frame = None
+        self.width = 0
+        self.height = 0
+        self.frame_index = -1
+        self.bytes_received = 0
+        self.tiles_received = 0
+
+    async def connect(self, host: str = "127.0.0.1", port: int = STREAM_DEFAULT_PORT):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        return self
+
+    def image(self):
+        return self.frame[: self.height, : self.width]
+
+    async def receive_frame(self) -> int:
+        # next frame applied to self.frame, returns its frame index
+        while True:
+            message_type, payload = await read_stream_message(self.reader)
+            self.bytes_received += STREAM_MESSAGE_HEADER.size + len(payload)
+            if message_type == STREAM_MESSAGE_FRAME:
+                break
+
+        frame_index, width, height, tile_size, num_chunks = (
+            STREAM_FRAME_HEADER.unpack_from(payload)
+        )
+        padded_shape = _padded_shape(height, width, tile_size) + (4,)
+        if self.frame is None or self.frame.shape != padded_shape:
+            self.frame = np.zeros(padded_shape, dtype=np.uint8)
+        self.width = width
+        self.height = height
+
+        offset = STREAM_FRAME_HEADER.size
+        for _ in range(num_chunks):
+            num_tiles, size = STREAM_CHUNK_HEADER.unpack_from(payload, offset)
+            offset += STREAM_CHUNK_HEADER.size
+            indices = np.frombuffer(
+                payload, dtype="<u4", count=num_tiles, offset=offset
+            )
+            offset += num_tiles * 4
+            tiles = np.frombuffer(
+                zlib.decompress(payload[offset : offset + size]), dtype=np.uint8
+            ).reshape(num_tiles, tile_size, tile_size, 4)
+            offset += size
+            scatter_tiles(self.frame, indices, tiles, tile_size)
+            self.tiles_received += num_tiles
+
+        self.frame_index = frame_index
+        return frame_index
+
+    async def send_input(
+        self,
+        azimuth_delta=0.0,
+        altitude_delta=0.0,
+        offset_delta_x=0.0,
+        offset_delta_y=0.0,
+        mouse_wheel=0.0,
+    ):
+        self.writer.write(
+            stream_message(
+                STREAM_MESSAGE_INPUT,
+                STREAM_INPUT.pack(
+                    azimuth_delta,
+                    altitude_delta,
+                    offset_delta_x,
+                    offset_delta_y,
+                    mouse_wheel,
+                ),
+            )
+        )
+        await self.writer.drain()
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def _synthetic_frame(frame_index, width, height):
+    # static gradient background with a moving square: a typical partial update
+    y, x = np.mgrid[0:height, 0:width]
+    frame = np.empty((height, width, 4), dtype=np.uint8)
+    frame[..., 0] = x * 255 // max(width - 1, 1)
+    frame[..., 1] = y * 255 // max(height - 1, 1)
+    frame[..., 2] = 64
+    frame[..., 3] = 255
+    left = (frame_index * 8) % max(width - 96, 1)
+    frame[200:296, left : left + 96, :3] = (255, 255, 255)
+    return frame
+
+
+def self_test(num_frames: int = 120, width: int = 1280, height: int = 720):
+    # server + reference client over localhost: every received frame must match
+    server = ViewportStreamServer(port=0).start()
+
+    async def client_main():
+        client = await ViewportStreamClient().connect(port=server.port)
+        # wait until the server registered the client
+        while server.num_clients == 0:
+            await asyncio.sleep(0.001)
+
+        begin = time.perf_counter()
+        mismatches = 0
+        for frame_index in range(num_frames):
+            frame = _synthetic_frame(frame_index, width, height)
+            server.submit(frame_index, frame.copy())
+            received = await client.receive_frame()
+            if received != frame_index or not np.array_equal(client.image(), frame):
+                mismatches += 1
+            await client.send_input(azimuth_delta=1.0)
+        elapsed = time.perf_counter() - begin
+        await client.close()
+        return client, mismatches, elapsed
+
+    client, mismatches, elapsed = asyncio.run(client_main())
+    deltas = server.poll_input()
+    server.report()
+    server.stop()
+    print(
+        f"self-test: {num_frames} frames in {elapsed:.2f}s, {mismatches} mismatches, "
+        f"{client.tiles_received / num_frames:.0f} tiles per frame, "
+        f"input azimuth delta {deltas[0]:.0f}"
+    )
+    return mismatches == 0
+
+
+def view_stream(host: str, port: int):
+    # reference viewer: the stream in a raylib window, ctrl + mouse drives the camera
+    import pyray as rl
+    import raylib as nrl
+
+    async def viewer_main():
+        client = await ViewportStreamClient().connect(host, port)
+        await client.receive_frame()
+        rl.init_window(client.width, client.height, b"SseEngine Viewport")
+        image = np.ascontiguousarray(client.image())
+        texture = rl.load_texture_from_image(
+            rl.Image(
+                nrl.ffi.from_buffer(image),
+                client.width,
+                client.height,
+                1,
+                rl.PIXELFORMAT_UNCOMPRESSED_R8G8B8A8,
+            )
+        )
+        frame = asyncio.create_task(client.receive_frame())
+        while not rl.window_should_close():
+            # non-blocking: draw the last complete frame
+            await asyncio.sleep(0)
+            if frame.done():
+                frame.result()
+                image[...] = client.image()
+                rl.update_texture(texture, nrl.ffi.from_buffer(image))
+                frame = asyncio.create_task(client.receive_frame())
+
+            dragging = rl.is_key_down(rl.KEY_LEFT_CONTROL)
+            delta = rl.get_mouse_delta()
+            rotate = dragging and rl.is_mouse_button_down(0)
+            pan = dragging and rl.is_mouse_button_down(1)
+            wheel = rl.get_mouse_wheel_move()
+            if rotate or pan or wheel != 0.0:
+                await client.send_input(
+                    delta.x if rotate else 0.0,
+                    delta.y if rotate else 0.0,
+                    delta.x if pan else 0.0,
+                    delta.y if pan else 0.0,
+                    wheel,
+                )
+
+            rl.begin_drawing()
+            rl.draw_texture(texture, 0, 0, rl.WHITE)
+            rl.end_drawing()
+        frame.cancel()
+        rl.unload_texture(texture)
+        rl.close_window()
+        await client.close()
+
+    asyncio.run(viewer_main())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SseEngine viewport stream")
+    parser.add_argument("--self-test", action="store_true")
+    parser.add_argument("--connect", default=None, help="HOST:PORT of run.py --stream")
+    args = parser.parse_args()
+
+    if args.connect is not None:
+        host, _, port = args.connect.rpartition(":")
+        view_stream(host or "127.0.0.1", int(port))
+    else:
+        raise SystemExit(0 if self_test() else 1)